@@ -0,0 +1,100 @@
+"""Concurrency and memory per in-flight request: threaded SqlAlchemyRepository path vs. aiosqlite async path.
+
+Each simulated request makes the reads of a movies page: 3 movies, their reviews, 3 featured movies and the genres.
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_async_repository
+"""
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+from movie_app.adapters import database_repository
+from movie_app.adapters.async_database_repository import AsyncSqliteRepository
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.adapters.orm import metadata, map_model_to_tables
+from movie_app.movies import services, async_movies
+from movie_app.utilities import services as utilities_services
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+IN_FLIGHT = (1, 10, 50, 200)
+
+
+def populate(database):
+    engine = create_engine('sqlite:///' + database)
+    clear_mappers()
+    metadata.create_all(engine)
+    map_model_to_tables()
+    database_repository.populate(engine, DATA_PATH)
+    return engine
+
+
+def threaded_page(repo, rank_list):
+    movies = services.get_movies_by_rank(rank_list, repo)
+    for movie in movies:
+        movie['reviews'] = services.get_reviews_for_movie(movie['rank'], repo)
+    featured_movies = utilities_services.get_random_movies(3, repo)
+    genre_names = utilities_services.get_genre_names(repo)
+    repo.close_session()
+    return movies, featured_movies, genre_names
+
+
+def measure(run_requests):
+    """ Runs run_requests twice: once timed, once with tracemalloc tracing (which slows it down) for peak memory. """
+    start = time.perf_counter()
+    threads = run_requests()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run_requests()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, threads
+
+
+def bench_threaded(engine, in_flight):
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+
+    def run_requests():
+        pages = [random.sample(range(1, 1001), 3) for _ in range(in_flight)]
+        # One thread per in-flight request, as with a threaded WSGI server.
+        with ThreadPoolExecutor(max_workers=in_flight) as executor:
+            list(executor.map(lambda rank_list: threaded_page(repo, rank_list), pages))
+            return threading.active_count()
+    return measure(run_requests)
+
+
+def bench_async(database, in_flight):
+    async def run_requests(repo):
+        pages = [random.sample(range(1, 1001), 3) for _ in range(in_flight)]
+        await asyncio.gather(*[async_movies.read_movies_by_rank(rank_list, repo) for rank_list in pages])
+        return threading.active_count()
+
+    loop = asyncio.new_event_loop()
+    repo = AsyncSqliteRepository(database, pool_size=4)
+    try:
+        return measure(lambda: loop.run_until_complete(run_requests(repo)))
+    finally:
+        loop.run_until_complete(repo.close())
+        loop.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.db')
+        engine = populate(database)
+        print(f'{"in flight":>9} {"path":>8} {"pages/s":>9} {"KiB/request":>12} {"threads":>8}')
+        for in_flight in IN_FLIGHT:
+            for path, (elapsed, peak, threads) in (('threaded', bench_threaded(engine, in_flight)),
+                                                   ('async', bench_async(database, in_flight))):
+                print(f'{in_flight:9} {path:>8} {in_flight / elapsed:9.0f} {peak / in_flight / 1024:12.1f} '
+                      f'{threads:8}')
+        print('Each thread also reserves its own stack (threading.stack_size() or the OS default, typically 8 MiB '
+              'of virtual memory), which tracemalloc does not count.')
+
+
+if __name__ == '__main__':
+    main()
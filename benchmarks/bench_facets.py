@@ -0,0 +1,102 @@
+"""Facet query latency over a synthetic catalogue: in memory (BitmapIndex) and in SQLite (SqlAlchemyRepository).
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_facets
+"""
+import random
+import time
+from collections import namedtuple
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.adapters.bitmap_index import BitmapIndex
+from movie_app.adapters.facets import query_facets
+from movie_app.adapters.orm import metadata, map_model_to_tables
+from movie_app.adapters.repository import FacetFilter
+from movie_app.domain.model import Director, Genre
+
+MEMORY_MOVIES = 1000000
+DATABASE_MOVIES = 100000
+GENRES = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Drama', 'Family', 'Fantasy',
+          'History', 'Horror', 'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Sport', 'Thriller', 'War',
+          'Western']
+DIRECTORS = 50000
+ROUNDS = 20
+
+# Just the attributes the BitmapIndex reads, so that a million movies fit in memory comfortably.
+SyntheticMovie = namedtuple('SyntheticMovie', ['rank', 'release_year', 'rating', 'director', 'genres', 'actors'])
+
+FILTERS = [
+    FacetFilter(),
+    FacetFilter(('Drama',)),
+    FacetFilter(('Action', 'Comedy'), 2010),
+    FacetFilter(('Horror',), 1990, None, 6),
+    FacetFilter((), None, 'Director 42'),
+]
+
+
+def synthetic_movies(number_of_movies):
+    generator = random.Random(235)
+    genres = [Genre(name) for name in GENRES]
+    directors = [Director(f'Director {i}') for i in range(DIRECTORS)]
+    for rank in range(1, number_of_movies + 1):
+        yield SyntheticMovie(rank, generator.randint(1950, 2019), round(generator.uniform(1, 10), 1),
+                             directors[generator.randrange(DIRECTORS)],
+                             generator.sample(genres, generator.randint(1, 3)), ())
+
+
+def time_queries(query):
+    for facet_filter in FILTERS:
+        query(facet_filter)     # Warm up.
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            facets = query(facet_filter)
+        elapsed = (time.perf_counter() - start) / ROUNDS
+        print(f'  {elapsed * 1000:8.2f} ms  {facets.number_of_movies:7} matches, {len(facets.directors):5} directors  '
+              f'{facet_filter}')
+
+
+def bench_memory():
+    movies = list(synthetic_movies(MEMORY_MOVIES))
+    start = time.perf_counter()
+    index = BitmapIndex().with_movies(movies)
+    print(f'in memory, {MEMORY_MOVIES} movies (index built in {time.perf_counter() - start:.1f}s)')
+    # The first query of an index makes its genre, decade and rating band ints, and its list of directors by rank.
+    start = time.perf_counter()
+    query_facets(index, FILTERS[1], 0, 3)
+    print(f'  {(time.perf_counter() - start) * 1000:8.2f} ms  first query')
+    time_queries(lambda facet_filter: query_facets(index, facet_filter, 0, 3))
+
+
+def bench_database():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    clear_mappers()
+    map_model_to_tables()
+    movies = list(synthetic_movies(DATABASE_MOVIES))
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.executemany('INSERT INTO genres (id, genre_name) VALUES (?, ?)', enumerate(GENRES, 1))
+    cursor.executemany('INSERT INTO directors (id, director_full_name) VALUES (?, ?)',
+                       [(i + 1, f'Director {i}') for i in range(DIRECTORS)])
+    cursor.executemany('INSERT INTO movies (id, title, release_year, description, director_id, runtime_minutes, '
+                       'rating) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       [(movie.rank, f'Movie {movie.rank}', movie.release_year, '',
+                         int(movie.director.director_full_name.split()[1]) + 1, 100, movie.rating) for movie in movies])
+    cursor.executemany('INSERT INTO movie_genres (movie_id, genre_id) VALUES (?, ?)',
+                       [(movie.rank, GENRES.index(genre.genre_name) + 1) for movie in movies for genre in movie.genres])
+    connection.commit()
+    connection.close()
+
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+    print(f'in SQLite, {DATABASE_MOVIES} movies')
+    time_queries(lambda facet_filter: repo.get_movie_facets(facet_filter, 0, 3))
+    clear_mappers()
+
+
+def main():
+    bench_memory()
+    bench_database()
+
+
+if __name__ == '__main__':
+    main()
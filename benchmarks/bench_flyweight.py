@@ -0,0 +1,74 @@
+"""Movies sharing one Director, Genre and Actor per name (EntityRegistry) compared with each movie having its own
+copies, as MovieFileCSVReader used to make them: the memory the parsed catalogue takes, and the time taken by
+membership checks such as genre in movie.genres.
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_flyweight
+"""
+import csv
+import os
+import time
+import tracemalloc
+from movie_app.domain.model import Director, Genre, Actor, EntityRegistry, parse_movies
+
+FILENAME = os.path.join('movie_app', 'adapters', 'data', 'Data1000Movies.csv')
+ROUNDS = 20
+
+
+class CopyingRegistry:
+    """ Makes a new Director, Genre or Actor for every appearance of a name. """
+
+    def director(self, director_full_name):
+        return Director(director_full_name)
+
+    def genre(self, genre_name):
+        return Genre(genre_name)
+
+    def actor(self, actor_full_name):
+        return Actor(actor_full_name)
+
+
+def parse(registry):
+    with open(FILENAME, mode='r', encoding='utf-8-sig') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        tracemalloc.start()
+        movies = list(parse_movies({name: index for index, name in enumerate(header)}, reader, registry))
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return movies, size
+
+
+def timed_checks(checks):
+    start = time.perf_counter()
+    for round in range(ROUNDS):
+        for entity, entities in checks:
+            entity in entities
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def membership_checks(movies):
+    # The genres and actors of the catalogue, each as first found on a movie, checked against every movie that has
+    # them (hits), and the genres checked against every movie (mostly misses).
+    genres = {genre.genre_name: genre for movie in reversed(movies) for genre in movie.genres}
+    actors = {actor.actor_full_name: actor for movie in reversed(movies) for actor in movie.actors}
+    hits = [(genres[genre.genre_name], movie.genres) for movie in movies for genre in movie.genres] + \
+        [(actors[actor.actor_full_name], movie.actors) for movie in movies for actor in movie.actors]
+    all_genres = [(genre, movie.genres) for movie in movies for genre in genres.values()]
+    return timed_checks(hits), timed_checks(all_genres)
+
+
+def main():
+    results = dict()
+    for name, registry in (('copies', CopyingRegistry()), ('shared', EntityRegistry())):
+        movies, size = parse(registry)
+        objects = len({id(person) for movie in movies for person in [movie.director] + movie.actors + movie.genres})
+        results[name] = (size,) + membership_checks(movies)
+        print(f'{name:<7} {objects:>5} directors, actors and genres  {size / 1e6:>5.2f} MB  '
+              f'hits {results[name][1]:>6.2f} ms  every genre against every movie {results[name][2]:>6.2f} ms')
+    (copies_size, copies_hits, copies_all), (shared_size, shared_hits, shared_all) = \
+        results['copies'], results['shared']
+    print(f'saved {(copies_size - shared_size) / 1e6:.2f} MB ({1 - shared_size / copies_size:.0%}); membership checks '
+          f'{copies_hits / shared_hits:.1f}x faster for hits, {copies_all / shared_all:.1f}x for every genre')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Fuzzy matching latency over a synthetic catalogue: in memory (TrigramIndex) and in SQLite (name_trigrams).
+
+Titles are made of words from the real titles, and names of real first and last names, so that trigrams are about
+as common as in the real catalogue. Each query is a title or name with a typo in it.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_fuzzy
+"""
+import os
+import random
+import time
+from collections import namedtuple
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+from movie_app.adapters.database_repository import SqlAlchemyRepository, index_missing_names
+from movie_app.adapters.fuzzy import TrigramIndex
+from movie_app.adapters.orm import metadata, map_model_to_tables
+from movie_app.domain.model import Director, Actor, MovieFileCSVReader
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data', 'Data1000Movies.csv')
+MEMORY_MOVIES = 200000
+DATABASE_MOVIES = 100000
+PEOPLE = 20000
+ROUNDS = 20
+
+# Just the attributes the TrigramIndex reads.
+SyntheticMovie = namedtuple('SyntheticMovie', ['rank', 'title', 'votes', 'director', 'actors'])
+
+
+def synthetic_catalogue(number_of_movies):
+    reader = MovieFileCSVReader(DATA_PATH)
+    reader.read_csv_file()
+    words = sorted({word for movie in reader.dataset_of_movies for word in movie.title.split()})
+    names = [person.director_full_name for person in reader.dataset_of_directors] + \
+            [person.actor_full_name for person in reader.dataset_of_actors]
+    first_names = sorted({name.split()[0] for name in names})
+    last_names = sorted({name.split()[-1] for name in names})
+
+    generator = random.Random(235)
+    people = sorted({f'{generator.choice(first_names)} {generator.choice(last_names)}' for _ in range(PEOPLE)})
+    directors = [Director(name) for name in people]
+    actors = [Actor(name) for name in people]
+    movies = [SyntheticMovie(rank, ' '.join(generator.choice(words) for _ in range(generator.randint(1, 5))),
+                             generator.randint(0, 1000000), directors[generator.randrange(len(directors))],
+                             generator.sample(actors, 3))
+              for rank in range(1, number_of_movies + 1)]
+    return movies, people
+
+
+def with_typo(generator, name):
+    # Swaps two neighbouring letters, the most common typo.
+    position = generator.randrange(len(name) - 1)
+    return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+
+def queries_for(movies, people):
+    generator = random.Random(42)
+    names = [movie.title for movie in generator.sample(movies, 10) if len(movie.title) > 3] + \
+        generator.sample(people, 10)
+    return [with_typo(generator, name) for name in names]
+
+
+def time_queries(queries, search):
+    for query in queries:
+        search(query)   # Warm up.
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in queries:
+            search(query)
+    elapsed = (time.perf_counter() - start) / (ROUNDS * len(queries))
+    print(f'  {elapsed * 1000:8.2f} ms per query, e.g. {queries[0]!r} -> {search(queries[0])[:1]}')
+
+
+def bench_memory():
+    movies, people = synthetic_catalogue(MEMORY_MOVIES)
+    start = time.perf_counter()
+    index = TrigramIndex().with_movies(movies)
+    print(f'in memory, {MEMORY_MOVIES} movies (index built in {time.perf_counter() - start:.1f}s)')
+    time_queries(queries_for(movies, people), lambda query: index.search(query, 10))
+
+
+def bench_database():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    clear_mappers()
+    map_model_to_tables()
+    movies, people = synthetic_catalogue(DATABASE_MOVIES)
+    person_ids = {name: i for i, name in enumerate(people, 1)}
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.executemany('INSERT INTO directors (id, director_full_name) VALUES (?, ?)',
+                       [(i, name) for name, i in person_ids.items()])
+    cursor.executemany('INSERT INTO actors (id, actor_full_name) VALUES (?, ?)',
+                       [(i, name) for name, i in person_ids.items()])
+    cursor.executemany('INSERT INTO movies (id, title, release_year, description, director_id, runtime_minutes, '
+                       'votes) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       [(movie.rank, movie.title, 2000, '', person_ids[movie.director.director_full_name], 100,
+                         movie.votes) for movie in movies])
+    cursor.executemany('INSERT INTO movie_actors (movie_id, actor_id) VALUES (?, ?)',
+                       [(movie.rank, person_ids[actor.actor_full_name]) for movie in movies for actor in movie.actors])
+    start = time.perf_counter()
+    index_missing_names(cursor)
+    connection.commit()
+    connection.close()
+
+    repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+    print(f'in SQLite, {DATABASE_MOVIES} movies (name_trigrams filled in {time.perf_counter() - start:.1f}s)')
+    time_queries(queries_for(movies, people), lambda query: repo.get_fuzzy_matches(query, 10))
+    clear_mappers()
+
+
+def main():
+    bench_memory()
+    bench_database()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Per-call overhead of the repository's hot queries on SQLite: each query as it used to be, built and compiled on
+every call, and as SqlAlchemyRepository makes it now, baked or prebuilt and compiled once.
+
+get_movie_ranks_for_genre also went from two statements (the genre's id, then its movies) to one join.
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_hot_queries
+"""
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers, joinedload, selectinload
+from movie_app.adapters import database_repository
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.adapters.orm import metadata, map_model_to_tables
+from movie_app.domain.model import Movie, User
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+CALLS = 2000
+RANKS = list(range(1, 11))
+
+
+def movie_query(session, collection_loader):
+    return session.query(Movie).options(joinedload(Movie._Movie__director), collection_loader(Movie._Movie__actors),
+                                        collection_loader(Movie._Movie__genres))
+
+
+def genre_ranks_before(session, genre_name):
+    row = session.execute('SELECT id FROM genres WHERE genre_name = :genre_name',
+                          {'genre_name': genre_name}).fetchone()
+    if row is None:
+        return []
+    rows = session.execute('SELECT movie_id FROM movie_genres WHERE genre_id = :genre_id ORDER BY movie_id ASC',
+                           {'genre_id': row[0]}).fetchall()
+    return [rank[0] for rank in rows]
+
+
+def watch_totals_before(session, username):
+    row = session.execute('SELECT id, movies_watched, time_spent_watching_movies_minutes FROM users '
+                          'WHERE username = :username', {'username': username}).fetchone()
+    return session.execute(
+        'SELECT genres.genre_name, watch_time_by_genre.minutes FROM watch_time_by_genre '
+        'JOIN genres ON genres.id = watch_time_by_genre.genre_id WHERE watch_time_by_genre.user_id = :user_id',
+        {'user_id': row[0]}).fetchall()
+
+
+def per_call_us(session, call):
+    start = time.perf_counter()
+    for i in range(CALLS):
+        call(i)
+        # Objects loaded by one call mustn't answer the next from the identity map.
+        session.expunge_all()
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine('sqlite:///' + os.path.join(directory, 'movies.db'))
+        clear_mappers()
+        metadata.create_all(engine)
+        map_model_to_tables()
+        database_repository.populate(engine, DATA_PATH)
+        repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+        session = repo._session_cm.session()
+        user = repo.get_user('nton939')
+        genres = ['Action', 'Comedy', 'Drama', 'Horror']
+
+        queries = (
+            ('get_movie_ranks_for_genre',
+             lambda i: genre_ranks_before(session, genres[i % 4]),
+             lambda i: repo.get_movie_ranks_for_genre(genres[i % 4])),
+            ('get_movie',
+             lambda i: movie_query(session, joinedload).get(i % 1000 + 1),
+             lambda i: repo.get_movie(i % 1000 + 1)),
+            ('get_movies_by_rank (10)',
+             lambda i: movie_query(session, selectinload).filter(Movie._Movie__rank.in_(RANKS)).all(),
+             lambda i: repo.get_movies_by_rank(RANKS)),
+            ('get_user',
+             lambda i: session.query(User).filter_by(_User__user_name='nton939').one(),
+             lambda i: repo.get_user('nton939')),
+            ('get_watch_totals',
+             lambda i: watch_totals_before(session, 'nton939'),
+             lambda i: repo.get_watch_totals(user)),
+        )
+        for name, before, after in queries:
+            before_us = per_call_us(session, before)
+            after_us = per_call_us(session, after)
+            print(f'{name:<26} before {before_us:>8.1f} us/call  after {after_us:>8.1f} us/call  '
+                  f'({before_us / after_us:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
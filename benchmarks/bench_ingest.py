@@ -0,0 +1,81 @@
+"""Ingesting a large catalogue with 1, 2, 4 and 8 worker processes: parsing the movie file alone, and populating the
+memory and database repositories from it.
+
+The catalogue is the bundled movie file repeated COPIES times, with new ranks and titles; the people and genres are
+shared between copies. With 1 worker the file is parsed in this process, as it always used to be.
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_ingest
+"""
+import csv
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine
+from movie_app.adapters import database_repository, memory_repository, parallel_ingest
+from movie_app.adapters.memory_repository import MemoryRepository
+from movie_app.adapters.orm import metadata
+from movie_app.domain.model import MovieFileCSVReader, parse_movies
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+COPIES = 20
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def write_catalogue(directory):
+    with open(os.path.join(DATA_PATH, 'Data1000Movies.csv'), mode='r', encoding='utf-8-sig') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        rows = list(reader)
+    rank, title = header.index('Rank'), header.index('Title')
+    with open(os.path.join(directory, 'Data1000Movies.csv'), mode='w', encoding='utf-8', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        for copy in range(COPIES):
+            for row in rows:
+                row = list(row)
+                row[rank] = str(copy * len(rows) + int(row[rank]))
+                row[title] = f'{row[title]} {copy}' if copy else row[title]
+                writer.writerow(row)
+    return os.path.getsize(os.path.join(directory, 'Data1000Movies.csv'))
+
+
+def parse(filename, workers):
+    if workers == 1:
+        return sum(1 for movie in MovieFileCSVReader(filename).iter_movies())
+    return sum(len(chunk) for chunk in parallel_ingest.map_chunks(filename, parse_movies, workers))
+
+
+def populate_memory(directory, workers):
+    memory_repository.populate(directory, MemoryRepository(), workers)
+
+
+def populate_database(directory, workers):
+    engine = create_engine('sqlite:///' + os.path.join(directory, f'movies-{workers}.db'))
+    metadata.create_all(engine)
+    database_repository.populate(engine, directory, workers)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f'{os.cpu_count()} CPUs')
+    with tempfile.TemporaryDirectory() as directory:
+        size = write_catalogue(directory)
+        print(f'{COPIES * 1000} movies, {size / 1e6:.1f} MB')
+        filename = os.path.join(directory, 'Data1000Movies.csv')
+        baselines = dict()
+        for workers in WORKER_COUNTS:
+            line = f'{workers} workers'
+            for name, function, argument in (('parse', parse, filename), ('memory', populate_memory, directory),
+                                             ('database', populate_database, directory)):
+                seconds = timed(function, argument, workers)
+                baselines.setdefault(name, seconds)
+                line += f'  {name} {seconds:>6.2f} s ({baselines[name] / seconds:.1f}x)'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
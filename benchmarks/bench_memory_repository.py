@@ -0,0 +1,87 @@
+"""Read throughput of the MemoryRepository with several reader threads, with and without a concurrent writer.
+
+The copy-on-write repository is compared with a variant that serializes reads with the writers' lock.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_memory_repository
+"""
+import os
+import threading
+import time
+from movie_app.adapters import memory_repository
+from movie_app.adapters.memory_repository import MemoryRepository
+from movie_app.domain.model import Review, User
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+DURATION = 1.0
+READER_THREADS = [1, 4, 8]
+
+
+class LockedReadsRepository(MemoryRepository):
+    """ Takes the writers' lock for every read, as a repository without copy-on-write would have to. """
+
+    def get_movie(self, rank: int):
+        with self._write_lock:
+            return super().get_movie(rank)
+
+    def get_movies_by_rank(self, rank_list):
+        with self._write_lock:
+            return super().get_movies_by_rank(rank_list)
+
+    def get_user(self, username: str):
+        with self._write_lock:
+            return super().get_user(username)
+
+
+def read_page(repo, cursor):
+    # The repository reads of a movies page: three movies, a featured movie and the signed-in user.
+    ranks = [cursor % 1000 + 1, (cursor + 1) % 1000 + 1, (cursor + 2) % 1000 + 1]
+    repo.get_movies_by_rank(ranks)
+    repo.get_movie((cursor * 7) % 1000 + 1)
+    repo.get_user('nton939')
+
+
+def bench(repo_class, reader_threads, with_writer):
+    repo = repo_class()
+    memory_repository.populate(DATA_PATH, repo)
+    stop = threading.Event()
+    pages = [0] * reader_threads
+
+    def read(index):
+        cursor = index
+        while not stop.is_set():
+            read_page(repo, cursor)
+            cursor += 3
+            pages[index] += 1
+
+    def write():
+        count = 0
+        while not stop.is_set():
+            count += 1
+            repo.add_review(Review(repo.get_movie(count % 1000 + 1), 'Great movie', 8))
+            repo.add_user(User(f'bench{count}', 'password'))
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=read, args=(index,)) for index in range(reader_threads)]
+    if with_writer:
+        threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(pages) / DURATION
+
+
+def main():
+    for with_writer in (False, True):
+        print('with a concurrent writer' if with_writer else 'reads only')
+        for reader_threads in READER_THREADS:
+            copy_on_write = bench(MemoryRepository, reader_threads, with_writer)
+            locked = bench(LockedReadsRepository, reader_threads, with_writer)
+            print(f'  {reader_threads} reader threads: copy-on-write {copy_on_write:9.0f} pages/s, '
+                  f'locked reads {locked:9.0f} pages/s')
+
+
+if __name__ == '__main__':
+    main()
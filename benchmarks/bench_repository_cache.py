@@ -0,0 +1,56 @@
+"""Latency of database-backed pages with and without the CachingRepository.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_repository_cache
+"""
+import os
+import tempfile
+import time
+from sqlalchemy.orm import clear_mappers
+from movie_app import create_app
+from movie_app.adapters import repository as repo
+from movie_app.adapters.query_recorder import QueryRecorder
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+PAGES = ['/movies_by_rank?cursor={}'.format(cursor) for cursor in range(0, 30, 3)] + \
+        ['/movies_by_genre?genre=Action', '/movies_by_genre?genre=Comedy&cursor=3', '/']
+ROUNDS = 20
+
+
+def bench_pages(directory, repository_cache):
+    clear_mappers()
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, f'bench-{repository_cache}.db'),
+        'SQLALCHEMY_ECHO': False,
+        'TEST_DATA_PATH': DATA_PATH,
+        'REPOSITORY_CACHE': repository_cache,
+        'REPOSITORY_CACHE_TTL': 0
+    })
+    client = app.test_client()
+    for page in PAGES:
+        client.get(page)    # Warm up: compile templates and fill the caches.
+
+    with QueryRecorder() as recorder:
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for page in PAGES:
+                client.get(page)
+        elapsed = time.perf_counter() - start
+    pages = ROUNDS * len(PAGES)
+    return elapsed / pages, recorder.count / pages, getattr(repo.repo_instance.repository, 'stats', None)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        uncached, uncached_statements, _ = bench_pages(directory, False)
+        cached, cached_statements, stats = bench_pages(directory, True)
+    print(f'without repository cache {uncached * 1000:7.3f} ms per page, {uncached_statements:5.1f} statements')
+    print(f'with repository cache    {cached * 1000:7.3f} ms per page, {cached_statements:5.1f} statements')
+    for method_name, method_stats in stats().items():
+        print(f'  {method_name:26} hits {method_stats["hits"]:6} misses {method_stats["misses"]:6} '
+              f'size {method_stats["size"]:5}')
+
+
+if __name__ == '__main__':
+    main()
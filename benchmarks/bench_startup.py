@@ -0,0 +1,83 @@
+"""Cold start: importing movie_app and creating the app, each in a fresh interpreter as a new worker process would.
+
+Reports the slowest imports (from python -X importtime), the time spent in each phase of create_app for the memory
+and database repositories, and which of the modules only needed to post a review, register or serve the async views
+were imported by browsing.
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_startup
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+RUNS = 5
+SLOWEST_IMPORTS = 15
+DEFERRED_MODULES = ('better_profanity', 'password_validator', 'aiosqlite')
+
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from movie_app import create_app
+imported = time.perf_counter()
+app = create_app(json.loads(sys.argv[1]))
+created = time.perf_counter()
+client = app.test_client()
+for path in ('/', '/movies_by_rank', '/movies_by_genre?genre=Action'):
+    client.get(path)
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'phases': app.extensions['startup_phases'],
+    'loaded': [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+}))
+'''
+
+
+def start(config):
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, json.dumps(config), json.dumps(DEFERRED_MODULES)],
+                            capture_output=True, check=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def slowest_imports():
+    # Each line of -X importtime output is "import time: self [us] | cumulative | imported package".
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import movie_app'], capture_output=True,
+                            check=True, text=True).stderr
+    imports = list()
+    for line in stderr.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        # Only packages imported directly by movie_app's own modules, or at the top level.
+        if len(name) - len(name.lstrip()) <= 3:
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:SLOWEST_IMPORTS]
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def bench(backend, config):
+    startups = [start(config) for run in range(RUNS)]
+    import_ms = median([startup['import'] for startup in startups]) * 1000
+    create_app_ms = median([startup['create_app'] for startup in startups]) * 1000
+    print(f'{backend:<9} import {import_ms:>7.1f} ms  create_app {create_app_ms:>7.1f} ms  '
+          f'deferred modules loaded: {", ".join(startups[0]["loaded"]) or "none"}')
+    for phase in startups[0]['phases']:
+        phase_ms = median([startup['phases'][phase] for startup in startups]) * 1000
+        print(f'          {phase:<24} {phase_ms:>7.1f} ms')
+
+
+def main():
+    for cumulative_ms, name in slowest_imports():
+        print(f'{cumulative_ms:>7.1f} ms  {name}')
+    config = {'TESTING': True, 'TEST_DATA_PATH': DATA_PATH, 'WTF_CSRF_ENABLED': False, 'METRICS_ENABLED': False}
+    bench('memory', dict(config, REPOSITORY='memory'))
+    with tempfile.TemporaryDirectory() as directory:
+        bench('database', dict(config, REPOSITORY='database', SQLALCHEMY_ECHO=False,
+                               SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(directory, 'movies.db')))
+
+
+if __name__ == '__main__':
+    main()
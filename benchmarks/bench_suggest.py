@@ -0,0 +1,57 @@
+"""Latency of type-ahead suggestions: SuggestIndex lookups, and whole /suggest requests through the Flask test client.
+
+Every prefix of a few titles and names is looked up, as if typed one keystroke at a time.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_suggest
+"""
+import os
+import time
+from movie_app import create_app
+from movie_app.adapters import memory_repository
+from movie_app.adapters.memory_repository import MemoryRepository
+from movie_app.domain.model import Movie
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+TYPED = ['The Dark Knight', 'Guardians of the Galaxy', 'Ridley Scott', 'Tom Hardy', 'Amelie', 'Zootopia']
+KEYSTROKES = [text[:length] for text in TYPED for length in range(1, len(text) + 1)]
+ROUNDS = 200
+
+
+def bench_index():
+    repo = MemoryRepository()
+    memory_repository.populate(DATA_PATH, repo)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for prefix in KEYSTROKES:
+            repo.get_suggestions(prefix, 10)
+    elapsed = (time.perf_counter() - start) / (ROUNDS * len(KEYSTROKES))
+    print(f'SuggestIndex lookup: {elapsed * 1e6:8.1f} us per keystroke')
+
+    start = time.perf_counter()
+    for rank in range(1001, 1101):
+        movie = Movie(f'Added Movie {rank}', 2021)
+        movie.rank = rank
+        repo.add_movie(movie)
+    print(f'add_movie:           {(time.perf_counter() - start) * 10:8.1f} ms per movie')
+
+
+def bench_requests():
+    app = create_app({'TESTING': True, 'TEST_DATA_PATH': DATA_PATH, 'WTF_CSRF_ENABLED': False,
+                      'REPOSITORY': 'memory', 'METRICS_ENABLED': False})
+    client = app.test_client()
+    rounds = ROUNDS // 10
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for prefix in KEYSTROKES:
+            client.get('/suggest', query_string={'q': prefix})
+    elapsed = (time.perf_counter() - start) / (rounds * len(KEYSTROKES))
+    print(f'/suggest request:    {elapsed * 1e3:8.2f} ms per keystroke ({1 / elapsed:.0f} requests/s)')
+
+
+def main():
+    bench_index()
+    bench_requests()
+
+
+if __name__ == '__main__':
+    main()
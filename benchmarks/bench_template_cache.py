@@ -0,0 +1,73 @@
+"""Render time saved by the movie-card fragment cache, and template compile time saved by the bytecode cache.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_template_cache
+"""
+import os
+import tempfile
+import time
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from movie_app import create_app
+from movie_app.fragment_cache import FragmentCacheExtension
+from movie_app.metrics import instrumentation
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+TEMPLATE_PATH = os.path.join('movie_app', 'templates')
+PAGES = ['/movies_by_rank?cursor={}'.format(cursor) for cursor in range(0, 30, 3)] + \
+        ['/movies_by_genre?genre=Action', '/movies_by_genre?genre=Comedy&cursor=3']
+ROUNDS = 20
+
+
+def bench_pages(fragment_cache_size):
+    app = create_app({
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': DATA_PATH,
+        'FRAGMENT_CACHE_SIZE': fragment_cache_size,
+        'TEMPLATE_BYTECODE_CACHE': False
+    })
+    client = app.test_client()
+    for page in PAGES:
+        client.get(page)    # Warm up: compile templates and fill the fragment cache.
+
+    rendered = instrumentation.TEMPLATE_RENDER_DURATION
+    render_before = rendered.sum(('movies/movies.html',))
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for page in PAGES:
+            client.get(page)
+    elapsed = time.perf_counter() - start
+    render_seconds = rendered.sum(('movies/movies.html',)) - render_before
+    pages = ROUNDS * len(PAGES)
+    return elapsed / pages, render_seconds / pages
+
+
+def bench_compile(bytecode_cache_dir):
+    # Each new Environment stands in for a freshly started worker process.
+    bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir) if bytecode_cache_dir else None
+    environment = Environment(loader=FileSystemLoader(TEMPLATE_PATH), extensions=[FragmentCacheExtension],
+                              bytecode_cache=bytecode_cache)
+    start = time.perf_counter()
+    for name in environment.list_templates():
+        environment.get_template(name)
+    return time.perf_counter() - start
+
+
+def main():
+    uncached_request, uncached_render = bench_pages(0)
+    hits_before = instrumentation.CACHE_HITS.value(('fragment',))
+    cached_request, cached_render = bench_pages(1024)
+    print(f'movies page render without fragment cache {uncached_render * 1000:7.3f} ms '
+          f'(request {uncached_request * 1000:7.3f} ms)')
+    print(f'movies page render with fragment cache    {cached_render * 1000:7.3f} ms '
+          f'(request {cached_request * 1000:7.3f} ms)')
+    print(f'render time saved per page                {(uncached_render - cached_render) * 1000:7.3f} ms '
+          f'({instrumentation.CACHE_HITS.value(("fragment",)) - hits_before} fragment hits)')
+
+    with tempfile.TemporaryDirectory() as directory:
+        cold = bench_compile(None)
+        bench_compile(directory)   # First worker fills the bytecode cache.
+        warm = bench_compile(directory)
+    print(f'template load in a new worker: compiled {cold * 1000:7.2f} ms, from bytecode cache {warm * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Per-page allocations and time spent turning movies into view models: rebuilt dicts vs. shared view models.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_view_models
+"""
+import os
+import random
+import time
+import tracemalloc
+from movie_app import create_app
+from movie_app.adapters import memory_repository
+from movie_app.adapters.memory_repository import MemoryRepository
+from movie_app.movies import services, view_models
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+PAGES = 2000
+ROUNDS = 20
+
+
+def build_pages(repo, to_views, pages):
+    # Each page shows 3 movies and 3 featured movies, and adds its URLs and reviews to the movies.
+    for rank_list, featured_ranks in pages:
+        movies = [view_models.for_page(movie, view_review_url='/movies_by_rank', add_review_url='/review',
+                                       reviews=[]) for movie in to_views(repo.get_movies_by_rank(rank_list))]
+        featured = [view_models.for_page(movie, hyperlink='/movies_by_rank')
+                    for movie in to_views(repo.get_movies_by_rank(featured_ranks))]
+        yield movies, featured
+
+
+def bench_build(repo, to_views):
+    pages = [(random.sample(range(1, 1001), 3), random.sample(range(1, 1001), 3)) for _ in range(PAGES)]
+    list(build_pages(repo, to_views, pages))   # Warm up, e.g. fill the view model cache.
+
+    start = time.perf_counter()
+    for _ in build_pages(repo, to_views, pages):
+        pass
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    allocated = 0
+    for _ in build_pages(repo, to_views, pages):
+        # The page's mappings are still alive here, so the traced memory is what the page allocated.
+        allocated += tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed / PAGES, allocated / PAGES
+
+
+def bench_requests(view_cache_size):
+    app = create_app({
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': DATA_PATH,
+        'MOVIE_VIEW_CACHE_SIZE': view_cache_size,
+        'FRAGMENT_CACHE_SIZE': 0,
+        'TEMPLATE_BYTECODE_CACHE': False
+    })
+    client = app.test_client()
+    urls = ['/movies_by_rank?cursor={}'.format(cursor) for cursor in range(0, 60, 3)]
+    for url in urls:
+        client.get(url)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for url in urls:
+            client.get(url)
+    return (time.perf_counter() - start) / (ROUNDS * len(urls))
+
+
+def main():
+    repo = MemoryRepository()
+    memory_repository.populate(DATA_PATH, repo)
+    view_models.movie_views = view_models.MovieViewCache()
+
+    dict_time, dict_bytes = bench_build(repo, services.movies_to_dict)
+    view_time, view_bytes = bench_build(repo, view_models.movie_views_for)
+    print(f'movie dicts rebuilt per page:  {dict_time * 1e6:7.1f} us, {dict_bytes / 1024:6.1f} KiB allocated per page')
+    print(f'shared view models:            {view_time * 1e6:7.1f} us, {view_bytes / 1024:6.1f} KiB allocated per page')
+
+    uncached = bench_requests(0)
+    cached = bench_requests(4096)
+    print(f'/movies_by_rank request without view model cache {uncached * 1000:6.3f} ms, with {cached * 1000:6.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
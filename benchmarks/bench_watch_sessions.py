@@ -0,0 +1,126 @@
+"""Group watch sessions with 10k members: building the group, fanning a review and a watch out to every member, and
+recording the fan-out in a repository.
+
+The MovieWatchingSimulation is compared with a variant that keeps the group in a list and searches each member's
+reviews and watched movies, as it used to, and batched writes (add_reviews, add_watches) with one write per member.
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_watch_sessions
+"""
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+from movie_app.adapters import database_repository, memory_repository
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.adapters.memory_repository import MemoryRepository
+from movie_app.adapters.orm import metadata, map_model_to_tables
+from movie_app.domain.model import Movie, MovieWatchingSimulation, Review, User
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+GROUP_SIZES = (1000, 10000)
+PASSWORD = 'pbkdf2:sha256:150000$abcdefgh$0123456789abcdef'
+
+
+class ListMovieWatchingSimulation:
+    """ Keeps the group in a list and checks each member's reviews and watched movies, as the simulation used to. """
+
+    def __init__(self, admin: User, movie: Movie):
+        self.movie_to_watch = movie
+        self.watch_group = [admin]
+
+    def add_user(self, user):
+        if user not in self.watch_group:
+            self.watch_group.append(user)
+
+    def write_review_for_everyone(self, review):
+        for user in self.watch_group:
+            if review not in user.reviews:
+                user.add_review(review)
+
+    def update_user_information(self):
+        for user in self.watch_group:
+            if self.movie_to_watch not in user.watched_movies:
+                user.watch_movie(self.movie_to_watch)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_simulation(simulation_class, group_size):
+    movie = Movie('Guardians of the Galaxy', 2014)
+    movie.runtime_minutes = 121
+    users = [User(f'member{i}', PASSWORD) for i in range(group_size)]
+    simulation = simulation_class(users[0], movie)
+
+    def join():
+        for user in users[1:]:
+            simulation.add_user(user)
+
+    def fan_out():
+        # A second review and watch reach nobody new, but the checks are made again.
+        for text in ('Loved it', 'Loved it again'):
+            simulation.write_review_for_everyone(Review(movie, text, 9))
+            simulation.update_user_information()
+
+    join_ms = timed(join)
+    fan_out_ms = timed(fan_out)
+    print(f'{simulation_class.__name__:<28} {group_size:>6} members  join {join_ms:>9.1f} ms  '
+          f'fan-out {fan_out_ms:>9.1f} ms')
+
+
+def memory_repo(group_size):
+    repo = MemoryRepository()
+    memory_repository.populate(DATA_PATH, repo)
+    for i in range(group_size):
+        repo.add_user(User(f'member{i}', PASSWORD))
+    return repo
+
+
+def database_repo(database, group_size):
+    engine = create_engine('sqlite:///' + database)
+    clear_mappers()
+    metadata.create_all(engine)
+    map_model_to_tables()
+    database_repository.populate(engine, DATA_PATH)
+    engine.execute('INSERT INTO users (username, password, time_spent_watching_movies_minutes) VALUES (?, ?, 0)',
+                   [(f'member{i}', PASSWORD) for i in range(group_size)])
+    return SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+
+
+def bench_persistence(backend, repo, group_size):
+    users = [User(f'member{i}', PASSWORD) for i in range(group_size)]
+
+    def one_at_a_time():
+        movie = repo.get_movie(2)
+        for user in users:
+            repo.add_watch(user, movie)
+        for user in users:
+            repo.add_review(Review(movie, 'Loved it', 9))
+
+    def batched():
+        movie = repo.get_movie(3)
+        repo.add_watches(users, movie)
+        repo.add_reviews([Review(movie, 'Loved it', 9) for user in users])
+
+    one_at_a_time_ms = timed(one_at_a_time)
+    batched_ms = timed(batched)
+    print(f'{backend:<10} {group_size:>6} members  one write per member {one_at_a_time_ms:>9.1f} ms  '
+          f'batched {batched_ms:>8.1f} ms  ({one_at_a_time_ms / batched_ms:.0f}x)')
+
+
+def main():
+    for group_size in GROUP_SIZES:
+        for simulation_class in (ListMovieWatchingSimulation, MovieWatchingSimulation):
+            bench_simulation(simulation_class, group_size)
+    with tempfile.TemporaryDirectory() as directory:
+        for group_size in GROUP_SIZES:
+            bench_persistence('memory', memory_repo(group_size), group_size)
+            database = os.path.join(directory, f'movies-{group_size}.db')
+            bench_persistence('sqlite', database_repo(database, group_size), group_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Write throughput and recovery time of the MemoryRepository write-ahead log.
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.bench_write_ahead_log
+"""
+import os
+import tempfile
+import time
+from movie_app.adapters import memory_repository
+from movie_app.adapters.memory_repository import MemoryRepository
+from movie_app.adapters.write_ahead_log import WriteAheadLog
+from movie_app.domain.model import Review, User
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+NUMBER_OF_WRITES = 5000
+
+
+def populated_repo():
+    repo = MemoryRepository()
+    memory_repository.populate(DATA_PATH, repo)
+    return repo
+
+
+def write_records(repo, count):
+    for i in range(count):
+        if i % 2 == 0:
+            repo.add_user(User(f'user{i}', 'pbkdf2:sha256:150000$abcdefgh$0123456789abcdef'))
+        else:
+            repo.add_review(Review(repo.get_movie(i % 1000 + 1), f'Review number {i}', i % 10 + 1))
+
+
+def bench_writes(directory, fsync_every):
+    log_path = os.path.join(directory, f'writes-{fsync_every}.log')
+    repo = populated_repo()
+    log = WriteAheadLog(log_path, fsync_every=fsync_every, compact_every=0)
+    repo.attach_log(log)
+
+    start = time.perf_counter()
+    write_records(repo, NUMBER_OF_WRITES)
+    log.close()
+    elapsed = time.perf_counter() - start
+    print(f'fsync_every={fsync_every:<5} {NUMBER_OF_WRITES / elapsed:>10.0f} writes/s  '
+          f'({os.path.getsize(log_path) / 1024:.0f} KiB log)')
+
+
+def bench_recovery(directory, compact):
+    log_path = os.path.join(directory, f'recovery-{compact}.log')
+    repo = populated_repo()
+    log = WriteAheadLog(log_path, fsync_every=0, compact_every=0)
+    repo.attach_log(log)
+    write_records(repo, NUMBER_OF_WRITES)
+    if compact:
+        log.compact()
+    log.close()
+
+    start = time.perf_counter()
+    repo = populated_repo()
+    populate_elapsed = time.perf_counter() - start
+    applied = WriteAheadLog(log_path).replay(repo)
+    replay_elapsed = time.perf_counter() - start - populate_elapsed
+    source = 'snapshot' if compact else 'log'
+    print(f'recovery from {source:<8} populate {populate_elapsed * 1000:>7.1f} ms  '
+          f'replay {replay_elapsed * 1000:>7.1f} ms  ({applied} records)')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for fsync_every in (1, 16, 128, 0):
+            bench_writes(directory, fsync_every)
+        for compact in (False, True):
+            bench_recovery(directory, compact)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""Load generator: drives the WSGI app with a mix of visitor sessions, or replays an access log, and reports the
+throughput and latency percentiles of each route for each repository backend.
+
+Sessions arrive open loop, in a Poisson process at --rate sessions per second, whether or not earlier sessions have
+finished, so a slow backend shows up as growing latencies and start lag rather than as a lower arrival rate. Each
+session is a new virtual user with their own cookies (and so their own Flask session), who sends back the CSRF token
+of the last form they were shown. The app is called in-process through the Flask test client, or over HTTP through a
+local threaded server (--transport socket).
+
+Run from the CS235Flix-SQL directory with: python -m benchmarks.load_generator
+e.g. python -m benchmarks.load_generator --backends memory,database --mix browse=6,genre=2,review=2 --rate 20
+     python -m benchmarks.load_generator --replay access.log --speed 10
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, quote, urlsplit
+from sqlalchemy.orm import clear_mappers
+from werkzeug.serving import make_server
+from movie_app import create_app
+
+DATA_PATH = os.path.join('movie_app', 'adapters', 'data')
+
+# The configuration of each backend the app can be served from, on top of BASE_CONFIG. The database file is created
+# in a temporary directory.
+BASE_CONFIG = {'TESTING': True, 'TEST_DATA_PATH': DATA_PATH, 'SQLALCHEMY_ECHO': False}
+BACKENDS = {
+    'memory': {'REPOSITORY': 'memory'},
+    'database': {'REPOSITORY': 'database'},
+    'cached-database': {'REPOSITORY': 'database', 'REPOSITORY_CACHE': True}
+}
+
+GENRES = ['Action', 'Adventure', 'Sci-Fi', 'Mystery', 'Horror', 'Thriller', 'Animation', 'Comedy', 'Family',
+          'Fantasy', 'Drama', 'Music', 'Biography', 'Romance', 'History', 'Crime', 'Western', 'War', 'Musical',
+          'Sport']
+REVIEW_TEXTS = ['Loved every minute of it', 'Not my kind of movie', 'Great cast, weak plot', 'Would watch again']
+PASSWORD = 'LoadTest123'
+DEFAULT_MIX = 'browse=60,genre=20,register=5,login=10,review=5'
+
+# Flask-WTF renders the token as a hidden input of every form.
+CSRF_TOKEN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+class Recorder:
+    """ Collects the latency of every request by route, and counts unexpected responses, from many threads. """
+
+    def __init__(self):
+        self.__latencies = defaultdict(list)
+        self.__errors = defaultdict(int)
+        self.__lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, ok: bool = True):
+        with self.__lock:
+            self.__latencies[route].append(seconds)
+            if not ok:
+                self.__errors[route] += 1
+
+    def routes(self):
+        with self.__lock:
+            return {route: (sorted(latencies), self.__errors[route]) for route, latencies in self.__latencies.items()}
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an ordered, non-empty list.
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+class InProcessTransport:
+    """ Calls the app directly, with a Flask test client, which keeps its own cookies, per virtual user. """
+    name = 'in-process'
+
+    def __init__(self, app):
+        self.__app = app
+
+    def connect(self):
+        client = self.__app.test_client()
+
+        def send(method, path, data):
+            response = client.open(path, method=method, data=data)
+            return response.status_code, response.get_data(as_text=True)
+        return send
+
+    def close(self):
+        pass
+
+
+class SocketTransport:
+    """ Serves the app from a threaded HTTP server on a local port, and sends each virtual user's requests over new
+    connections, with their own cookies.
+    """
+    name = 'socket'
+
+    def __init__(self, app):
+        # The server would otherwise log every request it serves.
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.__server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def connect(self):
+        cookies = SimpleCookie()
+        port = self.__server.server_port
+
+        def send(method, path, data):
+            headers = {}
+            if cookies:
+                headers['Cookie'] = '; '.join(f'{name}={morsel.value}' for name, morsel in cookies.items())
+            body = None
+            if data is not None:
+                body = urlencode(data)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            connection = HTTPConnection('127.0.0.1', port, timeout=60)
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                for header in response.headers.get_all('Set-Cookie') or []:
+                    cookies.load(header)
+                return response.status, response.read().decode('utf-8', 'replace')
+            finally:
+                connection.close()
+        return send
+
+    def close(self):
+        self.__server.shutdown()
+        self.__thread.join()
+
+
+class VirtualUser:
+    """ One visitor, with their own cookies, and the CSRF token of the last form they were shown. """
+
+    def __init__(self, name: str, transport, recorder: Recorder):
+        self.name = name
+        self.registered = False
+        self.__send = transport.connect()
+        self.__recorder = recorder
+        self.__csrf_token = None
+
+    def get(self, path: str, expect: int = 200):
+        return self.request('GET', path, None, expect)
+
+    def post(self, path: str, data: dict, expect: int = 302):
+        # The forms redirect after a successful POST, and show the form again if it fails validation.
+        return self.request('POST', path, dict(data, csrf_token=self.__csrf_token), expect)
+
+    def request(self, method: str, path: str, data: dict = None, expect: int = 200):
+        # A response is an error unless it has the expected status, or with no expected status, is a server error.
+        route = f'{method} {urlsplit(path).path}'
+        start = time.perf_counter()
+        try:
+            status, body = self.__send(method, path, data)
+        except Exception:
+            self.__recorder.record(route, time.perf_counter() - start, ok=False)
+            raise
+        ok = status < 500 if expect is None else status == expect
+        self.__recorder.record(route, time.perf_counter() - start, ok=ok)
+        token = CSRF_TOKEN.search(body)
+        if token is not None:
+            self.__csrf_token = token.group(1)
+        return status, body
+
+
+# ========================================
+# Sessions, one per arrival of a new visitor
+# ========================================
+def browse(user: VirtualUser, rng: random.Random):
+    user.get('/')
+    cursor = rng.randrange(0, 333) * 3
+    user.get(f'/movies_by_rank?cursor={cursor}')
+    user.get(f'/movies_by_rank?cursor={cursor + 3}&view_reviews_for={cursor + 4}')
+
+
+def genre(user: VirtualUser, rng: random.Random):
+    genre_name = quote(rng.choice(GENRES))
+    user.get(f'/movies_by_genre?genre={genre_name}')
+    user.get(f'/movies_by_genre?genre={genre_name}&cursor=3')
+
+
+def register(user: VirtualUser, rng: random.Random):
+    user.get('/authentication/register')
+    user.post('/authentication/register', {'username': user.name, 'password': PASSWORD})
+    user.registered = True
+
+
+def login(user: VirtualUser, rng: random.Random):
+    if not user.registered:
+        register(user, rng)
+    user.get('/authentication/login')
+    user.post('/authentication/login', {'username': user.name, 'password': PASSWORD})
+
+
+def review(user: VirtualUser, rng: random.Random):
+    login(user, rng)
+    rank = rng.randint(1, 1000)
+    user.get(f'/review?movie={rank}')
+    user.post('/review', {'movie_rank': rank, 'review': rng.choice(REVIEW_TEXTS), 'rating': rng.randint(1, 10)})
+
+
+SESSIONS = {'browse': browse, 'genre': genre, 'register': register, 'login': login, 'review': review}
+
+
+def parse_mix(mix: str) -> dict:
+    """ Parses e.g. 'browse=6,review=1' into the weight of each session. """
+    weights = dict()
+    for item in mix.split(','):
+        name, weight = item.split('=')
+        if name.strip() not in SESSIONS:
+            raise ValueError(f'Unknown session {name}, expected one of {", ".join(SESSIONS)}')
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def run_mix(transport, recorder: Recorder, mix: dict, rate: float, duration: float, workers: int, seed: int):
+    """ Starts sessions drawn from mix in a Poisson process of rate sessions per second, for duration seconds, and
+    returns the number of sessions and the seconds until the last of them finished.
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    sessions = []
+    with ThreadPoolExecutor(workers) as executor:
+        start = time.perf_counter()
+        offset = rng.expovariate(rate)
+        while offset < duration:
+            session = SESSIONS[rng.choices(names, weights)[0]]
+            user = VirtualUser(f'loaduser{len(sessions)}', transport, recorder)
+            sessions.append(executor.submit(run_session, session, user, random.Random(rng.random()), recorder,
+                                            start + offset))
+            offset += rng.expovariate(rate)
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(min(delay, max(0.0, start + duration - time.perf_counter())))
+    for session in sessions:
+        session.exception()
+    return len(sessions), time.perf_counter() - start
+
+
+def run_session(session, user: VirtualUser, rng: random.Random, recorder: Recorder, scheduled: float):
+    # How late the session started, e.g. because every worker was busy, is reported like a route.
+    recorder.record('session start lag', max(0.0, time.perf_counter() - scheduled))
+    session(user, rng)
+
+
+# ========================================
+# Access log replay
+# ========================================
+# Common Log Format, as written by web servers, and the variant written by the werkzeug development server.
+LOG_LINE = re.compile(r'^(\S+) \S+ \S+ \[([^\]]+)\] "(\S+) (\S+)[^"]*" (\d{3})')
+LOG_TIME_FORMATS = ('%d/%b/%Y:%H:%M:%S %z', '%d/%b/%Y %H:%M:%S')
+
+
+def parse_log_time(text: str) -> datetime:
+    for time_format in LOG_TIME_FORMATS:
+        try:
+            moment = datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+        # Only the time between requests matters, so times with an offset are made comparable with those without.
+        return moment if moment.tzinfo is None else moment.astimezone(timezone.utc).replace(tzinfo=None)
+    raise ValueError(f'Unrecognized time {text}')
+
+
+def read_access_log(file_name: str):
+    """ Returns the (seconds since the first request, client, path) of every GET in the log. Other requests are left
+    out, as the log doesn't have their bodies.
+    """
+    requests = []
+    first = None
+    with open(file_name, encoding='utf-8', errors='replace') as log:
+        for line in log:
+            match = LOG_LINE.match(line)
+            if match is None or match.group(3) != 'GET':
+                continue
+            moment = parse_log_time(match.group(2))
+            first = moment if first is None else first
+            requests.append(((moment - first).total_seconds(), match.group(1), match.group(4)))
+    return requests
+
+
+def run_replay(transport, recorder: Recorder, requests, speed: float, workers: int):
+    """ Sends the requests at their original offsets divided by speed, open loop, one virtual user per client. """
+    users = dict()
+    sent = []
+    with ThreadPoolExecutor(workers) as executor:
+        start = time.perf_counter()
+        for offset, client, path in requests:
+            delay = start + offset / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if client not in users:
+                users[client] = VirtualUser(client, transport, recorder)
+            # The original request may have got any status, so only server errors count as errors.
+            sent.append(executor.submit(users[client].request, 'GET', path, None, None))
+    for request in sent:
+        request.exception()
+    return len(sent), time.perf_counter() - start
+
+
+# ========================================
+# Running the backends and reporting
+# ========================================
+def make_app(backend: str, directory: str):
+    clear_mappers()
+    config = dict(BASE_CONFIG, **BACKENDS[backend])
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, f'load-{backend}.db')
+    return create_app(config)
+
+
+def report(backend: str, transport_name: str, recorder: Recorder, units: str, count: int, elapsed: float):
+    routes = recorder.routes()
+    requests = sum(len(latencies) for route, (latencies, errors) in routes.items() if route != 'session start lag')
+    print(f'\n{backend} ({transport_name}): {count} {units} in {elapsed:.1f} s, {requests} requests, '
+          f'{requests / elapsed:.1f} requests/s')
+    print(f'  {"route":<34} {"count":>6} {"errors":>6} {"req/s":>7} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} '
+          f'{"max ms":>8}')
+    for route, (latencies, errors) in sorted(routes.items()):
+        print(f'  {route:<34} {len(latencies):>6} {errors:>6} {len(latencies) / elapsed:>7.1f} '
+              f'{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.9) * 1000:>8.1f} '
+              f'{percentile(latencies, 0.99) * 1000:>8.1f} {latencies[-1] * 1000:>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backends', default='memory,database', help=f'any of {", ".join(BACKENDS)}')
+    parser.add_argument('--transport', choices=('in-process', 'socket'), default='in-process')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='weight of each session, e.g. browse=6,review=1')
+    parser.add_argument('--rate', type=float, default=10, help='sessions started per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds during which sessions are started')
+    parser.add_argument('--workers', type=int, default=64, help='sessions or requests in progress at most')
+    parser.add_argument('--seed', type=int, default=235)
+    parser.add_argument('--replay', help='access log whose GET requests are replayed instead of the mix')
+    parser.add_argument('--speed', type=float, default=1, help='how many times faster than logged to replay')
+    arguments = parser.parse_args()
+
+    mix = parse_mix(arguments.mix)
+    replayed = read_access_log(arguments.replay) if arguments.replay else None
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in arguments.backends.split(','):
+            app = make_app(backend, directory)
+            transport = (SocketTransport if arguments.transport == 'socket' else InProcessTransport)(app)
+            recorder = Recorder()
+            try:
+                if replayed is not None:
+                    count, elapsed = run_replay(transport, recorder, replayed, arguments.speed, arguments.workers)
+                    units = 'replayed requests'
+                else:
+                    count, elapsed = run_mix(transport, recorder, mix, arguments.rate, arguments.duration,
+                                             arguments.workers, arguments.seed)
+                    units = 'sessions'
+            finally:
+                transport.close()
+            report(backend, transport.name, recorder, units, count, elapsed)
+
+
+if __name__ == '__main__':
+    main()
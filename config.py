@@ -18,3 +18,36 @@ class Config:
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     REPOSITORY = environ.get('REPOSITORY')
+    # Cache reference data (movies, genres, directors, actors) across requests: entries per method, and seconds.
+    REPOSITORY_CACHE = environ.get('REPOSITORY_CACHE', 'False') == 'True'
+    REPOSITORY_CACHE_SIZE = int(environ.get('REPOSITORY_CACHE_SIZE', 1024))
+    REPOSITORY_CACHE_TTL = float(environ.get('REPOSITORY_CACHE_TTL', 300))
+    # Serve the movies and home pages from an aiosqlite repository, running each page's reads concurrently.
+    ASYNC_VIEWS = environ.get('ASYNC_VIEWS', 'False') == 'True'
+    ASYNC_POOL_SIZE = int(environ.get('ASYNC_POOL_SIZE', 4))
+    # Movie view models shared between requests: how many to keep, and for how many seconds.
+    MOVIE_VIEW_CACHE_SIZE = int(environ.get('MOVIE_VIEW_CACHE_SIZE', 4096))
+    MOVIE_VIEW_CACHE_TTL = float(environ.get('MOVIE_VIEW_CACHE_TTL', 300))
+    # Deduplicate identical repository reads within a request.
+    REQUEST_CACHE = environ.get('REQUEST_CACHE', 'True') == 'True'
+
+    # Worker processes parsing the movie file when populating a repository (1 parses it in the app's process).
+    INGEST_WORKERS = int(environ.get('INGEST_WORKERS', 1))
+
+    # Write-ahead log configuration for the memory repository (logging is disabled when no path is given).
+    MEMORY_LOG_PATH = environ.get('MEMORY_LOG_PATH')
+    MEMORY_LOG_FSYNC_EVERY = int(environ.get('MEMORY_LOG_FSYNC_EVERY', 1))
+    MEMORY_LOG_COMPACT_EVERY = int(environ.get('MEMORY_LOG_COMPACT_EVERY', 1000))
+
+    # Request instrumentation, exposed in Prometheus text format at /metrics.
+    METRICS_ENABLED = environ.get('METRICS_ENABLED', 'True') == 'True'
+
+    # Template caching: rendered fragments (e.g. movie cards) in memory, compiled templates on disk.
+    FRAGMENT_CACHE_SIZE = int(environ.get('FRAGMENT_CACHE_SIZE', 1024))
+    FRAGMENT_CACHE_TTL = float(environ.get('FRAGMENT_CACHE_TTL', 300))
+    TEMPLATE_BYTECODE_CACHE = environ.get('TEMPLATE_BYTECODE_CACHE', 'True') == 'True'
+    TEMPLATE_BYTECODE_CACHE_DIR = environ.get('TEMPLATE_BYTECODE_CACHE_DIR')
+
+    # Static files and response compression.
+    STATIC_FINGERPRINTING = environ.get('STATIC_FINGERPRINTING', 'True') == 'True'
+    HTML_GZIP_MIN_SIZE = int(environ.get('HTML_GZIP_MIN_SIZE', 1024))
@@ -1,16 +1,35 @@
 """Initialize Flask app."""
 import os
-from flask import Flask
+from flask import Flask, request
+from jinja2 import FileSystemBytecodeCache
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import sessionmaker, clear_mappers
 from sqlalchemy.pool import NullPool
 import movie_app.adapters.repository as repo
+import movie_app.adapters.async_repository as async_repo
 from movie_app.adapters import memory_repository, database_repository
-from movie_app.adapters.orm import metadata, map_model_to_tables
+from movie_app.adapters.write_ahead_log import WriteAheadLog
+from movie_app.adapters.request_cache import RequestScopedRepository
+from movie_app.adapters.caching_repository import CachingRepository
+from movie_app.movies import view_models
+from movie_app.metrics import instrumentation
+from movie_app.fragment_cache import FragmentCache, FragmentCacheExtension
+from movie_app import static_assets
+from movie_app.adapters.orm import metadata, map_model_to_tables, create_missing_columns, create_missing_indexes
+
+# The service functions the blueprints call, which are timed when metrics are enabled.
+MOVIES_SERVICE_ENTRY_POINTS = ('add_review', 'get_filmography', 'get_movie', 'get_movie_facets',
+                               'get_movie_ranks_for_genre', 'get_movies_by_rank', 'get_reviews_for_movie',
+                               'get_suggestions', 'get_watch_history', 'get_watch_totals', 'watch_movie')
+AUTHENTICATION_SERVICE_ENTRY_POINTS = ('add_user', 'authenticate_user', 'get_user')
 
 
 def create_app(test_config=None):
     """Construct the core application."""
+    # Time each phase of starting up, reported in app.extensions['startup_phases'] and at /metrics.
+    phases = instrumentation.StartupPhases()
+
     # Create the Flask app object.
     app = Flask(__name__)
 
@@ -22,11 +41,20 @@ def create_app(test_config=None):
         # Load test configuration, and override any configuration settings.
         app.config.from_mapping(test_config)
         data_path = app.config['TEST_DATA_PATH']
+    phases.end('config')
 
     if app.config['REPOSITORY'] == 'memory':
         # Create the MemoryRepository implementation for a memory-based repository.
         repo.repo_instance = memory_repository.MemoryRepository()
-        memory_repository.populate(data_path, repo.repo_instance)
+        memory_repository.populate(data_path, repo.repo_instance, int(app.config.get('INGEST_WORKERS', 1)))
+
+        if app.config.get('MEMORY_LOG_PATH'):
+            # Recover the Users and Reviews added in earlier runs, then record new ones in the write-ahead log.
+            log = WriteAheadLog(app.config['MEMORY_LOG_PATH'],
+                                fsync_every=int(app.config.get('MEMORY_LOG_FSYNC_EVERY', 1)),
+                                compact_every=int(app.config.get('MEMORY_LOG_COMPACT_EVERY', 1000)))
+            log.replay(repo.repo_instance)
+            repo.repo_instance.attach_log(log)
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
         database_uri = app.config['SQLALCHEMY_DATABASE_URI']
@@ -38,52 +66,151 @@ def create_app(test_config=None):
         database_echo = app.config['SQLALCHEMY_ECHO']
         database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
                                         echo=database_echo)
+        if app.config.get('METRICS_ENABLED', True):
+            instrumentation.instrument_engine(database_engine)
 
-        if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
+        if app.config['TESTING'] in (True, 'True') or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE")
             # For testing or first-time use of the web application, reinitialise the database.
             clear_mappers()
             metadata.create_all(database_engine)            # Conditionally create database tables.
             for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
                 database_engine.execute(table.delete())
+            phases.end('data_load')
 
             # Generate mappings that map domain model classes to the database tables, then populate it.
             map_model_to_tables()
-            database_repository.populate(database_engine, data_path)
+            phases.end('mapper_setup')
+            database_repository.populate(database_engine, data_path, int(app.config.get('INGEST_WORKERS', 1)))
         else:
-            # Solely generate mappings that map domain model classes to the database tables.
+            # Add the tables, columns and indexes declared since the database was created, and the trigrams of any
+            # names not yet in name_trigrams, then solely generate mappings that map domain model classes to the
+            # tables.
+            metadata.create_all(database_engine)
+            create_missing_columns(database_engine)
+            create_missing_indexes(database_engine)
+            database_repository.index_new_names(database_engine)
+            phases.end('data_load')
             map_model_to_tables()
+            phases.end('mapper_setup')
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
         repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
 
+        # Update the movies from a CSV file without repopulating the database (flask import-movies).
+        from movie_app.adapters import movie_import
+        movie_import.init_app(app, database_engine)
+
+        if app.config.get('ASYNC_VIEWS', False):
+            # aiosqlite and asyncio are only imported by apps that serve the async views.
+            from movie_app.adapters.async_database_repository import AsyncSqliteRepository
+            from movie_app.event_loop import EventLoopThread
+            # The movies and home pages read the same SQLite database with aiosqlite, on a shared event loop.
+            async_repo.async_repo_instance = AsyncSqliteRepository(
+                make_url(database_uri).database, pool_size=int(app.config.get('ASYNC_POOL_SIZE', 4)))
+            app.extensions['event_loop'] = EventLoopThread()
+    phases.end('data_load')
+
+    # The repository backend, before any caching layers are wrapped around it.
+    backend = repo.repo_instance
+
+    # Build each movie's view model once, and share it between requests.
+    view_models.movie_views = view_models.MovieViewCache(int(app.config.get('MOVIE_VIEW_CACHE_SIZE', 4096)),
+                                                         float(app.config.get('MOVIE_VIEW_CACHE_TTL', 300)))
+
+    # Cache rendered movie cards ({% cache %} tag), and compiled templates across worker processes.
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = FragmentCache(int(app.config.get('FRAGMENT_CACHE_SIZE', 1024)),
+                                                  float(app.config.get('FRAGMENT_CACHE_TTL', 300)))
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config.get('TEMPLATE_BYTECODE_CACHE_DIR'))
+
+    # Serve fingerprinted, precompressed static files with long-lived caching, and gzip large HTML responses.
+    static_assets.init_app(app)
+
+    from .movies import services as movies_services
+    from .authentication import services as authentication_services
+    if app.config.get('METRICS_ENABLED', True):
+        # Time every repository method, service entry point and template render, and expose them at /metrics.
+        instrumentation.instrument_repository(backend)
+        instrumentation.instrument_module(movies_services, 'movies.services', MOVIES_SERVICE_ENTRY_POINTS)
+        instrumentation.instrument_module(authentication_services, 'authentication.services',
+                                          AUTHENTICATION_SERVICE_ENTRY_POINTS)
+        instrumentation.instrument_templates(app)
+    else:
+        instrumentation.uninstrument_module(movies_services)
+        instrumentation.uninstrument_module(authentication_services)
+
+    if app.config.get('REPOSITORY_CACHE', False):
+        # Cache movies, genres, directors and actors across requests.
+        repo.repo_instance = CachingRepository(repo.repo_instance,
+                                               max_entries=int(app.config.get('REPOSITORY_CACHE_SIZE', 1024)),
+                                               ttl=float(app.config.get('REPOSITORY_CACHE_TTL', 300)))
+
+    if app.config.get('REQUEST_CACHE', True):
+        # Answer identical repository reads made while handling a request from a request-scoped memo.
+        repo.repo_instance = RequestScopedRepository(repo.repo_instance)
+    phases.end('caches')
+
     # Build the application - these steps require an application context.
     with app.app_context():
         # Register blueprints.
         from .authentication import authentication
         app.register_blueprint(authentication.authentication_blueprint)
 
-        from .home import home
-        app.register_blueprint(home.home_blueprint)
+        if 'event_loop' in app.extensions:
+            from .home import async_home
+            app.register_blueprint(async_home.home_blueprint)
+
+            from .movies import async_movies
+            app.register_blueprint(async_movies.movies_blueprint)
+        else:
+            from .home import home
+            app.register_blueprint(home.home_blueprint)
 
-        from .movies import movies
-        app.register_blueprint(movies.movies_blueprint)
+            from .movies import movies
+            app.register_blueprint(movies.movies_blueprint)
 
         from .utilities import utilities
         app.register_blueprint(utilities.utilities_blueprint)
 
+        from .metrics import metrics
+        app.register_blueprint(metrics.metrics_blueprint)
+
         # Register a callback that makes sure that database sessions are associated with http requests
         # We reset the session inside the database repository before a new flask request is generated
         @app.before_request
         def before_flask_http_request_function():
-            if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
-                repo.repo_instance.reset_session()
+            if app.config.get('METRICS_ENABLED', True):
+                instrumentation.start_request()
+            if isinstance(repo.repo_instance, RequestScopedRepository):
+                repo.repo_instance.begin_scope()
+            if isinstance(backend, database_repository.SqlAlchemyRepository):
+                backend.reset_session()
+
+        # Record the request latency and per-request SQL statement and row counts once the response is ready.
+        @app.after_request
+        def after_flask_http_request_function(response):
+            if app.config.get('METRICS_ENABLED', True):
+                instrumentation.finish_request(request.endpoint, response.status_code)
+            return response
 
         # Register a tear-down method that will be called after each request has been processed.
         @app.teardown_appcontext
         def shutdown_session(exception=None):
-            if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
-                repo.repo_instance.close_session()
+            if isinstance(repo.repo_instance, RequestScopedRepository):
+                calls_saved = repo.repo_instance.end_scope()
+                if calls_saved is not None and app.config.get('METRICS_ENABLED', True):
+                    instrumentation.REPOSITORY_CALLS_SAVED_PER_REQUEST.observe(calls_saved)
+            if isinstance(backend, database_repository.SqlAlchemyRepository):
+                backend.close_session()
+    phases.end('blueprint_registration')
+
+    app.extensions['startup_phases'] = phases.durations
+    if app.config.get('METRICS_ENABLED', True):
+        phases.record()
+    app.logger.info('Started in %.3f s (%s)', sum(phases.durations.values()),
+                    ', '.join(f'{phase} {duration:.3f} s' for phase, duration in phases.durations.items()))
     return app
@@ -0,0 +1,215 @@
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List
+from movie_app.adapters.async_repository import AsyncAbstractRepository
+from movie_app.adapters.repository import RepositoryException
+from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User
+
+try:
+    import aiosqlite
+except ImportError:     # aiosqlite is optional: it is only needed for the async view path (ASYNC_VIEWS).
+    aiosqlite = None
+
+MOVIE_COLUMNS = 'movies.id, movies.title, movies.release_year, movies.description, movies.runtime_minutes, ' \
+                'movies.rating, movies.votes, movies.revenue_in_millions, movies.metascore, ' \
+                'directors.director_full_name'
+
+# SQLite's default storage format for the DateTime columns of the orm.py schema.
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def placeholders(values) -> str:
+    return ', '.join('?' * len(values))
+
+
+class ConnectionPool:
+    """ Up to size aiosqlite connections to database, opened on demand in the event loop that uses the pool.
+    Each aiosqlite connection runs its statements in its own thread, so statements on different connections
+    run concurrently.
+    """
+
+    def __init__(self, database: str, size: int = 4):
+        if aiosqlite is None:
+            raise RuntimeError('The async repository requires the aiosqlite package')
+        self.__database = database
+        self.__size = size
+        self.__opened = list()
+        self.__idle = None
+
+    @asynccontextmanager
+    async def connection(self):
+        if self.__idle is None:
+            self.__idle = asyncio.Queue()
+        if self.__idle.empty() and len(self.__opened) < self.__size:
+            # Reserve the slot before awaiting, so that concurrent callers don't open more than size connections.
+            self.__opened.append(None)
+            connection = await aiosqlite.connect(self.__database)
+            self.__opened[self.__opened.index(None)] = connection
+        else:
+            connection = await self.__idle.get()
+        try:
+            yield connection
+        finally:
+            self.__idle.put_nowait(connection)
+
+    async def close(self):
+        for connection in self.__opened:
+            if connection is not None:
+                await connection.close()
+        self.__opened = list()
+        self.__idle = None
+
+
+class AsyncSqliteRepository(AsyncAbstractRepository):
+    """ Reads and writes the SQLite database created from the orm.py schema with aiosqlite.
+
+    Movies are built like SqlAlchemyRepository builds them, with their director, actors and genres; the
+    statements that load these run concurrently on separate connections.
+    """
+
+    def __init__(self, database: str, pool_size: int = 4):
+        self._pool = ConnectionPool(database, pool_size)
+
+    async def _fetch_all(self, statement: str, parameters=()):
+        async with self._pool.connection() as connection:
+            return await connection.execute_fetchall(statement, parameters)
+
+    async def _fetch_one(self, statement: str, parameters=()):
+        rows = await self._fetch_all(statement, parameters)
+        return rows[0] if rows else None
+
+    async def _execute(self, statement: str, parameters=()):
+        async with self._pool.connection() as connection:
+            await connection.execute(statement, parameters)
+            await connection.commit()
+
+    async def close(self):
+        await self._pool.close()
+
+    async def get_director(self, director_name) -> Director:
+        row = await self._fetch_one('SELECT director_full_name FROM directors WHERE director_full_name = ?',
+                                    (director_name,))
+        return None if row is None else Director(row[0])
+
+    async def get_genres(self) -> List[Genre]:
+        rows = await self._fetch_all('SELECT genre_name FROM genres ORDER BY id')
+        return [Genre(row[0]) for row in rows]
+
+    async def get_actor(self, actor_name) -> Actor:
+        row = await self._fetch_one('SELECT actor_full_name FROM actors WHERE actor_full_name = ?', (actor_name,))
+        return None if row is None else Actor(row[0])
+
+    async def get_movie(self, rank: int) -> Movie:
+        movies = await self.get_movies_by_rank([rank])
+        return movies[0] if movies else None
+
+    async def get_number_of_movies(self):
+        row = await self._fetch_one('SELECT count(*) FROM movies')
+        return row[0]
+
+    async def get_first_movie(self) -> Movie:
+        row = await self._fetch_one('SELECT id FROM movies ORDER BY id ASC LIMIT 1')
+        return None if row is None else await self.get_movie(row[0])
+
+    async def get_last_movie(self) -> Movie:
+        row = await self._fetch_one('SELECT id FROM movies ORDER BY id DESC LIMIT 1')
+        return None if row is None else await self.get_movie(row[0])
+
+    async def get_movies_by_rank(self, rank_list):
+        rank_list = list(rank_list)
+        if len(rank_list) == 0:
+            return list()
+
+        in_ranks = placeholders(rank_list)
+        movie_rows, actor_rows, genre_rows = await asyncio.gather(
+            self._fetch_all(f'SELECT {MOVIE_COLUMNS} FROM movies '
+                            f'LEFT OUTER JOIN directors ON directors.id = movies.director_id '
+                            f'WHERE movies.id IN ({in_ranks}) ORDER BY movies.id', rank_list),
+            self._fetch_all(f'SELECT movie_actors.movie_id, actors.actor_full_name FROM movie_actors '
+                            f'JOIN actors ON actors.id = movie_actors.actor_id '
+                            f'WHERE movie_actors.movie_id IN ({in_ranks}) ORDER BY movie_actors.id', rank_list),
+            self._fetch_all(f'SELECT movie_genres.movie_id, genres.genre_name FROM movie_genres '
+                            f'JOIN genres ON genres.id = movie_genres.genre_id '
+                            f'WHERE movie_genres.movie_id IN ({in_ranks}) ORDER BY movie_genres.id', rank_list)
+        )
+
+        actors = dict()
+        for movie_rank, actor_name in actor_rows:
+            actors.setdefault(movie_rank, list()).append(Actor(actor_name))
+        genres = dict()
+        for movie_rank, genre_name in genre_rows:
+            genres.setdefault(movie_rank, list()).append(Genre(genre_name))
+        return [self._movie(row, actors.get(row[0], list()), genres.get(row[0], list())) for row in movie_rows]
+
+    async def get_movie_ranks_for_genre(self, genre_name: str):
+        rows = await self._fetch_all('SELECT movie_genres.movie_id FROM movie_genres '
+                                     'JOIN genres ON genres.id = movie_genres.genre_id '
+                                     'WHERE genres.genre_name = ? ORDER BY movie_genres.movie_id ASC', (genre_name,))
+        return [row[0] for row in rows]
+
+    async def add_review(self, review: Review):
+        await self._execute('INSERT INTO reviews (movie_id, review_text, rating, timestamp) VALUES (?, ?, ?, ?)',
+                            (review.movie.rank, review.review_text, review.rating,
+                             review.timestamp.strftime(TIMESTAMP_FORMAT)))
+
+    async def get_reviews(self):
+        return await self._select_reviews('')
+
+    async def get_reviews_for_movies(self, rank_list):
+        rank_list = list(rank_list)
+        if len(rank_list) == 0:
+            return list()
+        return await self._select_reviews(f'WHERE reviews.movie_id IN ({placeholders(rank_list)})', rank_list)
+
+    async def add_user(self, user: User):
+        try:
+            await self._execute('INSERT INTO users (username, password, time_spent_watching_movies_minutes) '
+                                'VALUES (?, ?, ?)',
+                                (user.user_name, user.password, user.time_spent_watching_movies_minutes))
+        except sqlite3.IntegrityError:
+            raise RepositoryException(f'Username {user.user_name} is already taken')
+
+    async def get_user(self, username: str) -> User:
+        row = await self._fetch_one('SELECT username, password, time_spent_watching_movies_minutes FROM users '
+                                    'WHERE username = ?', (username,))
+        if row is None:
+            return None
+        user = User(row[0], row[1])
+        user._User__time_spent_watching_movies_minutes = row[2]
+        return user
+
+    async def _select_reviews(self, where: str, parameters=()):
+        rows = await self._fetch_all('SELECT reviews.movie_id, movies.title, movies.release_year, reviews.review_text, '
+                                     'reviews.rating, reviews.timestamp FROM reviews '
+                                     f'JOIN movies ON movies.id = reviews.movie_id {where} ORDER BY reviews.id',
+                                     parameters)
+        movies = dict()
+        reviews = list()
+        for movie_rank, title, release_year, review_text, rating, timestamp in rows:
+            movie = movies.get(movie_rank)
+            if movie is None:
+                movie = movies[movie_rank] = Movie(title, release_year)
+                movie.rank = movie_rank
+            review = Review(movie, review_text, rating)
+            review._Review__timestamp = datetime.fromisoformat(timestamp)
+            reviews.append(review)
+        return reviews
+
+    @staticmethod
+    def _movie(row, actors, genres) -> Movie:
+        rank, title, release_year, description, runtime_minutes, rating, votes, revenue, metascore, director = row
+        # Like the ORM, store column values as they are, bypassing the validating setters.
+        movie = Movie(title, release_year)
+        movie._Movie__rank = rank
+        movie._Movie__description = description
+        movie._Movie__runtime_minutes = runtime_minutes
+        movie._Movie__rating = rating
+        movie._Movie__votes = votes
+        movie._Movie__revenue = revenue
+        movie._Movie__metascore = metascore
+        movie._Movie__director = Director(director) if director is not None else None
+        movie._Movie__actors = actors
+        movie._Movie__genres = genres
+        return movie
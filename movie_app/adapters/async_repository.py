@@ -0,0 +1,104 @@
+import abc
+from typing import List
+from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User
+
+
+async_repo_instance = None
+
+
+class AsyncAbstractRepository(abc.ABC):
+    """ Coroutine counterpart of AbstractRepository, for the reads (and the Review and User writes) made while
+    serving pages. Reference data is written through AbstractRepository, e.g. when populating the database.
+    """
+
+    @abc.abstractmethod
+    async def get_director(self, director_name) -> Director:
+        """ Returns the Director named director_name from the repository.
+        If there is no Director with the given director_name, this method returns None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_genres(self) -> List[Genre]:
+        """ Returns the Genres stored in the repository. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_actor(self, actor_name) -> Actor:
+        """ Returns the Actor named actor_name from the repository.
+        If there is no Actor with the given actor_name, this method returns None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_movie(self, rank: int) -> Movie:
+        """ Returns Movie with rank from the repository.
+        If there is no Movie with the given rank, this method returns None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_number_of_movies(self):
+        """ Returns the number of Movies in the repository. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_first_movie(self) -> Movie:
+        """ Returns the first Movie, ordered by rank, from the repository.
+        Returns None if the repository is empty.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_last_movie(self) -> Movie:
+        """ Returns the last Movie, ordered by rank, from the repository.
+        Returns None if the repository is empty.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_movies_by_rank(self, rank_list):
+        """ Returns a list of Movies, whose ranks match those in rank_list, from the repository.
+        If there are no matches, this method returns an empty list.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_movie_ranks_for_genre(self, genre_name: str):
+        """ Returns a list of ranks representing Movies that have the Genre named genre_name.
+        If there are no Movies with the Genre, this method returns an empty list.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_review(self, review: Review):
+        """ Adds a Review to the repository. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_reviews(self):
+        """ Returns the Reviews stored in the repository. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_reviews_for_movies(self, rank_list):
+        """ Returns the Reviews of the Movies whose ranks are in rank_list. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_user(self, user: User):
+        """ Adds a User to the repository.
+        If the repository already has a User with the same username, this method raises a RepositoryException.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_user(self, username: str) -> User:
+        """ Returns the User named username from the repository.
+        If there is no User with the given username, this method returns None.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """ Releases any connections held by the repository. """
+        pass
@@ -0,0 +1,447 @@
+import json
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+from movie_app.adapters.repository import decade_of, rating_band_of
+from movie_app.domain.model import Movie
+
+# A Bitmap splits its values by their high 16 bits into containers of at most 65536 low 16-bit values, as roaring
+# bitmaps do. A container holding at most ARRAY_LIMIT values is a sorted array('H'); a fuller one is an int whose
+# set bits are the values, CONTAINER_BYTES long. Either way a container takes at most 8KB, and the bitwise
+# operations on int containers run in C over whole machine words.
+CONTAINER_BITS = 16
+LOW_MASK = (1 << CONTAINER_BITS) - 1
+CONTAINER_BYTES = (1 << CONTAINER_BITS) // 8
+ARRAY_LIMIT = 4096
+
+NONZERO_BYTE = re.compile(rb'[^\x00]')
+# The positions of the set bits of each byte value.
+BYTE_POSITIONS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+# Serialized bitmaps are: number of containers, then for each container its key, kind and payload length, and the
+# payload; an array payload is its little-endian uint16s, a bits payload the int's CONTAINER_BYTES little-endian.
+BITMAP_HEADER = struct.Struct('<I')
+CONTAINER_HEADER = struct.Struct('<IBI')
+ARRAY_CONTAINER = 0
+BITS_CONTAINER = 1
+
+try:
+    popcount = int.bit_count    # Python 3.10+
+except AttributeError:
+    def popcount(bits: int) -> int:
+        return bin(bits).count('1')
+
+
+class BitmapException(Exception):
+    pass
+
+
+def positions(bits: int):
+    """ Yields the positions of the set bits of bits, lowest first. """
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for match in NONZERO_BYTE.finditer(data):
+        offset = match.start()
+        for bit in BYTE_POSITIONS[data[offset]]:
+            yield offset * 8 + bit
+
+
+def array_to_bits(values) -> int:
+    data = bytearray(CONTAINER_BYTES)
+    for value in values:
+        data[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(data, 'little')
+
+
+def container_of(values) -> object:
+    """ Returns the container for the sorted low values, or None if there are none. """
+    if len(values) > ARRAY_LIMIT:
+        return array_to_bits(values)
+    return array('H', values) if len(values) > 0 else None
+
+
+def container_of_bits(bits: int):
+    # The result of an operation on int containers stays an int, even when it has become sparse: results are
+    # mostly short-lived intermediates of a query, which the next operation is faster on as an int.
+    return bits if bits != 0 else None
+
+
+def compacted(container):
+    # The container the values of container are stored in when a Bitmap is made from them.
+    if isinstance(container, int) and popcount(container) <= ARRAY_LIMIT:
+        return array('H', positions(container))
+    return container
+
+
+def cardinality_of(container) -> int:
+    return popcount(container) if isinstance(container, int) else len(container)
+
+
+def keep_in_bits(values, bits: int, keep: bool):
+    # Filters an array container by membership of an int container, testing the bytes of the int rather than
+    # shifting the whole int for every value.
+    data = bits.to_bytes(CONTAINER_BYTES, 'little')
+    return container_of([value for value in values if bool(data[value >> 3] >> (value & 7) & 1) == keep])
+
+
+def and_containers(first, second):
+    if isinstance(first, int) and isinstance(second, int):
+        return container_of_bits(first & second)
+    if isinstance(first, int):
+        first, second = second, first
+    if isinstance(second, int):
+        return keep_in_bits(first, second, True)
+    return container_of(sorted(set(first).intersection(second)))
+
+
+def or_containers(first, second):
+    if isinstance(first, int) or isinstance(second, int):
+        first_bits = first if isinstance(first, int) else array_to_bits(first)
+        second_bits = second if isinstance(second, int) else array_to_bits(second)
+        return first_bits | second_bits
+    return container_of(sorted(set(first).union(second)))
+
+
+def andnot_containers(first, second):
+    if isinstance(first, int):
+        second_bits = second if isinstance(second, int) else array_to_bits(second)
+        return container_of_bits(first & ~second_bits)
+    if isinstance(second, int):
+        return keep_in_bits(first, second, False)
+    return container_of(sorted(set(first).difference(second)))
+
+
+class Bitmap:
+    """ An immutable set of non-negative ints, compressed for dense runs of values, such as movie ranks.
+
+    Bitmaps support and (&), or (|) and and-not (-), which work container by container, len for their cardinality,
+    membership tests and iteration in ascending order. They never change once made, so they can be shared between
+    versions of an index: the operations, and with_values, return new Bitmaps that share the unchanged containers.
+    The containers of a Bitmap made from values, or read from bytes, are compacted as described above; the results
+    of operations keep int containers as ints, trading memory for speed while they are in use.
+    """
+
+    __slots__ = ('_containers', '_cardinality')
+
+    def __init__(self, values: Iterable[int] = ()):
+        groups = dict()
+        for value in values:
+            if value < 0:
+                raise BitmapException(f'Bitmaps hold non-negative ints, not {value}')
+            groups.setdefault(value >> CONTAINER_BITS, set()).add(value & LOW_MASK)
+        self._set_containers({key: container_of(sorted(groups[key])) for key in sorted(groups)})
+
+    @classmethod
+    def _from_containers(cls, containers: dict) -> 'Bitmap':
+        bitmap = cls.__new__(cls)
+        bitmap._set_containers({key: containers[key] for key in sorted(containers) if containers[key] is not None})
+        return bitmap
+
+    def _set_containers(self, containers: dict):
+        self._containers = containers
+        self._cardinality = sum(cardinality_of(container) for container in containers.values())
+
+    def __len__(self) -> int:
+        return self._cardinality
+
+    def __bool__(self) -> bool:
+        return self._cardinality > 0
+
+    def __contains__(self, value) -> bool:
+        if not isinstance(value, int) or value < 0:
+            return False
+        container = self._containers.get(value >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low = value & LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        index = bisect_left(container, low)
+        return index < len(container) and container[index] == low
+
+    def __iter__(self):
+        for key, container in self._containers.items():
+            base = key << CONTAINER_BITS
+            if isinstance(container, int):
+                for low in positions(container):
+                    yield base + low
+            else:
+                for low in container:
+                    yield base + low
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Bitmap):
+            return NotImplemented
+        # Compacted containers are arrays up to ARRAY_LIMIT values and ints above it, so equal sets have equal ones.
+        return self._containers.keys() == other._containers.keys() and all(
+            compacted(container) == compacted(other._containers[key]) for key, container in self._containers.items())
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'<Bitmap of {self._cardinality} values>'
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap._from_containers({
+            key: and_containers(container, other._containers[key])
+            for key, container in self._containers.items() if key in other._containers
+        })
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        containers = dict(self._containers)
+        for key, container in other._containers.items():
+            containers[key] = or_containers(containers[key], container) if key in containers else container
+        return Bitmap._from_containers(containers)
+
+    def __sub__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap._from_containers({
+            key: andnot_containers(container, other._containers[key]) if key in other._containers else container
+            for key, container in self._containers.items()
+        })
+
+    def and_cardinality(self, other: 'Bitmap') -> int:
+        """ Returns len(self & other), without making the intersection when both containers are ints. """
+        count = 0
+        for key, container in self._containers.items():
+            other_container = other._containers.get(key)
+            if other_container is None:
+                continue
+            if isinstance(container, int) and isinstance(other_container, int):
+                count += popcount(container & other_container)
+            else:
+                intersection = and_containers(container, other_container)
+                count += 0 if intersection is None else cardinality_of(intersection)
+        return count
+
+    def with_values(self, values: Iterable[int]) -> 'Bitmap':
+        return self | Bitmap(values)
+
+    def to_int(self) -> int:
+        """ Returns the int whose set bits are the values, for operations on every value at once. """
+        if not self._containers:
+            return 0
+        # The keys are sorted, so the last one is the highest.
+        data = bytearray((next(reversed(self._containers)) + 1) * CONTAINER_BYTES)
+        for key, container in self._containers.items():
+            start = key * CONTAINER_BYTES
+            if isinstance(container, int):
+                data[start:start + CONTAINER_BYTES] = container.to_bytes(CONTAINER_BYTES, 'little')
+            else:
+                for value in container:
+                    data[start + (value >> 3)] |= 1 << (value & 7)
+        return int.from_bytes(data, 'little')
+
+    def to_bytes(self) -> bytes:
+        parts = [BITMAP_HEADER.pack(len(self._containers))]
+        for key, container in self._containers.items():
+            container = compacted(container)
+            if isinstance(container, int):
+                payload = container.to_bytes(CONTAINER_BYTES, 'little')
+                parts.append(CONTAINER_HEADER.pack(key, BITS_CONTAINER, len(payload)))
+            else:
+                values = array('H', container)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                payload = values.tobytes()
+                parts.append(CONTAINER_HEADER.pack(key, ARRAY_CONTAINER, len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Bitmap':
+        bitmap, offset = read_bitmap(memoryview(data), 0)
+        if offset != len(data):
+            raise BitmapException('Trailing bytes after the bitmap')
+        return bitmap
+
+
+def read_bitmap(data: memoryview, offset: int):
+    """ Returns the Bitmap serialized at offset in data, and the offset just past it. """
+    try:
+        number_of_containers, = BITMAP_HEADER.unpack_from(data, offset)
+        offset += BITMAP_HEADER.size
+        containers = dict()
+        for _ in range(number_of_containers):
+            key, kind, length = CONTAINER_HEADER.unpack_from(data, offset)
+            offset += CONTAINER_HEADER.size
+            payload = data[offset:offset + length]
+            if len(payload) != length:
+                raise BitmapException('The bitmap is truncated')
+            offset += length
+            if kind == BITS_CONTAINER:
+                containers[key] = int.from_bytes(payload, 'little')
+            elif kind == ARRAY_CONTAINER:
+                values = array('H')
+                values.frombytes(payload)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                containers[key] = values
+            else:
+                raise BitmapException(f'Unknown container kind {kind}')
+    except struct.error as error:
+        raise BitmapException('The bitmap is truncated') from error
+    return Bitmap._from_containers(containers), offset
+
+
+EMPTY_BITMAP = Bitmap()
+
+# The memberships an index keeps a Bitmap of movie ranks for, for every value: genre names, director names, actor
+# names, decades (see decade_of) and rating bands (see rating_band_of).
+FIELDS = ('genres', 'directors', 'actors', 'decades', 'rating_bands')
+
+# The fields with few values, each held by many movies. Facet queries and and count their memberships as plain ints
+# over the ranks (see BitmapIndex.bits): one pass over the bits, in C, is faster than going container by container,
+# and a few of these ints take little memory next to the movies.
+DENSE_FIELDS = ('genres', 'decades', 'rating_bands')
+
+INDEX_MAGIC = b'CS235BMI'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<8sII')      # Magic, version, CRC32 of the rest.
+ENTRY_HEADER = struct.Struct('<I')          # A count, or the length of the JSON value that follows.
+
+
+def movie_memberships(movie: Movie):
+    """ Yields the (field, value) pairs that movie is a member of. """
+    for genre in movie.genres:
+        yield 'genres', genre.genre_name
+    if movie.director is not None:
+        yield 'directors', movie.director.director_full_name
+    for actor in movie.actors:
+        yield 'actors', actor.actor_full_name
+    yield 'decades', decade_of(movie.release_year)
+    rating_band = rating_band_of(movie.rating)
+    if rating_band is not None:
+        yield 'rating_bands', rating_band
+
+
+class BitmapIndex:
+    """ Bitmaps of the ranks of the movies having each genre, director, actor, decade and rating band, plus one of
+    every rank, so that catalogue questions such as "the comedies of the 1990s without Jim Carrey" are answered with
+    a few bitmap operations instead of a scan of the movies.
+
+    Like the Bitmaps, an index never changes: with_movies returns a new index, sharing the Bitmaps of the values
+    the new movies don't have.
+    """
+
+    def __init__(self, all_ranks: Bitmap = EMPTY_BITMAP, fields: dict = None):
+        self.all = all_ranks
+        self._fields = {field: dict() for field in FIELDS} if fields is None else fields
+        self._cardinalities = dict()
+        self._bits = dict()
+        self._directors_by_rank = None
+
+    def get(self, field: str, value) -> Bitmap:
+        """ Returns the Bitmap of the ranks of the movies with value in field; it is empty for an unknown value. """
+        return self._fields[field].get(value, EMPTY_BITMAP)
+
+    def values(self, field: str) -> dict:
+        """ Returns a dict mapping each value in field to its Bitmap. Don't change it. """
+        return self._fields[field]
+
+    def cardinalities(self, field: str) -> dict:
+        """ Returns a dict mapping each value in field to the number of movies with it. Don't change it. """
+        # Worked out once per index, which never changes; threads racing to do it get equal dicts.
+        if field not in self._cardinalities:
+            self._cardinalities[field] = {value: len(bitmap) for value, bitmap in self._fields[field].items()}
+        return self._cardinalities[field]
+
+    def all_bits(self) -> int:
+        """ Returns the int whose set bits are the ranks of every movie. """
+        if None not in self._bits:
+            self._bits[None] = self.all.to_int()
+        return self._bits[None]
+
+    def bits(self, field: str) -> dict:
+        """ Returns a dict mapping each value in field, one of DENSE_FIELDS, to the int whose set bits are the ranks
+        of the movies with it. Don't change it.
+        """
+        # Made once per index, the first time a query asks, like the cardinalities.
+        if field not in self._bits:
+            if field not in DENSE_FIELDS:
+                raise BitmapException(f'{field} is not kept as ints')
+            self._bits[field] = {value: bitmap.to_int() for value, bitmap in self._fields[field].items()}
+        return self._bits[field]
+
+    def directors_by_rank(self) -> list:
+        """ Returns a list of the director of the movie of each rank, or None where there is no movie or director.
+        Don't change it.
+        """
+        # A movie has at most one director, so the directors' Bitmaps don't overlap. Made once per index, like bits.
+        if self._directors_by_rank is None:
+            directors = [None] * self.all_bits().bit_length()
+            for director, bitmap in self._fields['directors'].items():
+                for rank in bitmap:
+                    directors[rank] = director
+            self._directors_by_rank = directors
+        return self._directors_by_rank
+
+    def with_movies(self, movies: Iterable[Movie]) -> 'BitmapIndex':
+        ranks = list()
+        new_members = {field: dict() for field in FIELDS}
+        for movie in movies:
+            ranks.append(movie.rank)
+            for field, value in movie_memberships(movie):
+                new_members[field].setdefault(value, list()).append(movie.rank)
+        if not ranks:
+            return self
+
+        fields = dict()
+        for field in FIELDS:
+            bitmaps = self._fields[field]
+            if new_members[field]:
+                bitmaps = dict(bitmaps)
+                for value, value_ranks in new_members[field].items():
+                    bitmaps[value] = bitmaps.get(value, EMPTY_BITMAP).with_values(value_ranks)
+            fields[field] = bitmaps
+        return BitmapIndex(self.all.with_values(ranks), fields)
+
+    def to_bytes(self) -> bytes:
+        parts = [self.all.to_bytes()]
+        for field in FIELDS:
+            bitmaps = self._fields[field]
+            parts.append(ENTRY_HEADER.pack(len(bitmaps)))
+            for value, bitmap in bitmaps.items():
+                # Decades and rating bands are ints, the other values strings; JSON keeps them apart.
+                encoded_value = json.dumps(value).encode('utf-8')
+                parts.append(ENTRY_HEADER.pack(len(encoded_value)))
+                parts.append(encoded_value)
+                parts.append(bitmap.to_bytes())
+        body = b''.join(parts)
+        return INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, zlib.crc32(body)) + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BitmapIndex':
+        if len(data) < INDEX_HEADER.size:
+            raise BitmapException('Not a bitmap index')
+        magic, version, checksum = INDEX_HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise BitmapException('Not a bitmap index, or one written by another version')
+        body = memoryview(data)[INDEX_HEADER.size:]
+        if zlib.crc32(body) != checksum:
+            raise BitmapException('The bitmap index is corrupt')
+
+        all_ranks, offset = read_bitmap(body, 0)
+        fields = dict()
+        for field in FIELDS:
+            number_of_values, = ENTRY_HEADER.unpack_from(body, offset)
+            offset += ENTRY_HEADER.size
+            bitmaps = dict()
+            for _ in range(number_of_values):
+                length, = ENTRY_HEADER.unpack_from(body, offset)
+                offset += ENTRY_HEADER.size
+                value = json.loads(bytes(body[offset:offset + length]).decode('utf-8'))
+                bitmaps[value], offset = read_bitmap(body, offset + length)
+            fields[field] = bitmaps
+        return cls(all_ranks, fields)
+
+    def save(self, path: str):
+        with open(path, mode='wb') as index_file:
+            index_file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'BitmapIndex':
+        with open(path, mode='rb') as index_file:
+            return cls.from_bytes(index_file.read())
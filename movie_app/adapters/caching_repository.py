@@ -0,0 +1,261 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+from typing import List
+from movie_app.adapters.repository import AbstractRepository, FacetFilter, MovieFacets, Suggestion, Filmography, \
+    Watch, WatchTotals
+from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList
+from movie_app.metrics import instrumentation
+
+# The reference-data reads that are cached. Reviews, Users, watches and WatchLists change with every request that
+# writes, so their methods always go to the wrapped repository.
+CACHED_METHODS = ('get_director', 'get_genres', 'get_actor', 'get_movie', 'get_number_of_movies', 'get_first_movie',
+                  'get_last_movie', 'get_movies_by_rank', 'get_movie_ranks_for_genre', 'get_movie_facets',
+                  'get_fuzzy_matches', 'get_filmography')
+
+_MISSING = object()
+
+
+class LRUCache:
+    """ Thread-safe LRU cache with an optional time-to-live for its entries.
+    A ttl of 0 (or None) keeps entries until they are evicted or invalidated.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 0, clock=monotonic):
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__clock = clock
+        # Maps each key to (expiry time, value), least recently used first.
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key, default=_MISSING):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self.__clock():
+                del self.__entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires = self.__clock() + self.__ttl if self.__ttl else None
+        with self.__lock:
+            self.__entries[key] = (expires, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.__lock:
+            if self.__entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """ Drops every entry whose key satisfies predicate. """
+        with self.__lock:
+            for key in [key for key in self.__entries if predicate(key)]:
+                del self.__entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self.__lock:
+            self.invalidations += len(self.__entries)
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self.__entries), 'max_entries': self.__max_entries, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'expirations': self.expirations,
+                'invalidations': self.invalidations}
+
+
+class CachingRepository(AbstractRepository):
+    """ Wraps a repository and caches its reference-data reads (movies, genres, directors and actors) across
+    requests, in one LRU cache per method.
+
+    The cache only sees writes made through its own add_* methods, which invalidate exactly the entries they
+    affect, so the wrapped repository must not be written to directly. Objects returned by a SqlAlchemyRepository
+    are detached from their session before they are cached.
+    """
+
+    def __init__(self, repo: AbstractRepository, max_entries: int = 1024, ttl: float = 300, clock=monotonic):
+        self._repo = repo
+        self._caches = {method_name: LRUCache(max_entries, ttl, clock) for method_name in CACHED_METHODS}
+        # Backends whose objects are bound to a session provide detach(), see SqlAlchemyRepository.detach.
+        self._detach = getattr(repo, 'detach', None)
+
+    def __getattr__(self, name):
+        # Backend-specific methods (e.g. reset_session, attach_log) are passed through unchanged.
+        return getattr(self._repo, name)
+
+    @property
+    def repository(self) -> AbstractRepository:
+        return self._repo
+
+    def stats(self) -> dict:
+        """ Returns the hit, miss, eviction, expiration and invalidation counts and the size of each method's cache. """
+        return {method_name: cache.stats() for method_name, cache in self._caches.items()}
+
+    def clear(self):
+        for cache in self._caches.values():
+            cache.clear()
+
+    def _read(self, method_name: str, key, *args):
+        cache = self._caches[method_name]
+        result = cache.get(key)
+        instrumentation.record_cache_lookup(f'repository.{method_name}', result is not _MISSING)
+        if result is _MISSING:
+            result = getattr(self._repo, method_name)(*args)
+            self._keep(result)
+            cache.set(key, result)
+        # Hand out copies of cached lists, so that callers can't change the cached ones.
+        return list(result) if isinstance(result, list) else result
+
+    def _keep(self, result):
+        if self._detach is not None:
+            for entity in (result if isinstance(result, list) else [result]):
+                # Ranks, MovieFacets, Suggestions and Filmographies hold no entities.
+                if entity is not None and not isinstance(entity, (int, MovieFacets, Suggestion, Filmography)):
+                    self._detach(entity)
+
+    def _invalidate_movie(self, movie: Movie, replaced: bool = False):
+        rank = movie.rank
+        self._caches['get_movie'].invalidate((rank,))
+        self._caches['get_movies_by_rank'].invalidate_where(lambda rank_list: rank in rank_list)
+        self._caches['get_number_of_movies'].clear()
+        self._caches['get_first_movie'].clear()
+        self._caches['get_last_movie'].clear()
+        if replaced:
+            # The movie the rank had may have been in other genres, and the Movie may be the same object, changed
+            # since, so its old genres can't be looked up.
+            self._caches['get_movie_ranks_for_genre'].clear()
+        else:
+            for genre in movie.genres:
+                self._caches['get_movie_ranks_for_genre'].invalidate((genre.genre_name,))
+        # Every facet count may include the movie.
+        self._caches['get_movie_facets'].clear()
+        # The movie's title and people may be close to any query.
+        self._caches['get_fuzzy_matches'].clear()
+        # Adding a movie also adds its director, actors and genres, if the repository didn't have them yet.
+        self._caches['get_genres'].clear()
+        if movie.director is not None:
+            self._caches['get_director'].invalidate((movie.director.director_full_name,))
+        for actor in movie.actors:
+            self._caches['get_actor'].invalidate((actor.actor_full_name,))
+        if replaced:
+            # The same goes for the people the movie had.
+            self._caches['get_filmography'].clear()
+            return
+        # Only the filmographies of the movie's people change, every page and order of them.
+        people = {('director', movie.director.director_full_name)} if movie.director is not None else set()
+        people.update(('actor', actor.actor_full_name) for actor in movie.actors)
+        self._caches['get_filmography'].invalidate_where(lambda key: key[:2] in people)
+
+    def add_director(self, director: Director):
+        self._repo.add_director(director)
+        self._caches['get_director'].invalidate((director.director_full_name,))
+
+    def get_director(self, director_name) -> Director:
+        return self._read('get_director', (director_name,), director_name)
+
+    def add_genre(self, genre: Genre):
+        self._repo.add_genre(genre)
+        self._caches['get_genres'].clear()
+
+    def get_genres(self) -> List[Genre]:
+        return self._read('get_genres', ())
+
+    def add_actor(self, actor: Actor):
+        self._repo.add_actor(actor)
+        self._caches['get_actor'].invalidate((actor.actor_full_name,))
+
+    def get_actor(self, actor_name) -> Actor:
+        return self._read('get_actor', (actor_name,), actor_name)
+
+    def add_movie(self, movie: Movie):
+        replaced = self._repo.get_movie(movie.rank) is not None
+        self._repo.add_movie(movie)
+        self._invalidate_movie(movie, replaced)
+
+    def get_movie(self, rank: int) -> Movie:
+        return self._read('get_movie', (rank,), rank)
+
+    def get_number_of_movies(self):
+        return self._read('get_number_of_movies', ())
+
+    def get_first_movie(self) -> Movie:
+        return self._read('get_first_movie', ())
+
+    def get_last_movie(self) -> Movie:
+        return self._read('get_last_movie', ())
+
+    def get_movies_by_rank(self, rank_list):
+        rank_list = tuple(rank_list)
+        return self._read('get_movies_by_rank', rank_list, rank_list)
+
+    def get_movie_ranks_for_genre(self, genre_name: str):
+        return self._read('get_movie_ranks_for_genre', (genre_name,), genre_name)
+
+    def get_movie_facets(self, facet_filter: FacetFilter, cursor: int = 0, limit: int = None) -> MovieFacets:
+        return self._read('get_movie_facets', (facet_filter, cursor, limit), facet_filter, cursor, limit)
+
+    def get_suggestions(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        # The backends answer from an index in memory, which add_movie keeps up to date.
+        return self._repo.get_suggestions(prefix, limit)
+
+    def get_fuzzy_matches(self, query: str, limit: int = 10) -> List[Suggestion]:
+        return self._read('get_fuzzy_matches', (query, limit), query, limit)
+
+    def get_filmography(self, kind: str, name: str, sort: str = 'year', cursor: int = 0,
+                        limit: int = None) -> Filmography:
+        return self._read('get_filmography', (kind, name, sort, cursor, limit), kind, name, sort, cursor, limit)
+
+    def add_review(self, review: Review):
+        # None of the cached reads include reviews.
+        self._repo.add_review(review)
+
+    def add_reviews(self, reviews: List[Review]):
+        self._repo.add_reviews(reviews)
+
+    def get_reviews(self):
+        return self._repo.get_reviews()
+
+    def add_user(self, user: User):
+        self._repo.add_user(user)
+
+    def get_user(self, username: str) -> User:
+        return self._repo.get_user(username)
+
+    def add_watch(self, user: User, movie: Movie, watched_at: datetime = None):
+        # None of the cached reads include watches.
+        self._repo.add_watch(user, movie, watched_at)
+
+    def add_watches(self, users: List[User], movie: Movie, watched_at: datetime = None):
+        self._repo.add_watches(users, movie, watched_at)
+
+    def get_watch_history(self, user: User, cursor: int = 0, limit: int = None) -> List[Watch]:
+        return self._repo.get_watch_history(user, cursor, limit)
+
+    def get_watch_totals(self, user: User) -> WatchTotals:
+        return self._repo.get_watch_totals(user)
+
+    def add_watchlist(self, watchlist: WatchList):
+        self._repo.add_watchlist(watchlist)
+
+    def get_watchlist(self, user: User) -> List[WatchList]:
+        return self._repo.get_watchlist(user)
@@ -1,20 +1,103 @@
 import csv
 import os
+import threading
 from datetime import datetime
-from typing import List
-from sqlalchemy import desc, asc
+from time import monotonic
+from typing import Iterable, List
+from sqlalchemy import desc, asc, inspect, text, bindparam, Integer, DateTime
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext import baked
+from sqlalchemy.util import LRUCache
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from werkzeug.security import generate_password_hash
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, joinedload, selectinload
 from flask import _app_ctx_stack
 from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList
-from movie_app.adapters.repository import AbstractRepository
+from movie_app.adapters.repository import AbstractRepository, RepositoryException, FacetFilter, MovieFacets, \
+    Suggestion, Filmography, FILMOGRAPHY_SORTS, Watch, WatchTotals
+from movie_app.adapters.suggest import SuggestIndex, normalize
+from movie_app.adapters import parallel_ingest
+from movie_app.adapters.fuzzy import trigrams, trigrams_of_normalized, entry_of, max_edits, overlap_threshold, \
+    counted_trigrams, close_matches, best_matches
 
 directors = None
 genres = None
 actors = None
 
+# The names matched by get_fuzzy_matches, kept in name_trigrams: (kind, table, name column).
+NAMED_TABLES = (('movie', 'movies', 'title'), ('director', 'directors', 'director_full_name'),
+                ('actor', 'actors', 'actor_full_name'))
+# Postings are counted up to this many, to find a query's rarest trigrams without counting every name under a
+# common one such as that of 'the'.
+POSTING_COUNT_LIMIT = 1000
+
+# The condition on movies selecting a person's movies, for each kind of person, looking the person up by name with
+# the indexes on their name and on movies.director_id and movie_actors.actor_id (see orm.py).
+FILMOGRAPHY_CONDITIONS = {
+    'director': 'movies.director_id IN (SELECT id FROM directors WHERE director_full_name = :name)',
+    'actor': 'movies.id IN (SELECT movie_id FROM movie_actors '
+             'WHERE actor_id IN (SELECT id FROM actors WHERE actor_full_name = :name))'
+}
+# The ORDER BY of each of FILMOGRAPHY_SORTS. SQLite orders NULL before numbers, and text such as 'N/A' after them,
+# so ratings that aren't known are made NULL, which a descending order puts last.
+FILMOGRAPHY_ORDERS = {
+    'year': 'movies.release_year DESC, movies.id',
+    'rating': 'CASE WHEN movies.rating BETWEEN 0 AND 10 THEN movies.rating END DESC, movies.id'
+}
+
+# The statements executed most often are built once, here, so that each is compiled once, on first use, and its
+# compiled form taken from SqlAlchemyRepository's compiled cache from then on (see SqlAlchemyRepository._execute).
+# A genre's movies are looked up by genre name in one statement, with the indexes on genres.genre_name and
+# movie_genres (genre_id, movie_id), which has them in rank order.
+MOVIE_RANKS_FOR_GENRE = text(
+    'SELECT movie_genres.movie_id FROM genres JOIN movie_genres ON movie_genres.genre_id = genres.id '
+    'WHERE genres.genre_name = :genre_name ORDER BY movie_genres.movie_id')
+FILMOGRAPHY_RANKS = {
+    (kind, sort): text(f'SELECT movies.id FROM movies WHERE {condition} ORDER BY {FILMOGRAPHY_ORDERS[sort]} '
+                       f'LIMIT :limit OFFSET :cursor')
+    for kind, condition in FILMOGRAPHY_CONDITIONS.items() for sort in FILMOGRAPHY_SORTS
+}
+FILMOGRAPHY_COUNTS = {
+    kind: text(f'SELECT count(*) FROM movies WHERE {condition}') for kind, condition in FILMOGRAPHY_CONDITIONS.items()
+}
+MOVIE_RUNTIME = text('SELECT runtime_minutes FROM movies WHERE id = :rank')
+INSERT_WATCHES = text(
+    'INSERT INTO user_watched_movies (user_id, movie_id, watched_at) '
+    'SELECT id, :rank, :watched_at FROM users WHERE username = :username').bindparams(
+    bindparam('watched_at', type_=DateTime))
+ADD_TO_WATCH_TOTALS = text(
+    'UPDATE users SET movies_watched = movies_watched + 1, '
+    'time_spent_watching_movies_minutes = time_spent_watching_movies_minutes + :runtime WHERE username = :username')
+ADD_TO_GENRE_WATCH_TIMES = text(
+    'INSERT INTO watch_time_by_genre (user_id, genre_id, minutes) '
+    'SELECT users.id, movie_genres.genre_id, :runtime FROM users, movie_genres '
+    'WHERE users.username = :username AND movie_genres.movie_id = :rank '
+    'ON CONFLICT (user_id, genre_id) DO UPDATE SET minutes = minutes + excluded.minutes')
+WATCH_HISTORY = text(
+    'SELECT movie_id, watched_at FROM user_watched_movies '
+    'WHERE user_id = (SELECT id FROM users WHERE username = :username) '
+    'ORDER BY id DESC LIMIT :limit OFFSET :cursor').columns(movie_id=Integer, watched_at=DateTime)
+WATCH_TOTALS = text(
+    'SELECT id, movies_watched, time_spent_watching_movies_minutes FROM users WHERE username = :username')
+GENRE_WATCH_TIMES = text(
+    'SELECT genres.genre_name, watch_time_by_genre.minutes FROM watch_time_by_genre '
+    'JOIN genres ON genres.id = watch_time_by_genre.genre_id WHERE watch_time_by_genre.user_id = :user_id')
+# The most compiled statements kept: those above, and the ones built per call, e.g. for facets, are compiled anew.
+COMPILED_CACHE_SIZE = 100
+
+
+def baked_movie_query(bakery, collection_loader):
+    # Movies are always displayed with their director, actors and genres, so load them with the movies instead of
+    # lazily, one statement per movie and relationship. Lists of movies load each collection in one extra statement
+    # (selectinload); single movies can be fetched in one joined statement. The lambda's code is the same for both
+    # loaders, so the loader is made part of the query's cache key.
+    return bakery(lambda session: session.query(Movie).options(
+        joinedload(Movie._Movie__director),
+        collection_loader(Movie._Movie__actors),
+        collection_loader(Movie._Movie__genres)
+    ), collection_loader)
+
 
 class SessionContextManager:
     def __init__(self, session_factory):
@@ -39,18 +122,56 @@ class SessionContextManager:
 
     def reset_session(self):
         # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
-        self.close_current_session()
-        self.__session = scoped_session(self.__session_factory, scopefunc=_app_ctx_stack.__ident_func__)
+        # via the 'before_request' callback. Only the calling thread's session is replaced: replacing the
+        # scoped_session itself would also replace the sessions of requests in progress on other threads.
+        self.__session.remove()
 
     def close_current_session(self):
         if not self.__session is None:
-            self.__session.close()
+            self.__session.remove()
 
 
 class SqlAlchemyRepository(AbstractRepository):
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, suggestions_ttl: float = 300, clock=monotonic):
         self._session_cm = SessionContextManager(session_factory)
+        # The SuggestIndex is built in this process, on the first request for suggestions, and kept up to date by
+        # add_movie. Movies added by other processes (e.g. flask import-movies) show up once it is suggestions_ttl
+        # seconds old and is built again.
+        self._suggestions_ttl = suggestions_ttl
+        self._clock = clock
+        self._suggest_index = (None, None)      # (SuggestIndex, expiry time)
+        self._suggest_lock = threading.Lock()
+        self._compiled_cache = LRUCache(COMPILED_CACHE_SIZE)
+
+        # The ORM queries made most often are baked: each is built and compiled once, on first use, and reused from
+        # then on, with its parameters bound per call.
+        self._bakery = baked.bakery()
+        self._movie = baked_movie_query(self._bakery, joinedload)
+        self._last_movie = self._movie.with_criteria(lambda query: query.order_by(desc(Movie._Movie__rank)))
+        self._movies_by_rank = baked_movie_query(self._bakery, selectinload).with_criteria(
+            lambda query: query.filter(Movie._Movie__rank.in_(bindparam('ranks', expanding=True))))
+        self._number_of_movies = self._bakery(lambda session: session.query(Movie))
+        self._genres = self._bakery(lambda session: session.query(Genre))
+        self._director = self._bakery(lambda session: session.query(Director).filter(
+            Director._Director__director_full_name == bindparam('name')))
+        self._actor = self._bakery(lambda session: session.query(Actor).filter(
+            Actor._Actor__actor_full_name == bindparam('name')))
+        self._user = self._bakery(lambda session: session.query(User).filter(
+            User._User__user_name == bindparam('username')))
+
+    def _movie_query(self, collection_loader=selectinload):
+        # Movies loaded as by baked_movie_query, for queries whose criteria are built per call.
+        return self._session_cm.session.query(Movie).options(
+            joinedload(Movie._Movie__director),
+            collection_loader(Movie._Movie__actors),
+            collection_loader(Movie._Movie__genres)
+        )
+
+    def _execute(self, statement, parameters=None):
+        # Executes one of the statements built once above, in the session's transaction, compiling it only if its
+        # compiled form isn't in the compiled cache. Session.execute would compile it every time.
+        connection = self._session_cm.session.connection().execution_options(compiled_cache=self._compiled_cache)
+        return connection.execute(statement, parameters)
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -58,6 +179,18 @@ class SqlAlchemyRepository(AbstractRepository):
     def reset_session(self):
         self._session_cm.reset_session()
 
+    def detach(self, entity):
+        """ Removes entity, and for a Movie its director, actors and genres, from the current session, so that it
+        can outlive the session (e.g. in a CachingRepository) without being expired by a later commit or rollback.
+        """
+        session = self._session_cm.session
+        entities = [entity]
+        if isinstance(entity, Movie):
+            entities += [entity.director] + entity.actors + entity.genres
+        for entity in entities:
+            if entity is not None and entity in session:
+                session.expunge(entity)
+
     def add_director(self, director: Director):
         with self._session_cm as scm:
             scm.session.add(director)
@@ -66,8 +199,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_director(self, director_name) -> Director:
         director = None
         try:
-            director = \
-                self._session_cm.session.query(Director).filter_by(_Director__director_full_name=director_name).one()
+            director = self._director(self._session_cm.session()).params(name=director_name).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -80,7 +212,7 @@ class SqlAlchemyRepository(AbstractRepository):
             scm.commit()
 
     def get_genres(self) -> List[Genre]:
-        genres = self._session_cm.session.query(Genre).all()
+        genres = self._genres(self._session_cm.session()).all()
         return genres
 
     def add_actor(self, actor: Actor):
@@ -91,7 +223,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_actor(self, actor_name) -> Actor:
         actor = None
         try:
-            actor = self._session_cm.session.query(Actor).filter_by(_Actor__actor_full_name=actor_name).one()
+            actor = self._actor(self._session_cm.session()).params(name=actor_name).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -101,84 +233,459 @@ class SqlAlchemyRepository(AbstractRepository):
     def add_movie(self, movie: Movie):
         with self._session_cm as scm:
             scm.session.add(movie)
+            # Flushing gives the movie's new director and actors their ids. Their trigrams are added in the same
+            # transaction as they are.
+            scm.session.flush()
+            cursor = scm.session.connection().connection.cursor()
+            index_names(cursor, 'movie', [(movie.rank, movie.title)])
+            people = [('director', movie.director.id, movie.director.director_full_name)] \
+                if movie.director is not None else []
+            people += [('actor', actor.id, actor.actor_full_name) for actor in movie.actors]
+            for kind, person_id, name in people:
+                if cursor.execute('SELECT 1 FROM name_trigrams WHERE kind = ? AND entity_id = ? LIMIT 1',
+                                  (kind, person_id)).fetchone() is None:
+                    index_names(cursor, kind, [(person_id, name)])
             scm.commit()
+        with self._suggest_lock:
+            suggest_index, expires = self._suggest_index
+            if suggest_index is not None:
+                self._suggest_index = (suggest_index.with_movies([movie]), expires)
 
     def get_movie(self, rank: int) -> Movie:
-        movie = None
-        try:
-            movie = self._session_cm.session.query(Movie).filter(Movie._Movie__rank == rank).one()
-        except NoResultFound:
-            # Ignore any exception and return None.
-            pass
-
+        # get() answers from the session's identity map when the movie has already been loaded in this session,
+        # and only issues a statement otherwise. It returns None if there is no Movie with the rank.
+        movie = self._movie(self._session_cm.session()).get(rank)
         return movie
 
     def get_number_of_movies(self):
-        number_of_movies = self._session_cm.session.query(Movie).count()
+        number_of_movies = self._number_of_movies(self._session_cm.session()).count()
         return number_of_movies
 
     def get_first_movie(self) -> Movie:
-        movie = self._session_cm.session.query(Movie).first()
+        movie = self._movie(self._session_cm.session()).first()
         return movie
 
     def get_last_movie(self) -> Movie:
-        movie = self._session_cm.session.query(Movie).order_by(desc(Movie._Movie__rank)).first()
+        movie = self._last_movie(self._session_cm.session()).first()
         return movie
 
     def get_movies_by_rank(self, rank_list):
-        movies = self._session_cm.session.query(Movie).filter(Movie._Movie__rank.in_(rank_list)).all()
+        movies = self._movies_by_rank(self._session_cm.session()).params(ranks=list(rank_list)).all()
         return movies
 
     def get_movie_ranks_for_genre(self, genre_name: str):
-        # Use native SQL to retrieve movie ranks, since there is no mapped class for the movie_genres table.
-        row = self._session_cm.session.execute('SELECT id FROM genres WHERE genre_name = :genre_name',
-                                               {'genre_name': genre_name}).fetchone()
-
-        if row is None:
-            # No genre with the name genre_name - create an empty list.
-            movie_ranks = list()
-        else:
-            genre_id = row[0]
-
-            # Retrieve article ids of articles associated with the tag.
-            movie_ranks = self._session_cm.session.execute(
-                'SELECT movie_id FROM movie_genres WHERE genre_id = :genre_id ORDER BY movie_id ASC',
-                {'genre_id': genre_id}
-            ).fetchall()
-            movie_ranks = [rank[0] for rank in movie_ranks]
-
+        # Use native SQL to retrieve movie ranks, since there is no mapped class for the movie_genres table. There are
+        # none if there is no genre with the name genre_name.
+        rows = self._execute(MOVIE_RANKS_FOR_GENRE, {'genre_name': genre_name}).fetchall()
+        movie_ranks = [row[0] for row in rows]
         return movie_ranks
 
+    def get_movie_facets(self, facet_filter: FacetFilter, cursor: int = 0, limit: int = None) -> MovieFacets:
+        # Each facet is counted with one GROUP BY over the movies matching the other facets' filters, using the
+        # indexes on the join tables and movie columns (see orm.py).
+        session = self._session_cm.session
+        parameters = {'cursor': cursor, 'limit': -1 if limit is None else limit}
+        matches = facet_conditions(facet_filter, parameters)
+
+        ranks = session.execute(f'SELECT movies.id FROM movies WHERE {matches} ORDER BY movies.id '
+                                f'LIMIT :limit OFFSET :cursor', parameters).fetchall()
+        number_of_movies = session.execute(f'SELECT count(*) FROM movies WHERE {matches}', parameters).scalar()
+
+        # Without filters, genres are counted from the (genre_id, movie_id) index alone.
+        genre_movies = '' if matches == NO_CONDITIONS \
+            else f'WHERE movie_genres.movie_id IN (SELECT movies.id FROM movies WHERE {matches})'
+        genres = session.execute(
+            f'SELECT genres.genre_name, genre_counts.count FROM (SELECT genre_id, count(*) AS count '
+            f'FROM movie_genres {genre_movies} GROUP BY genre_id) AS genre_counts '
+            f'JOIN genres ON genres.id = genre_counts.genre_id', parameters).fetchall()
+        decades = session.execute(
+            f'SELECT movies.release_year / 10 * 10, count(*) FROM movies '
+            f'WHERE {facet_conditions(facet_filter, parameters, "decade")} GROUP BY 1', parameters).fetchall()
+        # SQLite orders text after numbers, so this also leaves out 'N/A' ratings.
+        rating_bands = session.execute(
+            f'SELECT CAST(movies.rating AS INTEGER), count(*) FROM movies '
+            f'WHERE {facet_conditions(facet_filter, parameters, "rating_band")} '
+            f'AND movies.rating BETWEEN 0 AND 10 GROUP BY 1', parameters).fetchall()
+
+        directors = session.execute(
+            f'SELECT directors.director_full_name, director_counts.count FROM (SELECT director_id, count(*) AS count '
+            f'FROM movies WHERE {facet_conditions(facet_filter, parameters, "director")} GROUP BY director_id) '
+            f'AS director_counts JOIN directors ON directors.id = director_counts.director_id', parameters).fetchall()
+
+        return MovieFacets(number_of_movies, [row[0] for row in ranks], dict(genres), dict(decades), dict(directors),
+                           dict(rating_bands))
+
+    def get_suggestions(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        suggest_index = self._current_suggest_index()
+        if suggest_index is None:
+            with self._suggest_lock:
+                # Another thread may have built it while this one waited.
+                suggest_index = self._current_suggest_index()
+                if suggest_index is None:
+                    suggest_index = self._build_suggest_index()
+                    expires = self._clock() + self._suggestions_ttl if self._suggestions_ttl else None
+                    self._suggest_index = (suggest_index, expires)
+        return suggest_index.suggest(prefix, limit)
+
+    def _current_suggest_index(self):
+        suggest_index, expires = self._suggest_index
+        return suggest_index if expires is None or expires > self._clock() else None
+
+    def reset_suggestions(self):
+        """ Drops the SuggestIndex, so that the next request for suggestions builds it from the database. """
+        with self._suggest_lock:
+            self._suggest_index = (None, None)
+
+    def _build_suggest_index(self) -> SuggestIndex:
+        # Three statements read every title and name with the votes needed to rank them, without loading Movies.
+        session = self._session_cm.session
+        votes = dict()
+        suggestions = list()
+        for rank, title, movie_votes in session.execute('SELECT id, title, votes FROM movies'):
+            votes[rank] = movie_votes if isinstance(movie_votes, int) else 0
+            suggestions.append(Suggestion('movie', title, rank, votes[rank]))
+        for kind, statement in (
+                ('director', 'SELECT movies.id, directors.director_full_name FROM movies '
+                             'JOIN directors ON directors.id = movies.director_id'),
+                ('actor', 'SELECT movie_actors.movie_id, actors.actor_full_name FROM movie_actors '
+                          'JOIN actors ON actors.id = movie_actors.actor_id')):
+            people_votes = dict()
+            for rank, name in session.execute(statement):
+                people_votes[name] = people_votes.get(name, 0) + votes.get(rank, 0)
+            suggestions += [Suggestion(kind, name, None, total) for name, total in people_votes.items()]
+        return SuggestIndex(suggestions)
+
+    def get_fuzzy_matches(self, query: str, limit: int = 10) -> List[Suggestion]:
+        # The candidates are the names listed often enough under the query's rarest trigrams (see
+        # fuzzy.counted_trigrams), counted from the index on name_trigrams. Only their names are read, and only the
+        # people close enough have their votes totalled. There can be thousands of candidates, so they are read
+        # with the DB-API cursor, without SQLAlchemy's processing of every row.
+        normalized_query = normalize(query)
+        query_trigrams = sorted(trigrams_of_normalized(normalized_query))
+        if not query_trigrams or limit <= 0:
+            return []
+        cursor = self._session_cm.session.connection().connection.cursor()
+        posting_sizes = dict(cursor.execute(' UNION ALL '.join(
+            ['SELECT ?, (SELECT count(*) FROM (SELECT 1 FROM name_trigrams WHERE trigram = ? LIMIT ?))'] *
+            len(query_trigrams)), [value for trigram in query_trigrams
+                                   for value in (trigram, trigram, POSTING_COUNT_LIMIT)]).fetchall())
+        threshold = overlap_threshold(len(query_trigrams), max_edits(normalized_query))
+        counted, required = counted_trigrams(query_trigrams, posting_sizes, threshold)
+
+        candidates = list()
+        people_ids = dict()
+        cursor.execute(f'SELECT candidates.kind, candidates.entity_id, movies.title, movies.votes, '
+                       f'directors.director_full_name, actors.actor_full_name FROM (SELECT kind, entity_id '
+                       f'FROM name_trigrams WHERE trigram IN ({", ".join("?" * len(counted))}) '
+                       f'GROUP BY kind, entity_id HAVING count(*) >= ?) AS candidates '
+                       f"LEFT JOIN movies ON candidates.kind = 'movie' AND movies.id = candidates.entity_id "
+                       f"LEFT JOIN directors ON candidates.kind = 'director' AND directors.id = candidates.entity_id "
+                       f"LEFT JOIN actors ON candidates.kind = 'actor' AND actors.id = candidates.entity_id",
+                       [*counted, required])
+        for kind, entity_id, title, votes, director_name, actor_name in cursor.fetchall():
+            if kind == 'movie':
+                suggestion = Suggestion(kind, title, entity_id, votes if isinstance(votes, int) else 0)
+            else:
+                # Votes are totalled below, for the close matches only.
+                suggestion = Suggestion(kind, director_name if kind == 'director' else actor_name, None, 0)
+                people_ids[(kind, suggestion.name)] = entity_id
+            candidates.append(entry_of(suggestion))
+
+        matches = close_matches(query, candidates)
+        people_votes = self._people_votes([(suggestion.kind, people_ids[(suggestion.kind, suggestion.name)])
+                                           for _, suggestion in matches if suggestion.kind != 'movie'])
+        for i, (distance, suggestion) in enumerate(matches):
+            if suggestion.kind != 'movie':
+                person = (suggestion.kind, people_ids[(suggestion.kind, suggestion.name)])
+                matches[i] = (distance, suggestion._replace(votes=people_votes.get(person, 0)))
+        return best_matches(matches, limit)
+
+    def _people_votes(self, people) -> dict:
+        # Returns the total votes of the movies of each (kind, id) in people.
+        session = self._session_cm.session
+        votes = dict()
+        for kind, statement in (
+                ('director', 'SELECT movies.director_id, movies.votes FROM movies WHERE movies.director_id IN :ids'),
+                ('actor', 'SELECT movie_actors.actor_id, movies.votes FROM movie_actors '
+                          'JOIN movies ON movies.id = movie_actors.movie_id WHERE movie_actors.actor_id IN :ids')):
+            ids = [person_id for person_kind, person_id in people if person_kind == kind]
+            if ids:
+                for person_id, movie_votes in session.execute(
+                        text(statement).bindparams(bindparam('ids', expanding=True)), {'ids': ids}):
+                    votes[(kind, person_id)] = votes.get((kind, person_id), 0) + \
+                                               (movie_votes if isinstance(movie_votes, int) else 0)
+        return votes
+
+    def get_filmography(self, kind: str, name: str, sort: str = 'year', cursor: int = 0,
+                        limit: int = None) -> Filmography:
+        if kind not in FILMOGRAPHY_CONDITIONS or sort not in FILMOGRAPHY_SORTS:
+            raise RepositoryException(f'No {sort} ordered filmography of a {kind}')
+        parameters = {'name': name, 'cursor': cursor, 'limit': -1 if limit is None else limit}
+        ranks = self._execute(FILMOGRAPHY_RANKS[(kind, sort)], parameters).fetchall()
+        number_of_movies = self._execute(FILMOGRAPHY_COUNTS[kind], {'name': name}).scalar()
+        return Filmography(number_of_movies, [row[0] for row in ranks])
+
     def add_review(self, review: Review):
-        super().add_review(review)
+        self.add_reviews([review])
+
+    def add_reviews(self, reviews: Iterable[Review]):
+        # The Reviews are added with one commit, rather than one each.
+        reviews = list(reviews)
+        for review in reviews:
+            super().add_review(review)
         with self._session_cm as scm:
-            scm.session.add(review)
+            for review in reviews:
+                if inspect(review.movie).detached:
+                    # Adding the review would attach the detached (e.g. cached) movie to this session, and the commit
+                    # would expire it. Add a copy of the review that refers to this session's instance of the movie.
+                    review = scm.session.merge(review)
+                scm.session.add(review)
             scm.commit()
 
     def get_reviews(self):
-        reviews = self._session_cm.session.query(Review).all()
+        # Reviews are matched against their movies, so load each review's movie along with it.
+        reviews = self._session_cm.session.query(Review).options(joinedload(Review._Review__movie)).all()
         return reviews
 
     def add_user(self, user: User):
         with self._session_cm as scm:
             scm.session.add(user)
-            scm.commit()
+            try:
+                scm.commit()
+            except IntegrityError:
+                # The unique constraint on users.username makes the check and the insert atomic.
+                raise RepositoryException(f'Username {user.user_name} is already taken')
 
     def get_user(self, username: str) -> User:
         user = None
         try:
-            user = self._session_cm.session.query(User).filter_by(_User__user_name=username).one()
+            user = self._user(self._session_cm.session()).params(username=username).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
 
         return user
 
+    def add_watch(self, user: User, movie: Movie, watched_at: datetime = None):
+        self.add_watches([user], movie, watched_at)
+
+    def add_watches(self, users: Iterable[User], movie: Movie, watched_at: datetime = None):
+        # A few statements, each executed once per user with executemany, in one transaction, whatever the length of
+        # the users' histories: the watches are appended, and the totals and the minutes of each of the movie's
+        # genres are added to. Users are looked up by username within the statements themselves.
+        watched_at = datetime.now() if watched_at is None else watched_at
+        with self._session_cm as scm:
+            runtime = self._execute(MOVIE_RUNTIME, {'rank': movie.rank}).scalar()
+            if runtime is None:
+                raise RepositoryException('Only Users and Movies in the repository can be watched')
+            parameters = [{'username': user.user_name, 'rank': movie.rank, 'runtime': runtime,
+                           'watched_at': watched_at} for user in users]
+            if not parameters:
+                return
+            inserted = self._execute(INSERT_WATCHES, parameters).rowcount
+            if inserted != len(parameters):
+                # The context manager rolls back the watches that were inserted.
+                raise RepositoryException('Only Users and Movies in the repository can be watched')
+            self._execute(ADD_TO_WATCH_TOTALS, parameters)
+            self._execute(ADD_TO_GENRE_WATCH_TIMES, parameters)
+            scm.commit()
+
+    def get_watch_history(self, user: User, cursor: int = 0, limit: int = None) -> List[Watch]:
+        rows = self._execute(WATCH_HISTORY, {'username': user.user_name, 'cursor': cursor,
+                                             'limit': -1 if limit is None else limit}).fetchall()
+        return [Watch(rank, watched_at) for rank, watched_at in rows]
+
+    def get_watch_totals(self, user: User) -> WatchTotals:
+        row = self._execute(WATCH_TOTALS, {'username': user.user_name}).fetchone()
+        if row is None:
+            return WatchTotals(0, 0, dict())
+        genre_minutes = self._execute(GENRE_WATCH_TIMES, {'user_id': row[0]}).fetchall()
+        return WatchTotals(row[1], row[2], dict(genre_minutes))
+
     def add_watchlist(self, watchlist: WatchList):
-        pass
+        # The WatchList's movies are inserted in one executemany, numbered in the order they were added.
+        with self._session_cm as scm:
+            session = scm.session
+            user_id = session.execute('SELECT id FROM users WHERE username = :username',
+                                      {'username': watchlist.watchlist_owner.user_name}).scalar()
+            if user_id is None:
+                raise RepositoryException('Only Users in the repository can own a WatchList')
+            watchlist_id = session.execute('INSERT INTO watchlists (user_id, name) VALUES (:user_id, :name)',
+                                           {'user_id': user_id, 'name': watchlist.watchlist_name}).lastrowid
+            items = [{'watchlist_id': watchlist_id, 'position': position, 'rank': movie.rank}
+                     for position, movie in enumerate(watchlist.watchlist)]
+            if items:
+                session.execute('INSERT INTO watchlist_items (watchlist_id, position, movie_id) '
+                                'VALUES (:watchlist_id, :position, :rank)', items)
+            scm.commit()
 
     def get_watchlist(self, user: User) -> List[WatchList]:
-        pass
+        # Three statements however many WatchLists and movies the user has: the WatchLists, by the index on their
+        # owner, their movies' ranks in order, and the movies themselves.
+        if user is None:
+            return []
+        session = self._session_cm.session
+        parameters = {'username': user.user_name}
+        owned = 'SELECT id FROM watchlists WHERE user_id = (SELECT id FROM users WHERE username = :username)'
+        rows = session.execute(f'SELECT id, name FROM watchlists WHERE id IN ({owned}) ORDER BY id',
+                               parameters).fetchall()
+        if not rows:
+            return []
+        items = session.execute(f'SELECT watchlist_id, movie_id FROM watchlist_items WHERE watchlist_id IN ({owned}) '
+                                f'ORDER BY watchlist_id, position', parameters).fetchall()
+        movies = self._movie_query().filter(
+            text(f'movies.id IN (SELECT movie_id FROM watchlist_items WHERE watchlist_id IN ({owned}))')).params(
+            parameters).all()
+        movies = {movie.rank: movie for movie in movies}
+
+        watchlists = {watchlist_id: WatchList(user, name) for watchlist_id, name in rows}
+        for watchlist_id, rank in items:
+            # Nothing stops a movie on a watchlist being deleted; the watchlist leaves it out.
+            if rank in movies:
+                watchlists[watchlist_id].add_movie(movies[rank])
+        return list(watchlists.values())
+
+
+NO_CONDITIONS = '1 = 1'
+
+
+def facet_conditions(facet_filter: FacetFilter, parameters: dict, excluded_facet: str = None) -> str:
+    """ Returns the SQL condition on movies for facet_filter, leaving out the filter on excluded_facet, and adds the
+    values it refers to to parameters.
+    """
+    conditions = [NO_CONDITIONS]
+    for i, genre_name in enumerate(facet_filter.genres):
+        conditions.append(f'movies.id IN (SELECT movie_id FROM movie_genres '
+                          f'WHERE genre_id = (SELECT id FROM genres WHERE genre_name = :genre_{i}))')
+        parameters[f'genre_{i}'] = genre_name
+    if facet_filter.decade is not None and excluded_facet != 'decade':
+        conditions.append('movies.release_year BETWEEN :decade AND :decade + 9')
+        parameters['decade'] = facet_filter.decade
+    if facet_filter.director is not None and excluded_facet != 'director':
+        conditions.append('movies.director_id IN (SELECT id FROM directors WHERE director_full_name = :director)')
+        parameters['director'] = facet_filter.director
+    if facet_filter.rating_band is not None and excluded_facet != 'rating_band':
+        conditions.append('movies.rating >= :rating_band AND movies.rating < :rating_band + 1')
+        parameters['rating_band'] = facet_filter.rating_band
+    return ' AND '.join(conditions)
+
+
+def index_names(cursor, kind: str, names):
+    """ Adds the trigrams of names, (id, name) pairs of the given kind, to name_trigrams. """
+    cursor.executemany('INSERT INTO name_trigrams (trigram, kind, entity_id) VALUES (?, ?, ?)',
+                       [(trigram, kind, entity_id) for entity_id, name in names for trigram in trigrams(name)])
+
+
+def unindex_names(cursor, kind: str, entity_ids):
+    """ Removes the trigrams of the names of the given kind with entity_ids from name_trigrams. """
+    cursor.executemany('DELETE FROM name_trigrams WHERE kind = ? AND entity_id = ?',
+                       [(kind, entity_id) for entity_id in entity_ids])
+
+
+def index_missing_names(cursor):
+    """ Adds the trigrams of the titles and names that name_trigrams doesn't have yet, e.g. all of them in a
+    database created before it was.
+    """
+    for kind, table, column in NAMED_TABLES:
+        names = cursor.execute(f'SELECT id, {column} FROM {table} WHERE id NOT IN '
+                               f'(SELECT entity_id FROM name_trigrams WHERE kind = ?)', (kind,)).fetchall()
+        index_names(cursor, kind, names)
+
+
+def index_new_names(engine: Engine):
+    """ Runs index_missing_names in a transaction of its own, e.g. when the application starts. """
+    conn = engine.raw_connection()
+    try:
+        index_missing_names(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def drop_stale_names(cursor):
+    """ Removes the trigrams of the titles and names no longer in the database. """
+    for kind, table, _ in NAMED_TABLES:
+        cursor.execute(f'DELETE FROM name_trigrams WHERE kind = ? AND entity_id NOT IN (SELECT id FROM {table})',
+                       (kind,))
+
+
+# The statements populate inserts the movie file with.
+INSERT_DIRECTORS = """
+    INSERT INTO directors (id, director_full_name)
+    VALUES (?, ?)"""
+INSERT_GENRES = """
+    INSERT INTO genres (id, genre_name)
+    VALUES (?, ?)"""
+INSERT_ACTORS = """
+    INSERT INTO actors (id, actor_full_name)
+    VALUES (?, ?)"""
+INSERT_MOVIES = """
+    INSERT INTO movies (id, title, release_year, description, director_id, runtime_minutes, rating, votes,
+    revenue_in_millions, metascore)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+INSERT_MOVIE_ACTORS = """
+    INSERT INTO movie_actors (id, movie_id, actor_id)
+    VALUES (?, ?, ?)"""
+INSERT_MOVIE_GENRES = """
+    INSERT INTO movie_genres (id, movie_id, genre_id)
+    VALUES (?, ?, ?)"""
+
+
+def column_value(value: str, convert):
+    # Like movie_generator, keep 'N/A' as it is.
+    value = value.strip()
+    return convert(value) if value != 'N/A' else value
+
+
+def movie_rows(column: dict, rows):
+    """ Yields each row of a movie file, a list of values, as the movies table stores it (see movie_generator), with
+    the name of its director in place of the director's id, followed by the names of its actors and of its genres.
+    """
+    rank, title, year, description, director, runtime, rating, votes, revenue, metascore, actors, genres = (
+        column[name] for name in ('Rank', 'Title', 'Year', 'Description', 'Director', 'Runtime (Minutes)', 'Rating',
+                                  'Votes', 'Revenue (Millions)', 'Metascore', 'Actors', 'Genre'))
+    for row in rows:
+        yield (int(row[rank]), row[title], int(row[year]), row[description].strip(), row[director].strip(),
+               int(row[runtime]), column_value(row[rating], float), column_value(row[votes], int),
+               column_value(row[revenue], float), column_value(row[metascore], int),
+               [actor.strip() for actor in row[actors].split(',')], [genre.strip() for genre in row[genres].split(',')])
+
+
+def name_id(ids: dict, new_names: list, name: str) -> int:
+    # Numbers names in the order they are first found, as director_generator, genre_generator and actor_generator do.
+    name_id = ids.get(name)
+    if name_id is None:
+        name_id = ids[name] = len(ids) + 1
+        new_names.append((name_id, name))
+    return name_id
+
+
+def insert_movie_chunks(cursor, chunks):
+    """ Inserts the directors, genres, actors and movies of chunks of movie_rows, in file order, into the tables
+    that populate fills in, numbering them as populate does when it reads the file in this process.
+    """
+    director_ids, genre_ids, actor_ids = dict(), dict(), dict()
+    # The ranks of each genre's and actor's movies, by id.
+    genre_movies, actor_movies = dict(), dict()
+    for chunk in chunks:
+        new_directors, new_genres, new_actors, movies = list(), list(), list(), list()
+        for row in chunk:
+            rank, actor_names, genre_names = row[0], row[10], row[11]
+            for genre in genre_names:
+                genre_movies.setdefault(name_id(genre_ids, new_genres, genre), list()).append(rank)
+            for actor in actor_names:
+                actor_movies.setdefault(name_id(actor_ids, new_actors, actor), list()).append(rank)
+            movies.append(row[:4] + (name_id(director_ids, new_directors, row[4]),) + row[5:10])
+        cursor.executemany(INSERT_DIRECTORS, new_directors)
+        cursor.executemany(INSERT_GENRES, new_genres)
+        cursor.executemany(INSERT_ACTORS, new_actors)
+        cursor.executemany(INSERT_MOVIES, movies)
+
+    # Like movie_actors_generator and movie_genres_generator, number the associations by actor and genre.
+    cursor.executemany(INSERT_MOVIE_ACTORS, ((i, rank, actor_id) for i, (actor_id, rank) in enumerate(
+        ((actor_id, rank) for actor_id, ranks in actor_movies.items() for rank in ranks), start=1)))
+    cursor.executemany(INSERT_MOVIE_GENRES, ((i, rank, genre_id) for i, (genre_id, rank) in enumerate(
+        ((genre_id, rank) for genre_id, ranks in genre_movies.items() for rank in ranks), start=1)))
 
 
 def csv_processor(filename: str):
@@ -325,47 +832,30 @@ def process_user(user_row):
     return user_row
 
 
-def populate(engine: Engine, data_path: str):
+def populate(engine: Engine, data_path: str, workers: int = 1):
     conn = engine.raw_connection()
     cursor = conn.cursor()
 
-    global directors, genres, actors
-    directors = dict()
-    genres = dict()
-    actors = dict()
-
-    csv_processor(os.path.join(data_path, 'Data1000Movies.csv'))
-
-    insert_directors = """
-        INSERT INTO directors (id, director_full_name)
-        VALUES (?, ?)"""
-    cursor.executemany(insert_directors, director_generator())
+    if workers > 1:
+        # Parse the movie file in workers processes, and insert the chunks they parse in file order.
+        insert_movie_chunks(cursor, parallel_ingest.map_chunks(os.path.join(data_path, 'Data1000Movies.csv'),
+                                                               movie_rows, workers))
+    else:
+        global directors, genres, actors
+        directors = dict()
+        genres = dict()
+        actors = dict()
 
-    insert_genres = """
-        INSERT INTO genres (id, genre_name)
-        VALUES (?, ?)"""
-    cursor.executemany(insert_genres, genre_generator())
+        csv_processor(os.path.join(data_path, 'Data1000Movies.csv'))
 
-    insert_actors = """
-        INSERT INTO actors (id, actor_full_name)
-        VALUES (?, ?)"""
-    cursor.executemany(insert_actors, actor_generator())
+        cursor.executemany(INSERT_DIRECTORS, director_generator())
+        cursor.executemany(INSERT_GENRES, genre_generator())
+        cursor.executemany(INSERT_ACTORS, actor_generator())
+        cursor.executemany(INSERT_MOVIES, movie_generator(os.path.join(data_path, 'Data1000Movies.csv')))
+        cursor.executemany(INSERT_MOVIE_ACTORS, movie_actors_generator())
+        cursor.executemany(INSERT_MOVIE_GENRES, movie_genres_generator())
 
-    insert_movies = """
-        INSERT INTO movies (id, title, release_year, description, director_id, runtime_minutes, rating, votes, 
-        revenue_in_millions, metascore)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-    cursor.executemany(insert_movies, movie_generator(os.path.join(data_path, 'Data1000Movies.csv')))
-
-    insert_movie_actors = """
-        INSERT INTO movie_actors (id, movie_id, actor_id)
-        VALUES (?, ?, ?)"""
-    cursor.executemany(insert_movie_actors, movie_actors_generator())
-
-    insert_movie_genres = """
-        INSERT INTO movie_genres (id, movie_id, genre_id)
-        VALUES (?, ?, ?)"""
-    cursor.executemany(insert_movie_genres, movie_genres_generator())
+    index_missing_names(cursor)
 
     default_review = [1, 1, 'GOTG is my new favourite movie of all time!', 10, datetime.now(), 1]
     insert_reviews = """
@@ -373,11 +863,34 @@ def populate(engine: Engine, data_path: str):
         VALUES (?, ?, ?, ?, ?, ?)"""
     cursor.execute(insert_reviews, default_review)
 
-    default_user = [1, 'nton939', generate_password_hash('nton939Password'), 121]
+    # The default user has watched the movie they reviewed.
+    default_user = [1, 'nton939', generate_password_hash('nton939Password'), 121, 1]
     insert_users = """
-        INSERT INTO users (id, username, password, time_spent_watching_movies_minutes)
-        VALUES (?, ?, ?, ?)"""
+        INSERT INTO users (id, username, password, time_spent_watching_movies_minutes, movies_watched)
+        VALUES (?, ?, ?, ?, ?)"""
     cursor.execute(insert_users, default_user)
 
+    default_watch = [1, 1, 1, datetime.now()]
+    insert_watches = """
+        INSERT INTO user_watched_movies (id, user_id, movie_id, watched_at)
+        VALUES (?, ?, ?, ?)"""
+    cursor.execute(insert_watches, default_watch)
+    cursor.execute("""
+        INSERT INTO watch_time_by_genre (user_id, genre_id, minutes)
+        SELECT user_watched_movies.user_id, movie_genres.genre_id, sum(movies.runtime_minutes)
+        FROM user_watched_movies
+        JOIN movies ON movies.id = user_watched_movies.movie_id
+        JOIN movie_genres ON movie_genres.movie_id = movies.id
+        GROUP BY 1, 2""")
+
+    # The default user wants to watch the top five movies.
+    cursor.execute("""
+        INSERT INTO watchlists (id, user_id, name)
+        VALUES (?, ?, ?)""", [1, 1, 'Watch Later'])
+    insert_watchlist_items = """
+        INSERT INTO watchlist_items (watchlist_id, position, movie_id)
+        VALUES (?, ?, ?)"""
+    cursor.executemany(insert_watchlist_items, [[1, position, rank] for position, rank in enumerate(range(1, 6))])
+
     conn.commit()
     conn.close()
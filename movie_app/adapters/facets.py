@@ -0,0 +1,66 @@
+from collections import Counter
+from itertools import compress, islice
+from typing import Dict
+from movie_app.adapters.bitmap_index import BitmapIndex, popcount, positions
+from movie_app.adapters.repository import FacetFilter, MovieFacets
+
+# Turns the '0' and '1' digits of a binary string into the bytes 0 and 1.
+BINARY_DIGIT_BYTES = bytes.maketrans(b'01', b'\x00\x01')
+# Directors are counted by visiting the matching movies one by one when at most one movie in SPARSE_MATCHES matches,
+# and otherwise by picking them out of every rank's director, which takes about as long whatever the matches.
+SPARSE_MATCHES = 32
+
+
+def counts(bitsets: Dict[object, int], matches: int) -> dict:
+    value_counts = dict()
+    for value, bits in bitsets.items():
+        count = popcount(bits & matches)
+        if count > 0:
+            value_counts[value] = count
+    return value_counts
+
+
+def query_facets(index: BitmapIndex, facet_filter: FacetFilter, cursor: int = 0, limit: int = None) -> MovieFacets:
+    """ Answers a facet query with the genre, decade and rating band ints of index (see BitmapIndex.bits):
+    filtering is a bitwise and, and counting a popcount. A director's Bitmap is made an int to filter by it. Directors
+    have too many values to count each against the matches, so the matching movies' directors are counted instead
+    (see director_counts).
+    """
+    everything = index.all_bits()
+    genres = everything
+    for genre_name in facet_filter.genres:
+        genres &= index.bits('genres').get(genre_name, 0)
+    decade = everything if facet_filter.decade is None else index.bits('decades').get(facet_filter.decade, 0)
+    rating_band = everything if facet_filter.rating_band is None \
+        else index.bits('rating_bands').get(facet_filter.rating_band, 0)
+    director = everything if facet_filter.director is None \
+        else index.get('directors', facet_filter.director).to_int()
+
+    matches = genres & decade & rating_band & director
+    page = islice(positions(matches), cursor, None if limit is None else cursor + limit)
+    return MovieFacets(
+        number_of_movies=popcount(matches),
+        ranks=list(page),
+        genres=counts(index.bits('genres'), matches),
+        # Each single-valued facet is counted with the other facets' filters, so that its counts say how many
+        # movies there would be with another value selected.
+        decades=counts(index.bits('decades'), genres & rating_band & director),
+        directors=director_counts(index, genres & decade & rating_band),
+        rating_bands=counts(index.bits('rating_bands'), genres & decade & director)
+    )
+
+
+def director_counts(index: BitmapIndex, matches: int) -> dict:
+    """ Returns the number of the movies in matches, an int whose set bits are ranks, each director directed. """
+    if matches == index.all_bits():
+        return dict(index.cardinalities('directors'))
+    directors_by_rank = index.directors_by_rank()
+    if popcount(matches) * SPARSE_MATCHES < len(directors_by_rank):
+        director_counts = Counter(map(directors_by_rank.__getitem__, positions(matches)))
+    else:
+        # The matches' bits, lowest first, as the bytes 0 and 1, pick the matching movies' directors out of the list
+        # of every rank's director, so that picking and counting them both run in C.
+        selected = bin(matches)[:1:-1].encode('ascii').translate(BINARY_DIGIT_BYTES)
+        director_counts = Counter(compress(directors_by_rank, selected))
+    director_counts.pop(None, None)
+    return dict(director_counts)
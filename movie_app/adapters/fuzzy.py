@@ -0,0 +1,183 @@
+from collections import namedtuple, Counter
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple
+from movie_app.adapters.repository import Suggestion
+from movie_app.adapters.suggest import normalize, votes_of, people_of
+from movie_app.domain.model import Movie
+
+
+# Besides the rarest trigrams every close name must have one of, this many more are counted (see counted_trigrams).
+EXTRA_COUNTED_TRIGRAMS = 2
+
+# A name to match, with its normalized text and trigrams worked out once.
+Entry = namedtuple('Entry', ['suggestion', 'normalized', 'trigrams'])
+
+
+def trigrams(text: str) -> frozenset:
+    """ Returns the trigrams of the words of text, normalized, each padded with two spaces in front and one behind
+    (as PostgreSQL's pg_trgm does), so that short words and word starts have trigrams too.
+    """
+    return trigrams_of_normalized(normalize(text or ''))
+
+
+def trigrams_of_normalized(normalized: str) -> frozenset:
+    return frozenset(padded[i:i + 3] for word in normalized.split()
+                     for padded in ('  ' + word + ' ',) for i in range(len(padded) - 2))
+
+
+def entry_of(suggestion: Suggestion) -> Entry:
+    normalized = normalize(suggestion.name or '')
+    return Entry(suggestion, normalized, trigrams_of_normalized(normalized))
+
+
+def max_edits(normalized_query: str) -> int:
+    # The typos tolerated: none in queries as short as 'dark', whose names would share too few trigrams with them
+    # to be found without reading most names, and up to two in long ones.
+    length = len(normalized_query)
+    return 0 if length <= 4 else 1 if length <= 10 else 2
+
+
+def overlap_threshold(number_of_trigrams: int, edits: int) -> int:
+    """ Returns how many of a query's trigrams a name within edits edits of it must share with it. An edit changes
+    at most four trigrams (a transposition of two letters); at least one trigram is always required, so that a
+    query is never answered by looking at every name.
+    """
+    return max(1, number_of_trigrams - 4 * edits)
+
+
+def counted_trigrams(query_trigrams: Iterable[str], posting_sizes: Dict[str, int],
+                     threshold: int) -> Tuple[List[str], int]:
+    """ Returns the rarest of query_trigrams, and how many of them a name sharing threshold of query_trigrams must
+    have, so that only their postings need be read to find every such name.
+
+    A name missing all of the len - threshold + 1 rarest trigrams can share at most threshold - 1 of them, so it
+    must have at least one of those. Each of the EXTRA_COUNTED_TRIGRAMS next rarest trigrams counted raises that to
+    one more, which leaves far fewer names to compare. The common trigrams, such as those of 'the', are left out,
+    so their long postings are never read.
+    """
+    query_trigrams = sorted(query_trigrams, key=lambda trigram: (posting_sizes.get(trigram, 0), trigram))
+    counted = min(len(query_trigrams), len(query_trigrams) - threshold + 1 + EXTRA_COUNTED_TRIGRAMS)
+    return query_trigrams[:counted], threshold - (len(query_trigrams) - counted)
+
+
+def edit_distance(first: str, second: str, bound: int) -> int:
+    """ Returns the optimal string alignment distance between first and second (insertions, deletions,
+    substitutions and transpositions of adjacent characters), or bound + 1 if it is more than bound. Only the cells
+    within bound of the diagonal are filled in, so the cost is O(bound * length).
+    """
+    if abs(len(first) - len(second)) > bound:
+        return bound + 1
+    too_far = bound + 1
+    previous_previous = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [too_far] * (len(second) + 1)
+        current[0] = i
+        for j in range(max(1, i - bound), min(len(second), i + bound) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+        if min(current[max(0, i - bound):i + bound + 1]) > bound:
+            return too_far
+        previous_previous, previous = previous, current
+    return min(previous[len(second)], too_far)
+
+
+def name_distance(normalized_query: str, normalized_name: str, bound: int) -> int:
+    """ Returns the edit distance between the query and the closest run of as many consecutive words of the name,
+    so that 'guardains' is one edit from Guardians of the Galaxy.
+    """
+    words = normalized_name.split()
+    length = len(normalized_query.split())
+    if length >= len(words):
+        return edit_distance(normalized_query, ' '.join(words), bound)
+    return min(edit_distance(normalized_query, ' '.join(words[first:first + length]), bound)
+               for first in range(len(words) - length + 1))
+
+
+def close_matches(query: str, candidates: Iterable[Entry]) -> List[Tuple[int, Suggestion]]:
+    """ Returns the (edit distance, Suggestion) of each of the candidates within max_edits of query. """
+    normalized_query = normalize(query)
+    query_trigrams = trigrams_of_normalized(normalized_query)
+    bound = max_edits(normalized_query)
+    threshold = overlap_threshold(len(query_trigrams), bound)
+    matches = list()
+    for candidate in candidates:
+        # Names sharing too few trigrams can't be close enough, and are dropped before the costlier edit distance.
+        if len(query_trigrams & candidate.trigrams) < threshold:
+            continue
+        distance = name_distance(normalized_query, candidate.normalized, bound)
+        if distance <= bound:
+            matches.append((distance, candidate.suggestion))
+    return matches
+
+
+def best_matches(matches: Iterable[Tuple[int, Suggestion]], limit: int) -> List[Suggestion]:
+    """ Returns up to limit of the matched Suggestions, the closest first, and the most voted of equally close ones. """
+    ranked = sorted(matches, key=lambda match: (match[0], -match[1].votes, match[1].name, match[1].kind,
+                                                match[1].rank or 0))
+    return [suggestion for _, suggestion in ranked[:limit]]
+
+
+class TrigramIndex:
+    """ Finds movie titles and director and actor names within a few typos of a query.
+
+    Every name is listed under each of its trigrams. A query counts the names in the lists of its rarest trigrams,
+    and those listed often enough (see counted_trigrams) are the candidates, of which those within a bounded edit
+    distance are kept (see close_matches). Like the other
+    indexes of the MemoryRepository, a TrigramIndex never changes: with_movies returns a new one, sharing the lists
+    of the trigrams the new movies don't have.
+    """
+
+    def __init__(self):
+        self._entries = list()          # Entries, by entry number.
+        self._postings = dict()         # Trigram -> tuple of entry numbers.
+        self._people = dict()           # (kind, name) -> entry number.
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def with_movies(self, movies: Iterable[Movie]) -> 'TrigramIndex':
+        entries = list(self._entries)
+        people = dict(self._people)
+        new_postings = dict()
+
+        def add_entry(suggestion: Suggestion):
+            entries.append(entry_of(suggestion))
+            for trigram in entries[-1].trigrams:
+                new_postings.setdefault(trigram, list()).append(len(entries) - 1)
+
+        for movie in movies:
+            add_entry(Suggestion('movie', movie.title, movie.rank, votes_of(movie)))
+            for kind, name in people_of(movie):
+                entry = people.get((kind, name))
+                if entry is None:
+                    add_entry(Suggestion(kind, name, None, votes_of(movie)))
+                    people[(kind, name)] = len(entries) - 1
+                else:
+                    # The person's name, and so their trigrams, stay the same; only their votes go up.
+                    suggestion = entries[entry].suggestion
+                    entries[entry] = entries[entry]._replace(
+                        suggestion=suggestion._replace(votes=suggestion.votes + votes_of(movie)))
+
+        index = TrigramIndex()
+        index._entries, index._people = entries, people
+        index._postings = dict(self._postings)
+        for trigram, entry_numbers in new_postings.items():
+            index._postings[trigram] = index._postings.get(trigram, ()) + tuple(entry_numbers)
+        return index
+
+    def search(self, query: str, limit: int = 10) -> List[Suggestion]:
+        normalized_query = normalize(query)
+        query_trigrams = trigrams_of_normalized(normalized_query)
+        if not query_trigrams or limit <= 0:
+            return []
+        threshold = overlap_threshold(len(query_trigrams), max_edits(normalized_query))
+        posting_sizes = {trigram: len(self._postings.get(trigram, ())) for trigram in query_trigrams}
+        counted, required = counted_trigrams(query_trigrams, posting_sizes, threshold)
+        counts = Counter(chain.from_iterable(self._postings.get(trigram, ()) for trigram in counted))
+        entries = self._entries
+        candidates = [entries[entry] for entry, count in counts.items() if count >= required]
+        return best_matches(close_matches(query, candidates), limit)
@@ -1,135 +1,321 @@
 import os
-from typing import List
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, List
 from werkzeug.security import generate_password_hash
-from movie_app.adapters.repository import AbstractRepository, RepositoryException
-from movie_app.domain.model import Director, Genre, Actor, Movie, MovieFileCSVReader, Review, User, WatchList
+from movie_app.adapters.repository import AbstractRepository, RepositoryException, FacetFilter, MovieFacets, \
+    Suggestion, Filmography, FILMOGRAPHY_SORTS, Watch, WatchTotals
+from movie_app.adapters.bitmap_index import BitmapIndex
+from movie_app.adapters.facets import query_facets
+from movie_app.adapters.fuzzy import TrigramIndex
+from movie_app.adapters.suggest import SuggestIndex
+from movie_app.adapters.write_ahead_log import WriteAheadLog
+from movie_app.adapters import parallel_ingest
+from movie_app.domain.model import Director, Genre, Actor, Movie, MovieFileCSVReader, Review, User, WatchList, \
+    EntityRegistry, parse_movies
 
 
-class MemoryRepository(AbstractRepository):
+# The movies in the order they were added, the same movies keyed by rank, the BitmapIndex of their ranks, and the
+# SuggestIndex and TrigramIndex of their titles and people. They are published together, so that readers never find
+# a movie in one but not the others.
+MovieIndex = namedtuple('MovieIndex', ['movies', 'by_rank', 'bitmaps', 'suggestions', 'trigrams'])
+
 
-    def __init__(self):
-        self._directors = list()
-        self._genres = list()
-        self._actors = list()
-        self._movies = list()
-        self._movies_index = dict()
-        self._reviews = list()
-        self._users = list()
-        self._all_watchlist = list()
+class MemoryRepository(AbstractRepository):
+    """ Keeps the repository in memory, safe for use by the threads of a threaded server.
+
+    Reads take no lock. Writes are serialized by a lock, and copy on write: a writer builds a new version of the
+    collection it changes and publishes it by rebinding an attribute, which is atomic. Published tuples and dicts
+    are never changed afterwards, so a reader always sees a complete version, however long it holds on to it.
+
+    Publishing a new version of the movies copies their indexes, so adding Movies one at a time takes time in
+    proportion to the number of Movies each time: add them with add_movies, or with add_movie within movie_batch.
+
+    Watches and Users are not copied on write. Copying a history for every watch would make recording one
+    O(history), so each user's history is a list that writers append to in place; appending and slicing a list are
+    atomic, and entries are never changed or removed, so a reader still sees a complete prefix of the history. The
+    dict of WatchTotals is changed in place too, a user's new WatchTotals replacing their old. And a User records
+    the Movies they watched and the Reviews they wrote on itself, as the domain model does, so a reader holding a
+    User sees it change.
+    """
+
+    def __init__(self, log: WriteAheadLog = None):
+        self._directors = dict()        # Director name -> Director, in the order they were added.
+        self._genres = tuple()
+        self._actors = dict()           # Actor name -> Actor, in the order they were added.
+        self._movies = MovieIndex(tuple(), dict(), BitmapIndex(), SuggestIndex(), TrigramIndex())
+        self._reviews = tuple()
+        self._users = dict()            # Username -> User.
+        self._watchlists = dict()       # Username -> tuple of the WatchLists they own, in the order they were added.
+        self._watch_histories = dict()  # Username -> list of Watches, oldest first.
+        self._watch_totals = dict()     # Username -> WatchTotals.
+        self._log = log
+        self._write_lock = threading.Lock()
+        self._batch = threading.local()     # The Movies added in this thread's movie_batch, if one is open.
+
+    def attach_log(self, log: WriteAheadLog):
+        # Users and Reviews added from now on are recorded in the log before the repository is updated.
+        self._log = log
 
     def add_director(self, director: Director):
-        self._directors.append(director)
+        self.add_directors([director])
+
+    def add_directors(self, directors: Iterable[Director]):
+        # Adding many Directors at once publishes one new version, instead of one per Director.
+        with self._write_lock:
+            self._directors = with_entries(self._directors,
+                                           ((director.director_full_name, director) for director in directors))
 
     def get_director(self, director_name) -> Director:
-        return next(
-            (director for director in self._directors if director.director_full_name == director_name), None)
+        return self._directors.get(director_name)
 
     def add_genre(self, genre: Genre):
-        self._genres.append(genre)
+        self.add_genres([genre])
+
+    def add_genres(self, genres: Iterable[Genre]):
+        with self._write_lock:
+            self._genres = self._genres + tuple(genres)
 
     def get_genres(self) -> List[Genre]:
-        return self._genres
+        return list(self._genres)
 
     def add_actor(self, actor: Actor):
-        self._actors.append(actor)
+        self.add_actors([actor])
+
+    def add_actors(self, actors: Iterable[Actor]):
+        with self._write_lock:
+            self._actors = with_entries(self._actors, ((actor.actor_full_name, actor) for actor in actors))
 
     def get_actor(self, actor_name) -> Actor:
-        return next((actor for actor in self._actors if actor.actor_full_name == actor_name), None)
+        return self._actors.get(actor_name)
 
     def add_movie(self, movie: Movie):
-        self._movies.append(movie)
-        self._movies_index[movie.rank] = movie
+        pending = getattr(self._batch, 'movies', None)
+        if pending is not None:
+            pending.append(movie)
+        else:
+            self.add_movies([movie])
+
+    @contextmanager
+    def movie_batch(self):
+        """ Collects the Movies this thread adds with add_movie in the with block, and adds them together with
+        add_movies when it ends, publishing one new version instead of one per Movie. Until then they can't be read.
+        """
+        if getattr(self._batch, 'movies', None) is not None:
+            # Already in a batch, which the Movies join.
+            yield
+            return
+        self._batch.movies = list()
+        try:
+            yield
+            movies = self._batch.movies
+        finally:
+            self._batch.movies = None
+        self.add_movies(movies)
+
+    def add_movies(self, movies: Iterable[Movie]):
+        movies = tuple(movies)
+        with self._write_lock:
+            by_rank = dict(self._movies.by_rank)
+            for movie in movies:
+                by_rank[movie.rank] = movie
+            self._movies = MovieIndex(self._movies.movies + movies, by_rank, self._movies.bitmaps.with_movies(movies),
+                                      self._movies.suggestions.with_movies(movies),
+                                      self._movies.trigrams.with_movies(movies))
 
     def get_movie(self, rank: int) -> Movie:
-        movie = None
-        try:
-            movie = self._movies_index[rank]
-        except KeyError:
-            pass  # Ignore exception and return None.
-        return movie
+        return self._movies.by_rank.get(rank)
 
     def get_number_of_movies(self):
-        return len(self._movies)
+        return len(self._movies.movies)
 
     def get_first_movie(self) -> Movie:
-        movie = None
-        if len(self._movies) > 0:
-            movie = self._movies[0]
-        return movie
+        movies = self._movies.movies
+        return movies[0] if len(movies) > 0 else None
 
     def get_last_movie(self) -> Movie:
-        movie = None
-        if len(self._movies) > 0:
-            movie = self._movies[-1]
-        return movie
+        movies = self._movies.movies
+        return movies[-1] if len(movies) > 0 else None
 
     def get_movies_by_rank(self, rank_list):
-        # Strip out any ranks in rank_list that don't represent Movie ranks in the repository.
-        existing_ranks = [rank for rank in rank_list if rank in self._movies_index]
-
-        # Fetch the Movies.
-        movies = [self._movies_index[rank] for rank in existing_ranks]
-        return movies
+        # Fetch the Movies, leaving out any ranks in rank_list that don't represent Movie ranks in the repository.
+        by_rank = self._movies.by_rank
+        return [by_rank[rank] for rank in rank_list if rank in by_rank]
 
     def get_movie_ranks_for_genre(self, genre_name: str):
-        # Linear search, to find the first occurrence of a Genre with the name genre_name.
-        genre = next((genre for genre in self._genres if genre.genre_name == genre_name), None)
-
-        # Retrieve the ranks of movies associated with the Genre.
-        if genre is not None:
-            movie_ranks = [movie.rank for movie in self._movies if genre in movie.genres]
-        else:
-            # No Genre with name genre_name. Return an empty list.
-            movie_ranks = list()
-        return movie_ranks
+        # The ranks in ascending order, as the database returns them; an unknown genre has an empty Bitmap.
+        return list(self._movies.bitmaps.get('genres', genre_name))
+
+    def get_movie_facets(self, facet_filter: FacetFilter, cursor: int = 0, limit: int = None) -> MovieFacets:
+        return query_facets(self._movies.bitmaps, facet_filter, cursor, limit)
+
+    def get_suggestions(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        return self._movies.suggestions.suggest(prefix, limit)
+
+    def get_fuzzy_matches(self, query: str, limit: int = 10) -> List[Suggestion]:
+        return self._movies.trigrams.search(query, limit)
+
+    def get_filmography(self, kind: str, name: str, sort: str = 'year', cursor: int = 0,
+                        limit: int = None) -> Filmography:
+        if kind not in PERSON_FIELDS or sort not in FILMOGRAPHY_SORTS:
+            raise RepositoryException(f'No {sort} ordered filmography of a {kind}')
+        # The person's ranks are one dict lookup in the BitmapIndex; only their own movies are sorted.
+        movies = self._movies
+        ranks = movies.bitmaps.get(PERSON_FIELDS[kind], name)
+        ordered = sorted((movies.by_rank[rank] for rank in ranks), key=FILMOGRAPHY_ORDERS[sort])
+        page = ordered[cursor:None if limit is None else cursor + limit]
+        return Filmography(len(ranks), [movie.rank for movie in page])
+
+    def get_bitmap_index(self) -> BitmapIndex:
+        """ Returns the BitmapIndex of the movies' genres, directors, actors, decades and rating bands, e.g. to save
+        it with BitmapIndex.save. It never changes; adding movies publishes a new one.
+        """
+        return self._movies.bitmaps
 
     def add_review(self, review: Review):
-        super().add_review(review)
-        self._reviews.append(review)
+        self.add_reviews([review])
+
+    def add_reviews(self, reviews: Iterable[Review]):
+        # Adding many Reviews at once publishes one new version, and logs them in one write.
+        reviews = tuple(reviews)
+        for review in reviews:
+            super().add_review(review)
+        with self._write_lock:
+            if self._log is not None:
+                self._log.append_reviews(reviews)
+            self._reviews = self._reviews + reviews
 
     def get_reviews(self):
-        return self._reviews
+        return list(self._reviews)
 
     def add_user(self, user: User):
-        self._users.append(user)
+        # Checking for the username and adding the user is one step, so concurrent registrations can't both succeed.
+        with self._write_lock:
+            if user.user_name in self._users:
+                raise RepositoryException(f'Username {user.user_name} is already taken')
+            if self._log is not None:
+                self._log.append_user(user)
+            self._users = with_entries(self._users, [(user.user_name, user)])
 
     def get_user(self, username: str) -> User:
-        return next((user for user in self._users if user.user_name == username), None)
+        return self._users.get(username)
+
+    def add_watch(self, user: User, movie: Movie, watched_at: datetime = None):
+        self.add_watches([user], movie, watched_at)
+
+    def add_watches(self, users: Iterable[User], movie: Movie, watched_at: datetime = None):
+        # The watches are checked, logged and recorded under one acquisition of the lock, and none of them are if
+        # any of the Users isn't in the repository.
+        watched_at = datetime.now() if watched_at is None else watched_at
+        with self._write_lock:
+            users = [self._users.get(user.user_name) for user in users]
+            if any(user is None for user in users) or self._movies.by_rank.get(movie.rank) is None:
+                raise RepositoryException('Only Users and Movies in the repository can be watched')
+            if self._log is not None:
+                self._log.append_watches(users, movie, watched_at)
+            for user in users:
+                user.watch_movie(movie)
+                self._watch_histories.setdefault(user.user_name, list()).append(Watch(movie.rank, watched_at))
+                totals = self._watch_totals.get(user.user_name, NO_WATCHES)
+                genre_minutes = dict(totals.genre_minutes)
+                for genre in movie.genres:
+                    genre_minutes[genre.genre_name] = genre_minutes.get(genre.genre_name, 0) + movie.runtime_minutes
+                self._watch_totals[user.user_name] = WatchTotals(totals.movies_watched + 1,
+                                                                 totals.minutes + movie.runtime_minutes, genre_minutes)
+
+    def get_watch_history(self, user: User, cursor: int = 0, limit: int = None) -> List[Watch]:
+        # Only the requested page is copied, newest first, from the end of the history.
+        history = self._watch_histories.get(user.user_name, ())
+        end = len(history) - cursor
+        if end <= 0:
+            return []
+        start = 0 if limit is None else max(0, end - limit)
+        return history[start:end][::-1]
+
+    def get_watch_totals(self, user: User) -> WatchTotals:
+        return self._watch_totals.get(user.user_name, NO_WATCHES)
 
     def add_watchlist(self, watchlist: WatchList):
-        self._all_watchlist.append(watchlist)
+        owner_name = watchlist.watchlist_owner.user_name
+        with self._write_lock:
+            if owner_name not in self._users:
+                raise RepositoryException('Only Users in the repository can own a WatchList')
+            watchlists = dict(self._watchlists)
+            watchlists[owner_name] = watchlists.get(owner_name, ()) + (watchlist,)
+            self._watchlists = watchlists
 
     def get_watchlist(self, user: User) -> List[WatchList]:
-        all_watchlist = []
-        for watchlist in self._all_watchlist:
-            if watchlist.watchlist_owner == user:
-                all_watchlist.append(watchlist)
-        return all_watchlist
+        # WatchLists are kept by owner, so only the user's own are looked at.
+        if user is None:
+            return []
+        return list(self._watchlists.get(user.user_name, ()))
 
 
-def load_data(data_path: str, repo: MemoryRepository):
-    all_data = MovieFileCSVReader(os.path.join(data_path, 'Data1000Movies.csv'))
-    all_data.read_csv_file()
+# The WatchTotals of a user who hasn't watched anything.
+NO_WATCHES = WatchTotals(0, 0, dict())
+
+# The BitmapIndex field of each kind of person's movies.
+PERSON_FIELDS = {'director': 'directors', 'actor': 'actors'}
 
-    # load directors into repository.
-    for director in all_data.dataset_of_directors:
-        repo.add_director(director)
+# The sort key of each of FILMOGRAPHY_SORTS. Ratings that aren't known (None or 'N/A') come last.
+FILMOGRAPHY_ORDERS = {
+    'year': lambda movie: (-movie.release_year, movie.rank),
+    'rating': lambda movie: (0, -movie.rating, movie.rank) if isinstance(movie.rating, (int, float))
+    else (1, 0, movie.rank)
+}
 
-    # load genres into repository.
-    for genre in all_data.dataset_of_genres:
-        repo.add_genre(genre)
 
-    # load actors into repository.
-    for actor in all_data.dataset_of_actors:
-        repo.add_actor(actor)
+def with_entries(entries: dict, new_entries) -> dict:
+    """ Returns a copy of entries with the (key, value) pairs of new_entries added. Like the linear searches the
+    lookups replaced, lookups return the first value added under a key, so existing keys are left alone.
+    """
+    entries = dict(entries)
+    for key, value in new_entries:
+        entries.setdefault(key, value)
+    return entries
+
+
+def load_data(data_path: str, repo: MemoryRepository, workers: int = 1):
+    if workers > 1:
+        load_data_in_parallel(data_path, repo, workers)
+        return
+    all_data = MovieFileCSVReader(os.path.join(data_path, 'Data1000Movies.csv'))
+    all_data.read_csv_file()
 
-    # load movies into repository.
-    for movie in all_data.dataset_of_movies:
-        repo.add_movie(movie)
+    # load directors, genres, actors and movies into repository.
+    repo.add_directors(all_data.dataset_of_directors)
+    repo.add_genres(all_data.dataset_of_genres)
+    repo.add_actors(all_data.dataset_of_actors)
+    repo.add_movies(all_data.dataset_of_movies)
+
+
+def load_data_in_parallel(data_path: str, repo: MemoryRepository, workers: int):
+    # The file is parsed into Movies by workers processes, a chunk each at a time. The chunks' Movies come back in
+    # file order, are made to share one Director, Genre and Actor per name across chunks, and their directors, genres
+    # and actors are collected as MovieFileCSVReader.read_csv_file collects them, so that the repository ends up as
+    # it would have reading the file in this process.
+    registry = EntityRegistry()
+    directors, genres, actors, movies = set(), set(), set(), list()
+    for chunk in parallel_ingest.map_chunks(os.path.join(data_path, 'Data1000Movies.csv'), parse_movies, workers):
+        for movie in chunk:
+            registry.share(movie)
+            directors.add(movie.director)
+            actors.update(movie.actors)
+            genres.update(movie.genres)
+        movies.extend(chunk)
+
+    repo.add_directors(directors)
+    repo.add_genres(genres)
+    repo.add_actors(actors)
+    repo.add_movies(movies)
 
 
 def load_review_and_user(repo: MemoryRepository):
-    # load default review for default user into repository, then load default user into repository.
+    # load default review for default user into repository, then load default user into repository. The default
+    # user in the database has always had 121 minutes of watching, the runtime of the movie they reviewed; they are
+    # recorded here as having watched it, so that both repositories start with the same watch history and totals.
     review = Review(
         movie=repo.get_movie(1),
         txt='GOTG is my new favourite movie of all time!',
@@ -139,6 +325,7 @@ def load_review_and_user(repo: MemoryRepository):
     user.add_review(review)
     repo.add_review(review)
     repo.add_user(user)
+    repo.add_watch(user, review.movie)
 
 
 def load_watchlist(repo: MemoryRepository):
@@ -150,9 +337,9 @@ def load_watchlist(repo: MemoryRepository):
     repo.add_watchlist(watchlist)
 
 
-def populate(data_path: str, repo: MemoryRepository):
-    # Load directors, genres, actors and movies into the repository.
-    load_data(data_path, repo)
+def populate(data_path: str, repo: MemoryRepository, workers: int = 1):
+    # Load directors, genres, actors and movies into the repository, parsing the movie file in workers processes.
+    load_data(data_path, repo, workers)
 
     # Load default review and user into the repository.
     load_review_and_user(repo)
@@ -0,0 +1,286 @@
+import csv
+from collections import namedtuple
+from time import perf_counter
+import click
+from sqlalchemy.engine import Engine
+import movie_app.adapters.repository as repo
+from movie_app.adapters.caching_repository import CachingRepository
+from movie_app.adapters.database_repository import SqlAlchemyRepository, index_names, unindex_names, \
+    index_missing_names, drop_stale_names, column_value
+from movie_app.movies import view_models
+
+# A movie as the movies table stores it (see database_repository.movie_generator), with the natural keys of its
+# director, actors and genres. Actors and genres are sets: the association tables don't keep the CSV order.
+MovieRecord = namedtuple('MovieRecord', ['title', 'release_year', 'description', 'director', 'runtime_minutes',
+                                         'rating', 'votes', 'revenue', 'metascore', 'actors', 'genres'])
+
+# The tables holding the people and genres movies refer to: (table, name column, association table, id column).
+PEOPLE_TABLES = {
+    'directors': ('directors', 'director_full_name', 'movies', 'director_id'),
+    'actors': ('actors', 'actor_full_name', 'movie_actors', 'actor_id'),
+    'genres': ('genres', 'genre_name', 'movie_genres', 'genre_id')
+}
+
+# The other tables that refer to people or genres, and so keep them when no movie does: (table, id column). A user's
+# watch time in a genre outlives the genre's movies, and is only counted while the genre is there.
+OTHER_REFERENCES = {
+    'genres': [('watch_time_by_genre', 'genre_id')]
+}
+
+
+class ImportReport:
+    """ What import_movies changed, or would change when it is a dry run, and how long it took. """
+
+    def __init__(self):
+        self.movies_inserted = list()
+        self.movies_updated = list()
+        self.movies_deleted = list()
+        self.movies_kept = list()       # Missing from the CSV file, but reviewed, watched or on a watchlist.
+        self.movies_unchanged = 0
+        self.people_inserted = {name: 0 for name in PEOPLE_TABLES}
+        self.people_deleted = {name: 0 for name in PEOPLE_TABLES}
+        self.associations_inserted = 0
+        self.associations_deleted = 0
+        self.batches = 0
+        self.dry_run = False
+        self.elapsed = 0.0
+
+    @property
+    def changed_ranks(self):
+        return self.movies_inserted + self.movies_updated + self.movies_deleted
+
+    def __str__(self):
+        lines = [
+            f'movies: {len(self.movies_inserted)} inserted, {len(self.movies_updated)} updated, '
+            f'{len(self.movies_deleted)} deleted, {len(self.movies_kept)} kept, {self.movies_unchanged} unchanged'
+        ]
+        for name in PEOPLE_TABLES:
+            lines.append(f'{name}: {self.people_inserted[name]} inserted, {self.people_deleted[name]} deleted')
+        lines.append(f'associations: {self.associations_inserted} inserted, {self.associations_deleted} deleted')
+        if self.movies_kept:
+            lines.append('kept (reviewed, watched or on a watchlist): '
+                         + ', '.join(str(rank) for rank in self.movies_kept))
+        lines.append(f'{"dry run" if self.dry_run else str(self.batches) + " batches"} in {self.elapsed:.3f}s')
+        return '\n'.join(lines)
+
+
+def read_movie_records(filename: str):
+    """ Returns a dict mapping the rank of each movie in the CSV file to its MovieRecord. """
+    records = dict()
+    with open(filename, mode='r', encoding='utf-8-sig') as csvfile:
+        for row in csv.DictReader(csvfile):
+            records[int(row['Rank'].strip())] = MovieRecord(
+                title=row['Title'],
+                release_year=int(row['Year'].strip()),
+                description=row['Description'].strip(),
+                director=row['Director'].strip(),
+                runtime_minutes=int(row['Runtime (Minutes)'].strip()),
+                rating=column_value(row['Rating'], float),
+                votes=column_value(row['Votes'], int),
+                revenue=column_value(row['Revenue (Millions)'], float),
+                metascore=column_value(row['Metascore'], int),
+                actors=frozenset(actor.strip() for actor in row['Actors'].split(',')),
+                genres=frozenset(genre.strip() for genre in row['Genre'].split(','))
+            )
+    return records
+
+
+def read_current_records(cursor):
+    """ Returns a dict mapping the rank of each movie in the database to its MovieRecord. """
+    actors = dict()
+    for movie_id, actor_name in cursor.execute(
+            'SELECT movie_actors.movie_id, actors.actor_full_name FROM movie_actors '
+            'JOIN actors ON actors.id = movie_actors.actor_id'):
+        actors.setdefault(movie_id, set()).add(actor_name)
+    genres = dict()
+    for movie_id, genre_name in cursor.execute(
+            'SELECT movie_genres.movie_id, genres.genre_name FROM movie_genres '
+            'JOIN genres ON genres.id = movie_genres.genre_id'):
+        genres.setdefault(movie_id, set()).add(genre_name)
+
+    records = dict()
+    for row in cursor.execute(
+            'SELECT movies.id, movies.title, movies.release_year, movies.description, directors.director_full_name, '
+            'movies.runtime_minutes, movies.rating, movies.votes, movies.revenue_in_millions, movies.metascore '
+            'FROM movies LEFT OUTER JOIN directors ON directors.id = movies.director_id').fetchall():
+        records[row[0]] = MovieRecord(*row[1:], actors=frozenset(actors.get(row[0], ())),
+                                      genres=frozenset(genres.get(row[0], ())))
+    return records
+
+
+def name_ids(cursor, name: str):
+    table, name_column, _, _ = PEOPLE_TABLES[name]
+    return {row[1]: row[0] for row in cursor.execute(f'SELECT id, {name_column} FROM {table}')}
+
+
+def insert_names(cursor, name: str, names):
+    """ Adds the names that aren't in the table yet, and returns the ids of all names in the table. """
+    table, name_column, _, _ = PEOPLE_TABLES[name]
+    ids = name_ids(cursor, name)
+    new_names = sorted(set(names) - ids.keys())
+    cursor.executemany(f'INSERT INTO {table} ({name_column}) VALUES (?)', [(new_name,) for new_name in new_names])
+    return name_ids(cursor, name) if new_names else ids, len(new_names)
+
+
+def delete_orphans(cursor, name: str) -> int:
+    """ Deletes the people or genres that no movie, or other table, refers to any more, and returns how many were
+    deleted.
+    """
+    table, _, association_table, id_column = PEOPLE_TABLES[name]
+    references = [(association_table, id_column)] + OTHER_REFERENCES.get(name, [])
+    cursor.execute(f'DELETE FROM {table} WHERE ' + ' AND '.join(
+        f'id NOT IN (SELECT {column} FROM {referring_table} WHERE {column} IS NOT NULL)'
+        for referring_table, column in references))
+    return cursor.rowcount
+
+
+def movie_row(rank, record: MovieRecord, director_ids):
+    return (record.title, record.release_year, record.description, director_ids[record.director],
+            record.runtime_minutes, record.rating, record.votes, record.revenue, record.metascore, rank)
+
+
+def replace_associations(cursor, report: ImportReport, rank, record: MovieRecord, actor_ids, genre_ids,
+                         current: MovieRecord = None):
+    if current is None or current.actors != record.actors:
+        if current is not None:
+            cursor.execute('DELETE FROM movie_actors WHERE movie_id = ?', (rank,))
+            report.associations_deleted += cursor.rowcount
+        cursor.executemany('INSERT INTO movie_actors (movie_id, actor_id) VALUES (?, ?)',
+                           [(rank, actor_ids[actor]) for actor in sorted(record.actors)])
+        report.associations_inserted += len(record.actors)
+    if current is None or current.genres != record.genres:
+        if current is not None:
+            cursor.execute('DELETE FROM movie_genres WHERE movie_id = ?', (rank,))
+            report.associations_deleted += cursor.rowcount
+        cursor.executemany('INSERT INTO movie_genres (movie_id, genre_id) VALUES (?, ?)',
+                           [(rank, genre_ids[genre]) for genre in sorted(record.genres)])
+        report.associations_inserted += len(record.genres)
+
+
+def import_movies(engine: Engine, filename: str, batch_size: int = 200, delete_missing: bool = True,
+                  dry_run: bool = False) -> ImportReport:
+    """ Brings the movies, directors, actors and genres in the database up to date with the CSV file, changing only
+    what differs, instead of deleting every row and repopulating the tables.
+
+    Movies are matched by rank, and directors, actors and genres by name. New and changed movies are written, and
+    missing movies deleted, batch_size movies per transaction; the directors, actors and genres no movie refers to
+    any more are deleted last, except genres users have watch time in. Reviews, users, watch histories and
+    watchlists are left alone, so a missing movie that has reviews, has been watched or is on a watchlist is kept
+    rather than deleted.
+    """
+    start = perf_counter()
+    report = ImportReport()
+    report.dry_run = dry_run
+    incoming = read_movie_records(filename)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        current = read_current_records(cursor)
+        referenced = {row[0] for row in cursor.execute(
+            'SELECT movie_id FROM reviews UNION SELECT movie_id FROM user_watched_movies '
+            'UNION SELECT movie_id FROM watchlist_items')}
+
+        for rank, record in incoming.items():
+            if rank not in current:
+                report.movies_inserted.append(rank)
+            elif current[rank] != record:
+                report.movies_updated.append(rank)
+            else:
+                report.movies_unchanged += 1
+        if delete_missing:
+            for rank in current.keys() - incoming.keys():
+                (report.movies_kept if rank in referenced else report.movies_deleted).append(rank)
+        report.movies_inserted.sort()
+        report.movies_updated.sort()
+        report.movies_deleted.sort()
+        report.movies_kept.sort()
+
+        if dry_run:
+            report.elapsed = perf_counter() - start
+            return report
+
+        # Add the directors, actors and genres of the new and changed movies.
+        written = [incoming[rank] for rank in report.movies_inserted + report.movies_updated]
+        director_ids, report.people_inserted['directors'] = insert_names(
+            cursor, 'directors', (record.director for record in written))
+        actor_ids, report.people_inserted['actors'] = insert_names(
+            cursor, 'actors', (actor for record in written for actor in record.actors))
+        genre_ids, report.people_inserted['genres'] = insert_names(
+            cursor, 'genres', (genre for record in written for genre in record.genres))
+        # The new directors and actors are the only names without trigrams.
+        index_missing_names(cursor)
+        connection.commit()
+
+        changes = [('insert', rank) for rank in report.movies_inserted] + \
+                  [('update', rank) for rank in report.movies_updated] + \
+                  [('delete', rank) for rank in report.movies_deleted]
+        for first in range(0, len(changes), batch_size):
+            for change, rank in changes[first:first + batch_size]:
+                if change == 'insert':
+                    cursor.execute('INSERT INTO movies (title, release_year, description, director_id, '
+                                   'runtime_minutes, rating, votes, revenue_in_millions, metascore, id) '
+                                   'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                   movie_row(rank, incoming[rank], director_ids))
+                    replace_associations(cursor, report, rank, incoming[rank], actor_ids, genre_ids)
+                    index_names(cursor, 'movie', [(rank, incoming[rank].title)])
+                elif change == 'update':
+                    cursor.execute('UPDATE movies SET title = ?, release_year = ?, description = ?, director_id = ?, '
+                                   'runtime_minutes = ?, rating = ?, votes = ?, revenue_in_millions = ?, '
+                                   'metascore = ? WHERE id = ?', movie_row(rank, incoming[rank], director_ids))
+                    replace_associations(cursor, report, rank, incoming[rank], actor_ids, genre_ids, current[rank])
+                    if current[rank].title != incoming[rank].title:
+                        unindex_names(cursor, 'movie', [rank])
+                        index_names(cursor, 'movie', [(rank, incoming[rank].title)])
+                else:
+                    for association_table in ('movie_actors', 'movie_genres'):
+                        cursor.execute(f'DELETE FROM {association_table} WHERE movie_id = ?', (rank,))
+                        report.associations_deleted += cursor.rowcount
+                    cursor.execute('DELETE FROM movies WHERE id = ?', (rank,))
+                    unindex_names(cursor, 'movie', [rank])
+            connection.commit()
+            report.batches += 1
+
+        for name in PEOPLE_TABLES:
+            report.people_deleted[name] = delete_orphans(cursor, name)
+        if report.people_deleted['directors'] or report.people_deleted['actors']:
+            drop_stale_names(cursor)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    report.elapsed = perf_counter() - start
+    return report
+
+
+def clear_caches(app, ranks):
+    """ Drops what this process has cached about the movies with ranks. Other processes serving the database pick
+    the changes up once their cache entries expire.
+    """
+    for rank in ranks:
+        view_models.movie_views.invalidate(rank)
+    app.jinja_env.fragment_cache.clear()
+    repository = repo.repo_instance
+    while repository is not None:
+        if isinstance(repository, CachingRepository):
+            repository.clear()
+        elif isinstance(repository, SqlAlchemyRepository):
+            repository.reset_suggestions()
+        repository = getattr(repository, 'repository', None)
+
+
+def init_app(app, engine: Engine):
+    @app.cli.command('import-movies')
+    @click.argument('filename', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', default=200, show_default=True, help='Movies written per transaction.')
+    @click.option('--keep-missing', is_flag=True, help='Keep the movies that are not in the CSV file.')
+    @click.option('--dry-run', is_flag=True, help='Report the changes without making them.')
+    def import_movies_command(filename, batch_size, keep_missing, dry_run):
+        """ Update the movies in the database from a CSV file, changing only what differs. """
+        report = import_movies(engine, filename, batch_size, delete_missing=not keep_missing, dry_run=dry_run)
+        if not dry_run:
+            clear_caches(app, report.changed_ranks)
+        click.echo(str(report))
@@ -1,5 +1,6 @@
-from sqlalchemy import Table, MetaData, Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Table, MetaData, Column, Integer, String, DateTime, ForeignKey, Float, Index, inspect
 from sqlalchemy.orm import mapper, relationship
+from sqlalchemy.schema import CreateColumn
 from movie_app.domain import model
 
 metadata = MetaData()
@@ -7,19 +8,23 @@ metadata = MetaData()
 directors = Table(
     'directors', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('director_full_name', String(255), nullable=False)
+    Column('director_full_name', String(255), nullable=False),
+    Index('ix_directors_director_full_name', 'director_full_name')
 )
 
 genres = Table(
     'genres', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('genre_name', String(255), nullable=False)
+    Column('genre_name', String(255), nullable=False),
+    Index('ix_genres_genre_name', 'genre_name')
 )
 
 actors = Table(
     'actors', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('actor_full_name', String(255), nullable=False),
+    # Filmographies look actors up by name.
+    Index('ix_actors_actor_full_name', 'actor_full_name')
 )
 
 movies = Table(
@@ -33,21 +38,29 @@ movies = Table(
     Column('rating', Float),
     Column('votes', Integer),
     Column('revenue_in_millions', Float),
-    Column('metascore', Integer)
+    Column('metascore', Integer),
+    # Browsing by facets filters and groups movies by these columns.
+    Index('ix_movies_director_id', 'director_id'),
+    Index('ix_movies_release_year', 'release_year'),
+    Index('ix_movies_rating', 'rating')
 )
 
 movie_actors = Table(
     'movie_actors', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('movie_id', ForeignKey('movies.id')),
-    Column('actor_id', ForeignKey('actors.id'))
+    Column('actor_id', ForeignKey('actors.id')),
+    # Fuzzy matching totals the votes of an actor's movies, and filmographies list them.
+    Index('ix_movie_actors_actor_id', 'actor_id')
 )
 
 movie_genres = Table(
     'movie_genres', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('movie_id', ForeignKey('movies.id')),
-    Column('genre_id', ForeignKey('genres.id'))
+    Column('genre_id', ForeignKey('genres.id')),
+    Index('ix_movie_genres_genre_id_movie_id', 'genre_id', 'movie_id'),
+    Index('ix_movie_genres_movie_id', 'movie_id')
 )
 
 reviews = Table(
@@ -65,17 +78,85 @@ users = Table(
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('username', String(255), unique=True, nullable=False),
     Column('password', String(255), nullable=False),
-    Column('time_spent_watching_movies_minutes', Integer, nullable=False)
+    Column('time_spent_watching_movies_minutes', Integer, nullable=False),
+    # Kept up to date with each watch, like the time spent watching, rather than counted from the watch history.
+    Column('movies_watched', Integer, nullable=False, server_default='0')
 )
 
+# Every watch of a movie by a user, in the order they were recorded.
 user_watched_movies = Table(
     'user_watched_movies', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('user_id', ForeignKey('users.id')),
-    Column('movie_id', ForeignKey('movies.id'))
+    Column('movie_id', ForeignKey('movies.id')),
+    Column('watched_at', DateTime),
+    # A page of a user's history, the most recent first, is read from this index alone.
+    Index('ix_user_watched_movies_user_id_id', 'user_id', 'id')
+)
+
+# The minutes each user has spent watching each genre, kept up to date with each watch.
+watch_time_by_genre = Table(
+    'watch_time_by_genre', metadata,
+    Column('user_id', ForeignKey('users.id'), primary_key=True),
+    Column('genre_id', ForeignKey('genres.id'), primary_key=True),
+    Column('minutes', Integer, nullable=False)
+)
+
+# The WatchLists of each user, in the order they were added.
+watchlists = Table(
+    'watchlists', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('user_id', ForeignKey('users.id'), nullable=False),
+    Column('name', String(255), nullable=False),
+    # A user's WatchLists are looked up by owner.
+    Index('ix_watchlists_user_id', 'user_id')
+)
+
+# The movies of each WatchList, numbered from 0 in the order they were added. The primary key keeps a WatchList's
+# movies together and in order, so they are read back without sorting.
+watchlist_items = Table(
+    'watchlist_items', metadata,
+    Column('watchlist_id', ForeignKey('watchlists.id'), primary_key=True),
+    Column('position', Integer, primary_key=True),
+    Column('movie_id', ForeignKey('movies.id'), nullable=False)
 )
 
 
+# The trigrams of every movie title (kind 'movie', entity_id the movie's id) and director and actor name (kinds
+# 'director' and 'actor'), for fuzzy matching; see database_repository.index_names.
+name_trigrams = Table(
+    'name_trigrams', metadata,
+    Column('trigram', String(3), nullable=False),
+    Column('kind', String(8), nullable=False),
+    Column('entity_id', Integer, nullable=False),
+    # Looking up a trigram's names reads this index alone.
+    Index('ix_name_trigrams_trigram', 'trigram', 'kind', 'entity_id'),
+    Index('ix_name_trigrams_kind_entity_id', 'kind', 'entity_id')
+)
+
+
+def create_missing_columns(engine):
+    """ Adds the columns declared above that a database created before they were declared doesn't have yet. They
+    are all either nullable or have a server default, so existing rows get a value.
+    """
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                engine.execute(f'ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(engine)}')
+
+
+def create_missing_indexes(engine):
+    """ Creates the indexes declared above that a database created before they were declared doesn't have yet. """
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(engine)
+
+
 def map_model_to_tables():
     mapper(model.Director, directors, properties={
         '_Director__director_full_name': directors.c.director_full_name
@@ -116,5 +197,8 @@ def map_model_to_tables():
         '_User__password': users.c.password,
         '_User__time_spent_watching_movies_minutes': users.c.time_spent_watching_movies_minutes,
         '_User__reviews': relationship(model.Review, backref='_user'),
-        '_User__watched_movies': relationship(movie_mapper, secondary=user_watched_movies, backref='_user')
+        # A watch history can be long, so it is never loaded with the user: it is read a page at a time, and
+        # written, by the repository (see SqlAlchemyRepository.add_watch).
+        '_User__watched_movies': relationship(movie_mapper, secondary=user_watched_movies, lazy='noload',
+                                              viewonly=True)
     })
@@ -0,0 +1,87 @@
+"""Parallel ingestion of a movie file: the file is split into chunks at record boundaries, the chunks are parsed by a
+pool of worker processes, and the results are handed back in file order to the one process that writes them to a
+repository (see memory_repository.load_data and database_repository.populate).
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Each worker parses a few chunks, so that a worker given a slow chunk doesn't hold up the others for long.
+CHUNKS_PER_WORKER = 4
+# The bytes read at a time when looking for a record boundary.
+BLOCK_SIZE = 1 << 16
+
+
+def read_columns(filename: str) -> dict:
+    """ Returns the position of each column of the file, from its header. """
+    with open(filename, mode='r', encoding='utf-8-sig') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    return {name: index for index, name in enumerate(header)}
+
+
+def chunk_offsets(filename: str, chunks: int) -> list:
+    """ Splits the records of the file, after its header, into up to chunks parts of about the same size, and returns
+    the (start, end) byte offsets of each. A newline ends a record unless it is in a quoted field: quotes, including
+    the doubled quotes of a quote in a field, come in pairs in whole records, so a newline ends a record if an even
+    number of quotes come between it and the end of the previous record.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, mode='rb') as file:
+        offsets = [len(file.readline())]
+        # The number of quotes, modulo 2, between the end of the last record found and position.
+        position, quotes = offsets[0], 0
+        for i in range(1, chunks):
+            target = offsets[0] + (size - offsets[0]) * i // chunks
+            if target > position:
+                file.seek(position)
+                quotes = (quotes + file.read(target - position).count(b'"')) % 2
+                position = end_of_record(file, target, quotes)
+                quotes = 0
+                if position >= size:
+                    break
+                offsets.append(position)
+        offsets.append(size)
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+
+
+def end_of_record(file, position: int, quotes: int) -> int:
+    """ Returns the offset just after the first newline from position that ends a record, given the number of quotes,
+    modulo 2, since the end of the previous record, or the end of the file.
+    """
+    file.seek(position)
+    while True:
+        block = file.read(BLOCK_SIZE)
+        if not block:
+            return position
+        start = 0
+        newline = block.find(b'\n')
+        while newline >= 0:
+            quotes = (quotes + block.count(b'"', start, newline)) % 2
+            if quotes == 0:
+                return position + newline + 1
+            start = newline + 1
+            newline = block.find(b'\n', start)
+        quotes = (quotes + block.count(b'"', start)) % 2
+        position += len(block)
+
+
+def parse_chunk(task) -> list:
+    # Runs in a worker process: parses the records between two offsets with parse, a module-level function (so that
+    # it can be sent to the worker) taking the column positions and the rows, as lists of values.
+    parse, filename, column, start, end = task
+    with open(filename, mode='rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    return list(parse(column, csv.reader(io.StringIO(text, newline=''))))
+
+
+def map_chunks(filename: str, parse, workers: int):
+    """ Yields the list parse makes of each chunk of the file's records, in file order, parsing the chunks in workers
+    processes. parse is given the position of each column and an iterable of rows, and returns an iterable.
+    """
+    column = read_columns(filename)
+    tasks = [(parse, filename, column, start, end)
+             for start, end in chunk_offsets(filename, workers * CHUNKS_PER_WORKER)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(parse_chunk, tasks)
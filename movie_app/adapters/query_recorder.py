@@ -0,0 +1,117 @@
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_NAMED_PARAMETER = re.compile(r':\w+')
+_PARAMETER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize_sql(statement: str) -> str:
+    """ Reduces statement to its shape, so that statements differing only in parameters compare equal.
+    Literals and named parameters become '?', and IN lists of any length collapse to a single '(?)'.
+    """
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NAMED_PARAMETER.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _PARAMETER_LIST.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class QueryRecorder:
+    """ Records the SQL statements executed through an Engine (or every Engine, by default), grouped by shape.
+
+    Use it as a context manager:
+
+        with QueryRecorder() as recorder:
+            services.get_movies_by_rank([1, 2, 3], repo)
+        assert recorder.count <= 3
+    """
+
+    def __init__(self, target=Engine):
+        self.__target = target
+        self.__statements = list()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def statements(self) -> list:
+        """ The (statement, parameters) pairs recorded so far, in execution order. """
+        return self.__statements
+
+    @property
+    def count(self) -> int:
+        return len(self.__statements)
+
+    def start(self):
+        event.listen(self.__target, 'before_cursor_execute', self._record)
+
+    def stop(self):
+        if event.contains(self.__target, 'before_cursor_execute', self._record):
+            event.remove(self.__target, 'before_cursor_execute', self._record)
+
+    def clear(self):
+        self.__statements.clear()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.__statements.append((statement, parameters))
+
+    def grouped(self) -> OrderedDict:
+        """ Maps each normalized statement to the list of parameters it was executed with. """
+        groups = OrderedDict()
+        for statement, parameters in self.__statements:
+            groups.setdefault(normalize_sql(statement), list()).append(parameters)
+        return groups
+
+    def repeated(self, max_repeats: int = 1) -> OrderedDict:
+        """ Returns the normalized statements executed more than max_repeats times, with their counts.
+        A statement repeated with different parameters is the signature of an N+1 query pattern.
+        """
+        return OrderedDict((statement, len(executions)) for statement, executions in self.grouped().items()
+                           if len(executions) > max_repeats)
+
+    def report(self) -> str:
+        lines = [f'{self.count} statements executed:']
+        for statement, executions in self.grouped().items():
+            lines.append(f'  {len(executions)} x {statement}')
+        return '\n'.join(lines)
+
+    def check_budget(self, max_statements: int, max_repeats: int = None, label: str = 'block'):
+        """ Raises QueryBudgetExceeded if more than max_statements statements were executed, or if
+        max_repeats is given and any statement shape was executed more than max_repeats times.
+        """
+        if self.count > max_statements:
+            raise QueryBudgetExceeded(
+                f'{label} exceeded its budget of {max_statements} SQL statements.\n{self.report()}')
+        if max_repeats is not None:
+            repeated = self.repeated(max_repeats)
+            if repeated:
+                raise QueryBudgetExceeded(
+                    f'{label} repeated statements more than {max_repeats} times (possible N+1 queries): '
+                    f'{dict(repeated)}.\n{self.report()}')
+
+
+@contextmanager
+def query_budget(max_statements: int, max_repeats: int = None, label: str = 'block', target=Engine):
+    """ Context manager that fails with QueryBudgetExceeded if the enclosed block exceeds its query budget.
+
+        with query_budget(4, max_repeats=1, label='/movies_by_genre'):
+            client.get('/movies_by_genre?genre=Action')
+    """
+    recorder = QueryRecorder(target)
+    with recorder:
+        yield recorder
+    recorder.check_budget(max_statements, max_repeats, label)
@@ -1,10 +1,51 @@
 import abc
-from typing import List
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterable, List
 from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList
 
 
 repo_instance = None
 
+# What movies are browsed by: any number of genre names (a movie must have all of them), a decade (e.g. 2010 for
+# 2010-2019), a director's name and a rating band (e.g. 7 for ratings from 7.0 up to, but excluding, 8.0).
+FacetFilter = namedtuple('FacetFilter', ['genres', 'decade', 'director', 'rating_band'],
+                         defaults=((), None, None, None))
+
+# The movies matching a FacetFilter: how many there are and the ranks of those on the requested page, plus, for
+# every value of every facet, the number of movies that would match with that value selected. A genre adds to the
+# genres selected; a decade, director or rating band replaces the one selected.
+MovieFacets = namedtuple('MovieFacets', ['number_of_movies', 'ranks', 'genres', 'decades', 'directors',
+                                         'rating_bands'])
+
+# A completion of what has been typed so far: a movie (kind 'movie', name is the title, rank its rank), a director
+# or an actor (kind 'director' or 'actor', rank None). Votes are the movie's, or the total of the person's movies.
+Suggestion = namedtuple('Suggestion', ['kind', 'name', 'rank', 'votes'])
+
+# The movies of a director or an actor: how many there are and the ranks of those on the requested page.
+Filmography = namedtuple('Filmography', ['number_of_movies', 'ranks'])
+
+# How filmographies are ordered: 'year' puts the newest movies first, 'rating' the best rated, with the movies whose
+# rating isn't known last. Movies that are otherwise equal are in rank order.
+FILMOGRAPHY_SORTS = ('year', 'rating')
+
+# A movie a user watched: its rank and when it was watched.
+Watch = namedtuple('Watch', ['rank', 'watched_at'])
+
+# What a user has watched: the number of movies (a movie watched twice counts twice), the minutes spent watching them
+# and the minutes spent watching each genre, by genre name.
+WatchTotals = namedtuple('WatchTotals', ['movies_watched', 'minutes', 'genre_minutes'])
+
+
+
+def decade_of(release_year: int) -> int:
+    return release_year // 10 * 10
+
+
+def rating_band_of(rating):
+    # Ratings that aren't known (None or 'N/A') are in no band.
+    return int(rating) if isinstance(rating, (int, float)) else None
+
 
 class RepositoryException(Exception):
 
@@ -94,6 +135,38 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_movie_facets(self, facet_filter: FacetFilter, cursor: int = 0, limit: int = None) -> MovieFacets:
+        """ Returns the MovieFacets of the Movies that match facet_filter.
+        The ranks are those of the matching Movies in ascending order, starting with the cursor-th one, and at most
+        limit of them if limit is given.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_suggestions(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        """ Returns up to limit Suggestions of movie titles and director and actor names having a word that starts
+        with prefix, ignoring case, accents and punctuation, with the most voted first.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_fuzzy_matches(self, query: str, limit: int = 10) -> List[Suggestion]:
+        """ Returns up to limit Suggestions of movie titles and director and actor names within a few typos of query
+        (of as many of their consecutive words as query has), the closest first, and the most voted of equally close
+        ones. Queries of four characters or fewer must match a word exactly.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_filmography(self, kind: str, name: str, sort: str = 'year', cursor: int = 0,
+                        limit: int = None) -> Filmography:
+        """ Returns the Filmography of the director (kind 'director') or actor (kind 'actor') named name.
+        The ranks are those of their Movies in the order sort (one of FILMOGRAPHY_SORTS) gives, starting with the
+        cursor-th one, and at most limit of them if limit is given. An unknown person has no Movies.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_review(self, review: Review):
         """ Adds a Review to the repository.
@@ -103,6 +176,14 @@ class AbstractRepository(abc.ABC):
         if review.movie is None:
             raise RepositoryException('Review not correctly attached to a Movie')
 
+    @abc.abstractmethod
+    def add_reviews(self, reviews: Iterable[Review]):
+        """ Adds Reviews to the repository together, e.g. the copies of a Review written for every member of a
+        MovieWatchingSimulation, in one transaction. If any of them doesn't have links with a Movie, this method
+        raises a RepositoryException and doesn't add any of them.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_reviews(self):
         """ Returns the Reviews stored in the repository. """
@@ -110,7 +191,10 @@ class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def add_user(self, user: User):
-        """" Adds a User to the repository. """
+        """" Adds a User to the repository.
+        If the repository already has a User with the same username, this method raises a RepositoryException and
+        doesn't update the repository. The check and the insert are atomic.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -120,9 +204,42 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def add_watch(self, user: User, movie: Movie, watched_at: datetime = None):
+        """ Records that user watched movie at watched_at (now if it is None), and adds the movie's runtime to the
+        user's WatchTotals, without reading their watch history.
+        If the User or the Movie isn't in the repository, this method raises a RepositoryException and doesn't update
+        the repository.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_watches(self, users: Iterable[User], movie: Movie, watched_at: datetime = None):
+        """ Records that every one of users watched movie at watched_at, e.g. the members of a
+        MovieWatchingSimulation, in one transaction. If any of the Users or the Movie isn't in the repository, this
+        method raises a RepositoryException and doesn't record any of the watches.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_watch_history(self, user: User, cursor: int = 0, limit: int = None) -> List[Watch]:
+        """ Returns the Watches of user, the most recent first, starting with the cursor-th one, and at most limit of
+        them if limit is given. A User who hasn't watched anything, or isn't in the repository, has no Watches.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_watch_totals(self, user: User) -> WatchTotals:
+        """ Returns the WatchTotals of user, which are kept up to date by add_watch rather than counted from the
+        watch history.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_watchlist(self, watchlist: WatchList):
-        """ Adds a WatchList to the repository. """
+        """ Adds a WatchList, and the Movies in it in their order, to the repository.
+        Raises RepositoryException if the WatchList's owner isn't in the repository.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -0,0 +1,166 @@
+import threading
+from datetime import datetime
+from typing import List
+from movie_app.adapters.repository import AbstractRepository, FacetFilter, MovieFacets, Suggestion, Filmography, \
+    Watch, WatchTotals
+from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList
+
+
+class RequestScopedRepository(AbstractRepository):
+    """ Wraps a repository and memoizes its read methods for the duration of a request.
+
+    Between begin_scope() and end_scope(), identical read calls made by the thread handling the request are
+    answered from a per-thread memo, and every add_* method empties the memo. Outside a scope, every call goes
+    straight to the wrapped repository.
+    """
+
+    def __init__(self, repo: AbstractRepository):
+        self._repo = repo
+        self._scope = threading.local()
+
+    def __getattr__(self, name):
+        # Backend-specific methods (e.g. reset_session, attach_log) are passed through unchanged.
+        return getattr(self._repo, name)
+
+    @property
+    def repository(self) -> AbstractRepository:
+        return self._repo
+
+    def begin_scope(self):
+        self._scope.memo = dict()
+        self._scope.calls_saved = 0
+
+    def end_scope(self):
+        """ Discards the memo and returns the number of repository calls it saved, or None if no scope was open. """
+        if getattr(self._scope, 'memo', None) is None:
+            return None
+        calls_saved = self._scope.calls_saved
+        self._scope.memo = None
+        self._scope.calls_saved = 0
+        return calls_saved
+
+    @property
+    def calls_saved(self) -> int:
+        return getattr(self._scope, 'calls_saved', 0)
+
+    def _read(self, method_name: str, *args):
+        memo = getattr(self._scope, 'memo', None)
+        if memo is None:
+            return getattr(self._repo, method_name)(*args)
+
+        results = memo.setdefault(method_name, dict())
+        try:
+            result = results[args]
+            self._scope.calls_saved += 1
+        except KeyError:
+            result = results[args] = getattr(self._repo, method_name)(*args)
+        return result
+
+    def _invalidate(self):
+        # Writes are rare within a request, and a database commit expires every object loaded so far, so rather
+        # than tracking which reads a write affects, all memoized reads are dropped.
+        memo = getattr(self._scope, 'memo', None)
+        if memo is not None:
+            memo.clear()
+
+    def add_director(self, director: Director):
+        self._repo.add_director(director)
+        self._invalidate()
+
+    def get_director(self, director_name) -> Director:
+        return self._read('get_director', director_name)
+
+    def add_genre(self, genre: Genre):
+        self._repo.add_genre(genre)
+        self._invalidate()
+
+    def get_genres(self) -> List[Genre]:
+        return self._read('get_genres')
+
+    def add_actor(self, actor: Actor):
+        self._repo.add_actor(actor)
+        self._invalidate()
+
+    def get_actor(self, actor_name) -> Actor:
+        return self._read('get_actor', actor_name)
+
+    def add_movie(self, movie: Movie):
+        self._repo.add_movie(movie)
+        self._invalidate()
+
+    def get_movie(self, rank: int) -> Movie:
+        return self._read('get_movie', rank)
+
+    def get_number_of_movies(self):
+        return self._read('get_number_of_movies')
+
+    def get_first_movie(self) -> Movie:
+        return self._read('get_first_movie')
+
+    def get_last_movie(self) -> Movie:
+        return self._read('get_last_movie')
+
+    def get_movies_by_rank(self, rank_list):
+        movies = self._read('get_movies_by_rank', tuple(rank_list))
+        memo = getattr(self._scope, 'memo', None)
+        if memo is not None:
+            # Later get_movie calls for these movies can be answered from the movies just fetched.
+            movies_by_rank = memo.setdefault('get_movie', dict())
+            for movie in movies:
+                movies_by_rank.setdefault((movie.rank,), movie)
+        return movies
+
+    def get_movie_ranks_for_genre(self, genre_name: str):
+        return self._read('get_movie_ranks_for_genre', genre_name)
+
+    def get_movie_facets(self, facet_filter: FacetFilter, cursor: int = 0, limit: int = None) -> MovieFacets:
+        return self._read('get_movie_facets', facet_filter, cursor, limit)
+
+    def get_suggestions(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        return self._read('get_suggestions', prefix, limit)
+
+    def get_fuzzy_matches(self, query: str, limit: int = 10) -> List[Suggestion]:
+        return self._read('get_fuzzy_matches', query, limit)
+
+    def get_filmography(self, kind: str, name: str, sort: str = 'year', cursor: int = 0,
+                        limit: int = None) -> Filmography:
+        return self._read('get_filmography', kind, name, sort, cursor, limit)
+
+    def add_review(self, review: Review):
+        self._repo.add_review(review)
+        self._invalidate()
+
+    def add_reviews(self, reviews: List[Review]):
+        self._repo.add_reviews(reviews)
+        self._invalidate()
+
+    def get_reviews(self):
+        return self._read('get_reviews')
+
+    def add_user(self, user: User):
+        self._repo.add_user(user)
+        self._invalidate()
+
+    def get_user(self, username: str) -> User:
+        return self._read('get_user', username)
+
+    def add_watch(self, user: User, movie: Movie, watched_at: datetime = None):
+        self._repo.add_watch(user, movie, watched_at)
+        self._invalidate()
+
+    def add_watches(self, users: List[User], movie: Movie, watched_at: datetime = None):
+        self._repo.add_watches(users, movie, watched_at)
+        self._invalidate()
+
+    def get_watch_history(self, user: User, cursor: int = 0, limit: int = None) -> List[Watch]:
+        return self._read('get_watch_history', user, cursor, limit)
+
+    def get_watch_totals(self, user: User) -> WatchTotals:
+        return self._read('get_watch_totals', user)
+
+    def add_watchlist(self, watchlist: WatchList):
+        self._repo.add_watchlist(watchlist)
+        self._invalidate()
+
+    def get_watchlist(self, user: User) -> List[WatchList]:
+        return self._read('get_watchlist', user)
@@ -0,0 +1,137 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Iterable, List
+from movie_app.adapters.repository import Suggestion
+from movie_app.domain.model import Movie
+
+# Prefixes up to this long match many names, so their top completions are remembered, per index.
+REMEMBERED_PREFIX_LENGTH = 2
+# More new suggestions than this are added by building the index again, rather than inserting them one by one.
+INSERTION_LIMIT = 100
+# The runs of characters other than letters and digits, which normalize replaces by spaces.
+NOT_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """ Folds text for matching: without accents, case folded, and with every run of characters other than letters
+    and digits replaced by a single space, e.g. 'Amélie (Le Fabuleux)' becomes 'amelie le fabuleux'.
+    """
+    if not text.isascii():
+        decomposed = unicodedata.normalize('NFKD', text)
+        text = ''.join(character for character in decomposed if not unicodedata.combining(character))
+    # \w matches what str.isalnum() accepts, and the underscore.
+    return NOT_ALPHANUMERIC.sub(' ', text.casefold()).strip()
+
+
+def keys_of(name: str) -> List[str]:
+    # A name is found by a prefix of any of its words: 'dark' and 'knight' both find The Dark Knight. Movies
+    # without a valid title have no name to find them by.
+    if not name:
+        return []
+    words = normalize(name).split(' ')
+    return [' '.join(words[first:]) for first in range(len(words)) if words[first]]
+
+
+def votes_of(movie: Movie) -> int:
+    # Movies without a vote count rank last.
+    return movie.votes if isinstance(movie.votes, int) else 0
+
+
+def people_of(movie: Movie):
+    if movie.director is not None:
+        yield 'director', movie.director.director_full_name
+    for actor in movie.actors:
+        yield 'actor', actor.actor_full_name
+
+
+class SuggestIndex:
+    """ Completes prefixes of movie titles and director and actor names, most voted first.
+
+    The normalized keys of all names are kept in one sorted list, so that the keys starting with a prefix are a
+    slice found by binary search. A director or actor has the votes of all their movies. Like the MemoryRepository,
+    an index never changes once made: with_movies returns a new one.
+    """
+
+    def __init__(self, suggestions: Iterable[Suggestion] = ()):
+        entries = sorted(((key, suggestion) for suggestion in suggestions for key in keys_of(suggestion.name)),
+                         key=itemgetter(0))
+        self._keys = [key for key, _ in entries]
+        self._suggestions = [suggestion for _, suggestion in entries]
+        self._people_votes = {(suggestion.kind, suggestion.name): suggestion.votes
+                              for suggestion in self._suggestions if suggestion.kind != 'movie'}
+        self._remembered = dict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def with_movies(self, movies: Iterable[Movie]) -> 'SuggestIndex':
+        movies = list(movies)
+        people_votes = dict()
+        for movie in movies:
+            for person in people_of(movie):
+                people_votes[person] = people_votes.get(person, self._people_votes.get(person, 0)) + votes_of(movie)
+
+        new_suggestions = [Suggestion('movie', movie.title, movie.rank, votes_of(movie)) for movie in movies] + \
+                          [Suggestion(kind, name, None, votes) for (kind, name), votes in people_votes.items()]
+        if len(new_suggestions) > INSERTION_LIMIT:
+            # The people with new movies have new vote totals, so their old suggestions go.
+            return SuggestIndex([suggestion for suggestion in self._unique_suggestions()
+                                 if (suggestion.kind, suggestion.name) not in people_votes] + new_suggestions)
+
+        # A few movies are inserted into copies of the sorted lists, which moves memory but compares few keys.
+        keys, suggestions = list(self._keys), list(self._suggestions)
+        for (kind, name), votes in people_votes.items():
+            if (kind, name) in self._people_votes:
+                old_suggestion = Suggestion(kind, name, None, self._people_votes[(kind, name)])
+                for key in keys_of(name):
+                    position = bisect_left(keys, key)
+                    while suggestions[position] != old_suggestion:
+                        position += 1
+                    del keys[position], suggestions[position]
+        for suggestion in new_suggestions:
+            for key in keys_of(suggestion.name):
+                position = bisect_right(keys, key)
+                keys.insert(position, key)
+                suggestions.insert(position, suggestion)
+
+        index = SuggestIndex()
+        index._keys, index._suggestions = keys, suggestions
+        index._people_votes = dict(self._people_votes)
+        index._people_votes.update(people_votes)
+        return index
+
+    def _unique_suggestions(self):
+        return dict.fromkeys(self._suggestions)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        """ Returns up to limit Suggestions whose names have a word starting with prefix, most voted first. """
+        key = normalize(prefix)
+        if not key or limit <= 0:
+            return []
+        if len(key) <= REMEMBERED_PREFIX_LENGTH:
+            remembered = self._remembered.get((key, limit))
+            if remembered is None:
+                remembered = self._remembered[(key, limit)] = self._suggest(key, limit)
+            return list(remembered)
+        return self._suggest(key, limit)
+
+    def _suggest(self, key: str, limit: int) -> List[Suggestion]:
+        first = bisect_left(self._keys, key)
+        # The first key after those starting with key.
+        last = bisect_left(self._keys, key[:-1] + chr(ord(key[-1]) + 1), first)
+        suggestions = self._suggestions
+
+        # A name with two words starting with key matches twice, so take a few extra and drop the repeats.
+        candidates = heapq.nlargest(limit * 2, range(first, last), key=lambda position: suggestions[position].votes)
+        best = unique(suggestions[position] for position in candidates)
+        if len(best) < limit and last - first > len(candidates):
+            best = unique(sorted((suggestions[position] for position in range(first, last)),
+                                 key=lambda suggestion: suggestion.votes, reverse=True))
+        return best[:limit]
+
+
+def unique(suggestions: Iterable[Suggestion]) -> List[Suggestion]:
+    return list(dict.fromkeys(suggestions))
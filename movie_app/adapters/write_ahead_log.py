@@ -0,0 +1,255 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import List
+from movie_app.domain.model import Movie, Review, User
+
+# Every record is framed as: payload length (4 bytes), CRC32 of the payload (4 bytes), payload.
+# The payload starts with a single record-type byte followed by a UTF-8 JSON body.
+RECORD_HEADER = struct.Struct('>II')
+
+USER_RECORD = 1
+REVIEW_RECORD = 2
+WATCH_RECORD = 3
+
+
+class WriteAheadLogException(Exception):
+    pass
+
+
+def encode_record(record_type: int, body: dict) -> bytes:
+    payload = bytes((record_type,)) + json.dumps(body, separators=(',', ':')).encode('utf-8')
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(file_name: str):
+    """ Yields (record_type, body, end_offset) for every intact record in file_name.
+    Reading stops silently at the first torn or corrupt record, which can only be the tail of the file.
+    """
+    if not os.path.exists(file_name):
+        return
+    with open(file_name, mode='rb') as logfile:
+        offset = 0
+        while True:
+            header = logfile.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, checksum = RECORD_HEADER.unpack(header)
+            payload = logfile.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum or length == 0:
+                return
+            offset += RECORD_HEADER.size + length
+            yield payload[0], json.loads(payload[1:].decode('utf-8')), offset
+
+
+def user_to_record(user: User) -> bytes:
+    return encode_record(USER_RECORD, {
+        'username': user.user_name,
+        'password': user.password,
+        'time_spent_watching_movies_minutes': user.time_spent_watching_movies_minutes
+    })
+
+
+def review_to_record(review: Review) -> bytes:
+    return encode_record(REVIEW_RECORD, {
+        'movie_rank': review.movie.rank,
+        'review_text': review.review_text,
+        'rating': review.rating,
+        'timestamp': review.timestamp.isoformat()
+    })
+
+
+def watch_to_record(user: User, movie: Movie, watched_at: datetime) -> bytes:
+    return encode_record(WATCH_RECORD, {
+        'username': user.user_name,
+        'movie_rank': movie.rank,
+        'watched_at': watched_at.isoformat()
+    })
+
+
+def record_to_user(body: dict) -> User:
+    user = User(body['username'], body['password'])
+    user._User__time_spent_watching_movies_minutes = body['time_spent_watching_movies_minutes']
+    return user
+
+
+def record_to_review(body: dict, repo) -> Review:
+    movie = repo.get_movie(body['movie_rank'])
+    if movie is None:
+        # The movie is no longer part of the dataset, so the review can't be restored.
+        return None
+    review = Review(movie, body['review_text'], body['rating'])
+    review._Review__timestamp = datetime.fromisoformat(body['timestamp'])
+    return review
+
+
+class WriteAheadLog:
+    """ Append-only log of the Users, Reviews and watches added to a MemoryRepository.
+
+    Records are written and flushed to the OS before the repository is updated, so they survive a process crash.
+    They are fsync'ed in groups of fsync_every records, which bounds what a power loss can lose. Once
+    compact_every records have been appended, the log is folded into a snapshot file and truncated.
+    """
+
+    def __init__(self, log_path: str, fsync_every: int = 1, compact_every: int = 1000):
+        self.__log_path = log_path
+        self.__snapshot_path = log_path + '.snapshot'
+        self.__fsync_every = fsync_every
+        self.__compact_every = compact_every
+        self.__pending_fsync = 0
+        self.__records_in_log = 0
+        self.__lock = threading.Lock()
+        self.__logfile = None
+
+    @property
+    def log_path(self) -> str:
+        return self.__log_path
+
+    @property
+    def snapshot_path(self) -> str:
+        return self.__snapshot_path
+
+    @property
+    def records_in_log(self) -> int:
+        return self.__records_in_log
+
+    def append_user(self, user: User):
+        self.__append(user_to_record(user))
+
+    def append_review(self, review: Review):
+        self.__append(review_to_record(review))
+
+    def append_reviews(self, reviews: List[Review]):
+        # The records are written together, and fsync'ed as a group, like the repository update they precede.
+        self.__append(b''.join(review_to_record(review) for review in reviews), len(reviews))
+
+    def append_watch(self, user: User, movie: Movie, watched_at: datetime):
+        self.__append(watch_to_record(user, movie, watched_at))
+
+    def append_watches(self, users: List[User], movie: Movie, watched_at: datetime):
+        self.__append(b''.join(watch_to_record(user, movie, watched_at) for user in users), len(users))
+
+    def replay(self, repo) -> int:
+        """ Re-applies the snapshot and then the log to repo, returning the number of records applied.
+        This is meant to run after populate and before the log is attached to repo, otherwise the replayed
+        records would be appended to the log a second time.
+        """
+        applied = 0
+        for file_name in (self.__snapshot_path, self.__log_path):
+            for record_type, body, end_offset in read_records(file_name):
+                if apply_record(record_type, body, repo):
+                    applied += 1
+                if file_name == self.__log_path:
+                    self.__records_in_log += 1
+
+        # Drop any torn record at the end of the log so that new records are appended after intact ones.
+        self.__truncate_torn_tail()
+        return applied
+
+    def flush(self):
+        with self.__lock:
+            self.__fsync()
+
+    def compact(self):
+        with self.__lock:
+            self.__compact()
+
+    def close(self):
+        with self.__lock:
+            if self.__logfile is not None:
+                self.__fsync()
+                self.__logfile.close()
+                self.__logfile = None
+
+    def __append(self, records: bytes, count: int = 1):
+        if count == 0:
+            return
+        with self.__lock:
+            if self.__logfile is None:
+                self.__logfile = open(self.__log_path, mode='ab')
+            self.__logfile.write(records)
+            self.__logfile.flush()
+            self.__records_in_log += count
+            self.__pending_fsync += count
+            if self.__fsync_every > 0 and self.__pending_fsync >= self.__fsync_every:
+                self.__fsync()
+            if self.__compact_every > 0 and self.__records_in_log >= self.__compact_every:
+                self.__compact()
+
+    def __fsync(self):
+        if self.__logfile is not None and self.__pending_fsync > 0:
+            self.__logfile.flush()
+            os.fsync(self.__logfile.fileno())
+        self.__pending_fsync = 0
+
+    def __compact(self):
+        # Fold the snapshot and the log into a new snapshot. Users are keyed by username, so only the latest
+        # record for each user is kept; reviews and watches are kept in the order they were written, after all the
+        # users, so that replaying a watch finds the user who watched.
+        users = dict()
+        reviews = list()
+        watches = list()
+        for file_name in (self.__snapshot_path, self.__log_path):
+            for record_type, body, end_offset in read_records(file_name):
+                if record_type == USER_RECORD:
+                    users[body['username']] = body
+                elif record_type == REVIEW_RECORD:
+                    reviews.append(body)
+                elif record_type == WATCH_RECORD:
+                    watches.append(body)
+
+        temporary_path = self.__snapshot_path + '.tmp'
+        with open(temporary_path, mode='wb') as snapshot:
+            for body in users.values():
+                snapshot.write(encode_record(USER_RECORD, body))
+            for body in reviews:
+                snapshot.write(encode_record(REVIEW_RECORD, body))
+            for body in watches:
+                snapshot.write(encode_record(WATCH_RECORD, body))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary_path, self.__snapshot_path)
+
+        # The snapshot now holds everything, so the log can start again from empty.
+        if self.__logfile is not None:
+            self.__logfile.close()
+        self.__logfile = open(self.__log_path, mode='wb')
+        os.fsync(self.__logfile.fileno())
+        self.__records_in_log = 0
+        self.__pending_fsync = 0
+
+    def __truncate_torn_tail(self):
+        if not os.path.exists(self.__log_path):
+            return
+        intact_length = 0
+        for record_type, body, end_offset in read_records(self.__log_path):
+            intact_length = end_offset
+        if os.path.getsize(self.__log_path) != intact_length:
+            with open(self.__log_path, mode='r+b') as logfile:
+                logfile.truncate(intact_length)
+
+
+def apply_record(record_type: int, body: dict, repo) -> bool:
+    if record_type == USER_RECORD:
+        if repo.get_user(body['username']) is not None:
+            return False
+        repo.add_user(record_to_user(body))
+        return True
+    elif record_type == REVIEW_RECORD:
+        review = record_to_review(body, repo)
+        if review is None:
+            return False
+        repo.add_review(review)
+        return True
+    elif record_type == WATCH_RECORD:
+        user = repo.get_user(body['username'])
+        movie = repo.get_movie(body['movie_rank'])
+        if user is None or movie is None:
+            # The movie is no longer part of the dataset, so the watch can't be restored.
+            return False
+        repo.add_watch(user, movie, datetime.fromisoformat(body['watched_at']))
+        return True
+    raise WriteAheadLogException(f'Unknown record type {record_type}')
@@ -2,7 +2,6 @@ from flask import Blueprint, render_template, redirect, url_for, session, reques
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Length, ValidationError
-from password_validator import PasswordValidator
 from functools import wraps
 import movie_app.utilities.utilities as utilities
 import movie_app.authentication.services as services
@@ -99,6 +98,8 @@ class PasswordValid:
         self.message = message
 
     def __call__(self, form, field):
+        # Only registering checks a password's strength, so password_validator is imported then.
+        from password_validator import PasswordValidator
         schema = PasswordValidator()
         schema \
             .min(7) \
@@ -1,5 +1,5 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from movie_app.adapters.repository import AbstractRepository
+from movie_app.adapters.repository import AbstractRepository, RepositoryException
 from movie_app.domain.model import User
 
 
@@ -24,9 +24,13 @@ def add_user(username: str, password: str, repo: AbstractRepository):
     # Encrypt password so that the database doesn't store passwords 'in the clear'.
     password_hash = generate_password_hash(password)
 
-    # Create and store the new User, with password encrypted.
+    # Create and store the new User, with password encrypted. The repository rejects the User if the username was
+    # taken since the check above, e.g. by a concurrent registration.
     user = User(username, password_hash)
-    repo.add_user(user)
+    try:
+        repo.add_user(user)
+    except RepositoryException:
+        raise NameNotUniqueException
 
 
 def get_user(username: str, repo: AbstractRepository):
@@ -1,4 +1,6 @@
 import csv
+import sys
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 
 
@@ -308,10 +310,52 @@ class Movie:
             self.__genres.remove(g)
 
 
+class EntityRegistry:
+    """ Keeps one Director, Genre and Actor for each name, with the name interned, so that every Movie of a dataset
+    shares them rather than having its own equal copies. Checks such as genre in movie.genres then find the very
+    same object, without comparing names.
+    """
+
+    def __init__(self):
+        self.__directors = dict()
+        self.__genres = dict()
+        self.__actors = dict()
+
+    def director(self, director_full_name: str) -> Director:
+        director = self.__directors.get(director_full_name)
+        if director is None:
+            director = self.__directors[director_full_name] = Director(sys.intern(director_full_name))
+        return director
+
+    def genre(self, genre_name: str) -> Genre:
+        genre = self.__genres.get(genre_name)
+        if genre is None:
+            genre = self.__genres[genre_name] = Genre(sys.intern(genre_name))
+        return genre
+
+    def actor(self, actor_full_name: str) -> Actor:
+        actor = self.__actors.get(actor_full_name)
+        if actor is None:
+            actor = self.__actors[actor_full_name] = Actor(sys.intern(actor_full_name))
+        return actor
+
+    def share(self, movie: Movie):
+        """ Makes movie refer to this registry's Director, Actors and Genres, e.g. after it was made with another
+        registry.
+        """
+        if movie.director is not None and movie.director.director_full_name is not None:
+            movie.director = self.director(movie.director.director_full_name)
+        movie.actors = [self.actor(actor.actor_full_name) if actor.actor_full_name is not None else actor
+                        for actor in movie.actors]
+        movie.genres = [self.genre(genre.genre_name) if genre.genre_name is not None else genre
+                        for genre in movie.genres]
+
+
 class MovieFileCSVReader:
 
     def __init__(self, file_name: str):
         self.__file_name = file_name
+        self.__registry = EntityRegistry()
         self.__dataset_of_movies = list()
         self.__dataset_of_actors = set()
         self.__dataset_of_directors = set()
@@ -333,56 +377,61 @@ class MovieFileCSVReader:
     def dataset_of_genres(self) -> set:
         return self.__dataset_of_genres
 
-    def read_csv_file(self):
+    def iter_movies(self):
+        """ Yields the file's Movies, with their directors, actors and genres, one at a time as they are parsed, in
+        one pass over the file. Only the row being parsed is held, so the catalogue can be consumed without keeping
+        it all in memory; the datasets aren't filled in (see read_csv_file).
+        """
         with open(self.__file_name, mode='r', encoding='utf-8-sig') as csvfile:
-            movie_file_reader = csv.DictReader(csvfile)
-            i = 0
-            for row in movie_file_reader:
-                # reading from csv.
-                movie_rank = int(row['Rank'].strip())
-                title = row['Title']
-                genres = row['Genre'].split(',')
-                movie_description = row['Description'].strip()
-                director = row['Director'].strip()
-                actors = row['Actors'].split(',')
-                year = int(row['Year'].strip())
-                runtime = int(row['Runtime (Minutes)'].strip())
-                movie_rating = float(row['Rating'].strip()) if row['Rating'].strip() != 'N/A' else row['Rating'].strip()
-                movie_votes = int(row['Votes'].strip()) if row['Votes'].strip() != 'N/A' else row['Votes'].strip()
-                movie_revenue = float(row['Revenue (Millions)'].strip()) \
-                    if row['Revenue (Millions)'].strip() != 'N/A' else row['Revenue (Millions)'].strip()
-                movie_metascore = int(row['Metascore'].strip()) \
-                    if row['Metascore'].strip() != 'N/A' else row['Metascore'].strip()
-
-                # assigning to respective objects.
-                movie_director = Director(director)
-                movie_genres = list()
-                for g in genres:
-                    genre = g.strip()
-                    movie_genres.append(Genre(genre))
-                movie_actors = list()
-                for a in actors:
-                    actor = a.strip()
-                    movie_actors.append(Actor(actor))
-
-                # assigning to respective datasets.
-                self.__dataset_of_movies.append(Movie(title, year))
-                self.__dataset_of_movies[len(self.__dataset_of_movies)-1].rank = movie_rank
-                self.__dataset_of_movies[len(self.__dataset_of_movies)-1].genres = movie_genres
-                self.__dataset_of_movies[len(self.__dataset_of_movies)-1].description = movie_description
-                self.__dataset_of_movies[len(self.__dataset_of_movies)-1].director = movie_director
-                self.__dataset_of_movies[len(self.__dataset_of_movies)-1].actors = movie_actors
-                self.__dataset_of_movies[len(self.__dataset_of_movies)-1].runtime_minutes = runtime
-                self.__dataset_of_movies[len(self.__dataset_of_movies) - 1].rating = movie_rating
-                self.__dataset_of_movies[len(self.__dataset_of_movies) - 1].votes = movie_votes
-                self.__dataset_of_movies[len(self.__dataset_of_movies) - 1].revenue = movie_revenue
-                self.__dataset_of_movies[len(self.__dataset_of_movies) - 1].metascore = movie_metascore
-                for a in movie_actors:
-                    self.__dataset_of_actors.add(a)
-                self.__dataset_of_directors.add(movie_director)
-                for g in movie_genres:
-                    self.__dataset_of_genres.add(g)
-                i += 1
+            # Rows are read as lists, looked up by the column positions in the header, rather than as dicts.
+            movie_file_reader = csv.reader(csvfile)
+            header = next(movie_file_reader, None)
+            if header is None:
+                return
+            yield from parse_movies({name: index for index, name in enumerate(header)}, movie_file_reader,
+                                    self.__registry)
+
+    def read_csv_file(self):
+        # Keeps every Movie, and its directors, actors and genres, in the datasets.
+        for movie in self.iter_movies():
+            self.__dataset_of_movies.append(movie)
+            self.__dataset_of_directors.add(movie.director)
+            self.__dataset_of_actors.update(movie.actors)
+            self.__dataset_of_genres.update(movie.genres)
+
+
+# The columns of a movie file that Movies are made from.
+MOVIE_FILE_COLUMNS = ('Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)',
+                      'Rating', 'Votes', 'Revenue (Millions)', 'Metascore')
+
+
+def parse_movies(column: dict, rows, registry: EntityRegistry = None):
+    """ Yields the Movie of each row of a movie file, a list of values, given the position of each column. The
+    Movies share the Directors, Genres and Actors of registry, a new one if none is given.
+    """
+    rank, title, genres, description, director, actors, year, runtime, rating, votes, revenue, metascore = (
+        column[name] for name in MOVIE_FILE_COLUMNS)
+    registry = EntityRegistry() if registry is None else registry
+    for row in rows:
+        movie = Movie(row[title], int(row[year]))
+        movie.rank = int(row[rank])
+        movie.genres = [registry.genre(genre.strip()) for genre in row[genres].split(',')]
+        movie.description = row[description].strip()
+        movie.director = registry.director(row[director].strip())
+        movie.actors = [registry.actor(actor.strip()) for actor in row[actors].split(',')]
+        movie.runtime_minutes = int(row[runtime])
+        # Unknown values are 'N/A' in the file, and None on the Movie.
+        movie.rating = number_or_none(row[rating], float)
+        movie.votes = number_or_none(row[votes], int)
+        movie.revenue = number_or_none(row[revenue], float)
+        movie.metascore = number_or_none(row[metascore], int)
+        yield movie
+
+
+def number_or_none(text: str, number_type):
+    # int() and float() ignore surrounding whitespace.
+    text = text.strip()
+    return None if text == 'N/A' else number_type(text)
 
 
 class Review:
@@ -429,6 +478,9 @@ class Review:
                 other.__rating == self.__rating and
                 other.__timestamp == self.__timestamp)
 
+    def __hash__(self):
+        return hash((self.__movie, self.__review_text, self.__rating, self.__timestamp))
+
 
 class User:
 
@@ -494,6 +546,13 @@ class User:
 
 
 class WatchList:
+    """ A User's named list of Movies to watch, in the order they were added.
+
+    The Movies are kept in a dict, in the order they were added, so adding and removing a Movie takes constant time
+    however long the list is; the list of them is made when it is next asked for. The orderings by title, year and
+    runtime are sorted once, the first time each is asked for, and are then kept sorted as Movies are added and
+    removed, rather than being sorted again on every call.
+    """
 
     def __init__(self, user: User, watchlist_name: str):
         if not isinstance(user, User):
@@ -504,10 +563,19 @@ class WatchList:
             self.__watchlist_name = "New Watchlist"
         else:
             self.__watchlist_name = watchlist_name.strip()
+        # Movie -> the number of Movies added before it, which breaks ties in the sorted orderings so that they
+        # are stable, like sorted().
+        self.__members = dict()
+        # The Movies in the order they were added, or None until they are next asked for after a change.
         self.__watchlist = list()
+        self.__movies_added = 0
+        # Ordering name -> (sort keys, Movies), both sorted by sort key.
+        self.__orderings = dict()
 
     @property
     def watchlist(self):
+        if self.__watchlist is None:
+            self.__watchlist = list(self.__members)
         return self.__watchlist
 
     @property
@@ -523,68 +591,95 @@ class WatchList:
         return self
 
     def __next__(self):
-        if self.__index < len(self.__watchlist):
-            result = self.__watchlist[self.__index]
+        if self.__index < len(self.__members):
+            result = self.watchlist[self.__index]
             self.__index += 1
             return result
         else:
             raise StopIteration
 
+    def __contains__(self, movie):
+        return movie in self.__members
+
     def add_movie(self, movie):
         if not isinstance(movie, Movie):
             raise Exception("Only Movies can be added to the watchlist")
-        elif movie not in self.__watchlist:
-            self.__watchlist.append(movie)
+        elif movie not in self.__members:
+            self.__members[movie] = self.__movies_added
+            self.__watchlist = None
+            for ordering, (keys, movies) in self.__orderings.items():
+                key = watchlist_sort_key(ordering, movie, self.__movies_added)
+                position = bisect_right(keys, key)
+                keys.insert(position, key)
+                movies.insert(position, movie)
+            self.__movies_added += 1
 
     def remove_movie(self, movie):
         if not isinstance(movie, Movie):
             raise Exception("Only Movies can be removed from the watchlist")
-        elif movie in self.__watchlist:
-            self.__watchlist.remove(movie)
+        elif movie in self.__members:
+            sequence = self.__members.pop(movie)
+            self.__watchlist = None
+            for ordering, (keys, movies) in self.__orderings.items():
+                position = bisect_left(keys, watchlist_sort_key(ordering, movie, sequence))
+                # The key was made when the Movie was added, so if the Movie has changed since, it isn't found here.
+                if position == len(movies) or movies[position] != movie:
+                    position = movies.index(movie)
+                del keys[position]
+                del movies[position]
 
     def select_movie_to_watch(self, index):
         if not isinstance(index, int):
             return None
-        elif index < 0 or index > (len(self.__watchlist) - 1):
+        elif index < 0 or index > (len(self.__members) - 1):
             return None
         else:
-            return self.__watchlist[index]
+            return self.watchlist[index]
 
     def size(self):
-        return len(self.__watchlist)
+        return len(self.__members)
 
     def first_movie_in_watchlist(self):
-        if len(self.__watchlist) == 0:
+        if len(self.__members) == 0:
             return None
         else:
-            return self.__watchlist[0]
+            return next(iter(self.__members))
 
     def clear_watchlist(self):
-        self.__watchlist.clear()
+        self.__watchlist = list()
+        self.__members.clear()
+        self.__orderings.clear()
 
     def share_watchlist(self, user):
         if not isinstance(user, User):
             raise Exception("A valid User is required")
         else:
+            # The Movies are already known to be distinct, so they are copied over along with the orderings
+            # instead of being added, and checked, one at a time.
             new_watchlist = WatchList(user, "")
-            for movie in self.__watchlist:
-                new_watchlist.add_movie(movie)
+            new_watchlist.__watchlist = None
+            new_watchlist.__members = dict(self.__members)
+            new_watchlist.__movies_added = self.__movies_added
+            new_watchlist.__orderings = {ordering: (list(keys), list(movies))
+                                         for ordering, (keys, movies) in self.__orderings.items()}
             return new_watchlist
 
     def sort_watchlist_by_title(self):
-        def get_movie_title(movie):
-            return movie.title
-        return sorted(self.__watchlist, key=get_movie_title)
+        return self.__sorted('title')
 
     def sort_watchlist_by_year(self):
-        def get_movie_year(movie):
-            return movie.release_year
-        return sorted(self.__watchlist, key=get_movie_year)
+        return self.__sorted('release_year')
 
     def sort_watchlist_by_runtime(self):
-        def get_movie_runtime(movie):
-            return movie.runtime_minutes
-        return sorted(self.__watchlist, key=get_movie_runtime)
+        return self.__sorted('runtime_minutes')
+
+    def __sorted(self, ordering):
+        if ordering not in self.__orderings:
+            keyed_movies = sorted((watchlist_sort_key(ordering, movie, sequence), movie)
+                                  for movie, sequence in self.__members.items())
+            self.__orderings[ordering] = ([key for key, movie in keyed_movies],
+                                          [movie for key, movie in keyed_movies])
+        return list(self.__orderings[ordering][1])
 
     def change_watchlist_name(self, new_name):
         if isinstance(new_name, str) or new_name != "":
@@ -593,20 +688,35 @@ class WatchList:
     def get_recommendations(self, filename):
         if not isinstance(filename, str):
             raise Exception("Invalid filename")
-        elif len(self.__watchlist) == 0:
+        elif len(self.__members) == 0:
             raise Exception("Sorry, there are no recommendations for now")
         else:
             new_watchlist = WatchList(self.watchlist_owner, "Movie Recommendations")
             movie_file_reader = MovieFileCSVReader(filename)
             movie_file_reader.read_csv_file()
             for new_movie in movie_file_reader.dataset_of_movies:
-                for current_movie in self.__watchlist:
+                for current_movie in self.__members:
                     if sorted(new_movie.genres) == sorted(current_movie.genres):
                         new_watchlist.add_movie(new_movie)
             return new_watchlist
 
 
+def watchlist_sort_key(ordering: str, movie: Movie, sequence: int):
+    """ Returns the key of movie in a WatchList ordering by the Movie attribute named ordering. Movies without a
+    value come last, and Movies with equal values stay in the order they were added.
+    """
+    value = getattr(movie, ordering)
+    return (value is None, 0 if value is None else value, sequence)
+
+
 class MovieWatchingSimulation:
+    """ A group of Users watching a Movie together, led by an administrator.
+
+    The group is kept as a dict, in the order Users joined, so joining, leaving and membership checks take constant
+    time however large the group is. The session remembers which members have each Review and which have watched the
+    current Movie, instead of searching every member's reviews and watched movies each time. A member's reviews and
+    watched movies are searched once, when they join, when the Movie changes, or when a Review is first written.
+    """
 
     def __init__(self, admin: User, movie: Movie):
         if type(admin) is not User:
@@ -617,8 +727,11 @@ class MovieWatchingSimulation:
             raise Exception("Sorry, that is an invalid Movie")
         else:
             self.__movie_to_watch = movie
-        self.__watch_group = list()
-        self.__watch_group.append(self.__administrator)
+        self.__watch_group = dict()
+        self.__watch_group[self.__administrator] = None
+        # Review -> the members who have it; the members who have watched the current movie.
+        self.__reviewed_by = dict()
+        self.__watched_by = {admin} if movie in admin.watched_movies else set()
 
     @property
     def administrator(self):
@@ -630,19 +743,34 @@ class MovieWatchingSimulation:
 
     @property
     def watch_group(self):
-        return self.__watch_group
+        return list(self.__watch_group)
+
+    def __contains__(self, user):
+        return user in self.__watch_group
+
+    def __len__(self):
+        return len(self.__watch_group)
 
     def add_user(self, user):
         if not isinstance(user, User):
             raise Exception("Please add a valid User")
         elif user not in self.__watch_group:
-            self.__watch_group.append(user)
+            self.__watch_group[user] = None
+            # A member may have watched the Movie, or have a Review, from before they joined.
+            if self.__movie_to_watch in user.watched_movies:
+                self.__watched_by.add(user)
+            for review, reviewed_by in self.__reviewed_by.items():
+                if review in user.reviews:
+                    reviewed_by.add(user)
 
     def remove_user(self, user):
         if not isinstance(user, User):
             raise Exception("Please remove a valid User")
         elif user in self.__watch_group and user != self.__administrator:
-            self.__watch_group.remove(user)
+            del self.__watch_group[user]
+            self.__watched_by.discard(user)
+            for reviewed_by in self.__reviewed_by.values():
+                reviewed_by.discard(user)
 
     def change_movie(self, movie):
         if not isinstance(movie, Movie):
@@ -651,21 +779,99 @@ class MovieWatchingSimulation:
             raise Exception("That movie is already in queue")
         else:
             self.__movie_to_watch = movie
+            self.__watched_by = {user for user in self.__watch_group if movie in user.watched_movies}
 
     def write_review_for_everyone(self, review):
+        """ Gives every member who hasn't had it yet a Review of their own, equal to review, and returns the Reviews
+        given, e.g. to add them to a repository together. The first member given it gets review itself.
+        """
         if not isinstance(review, Review):
             raise Exception("Please write a valid Review")
         elif review.movie != self.__movie_to_watch:
             raise Exception("Please write a Review for the Movie in queue")
         else:
+            reviewed_by = self.__reviewed_by.get(review)
+            if reviewed_by is None:
+                reviewed_by = self.__reviewed_by[review] = {user for user in self.__watch_group
+                                                            if review in user.reviews}
+            member_reviews = []
             for user in self.__watch_group:
-                if review not in user.reviews:
-                    user.add_review(review)
+                if user not in reviewed_by:
+                    # A Review belongs to one User, so the other members are given copies of it.
+                    member_review = review
+                    if reviewed_by:
+                        member_review = Review(review.movie, review.review_text, review.rating)
+                        member_review._Review__timestamp = review.timestamp
+                    user.add_review(member_review)
+                    reviewed_by.add(user)
+                    member_reviews.append(member_review)
+            return member_reviews
+
+    def members_yet_to_watch(self):
+        """ Returns the members who haven't watched the current Movie in this session, in the order they joined. """
+        return [user for user in self.__watch_group if user not in self.__watched_by]
+
+    def mark_watched(self, users):
+        """ Records that users have watched the current Movie, e.g. once a repository has recorded their watches. """
+        self.__watched_by.update(users)
 
     def update_user_information(self):
-        for user in self.__watch_group:
-            if self.__movie_to_watch not in user.watched_movies:
-                user.watch_movie(self.__movie_to_watch)
+        users = self.members_yet_to_watch()
+        for user in users:
+            user.watch_movie(self.__movie_to_watch)
+        self.mark_watched(users)
+        return users
+
+
+class WatchSessionRegistry:
+    """ The MovieWatchingSimulations in progress, by administrator, and the one each User is in. A User is in at
+    most one session at a time, so finding a User's session is a dict lookup rather than a search of every group.
+    """
+
+    def __init__(self):
+        self.__sessions = dict()        # Administrator -> MovieWatchingSimulation.
+        self.__session_of = dict()      # User -> the MovieWatchingSimulation they are in.
+
+    def __len__(self):
+        return len(self.__sessions)
+
+    def start_session(self, admin: User, movie: Movie) -> MovieWatchingSimulation:
+        if admin in self.__session_of:
+            raise Exception("That User is already in a watch session")
+        session = MovieWatchingSimulation(admin, movie)
+        self.__sessions[admin] = session
+        self.__session_of[admin] = session
+        return session
+
+    def join_session(self, user: User, admin: User) -> MovieWatchingSimulation:
+        session = self.__sessions.get(admin)
+        if session is None:
+            raise Exception("There is no watch session led by that User")
+        if self.__session_of.get(user, session) is not session:
+            raise Exception("That User is already in a watch session")
+        session.add_user(user)
+        self.__session_of[user] = session
+        return session
+
+    def leave_session(self, user: User):
+        # The administrator leaving ends the session for everyone.
+        session = self.__session_of.get(user)
+        if session is None:
+            return
+        if user == session.administrator:
+            self.end_session(user)
+        else:
+            session.remove_user(user)
+            del self.__session_of[user]
+
+    def end_session(self, admin: User):
+        session = self.__sessions.pop(admin, None)
+        if session is not None:
+            for user in session.watch_group:
+                del self.__session_of[user]
+
+    def session_of(self, user: User) -> MovieWatchingSimulation:
+        return self.__session_of.get(user)
 
 
 class ModelException(Exception):
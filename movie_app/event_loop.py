@@ -0,0 +1,38 @@
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    """ Runs an asyncio event loop in a daemon thread, shared by every request.
+
+    Flask 1.1 views are synchronous, so a view hands its coroutine to run() and waits for the result. The
+    coroutines of all in-flight requests are multiplexed on the one loop, so the reads a page makes run
+    concurrently, and the repository's connections are shared between requests.
+    """
+
+    def __init__(self):
+        self.__loop = None
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self.__lock:
+            if self.__loop is None:
+                self.__loop = asyncio.new_event_loop()
+                self.__thread = threading.Thread(target=self.__loop.run_forever, name='event-loop', daemon=True)
+                self.__thread.start()
+            return self.__loop
+
+    def run(self, coroutine, timeout=None):
+        """ Runs coroutine on the loop and returns its result, blocking the calling thread until it is done. """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self):
+        with self.__lock:
+            if self.__loop is not None:
+                self.__loop.call_soon_threadsafe(self.__loop.stop)
+                self.__thread.join()
+                self.__loop.close()
+                self.__loop = None
+                self.__thread = None
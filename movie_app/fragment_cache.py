@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from time import monotonic, perf_counter
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from movie_app.metrics import instrumentation
+
+FRAGMENT_RENDER_SECONDS_SAVED = instrumentation.REGISTRY.counter(
+    'cs235flix_fragment_render_seconds_saved_total',
+    'Rendering time avoided by serving template fragments from the fragment cache.', ('template',))
+
+
+class FragmentCache:
+    """ Thread-safe LRU cache of rendered template fragments.
+    Each entry keeps the time it took to render, so that hits can report the rendering time they saved. If ttl is
+    set, fragments are rendered again after ttl seconds, so that changes the key doesn't cover (e.g. movies updated
+    by another process) show up.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 0, clock=monotonic):
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= self.__clock():
+                del self.__entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[1]
+            return entry[:2]
+
+    def set(self, key, fragment: str, render_seconds: float):
+        with self.__lock:
+            expires = self.__clock() + self.__ttl if self.__ttl else None
+            self.__entries[key] = (fragment, render_seconds, expires)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """ Adds a {% cache key %}...{% endcache %} tag that renders its body once per distinct key.
+
+    The key is one or more comma-separated expressions and must cover everything the body depends on, e.g.
+
+        {% cache movie.rank, movie.reviews|length, movie.rank == show_reviews_for_movie %}
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        key = nodes.Tuple([nodes.Const(parser.name), nodes.Const(lineno)] + key_parts, 'load')
+        call = self.call_method('_render_fragment', [key])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, key, caller):
+        cache = self.environment.fragment_cache
+        entry = cache.get(key)
+        if entry is not None:
+            instrumentation.record_cache_lookup('fragment', True)
+            FRAGMENT_RENDER_SECONDS_SAVED.inc((key[0],), entry[1])
+            return Markup(entry[0])
+
+        instrumentation.record_cache_lookup('fragment', False)
+        start = perf_counter()
+        fragment = caller()
+        cache.set(key, fragment, perf_counter() - start)
+        return fragment
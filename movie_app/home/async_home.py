@@ -0,0 +1,17 @@
+from flask import Blueprint, render_template
+import movie_app.adapters.async_repository as async_repo
+import movie_app.utilities.utilities as utilities
+from movie_app.movies.async_movies import run, read_sidebar
+
+# Replaces the home blueprint of home.py when ASYNC_VIEWS is set.
+home_blueprint = Blueprint('home_bp', __name__)
+
+
+@home_blueprint.route('/', methods=['GET'])
+def home():
+    featured_movies, genre_names = run(read_sidebar(async_repo.async_repo_instance))
+    return render_template(
+        'home/home.html',
+        featured_movies=utilities.add_featured_movie_links(featured_movies),
+        genre_urls=utilities.genre_urls_for(genre_names)
+    )
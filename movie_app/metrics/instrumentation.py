@@ -0,0 +1,305 @@
+import threading
+import types
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import mapper
+from movie_app.adapters.repository import AbstractRepository
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(label_names, label_values, extra=()) -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, label_values=()):
+        return self._values.get(label_values, 0)
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{format_labels(self.label_names, label_values)} {format_number(value)}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def set(self, value, label_values=()):
+        with self._lock:
+            self._values[label_values] = value
+
+    def value(self, label_values=()):
+        return self._values.get(label_values, 0)
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{format_labels(self.label_names, label_values)} {format_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # For each label combination: per-bucket counts (the last slot is +Inf), sum of observations.
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_values=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, label_values=()):
+        series = self._values.get(label_values)
+        return 0 if series is None else sum(series[0])
+
+    def sum(self, label_values=()):
+        series = self._values.get(label_values)
+        return 0.0 if series is None else series[1]
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (bucket_counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for upper_bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                    cumulative += bucket_count
+                    labels = format_labels(self.label_names, label_values, (('le', format_number(upper_bound)),))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = format_labels(self.label_names, label_values)
+                lines.append(f'{self.name}_sum{labels} {format_number(total)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = list()
+
+    def counter(self, name, documentation, label_names=()):
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, label_names=()):
+        metric = Gauge(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self) -> str:
+        lines = list()
+        for metric in self._metrics:
+            lines.extend(metric.exposition())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'cs235flix_request_duration_seconds', 'Time spent handling HTTP requests.', ('endpoint',))
+REQUESTS = REGISTRY.counter(
+    'cs235flix_requests_total', 'HTTP responses sent.', ('endpoint', 'status'))
+REPOSITORY_CALL_DURATION = REGISTRY.histogram(
+    'cs235flix_repository_call_duration_seconds', 'Time spent in repository methods.', ('method',))
+SERVICE_CALL_DURATION = REGISTRY.histogram(
+    'cs235flix_service_call_duration_seconds', 'Time spent in service-layer functions.', ('function',))
+SQL_STATEMENT_DURATION = REGISTRY.histogram(
+    'cs235flix_sql_statement_duration_seconds', 'Time spent executing SQL statements.', ('verb',))
+TEMPLATE_RENDER_DURATION = REGISTRY.histogram(
+    'cs235flix_template_render_duration_seconds', 'Time spent rendering Jinja templates.', ('template',))
+SQL_STATEMENTS_PER_REQUEST = REGISTRY.histogram(
+    'cs235flix_sql_statements_per_request', 'SQL statements executed per HTTP request.', ('endpoint',),
+    COUNT_BUCKETS)
+ROWS_FETCHED_PER_REQUEST = REGISTRY.histogram(
+    'cs235flix_rows_fetched_per_request', 'Database rows loaded into model objects per HTTP request.',
+    ('endpoint',), COUNT_BUCKETS)
+REPOSITORY_CALLS_SAVED_PER_REQUEST = REGISTRY.histogram(
+    'cs235flix_repository_calls_saved_per_request', 'Repository reads answered by the request-scoped cache.', (),
+    COUNT_BUCKETS)
+CACHE_HITS = REGISTRY.counter(
+    'cs235flix_cache_hits_total', 'Cache lookups answered from a cache.', ('cache',))
+CACHE_MISSES = REGISTRY.counter(
+    'cs235flix_cache_misses_total', 'Cache lookups that fell through to the underlying source.', ('cache',))
+STARTUP_PHASE_DURATION = REGISTRY.gauge(
+    'cs235flix_startup_phase_seconds', 'Time spent in each phase of create_app when the app last started.',
+    ('phase',))
+
+
+class StartupPhases:
+    """ Times the phases of starting the app: each call to end charges the time since the previous one to a phase. """
+
+    def __init__(self):
+        self.durations = dict()
+        self._mark = perf_counter()
+
+    def end(self, phase: str):
+        now = perf_counter()
+        self.durations[phase] = self.durations.get(phase, 0.0) + now - self._mark
+        self._mark = now
+
+    def record(self):
+        for phase, duration in self.durations.items():
+            STARTUP_PHASE_DURATION.set(duration, (phase,))
+
+
+# Per-thread tallies for the request currently being handled by that thread.
+_request_state = threading.local()
+
+
+def start_request():
+    _request_state.start = perf_counter()
+    _request_state.sql_statements = 0
+    _request_state.rows_fetched = 0
+
+
+def finish_request(endpoint, status_code):
+    start = getattr(_request_state, 'start', None)
+    if start is None:
+        return
+    endpoint = endpoint or 'unknown'
+    REQUEST_DURATION.observe(perf_counter() - start, (endpoint,))
+    REQUESTS.inc((endpoint, str(status_code)))
+    SQL_STATEMENTS_PER_REQUEST.observe(_request_state.sql_statements, (endpoint,))
+    ROWS_FETCHED_PER_REQUEST.observe(_request_state.rows_fetched, (endpoint,))
+    _request_state.start = None
+
+
+def record_cache_lookup(cache_name: str, hit: bool):
+    if hit:
+        CACHE_HITS.inc((cache_name,))
+    else:
+        CACHE_MISSES.inc((cache_name,))
+
+
+def timed(histogram: Histogram, label: str):
+    """ Decorator that observes the wall-clock duration of every call in histogram under label. """
+    label_values = (label,)
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start, label_values)
+        wrapper.__instrumented__ = True
+        return wrapper
+    return decorator
+
+
+def instrument_repository(repository: AbstractRepository):
+    # Wrap the bound methods on the instance, so that isinstance checks against the backend keep working.
+    for method_name in sorted(AbstractRepository.__abstractmethods__):
+        method = getattr(repository, method_name)
+        if not getattr(method, '__instrumented__', False):
+            setattr(repository, method_name, timed(REPOSITORY_CALL_DURATION, method_name)(method))
+
+
+def instrument_module(module: types.ModuleType, prefix: str, names):
+    # Callers look service functions up through the module (e.g. services.get_movie), so replacing the
+    # module attributes is enough to time every call, including calls between functions of the module. Only the
+    # named functions are timed: timing helpers called once per movie rendered would cost more than they tell.
+    for name in names:
+        function = getattr(module, name)
+        if not getattr(function, '__instrumented__', False):
+            setattr(module, name, timed(SERVICE_CALL_DURATION, f'{prefix}.{name}')(function))
+
+
+def uninstrument_module(module: types.ModuleType):
+    # Module attributes outlive the app that replaced them, so an app without metrics puts back the functions an
+    # earlier app's instrument_module replaced (wraps() keeps each one as __wrapped__).
+    for name, function in list(vars(module).items()):
+        if getattr(function, '__instrumented__', False):
+            setattr(module, name, function.__wrapped__)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info['query_start_time'].pop()
+    SQL_STATEMENT_DURATION.observe(elapsed, (statement.lstrip().split(None, 1)[0].upper(),))
+    if getattr(_request_state, 'start', None) is not None:
+        _request_state.sql_statements += 1
+
+
+def _on_load(target, context):
+    if getattr(_request_state, 'start', None) is not None:
+        _request_state.rows_fetched += 1
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    # Listening on the mapper() function applies to every mapped class, including ones mapped later.
+    if not event.contains(mapper, 'load', _on_load):
+        event.listen(mapper, 'load', _on_load)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            TEMPLATE_RENDER_DURATION.observe(perf_counter() - start, (self.name,))
+
+
+def instrument_templates(app):
+    # Templates loaded from now on are created from InstrumentedTemplate, which times every render_template.
+    app.jinja_env.template_class = InstrumentedTemplate
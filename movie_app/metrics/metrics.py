@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+from movie_app.metrics.instrumentation import REGISTRY
+
+# Configure Blueprint.
+metrics_blueprint = Blueprint('metrics_bp', __name__)
+
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def metrics():
+    # Expose every latency histogram and counter in the Prometheus text exposition format.
+    return Response(REGISTRY.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,160 @@
+import asyncio
+from flask import Blueprint, current_app, request, render_template, url_for
+import movie_app.adapters.async_repository as async_repo
+import movie_app.movies.async_services as services
+import movie_app.utilities.async_services as utilities_services
+import movie_app.utilities.utilities as utilities
+from movie_app.movies.view_models import for_page
+from movie_app.movies import movies as sync_movies
+
+# Configure Blueprint. It replaces the movies blueprint of movies.py when ASYNC_VIEWS is set, so it has the same
+# name and endpoints.
+movies_blueprint = Blueprint('movies_bp', __name__)
+
+# Reviews and watches are written through the synchronous repository, like every other write, and facets,
+# suggestions, filmographies and watch histories are only answered by the synchronous repositories.
+movies_blueprint.add_url_rule('/review', 'review_on_movie', sync_movies.review_on_movie, methods=['GET', 'POST'])
+movies_blueprint.add_url_rule('/movies_by_facets', 'movies_by_facets', sync_movies.movies_by_facets)
+movies_blueprint.add_url_rule('/suggest', 'suggest', sync_movies.suggest)
+movies_blueprint.add_url_rule('/filmography/<any(director, actor):kind>', 'filmography', sync_movies.filmography)
+movies_blueprint.add_url_rule('/api/filmography/<any(director, actor):kind>', 'filmography_api',
+                              sync_movies.filmography_api)
+movies_blueprint.add_url_rule('/api/watch_history', 'watch_history_api', sync_movies.watch_history_api)
+movies_blueprint.add_url_rule('/api/watch', 'watch_api', sync_movies.watch_api, methods=['POST'])
+
+MOVIES_PER_PAGE = 3
+
+
+def run(coroutine):
+    return current_app.extensions['event_loop'].run(coroutine)
+
+
+def int_argument(name, default):
+    value = request.args.get(name)
+    return default if value is None else int(value)
+
+
+async def read_sidebar(repo):
+    """ Returns the featured movies and the genre names shown beside every page. """
+    return await asyncio.gather(utilities_services.get_random_movies(3, repo), utilities_services.get_genre_names(repo))
+
+
+async def read_movies_by_rank(rank_list, repo):
+    # The movies, their reviews and the sidebar don't depend on each other, so read them concurrently.
+    movies, reviews, (featured_movies, genre_names) = await asyncio.gather(
+        services.get_movies_by_rank(rank_list, repo),
+        services.get_reviews_for_movies(rank_list, repo),
+        read_sidebar(repo)
+    )
+    return movies, reviews, featured_movies, genre_names
+
+
+async def read_movies_by_genre(genre_name, cursor, repo):
+    async def read_movies():
+        movie_ranks = await services.get_movie_ranks_for_genre(genre_name, repo)
+        page_ranks = movie_ranks[cursor:cursor + MOVIES_PER_PAGE]
+        movies, reviews = await asyncio.gather(services.get_movies_by_rank(page_ranks, repo),
+                                               services.get_reviews_for_movies(page_ranks, repo))
+        return movie_ranks, movies, reviews
+
+    (movie_ranks, movies, reviews), (featured_movies, genre_names) = await asyncio.gather(
+        read_movies(), read_sidebar(repo))
+    return movie_ranks, movies, reviews, featured_movies, genre_names
+
+
+def navigation_urls(endpoint, cursor, number_of_movies, **arguments):
+    """ Returns the URLs of the first, last, previous and next pages, or None where there is no such page. """
+    first_movie_url = last_movie_url = prev_movie_url = next_movie_url = None
+
+    if cursor > 0:
+        prev_movie_url = url_for(endpoint, **arguments, cursor=cursor - MOVIES_PER_PAGE)
+        first_movie_url = url_for(endpoint, **arguments)
+
+    if cursor + MOVIES_PER_PAGE < number_of_movies:
+        next_movie_url = url_for(endpoint, **arguments, cursor=cursor + MOVIES_PER_PAGE)
+        last_cursor = MOVIES_PER_PAGE * int(number_of_movies / MOVIES_PER_PAGE)
+        if number_of_movies % MOVIES_PER_PAGE == 0:
+            last_cursor -= MOVIES_PER_PAGE
+        last_movie_url = url_for(endpoint, **arguments, cursor=last_cursor)
+    return first_movie_url, last_movie_url, prev_movie_url, next_movie_url
+
+
+def render_movies(movies_title, movies, featured_movies, genre_names, urls, movie_to_show_reviews):
+    first_movie_url, last_movie_url, prev_movie_url, next_movie_url = urls
+    return render_template(
+        'movies/movies.html',
+        title='Movies',
+        movies_title=movies_title,
+        movies=movies,
+        featured_movies=utilities.add_featured_movie_links(featured_movies),
+        genre_urls=utilities.genre_urls_for(genre_names),
+        first_movie_url=first_movie_url,
+        last_movie_url=last_movie_url,
+        prev_movie_url=prev_movie_url,
+        next_movie_url=next_movie_url,
+        show_reviews_for_movie=movie_to_show_reviews
+    )
+
+
+@movies_blueprint.route('/movies_by_rank', methods=['GET'])
+def movies_by_rank():
+    cursor = int_argument('cursor', 0)
+    movie_to_show_reviews = int_argument('view_reviews_for', 0)
+    movie_ranks = list(range(1, 1001))
+
+    movies, reviews, featured_movies, genre_names = run(
+        read_movies_by_rank(movie_ranks[cursor:cursor + MOVIES_PER_PAGE], async_repo.async_repo_instance))
+
+    # Construct urls for viewing movie reviews and adding reviews.
+    movies = [for_page(movie,
+                       view_review_url=url_for('movies_bp.movies_by_rank', cursor=cursor,
+                                               view_reviews_for=movie['rank']),
+                       add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                       reviews=reviews[movie['rank']])
+              for movie in movies]
+
+    urls = navigation_urls('movies_bp.movies_by_rank', cursor, len(movie_ranks))
+    return render_movies('Ranked Movies', movies, featured_movies, genre_names, urls, movie_to_show_reviews)
+
+
+@movies_blueprint.route('/movies_by_genre', methods=['GET'])
+def movies_by_genre():
+    genre_name = request.args.get('genre')
+    cursor = int_argument('cursor', 0)
+    movie_to_show_reviews = int_argument('view_reviews_for', 0)
+
+    movie_ranks, movies, reviews, featured_movies, genre_names = run(
+        read_movies_by_genre(genre_name, cursor, async_repo.async_repo_instance))
+
+    # Construct urls for viewing movie reviews and adding reviews.
+    movies = [for_page(movie,
+                       view_review_url=url_for('movies_bp.movies_by_genre', genre=genre_name, cursor=cursor,
+                                               view_reviews_for=movie['rank']),
+                       add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                       reviews=reviews[movie['rank']])
+              for movie in movies]
+
+    urls = navigation_urls('movies_bp.movies_by_genre', cursor, len(movie_ranks), genre=genre_name)
+    return render_movies('Movies with genre ' + genre_name, movies, featured_movies, genre_names, urls,
+                         movie_to_show_reviews)
+
+
+@movies_blueprint.route('/movie_after_review', methods=['GET'])
+def movie_after_review():
+    movie_to_show_reviews = int_argument('view_reviews_for', 0)
+    movie_rank = int_argument('movie_rank', 0)
+
+    movies, reviews, featured_movies, genre_names = run(
+        read_movies_by_rank([movie_rank], async_repo.async_repo_instance))
+    if len(movies) == 0:
+        raise services.NonExistentMovieException
+
+    movie = movies[0]
+    movie = for_page(movie,
+                     view_review_url=url_for('movies_bp.movie_after_review', view_reviews_for=movie['rank'],
+                                             movie_rank=movie['rank']),
+                     add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                     reviews=reviews[movie['rank']])
+
+    return render_movies('Thank you for reviewing!', [movie], featured_movies, genre_names, (None, None, None, None),
+                         movie_to_show_reviews)
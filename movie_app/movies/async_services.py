@@ -0,0 +1,63 @@
+import asyncio
+from movie_app.adapters.async_repository import AsyncAbstractRepository
+from movie_app.domain.model import Review
+from movie_app.movies.services import NonExistentMovieException, UnknownUserException, reviews_to_dict
+from movie_app.movies.view_models import movie_view, movie_views_for
+
+
+async def add_review(movie_rank: int, review_text: str, rating: int, username: str, repo: AsyncAbstractRepository):
+    # Check that the movie and the user exist.
+    movie, user = await asyncio.gather(repo.get_movie(movie_rank), repo.get_user(username))
+    if movie is None:
+        raise NonExistentMovieException
+    if user is None:
+        raise UnknownUserException
+
+    # Create review.
+    review = Review(movie, review_text, rating)
+
+    # Update the repository.
+    await repo.add_review(review)
+
+
+async def get_movie(movie_rank: int, repo: AsyncAbstractRepository):
+    movie = await repo.get_movie(movie_rank)
+    if movie is None:
+        raise NonExistentMovieException
+    return movie_view(movie)
+
+
+async def get_first_movie(repo: AsyncAbstractRepository):
+    movie = await repo.get_first_movie()
+    return movie_view(movie)
+
+
+async def get_last_movie(repo: AsyncAbstractRepository):
+    movie = await repo.get_last_movie()
+    return movie_view(movie)
+
+
+async def get_movie_ranks_for_genre(genre_name: str, repo: AsyncAbstractRepository):
+    movie_ranks = await repo.get_movie_ranks_for_genre(genre_name)
+    return movie_ranks
+
+
+async def get_movies_by_rank(rank_list, repo: AsyncAbstractRepository):
+    movies = await repo.get_movies_by_rank(rank_list)
+    return movie_views_for(movies)
+
+
+async def get_reviews_for_movie(movie_rank, repo: AsyncAbstractRepository):
+    movie, reviews = await asyncio.gather(repo.get_movie(movie_rank), repo.get_reviews_for_movies([movie_rank]))
+    if movie is None:
+        raise NonExistentMovieException
+    return reviews_to_dict(reviews)
+
+
+async def get_reviews_for_movies(rank_list, repo: AsyncAbstractRepository):
+    """ Returns a dict mapping each rank in rank_list to the reviews of that movie, in dict form. """
+    reviews = await repo.get_reviews_for_movies(rank_list)
+    reviews_by_rank = {rank: list() for rank in rank_list}
+    for review in reviews_to_dict(reviews):
+        reviews_by_rank[review['movie_rank']].append(review)
+    return reviews_by_rank
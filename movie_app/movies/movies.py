@@ -1,6 +1,5 @@
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session
-from better_profanity import profanity
+from flask import request, render_template, redirect, url_for, session, jsonify
 from flask_wtf import FlaskForm
 from wtforms import TextAreaField, HiddenField, SubmitField, IntegerField
 from wtforms.validators import DataRequired, Length, ValidationError, NumberRange
@@ -8,10 +7,17 @@ from movie_app.authentication.authentication import login_required
 import movie_app.adapters.repository as repo
 import movie_app.utilities.utilities as utilities
 import movie_app.movies.services as services
+from movie_app.movies.view_models import for_page
 
 # Configure Blueprint.
 movies_blueprint = Blueprint('movies_bp', __name__)
 
+# The most movies of a filmography returned by one API call.
+MAX_FILMOGRAPHY_MOVIES = 100
+
+# The most watches of a watch history returned by one API call.
+MAX_WATCH_HISTORY = 100
+
 
 @movies_blueprint.route('/movies_by_rank', methods=['GET'])
 def movies_by_rank():
@@ -58,10 +64,12 @@ def movies_by_rank():
         last_movie_url = url_for('movies_bp.movies_by_rank', cursor=last_cursor)
 
     # Construct urls for viewing movie reviews and adding reviews.
-    for movie in movies:
-        movie['view_review_url'] = url_for('movies_bp.movies_by_rank', cursor=cursor, view_reviews_for=movie['rank'])
-        movie['add_review_url'] = url_for('movies_bp.review_on_movie', movie=movie['rank'])
-        movie['reviews'] = services.get_reviews_for_movie(movie['rank'], repo.repo_instance)
+    movies = [for_page(movie,
+                       view_review_url=url_for('movies_bp.movies_by_rank', cursor=cursor,
+                                               view_reviews_for=movie['rank']),
+                       add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                       reviews=services.get_reviews_for_movie(movie['rank'], repo.repo_instance))
+              for movie in movies]
 
     # Generate the webpage to display the movies.
     return render_template(
@@ -125,11 +133,12 @@ def movies_by_genre():
         last_movie_url = url_for('movies_bp.movies_by_genre', genre=genre_name, cursor=last_cursor)
 
     # Construct urls for viewing movie reviews and adding reviews.
-    for movie in movies:
-        movie['view_review_url'] = url_for('movies_bp.movies_by_genre', genre=genre_name, cursor=cursor,
-                                           view_reviews_for=movie['rank'])
-        movie['add_review_url'] = url_for('movies_bp.review_on_movie', movie=movie['rank'])
-        movie['reviews'] = services.get_reviews_for_movie(movie['rank'], repo.repo_instance)
+    movies = [for_page(movie,
+                       view_review_url=url_for('movies_bp.movies_by_genre', genre=genre_name, cursor=cursor,
+                                               view_reviews_for=movie['rank']),
+                       add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                       reviews=services.get_reviews_for_movie(movie['rank'], repo.repo_instance))
+              for movie in movies]
 
     # Generate the webpage to display the movies.
     return render_template(
@@ -147,6 +156,235 @@ def movies_by_genre():
     )
 
 
+@movies_blueprint.route('/movies_by_facets', methods=['GET'])
+def movies_by_facets():
+    movies_per_page = 3
+
+    # Read query parameters: the selected genres, decade, director and rating band, and the page.
+    genre_names = request.args.getlist('genre')
+    decade = request.args.get('decade', type=int)
+    director_name = request.args.get('director') or None
+    rating_band = request.args.get('rating', type=int)
+    cursor = request.args.get('cursor', 0, type=int)
+    movie_to_show_reviews = request.args.get('view_reviews_for', 0, type=int)
+
+    def facets_url(**changes):
+        selection = dict(genre=genre_names, decade=decade, director=director_name, rating=rating_band)
+        selection.update(changes)
+        return url_for('movies_bp.movies_by_facets', **selection)
+
+    # Retrieve the page of matching movies and the counts of the facet values.
+    facets = services.get_movie_facets(genre_names, decade, director_name, rating_band, cursor, movies_per_page,
+                                       repo.repo_instance)
+    number_of_movies = facets['number_of_movies']
+    movies = services.get_movies_by_rank(facets['ranks'], repo.repo_instance)
+    first_movie_url = None
+    last_movie_url = None
+    next_movie_url = None
+    prev_movie_url = None
+
+    if cursor > 0:
+        # There are preceding movies, so generate URLs for the 'previous' and 'first' navigation buttons.
+        prev_movie_url = facets_url(cursor=cursor - movies_per_page)
+        first_movie_url = facets_url()
+
+    if cursor + movies_per_page < number_of_movies:
+        # There are further movies, so generate URLs for the 'next' and 'last' navigation buttons.
+        next_movie_url = facets_url(cursor=cursor + movies_per_page)
+        last_cursor = movies_per_page * int(number_of_movies / movies_per_page)
+        if number_of_movies % movies_per_page == 0:
+            last_cursor -= movies_per_page
+        last_movie_url = facets_url(cursor=last_cursor)
+
+    # Construct urls that select or deselect each facet value, going back to the first page.
+    facet_links = [
+        ('Genres', [facet_link(name, count, name in genre_names,
+                               facets_url(genre=[genre for genre in genre_names if genre != name]
+                                          if name in genre_names else genre_names + [name]))
+                    for name, count in facets['genres']]),
+        ('Decades', [facet_link(f'{value}s', count, value == decade,
+                                facets_url(decade=None if value == decade else value))
+                     for value, count in facets['decades']]),
+        ('Rating', [facet_link(f'{value}.0 - {value}.9', count, value == rating_band,
+                               facets_url(rating=None if value == rating_band else value))
+                    for value, count in facets['rating_bands']]),
+        ('Directors', [facet_link(name, count, name == director_name,
+                                  facets_url(director=None if name == director_name else name))
+                       for name, count in facets['directors']])
+    ]
+
+    # Construct urls for viewing movie reviews and adding reviews.
+    movies = [for_page(movie,
+                       view_review_url=facets_url(cursor=cursor, view_reviews_for=movie['rank']),
+                       add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                       reviews=services.get_reviews_for_movie(movie['rank'], repo.repo_instance))
+              for movie in movies]
+
+    # Generate the webpage to display the movies.
+    return render_template(
+        'movies/movies.html',
+        title='Movies',
+        movies_title=f'{number_of_movies} matching movies',
+        movies=movies,
+        facets=facet_links,
+        featured_movies=utilities.get_featured_movies(3),
+        genre_urls=utilities.get_genres_and_urls(),
+        first_movie_url=first_movie_url,
+        last_movie_url=last_movie_url,
+        prev_movie_url=prev_movie_url,
+        next_movie_url=next_movie_url,
+        show_reviews_for_movie=movie_to_show_reviews
+    )
+
+
+def facet_link(label, count, selected, url):
+    return {'label': label, 'count': count, 'selected': selected, 'url': url}
+
+
+@movies_blueprint.route('/suggest', methods=['GET'])
+def suggest():
+    # Read query parameters: what has been typed so far, and how many suggestions to return.
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+
+    suggestions = services.get_suggestions(prefix, limit, repo.repo_instance)
+    for suggestion in suggestions:
+        suggestion['url'] = suggestion_url(suggestion)
+    return jsonify(suggestions)
+
+
+def suggestion_url(suggestion):
+    if suggestion['kind'] == 'movie':
+        # The ranked movies page, starting with the movie.
+        return url_for('movies_bp.movies_by_rank', cursor=suggestion['rank'] - 1)
+    # The director's or actor's filmography.
+    return url_for('movies_bp.filmography', kind=suggestion['kind'], name=suggestion['name'])
+
+
+# The title of each kind of person's filmography page, and the label of each order it can be sorted in.
+FILMOGRAPHY_TITLES = {'director': 'Movies directed by {}', 'actor': 'Movies starring {}'}
+FILMOGRAPHY_SORT_LABELS = {'year': 'Newest first', 'rating': 'Best rated first'}
+
+
+@movies_blueprint.route('/filmography/<any(director, actor):kind>', methods=['GET'])
+def filmography(kind):
+    movies_per_page = 3
+
+    # Read query parameters: the person's name, the order of their movies, and the page.
+    name = request.args.get('name', '')
+    sort = request.args.get('sort')
+    cursor = request.args.get('cursor', 0, type=int)
+    movie_to_show_reviews = request.args.get('view_reviews_for', 0, type=int)
+
+    filmography = services.get_filmography(kind, name, sort, cursor, movies_per_page, repo.repo_instance)
+    sort = filmography['sort']
+    number_of_movies = filmography['number_of_movies']
+    movies = in_order(services.get_movies_by_rank(filmography['ranks'], repo.repo_instance), filmography['ranks'])
+
+    def filmography_url(**changes):
+        arguments = dict(kind=kind, name=name, sort=sort)
+        arguments.update(changes)
+        return url_for('movies_bp.filmography', **arguments)
+
+    first_movie_url = None
+    last_movie_url = None
+    next_movie_url = None
+    prev_movie_url = None
+
+    if cursor > 0:
+        # There are preceding movies, so generate URLs for the 'previous' and 'first' navigation buttons.
+        prev_movie_url = filmography_url(cursor=cursor - movies_per_page)
+        first_movie_url = filmography_url()
+
+    if cursor + movies_per_page < number_of_movies:
+        # There are further movies, so generate URLs for the 'next' and 'last' navigation buttons.
+        next_movie_url = filmography_url(cursor=cursor + movies_per_page)
+        last_cursor = movies_per_page * int(number_of_movies / movies_per_page)
+        if number_of_movies % movies_per_page == 0:
+            last_cursor -= movies_per_page
+        last_movie_url = filmography_url(cursor=last_cursor)
+
+    # Construct urls that sort the movies in each order, going back to the first page.
+    sort_links = [{'label': label, 'selected': value == sort, 'url': filmography_url(sort=value)}
+                  for value, label in FILMOGRAPHY_SORT_LABELS.items()]
+
+    # Construct urls for viewing movie reviews and adding reviews.
+    movies = [for_page(movie,
+                       view_review_url=filmography_url(cursor=cursor, view_reviews_for=movie['rank']),
+                       add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                       reviews=services.get_reviews_for_movie(movie['rank'], repo.repo_instance))
+              for movie in movies]
+
+    # Generate the webpage to display the movies.
+    return render_template(
+        'movies/movies.html',
+        title='Movies',
+        movies_title=f'{FILMOGRAPHY_TITLES[kind].format(name)} ({number_of_movies})',
+        movies=movies,
+        sorts=sort_links,
+        featured_movies=utilities.get_featured_movies(3),
+        genre_urls=utilities.get_genres_and_urls(),
+        first_movie_url=first_movie_url,
+        last_movie_url=last_movie_url,
+        prev_movie_url=prev_movie_url,
+        next_movie_url=next_movie_url,
+        show_reviews_for_movie=movie_to_show_reviews
+    )
+
+
+@movies_blueprint.route('/api/filmography/<any(director, actor):kind>', methods=['GET'])
+def filmography_api(kind):
+    # Read query parameters: the person's name, the order of their movies, and the page.
+    name = request.args.get('name', '')
+    sort = request.args.get('sort')
+    cursor = request.args.get('cursor', 0, type=int)
+    limit = max(0, min(request.args.get('limit', 10, type=int), MAX_FILMOGRAPHY_MOVIES))
+
+    filmography = services.get_filmography(kind, name, sort, cursor, limit, repo.repo_instance)
+    movies = in_order(services.get_movies_by_rank(filmography['ranks'], repo.repo_instance), filmography['ranks'])
+    return jsonify({
+        'kind': kind,
+        'name': name,
+        'sort': filmography['sort'],
+        'number_of_movies': filmography['number_of_movies'],
+        'movies': [{'rank': movie['rank'], 'title': movie['title'], 'release_year': movie['release_year'],
+                    'rating': movie['rating']} for movie in movies]
+    })
+
+
+def in_order(movies, rank_list):
+    # Movies are fetched by rank in no particular order; a filmography lists them in its own.
+    movies_by_rank = {movie['rank']: movie for movie in movies}
+    return [movies_by_rank[rank] for rank in rank_list if rank in movies_by_rank]
+
+
+@movies_blueprint.route('/api/watch_history', methods=['GET'])
+@login_required
+def watch_history_api():
+    # Read query parameters: the page of the logged in user's history, the most recent watches first.
+    cursor = request.args.get('cursor', 0, type=int)
+    limit = max(0, min(request.args.get('limit', 10, type=int), MAX_WATCH_HISTORY))
+
+    username = session['username']
+    watches = services.get_watch_history(username, cursor, limit, repo.repo_instance)
+    return jsonify({
+        'totals': services.get_watch_totals(username, repo.repo_instance),
+        'watches': [{'movie_rank': watch['movie_rank'], 'watched_at': watch['watched_at'].isoformat()}
+                    for watch in watches]
+    })
+
+
+@movies_blueprint.route('/api/watch', methods=['POST'])
+@login_required
+def watch_api():
+    username = session['username']
+    try:
+        services.watch_movie(request.form.get('movie', 0, type=int), username, repo.repo_instance)
+    except services.NonExistentMovieException:
+        return jsonify({'error': 'There is no such movie'}), 404
+    return jsonify(services.get_watch_totals(username, repo.repo_instance))
+
+
 @movies_blueprint.route('/movie_after_review', methods=['GET'])
 def movie_after_review():
     # Read query parameters.
@@ -171,10 +409,11 @@ def movie_after_review():
     movie = services.get_movie(movie_rank, repo.repo_instance)
 
     # Construct urls for viewing movie reviews and adding reviews.
-    movie['view_review_url'] = url_for('movies_bp.movie_after_review', view_reviews_for=movie['rank'],
-                                       movie_rank=movie['rank'])
-    movie['add_review_url'] = url_for('movies_bp.review_on_movie', movie=movie['rank'])
-    movie['reviews'] = services.get_reviews_for_movie(movie['rank'], repo.repo_instance)
+    movie = for_page(movie,
+                     view_review_url=url_for('movies_bp.movie_after_review', view_reviews_for=movie['rank'],
+                                             movie_rank=movie['rank']),
+                     add_review_url=url_for('movies_bp.review_on_movie', movie=movie['rank']),
+                     reviews=services.get_reviews_for_movie(movie['rank'], repo.repo_instance))
     movies = [movie]
     first_movie_url = None
     last_movie_url = None
@@ -254,6 +493,8 @@ class ProfanityFree:
         self.message = message
 
     def __call__(self, form, field):
+        # Importing better_profanity loads its wordlist, so it is left until a review is first posted.
+        from better_profanity import profanity
         if profanity.contains_profanity(field.data):
             raise ValidationError(self.message)
 
@@ -1,6 +1,18 @@
 from typing import List, Iterable
-from movie_app.adapters.repository import AbstractRepository
-from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList
+from movie_app.adapters.repository import AbstractRepository, FacetFilter, MovieFacets, Suggestion, Filmography, \
+    FILMOGRAPHY_SORTS, Watch, WatchTotals
+from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList, MovieWatchingSimulation
+from movie_app.movies.view_models import movie_view, movie_views_for
+
+
+# The number of directors listed when browsing by facets, those with the most matching movies first.
+DIRECTORS_PER_FACET = 15
+
+# The most suggestions returned for what has been typed into the search box.
+MAX_SUGGESTIONS = 20
+
+# The kinds of people with a filmography.
+FILMOGRAPHY_KINDS = ('director', 'actor')
 
 
 class NonExistentMovieException(Exception):
@@ -27,21 +39,66 @@ def add_review(movie_rank: int, review_text: str, rating: int, username: str, re
     repo.add_review(review)
 
 
+def watch_movie(movie_rank: int, username: str, repo: AbstractRepository):
+    # Check that the movie and the user exist.
+    movie = repo.get_movie(movie_rank)
+    if movie is None:
+        raise NonExistentMovieException
+    user = repo.get_user(username)
+    if user is None:
+        raise UnknownUserException
+
+    # Update the repository, which adds to the user's watch totals.
+    repo.add_watch(user, movie)
+
+
+def watch_together(simulation: MovieWatchingSimulation, repo: AbstractRepository):
+    # The members who haven't watched the movie in this session yet all watch it, recorded in one transaction.
+    users = simulation.members_yet_to_watch()
+    repo.add_watches(users, simulation.movie_to_watch)
+    simulation.mark_watched(users)
+    return len(users)
+
+
+def review_together(simulation: MovieWatchingSimulation, review_text: str, rating: int, repo: AbstractRepository):
+    # Every member is given their own copy of the review, and the copies are added in one transaction.
+    review = Review(simulation.movie_to_watch, review_text, rating)
+    member_reviews = simulation.write_review_for_everyone(review)
+    repo.add_reviews(member_reviews)
+    return len(member_reviews)
+
+
+def get_watch_history(username: str, cursor: int, limit: int, repo: AbstractRepository):
+    user = repo.get_user(username)
+    if user is None:
+        raise UnknownUserException
+    watches = repo.get_watch_history(user, max(0, cursor), limit)
+    return watches_to_dict(watches)
+
+
+def get_watch_totals(username: str, repo: AbstractRepository):
+    # The totals are kept up to date as movies are watched, so the history isn't read.
+    user = repo.get_user(username)
+    if user is None:
+        raise UnknownUserException
+    return watch_totals_to_dict(repo.get_watch_totals(user))
+
+
 def get_movie(movie_rank: int, repo: AbstractRepository):
     movie = repo.get_movie(movie_rank)
     if movie is None:
         raise NonExistentMovieException
-    return movie_to_dict(movie)
+    return movie_view(movie)
 
 
 def get_first_movie(repo: AbstractRepository):
     movie = repo.get_first_movie()
-    return movie_to_dict(movie)
+    return movie_view(movie)
 
 
 def get_last_movie(repo: AbstractRepository):
     movie = repo.get_last_movie()
-    return movie_to_dict(movie)
+    return movie_view(movie)
 
 
 def get_movie_ranks_for_genre(genre_name: str, repo: AbstractRepository):
@@ -49,10 +106,34 @@ def get_movie_ranks_for_genre(genre_name: str, repo: AbstractRepository):
     return movie_ranks
 
 
+def get_movie_facets(genre_names, decade, director_name, rating_band, cursor, limit, repo: AbstractRepository):
+    facet_filter = FacetFilter(tuple(sorted(set(genre_names))), decade, director_name, rating_band)
+    facets = repo.get_movie_facets(facet_filter, cursor, limit)
+    return facets_to_dict(facets)
+
+
+def get_suggestions(prefix: str, limit: int, repo: AbstractRepository):
+    limit = max(0, min(limit, MAX_SUGGESTIONS))
+    suggestions = repo.get_suggestions(prefix, limit)
+    if not suggestions:
+        # No name has a word starting with what has been typed, which may have a typo, so suggest names close to it.
+        suggestions = repo.get_fuzzy_matches(prefix, limit)
+    return suggestions_to_dict(suggestions)
+
+
+def get_filmography(kind: str, name: str, sort: str, cursor: int, limit: int, repo: AbstractRepository):
+    if kind not in FILMOGRAPHY_KINDS:
+        raise ValueError(f'{kind} is not a kind of person with a filmography')
+    # An unknown order, e.g. from an edited URL, falls back to the default one.
+    if sort not in FILMOGRAPHY_SORTS:
+        sort = FILMOGRAPHY_SORTS[0]
+    filmography = repo.get_filmography(kind, name, sort, max(0, cursor), limit)
+    return filmography_to_dict(filmography, sort)
+
+
 def get_movies_by_rank(rank_list, repo: AbstractRepository):
     movies = repo.get_movies_by_rank(rank_list)
-    movies_as_dict = movies_to_dict(movies)
-    return movies_as_dict
+    return movie_views_for(movies)
 
 
 def get_reviews_for_movie(movie_rank, repo: AbstractRepository):
@@ -92,6 +173,65 @@ def movies_to_dict(movies: Iterable[Movie]):
     return [movie_to_dict(movie) for movie in movies]
 
 
+def facets_to_dict(facets: MovieFacets):
+    # Facet values are listed as (value, number of movies) pairs.
+    directors = sorted(facets.directors.items(), key=lambda item: (-item[1], item[0]))[:DIRECTORS_PER_FACET]
+    facets_dict = {
+        'number_of_movies': facets.number_of_movies,
+        'ranks': facets.ranks,
+        'genres': sorted(facets.genres.items()),
+        'decades': sorted(facets.decades.items()),
+        'directors': directors,
+        'rating_bands': sorted(facets.rating_bands.items(), reverse=True)
+    }
+    return facets_dict
+
+
+def suggestion_to_dict(suggestion: Suggestion):
+    suggestion_dict = {
+        'kind': suggestion.kind,
+        'name': suggestion.name,
+        'rank': suggestion.rank,
+        'votes': suggestion.votes
+    }
+    return suggestion_dict
+
+
+def suggestions_to_dict(suggestions: Iterable[Suggestion]):
+    return [suggestion_to_dict(suggestion) for suggestion in suggestions]
+
+
+def filmography_to_dict(filmography: Filmography, sort: str):
+    filmography_dict = {
+        'number_of_movies': filmography.number_of_movies,
+        'ranks': filmography.ranks,
+        'sort': sort
+    }
+    return filmography_dict
+
+
+def watch_to_dict(watch: Watch):
+    watch_dict = {
+        'movie_rank': watch.rank,
+        'watched_at': watch.watched_at
+    }
+    return watch_dict
+
+
+def watches_to_dict(watches: Iterable[Watch]):
+    return [watch_to_dict(watch) for watch in watches]
+
+
+def watch_totals_to_dict(totals: WatchTotals):
+    # Genres are listed as (genre name, minutes) pairs, the most watched first.
+    totals_dict = {
+        'movies_watched': totals.movies_watched,
+        'minutes': totals.minutes,
+        'genre_minutes': sorted(totals.genre_minutes.items(), key=lambda item: (-item[1], item[0]))
+    }
+    return totals_dict
+
+
 def review_to_dict(review: Review):
     review_dict = {
         'movie_rank': review.movie.rank,
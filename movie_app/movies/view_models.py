@@ -0,0 +1,93 @@
+from collections import ChainMap
+from time import monotonic
+from types import MappingProxyType
+from typing import Iterable, Mapping
+from movie_app.domain.model import Movie
+
+
+def build_movie_view(movie: Movie) -> Mapping:
+    """ Returns the read-only view model of movie: the mapping movies.services.movie_to_dict builds, with
+    read-only sub-mappings and tuples in place of dicts and lists, so that it can be shared between requests.
+    """
+    return MappingProxyType({
+        'rank': movie.rank,
+        'title': movie.title,
+        'release_year': movie.release_year,
+        'description': movie.description,
+        'director': MappingProxyType({'director_name': movie.director.director_full_name}),
+        'actors': tuple(MappingProxyType({'actor_name': actor.actor_full_name}) for actor in movie.actors),
+        'genres': tuple(MappingProxyType({'genre_name': genre.genre_name}) for genre in movie.genres),
+        'runtime_minutes': movie.runtime_minutes,
+        'rating': movie.rating,
+        'votes': movie.votes,
+        'revenue': movie.revenue,
+        'metascore': movie.metascore
+    })
+
+
+class MovieViewCache:
+    """ Builds each movie's view model once and shares it between requests, keyed by rank.
+
+    Whatever changes a movie must invalidate its view model. As a safeguard, a view model is also rebuilt when the
+    movie with its rank has a different title or release year, and after ttl seconds if ttl is set. Lookups are
+    on the path of every movie shown, so they take no lock: replacing a dict entry is atomic, and when two threads
+    build the same view model at once, either result is correct.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 0, clock=monotonic):
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__clock = clock
+        # Maps each rank to (title, release year, expiry time, view model), oldest first.
+        self.__views = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, movie: Movie) -> Mapping:
+        entry = self.__views.get(movie.rank)
+        if entry is not None and entry[0] == movie.title and entry[1] == movie.release_year \
+                and (entry[2] is None or entry[2] > self.__clock()):
+            self.hits += 1
+            return entry[3]
+
+        self.misses += 1
+        view = build_movie_view(movie)
+        if self.__max_entries > 0:
+            expires = self.__clock() + self.__ttl if self.__ttl else None
+            self.__views[movie.rank] = (movie.title, movie.release_year, expires, view)
+            while len(self.__views) > self.__max_entries:
+                # Evict the view model that was built first.
+                try:
+                    self.__views.pop(next(iter(self.__views)), None)
+                except (RuntimeError, StopIteration):   # Another thread changed the dict; it will evict.
+                    break
+        return view
+
+    def invalidate(self, rank: int):
+        self.__views.pop(rank, None)
+
+    def clear(self):
+        self.__views.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self.__views), 'max_entries': self.__max_entries, 'hits': self.hits,
+                'misses': self.misses}
+
+
+# Set up by create_app from the MOVIE_VIEW_CACHE_* configuration.
+movie_views = MovieViewCache()
+
+
+def movie_view(movie: Movie) -> Mapping:
+    return movie_views.get(movie)
+
+
+def movie_views_for(movies: Iterable[Movie]):
+    return [movie_views.get(movie) for movie in movies]
+
+
+def for_page(view: Mapping, **page_values) -> Mapping:
+    """ Returns a mapping with the values of view plus page_values (e.g. the URLs and reviews a page adds to a
+    movie), without copying or changing the shared view.
+    """
+    return ChainMap(page_values, view)
@@ -0,0 +1,46 @@
+// Fills the search box's list with suggestions from /suggest as the user types, and opens the page of the
+// chosen movie or director.
+(function () {
+  var form = document.getElementById('search-form');
+  if (!form) {
+    return;
+  }
+  var input = form.querySelector('input');
+  var list = document.getElementById('search-suggestions');
+  var urls = {};
+  var latest = 0;
+
+  input.addEventListener('input', function () {
+    var request = ++latest;
+    if (!input.value.trim()) {
+      list.innerHTML = '';
+      return;
+    }
+    fetch(form.dataset.suggestUrl + '?q=' + encodeURIComponent(input.value))
+      .then(function (response) { return response.json(); })
+      .then(function (suggestions) {
+        if (request !== latest) {
+          return;   // A later keystroke has asked for newer suggestions.
+        }
+        list.innerHTML = '';
+        urls = {};
+        suggestions.forEach(function (suggestion) {
+          if (suggestion.url) {
+            var option = document.createElement('option');
+            option.value = suggestion.name;
+            option.label = suggestion.kind;
+            list.appendChild(option);
+            urls[suggestion.name] = urls[suggestion.name] || suggestion.url;
+          }
+        });
+      });
+  });
+
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    var url = urls[input.value] || list.options.length && urls[list.options[0].value];
+    if (url) {
+      window.location = url;
+    }
+  });
+})();
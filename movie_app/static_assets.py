@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import click
+from flask import request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:     # Brotli is optional: without it only gzip variants are produced and served.
+    brotli = None
+
+# Static URLs carry the first 12 hex digits of the file's SHA-256, e.g. css/main.3f2a1b9c0d4e.css.
+FINGERPRINT_LENGTH = 12
+FINGERPRINTED_NAME = re.compile(r'^(?P<stem>.+)\.(?P<fingerprint>[0-9a-f]{%d})(?P<extension>\.[^./]+)$'
+                                % FINGERPRINT_LENGTH)
+
+# Fingerprinted URLs change whenever the content does, so browsers may cache them for a year without revalidating.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.html', '.txt', '.json')
+
+# Precompressed variants in order of preference, as (encoding, file suffix).
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAssets:
+    """ Fingerprints static URLs and serves static files with far-future caching and precompressed variants. """
+
+    def __init__(self, static_folder: str):
+        self.__static_folder = static_folder
+        self.__fingerprints = dict()
+        self.__lock = threading.Lock()
+
+    def fingerprint(self, filename: str):
+        """ Returns the content fingerprint of filename, or None if there is no such static file. """
+        path = safe_join(self.__static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self.__fingerprints.get(filename)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with open(path, mode='rb') as static_file:
+            for block in iter(lambda: static_file.read(65536), b''):
+                digest.update(block)
+        fingerprint = digest.hexdigest()[:FINGERPRINT_LENGTH]
+        with self.__lock:
+            self.__fingerprints[filename] = (version, fingerprint)
+        return fingerprint
+
+    def fingerprinted_name(self, filename: str) -> str:
+        fingerprint = self.fingerprint(filename)
+        if fingerprint is None:
+            return filename
+        stem, extension = os.path.splitext(filename)
+        return f'{stem}.{fingerprint}{extension}'
+
+    def add_fingerprint(self, endpoint, values):
+        # url_defaults callback: url_for('static', filename='css/main.css') yields the fingerprinted name.
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.fingerprinted_name(values['filename'])
+
+    def send_static_file(self, filename):
+        # Replaces Flask's static view.
+        immutable = False
+        match = FINGERPRINTED_NAME.match(filename)
+        if match is not None and not os.path.isfile(safe_join(self.__static_folder, filename) or ''):
+            filename = match.group('stem') + match.group('extension')
+            # A stale fingerprint still gets the current file, but mustn't be cached forever.
+            immutable = self.fingerprint(filename) == match.group('fingerprint')
+
+        path = safe_join(self.__static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        encoding, served_name = self.__choose_variant(filename, path)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(self.__static_folder, served_name, mimetype=mimetype, conditional=True)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+            response.vary.add('Accept-Encoding')
+        if immutable:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    def __choose_variant(self, filename, path):
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] > 0:
+                variant_path = path + suffix
+                # Ignore variants left over from an older version of the file.
+                if os.path.isfile(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(path):
+                    return encoding, filename + suffix
+        return None, filename
+
+
+def compress_static_files(static_folder: str):
+    """ Writes .gz (and, if brotli is installed, .br) variants of every compressible static file.
+    Returns the list of variants written.
+    """
+    written = list()
+    for directory, _, filenames in os.walk(static_folder):
+        for filename in filenames:
+            if os.path.splitext(filename)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(directory, filename)
+            with open(path, mode='rb') as static_file:
+                content = static_file.read()
+
+            variants = [(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append((path + '.br', brotli.compress(content)))
+            for variant_path, compressed in variants:
+                # Only keep variants that are actually smaller than the original.
+                if len(compressed) < len(content):
+                    with open(variant_path, mode='wb') as variant_file:
+                        variant_file.write(compressed)
+                    written.append(variant_path)
+    return written
+
+
+def gzip_response(response, min_size: int):
+    """ after_request callback body: gzips HTML responses of at least min_size bytes for clients accepting gzip. """
+    if response.mimetype != 'text/html' or response.direct_passthrough or response.is_streamed \
+            or response.status_code < 200 \
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] <= 0:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def init_app(app):
+    static_assets = StaticAssets(app.static_folder)
+    app.extensions['static_assets'] = static_assets
+
+    if app.config.get('STATIC_FINGERPRINTING', True):
+        app.url_defaults(static_assets.add_fingerprint)
+    app.view_functions['static'] = static_assets.send_static_file
+
+    html_gzip_min_size = int(app.config.get('HTML_GZIP_MIN_SIZE', 1024))
+    if html_gzip_min_size >= 0:
+        @app.after_request
+        def compress_html_response(response):
+            return gzip_response(response, html_gzip_min_size)
+
+    @app.cli.command('compress-static')
+    def compress_static_command():
+        """ Precompress static files (gzip, and brotli when installed). """
+        for variant_path in compress_static_files(app.static_folder):
+            click.echo(variant_path)
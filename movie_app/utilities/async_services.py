@@ -0,0 +1,21 @@
+import random
+from movie_app.adapters.async_repository import AsyncAbstractRepository
+from movie_app.movies.view_models import movie_views_for
+
+
+async def get_genre_names(repo: AsyncAbstractRepository):
+    genres = await repo.get_genres()
+    genre_names = [genre.genre_name for genre in genres]
+    return genre_names
+
+
+async def get_random_movies(quantity, repo: AsyncAbstractRepository):
+    movie_count = await repo.get_number_of_movies()
+    if quantity >= movie_count:
+        # Reduce quantity of ranks to generate if repo has insufficient number of movies.
+        quantity = movie_count - 1
+
+    # Pick distinct and random movies.
+    random_ranks = random.sample(range(1, movie_count), quantity)
+    movies = await repo.get_movies_by_rank(random_ranks)
+    return movie_views_for(movies)
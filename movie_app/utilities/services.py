@@ -1,6 +1,5 @@
-from typing import Iterable
 from movie_app.adapters.repository import AbstractRepository
-from movie_app.domain.model import Movie
+from movie_app.movies.view_models import movie_views_for
 import random
 
 
@@ -19,21 +18,5 @@ def get_random_movies(quantity, repo: AbstractRepository):
     # Pick distinct and random movies.
     random_ranks = random.sample(range(1, movie_count), quantity)
     movies = repo.get_movies_by_rank(random_ranks)
-    return movies_to_dict(movies)
+    return movie_views_for(movies)
 
-
-# ============================================
-# Functions to convert model entities to dicts
-# ============================================
-def movie_to_dict(movie: Movie):
-    movie_dict = {
-        'rank': movie.rank,
-        'title': movie.title,
-        'release_year': movie.release_year,
-        'description': movie.description
-    }
-    return movie_dict
-
-
-def movies_to_dict(movies: Iterable[Movie]):
-    return [movie_to_dict(movie) for movie in movies]
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, render_template, redirect, url_for, session
 import movie_app.adapters.repository as repo
 import movie_app.utilities.services as services
+from movie_app.movies.view_models import for_page
 
 # Configure Blueprint.
 utilities_blueprint = Blueprint('utilities_bp', __name__)
@@ -8,14 +9,20 @@ utilities_blueprint = Blueprint('utilities_bp', __name__)
 
 def get_genres_and_urls():
     genre_names = services.get_genre_names(repo.repo_instance)
+    return genre_urls_for(genre_names)
+
+
+def get_featured_movies(quantity=3):
+    movies = services.get_random_movies(quantity, repo.repo_instance)
+    return add_featured_movie_links(movies)
+
+
+def genre_urls_for(genre_names):
     genre_urls = dict()
     for genre_name in genre_names:
         genre_urls[genre_name] = url_for('movies_bp.movies_by_genre', genre=genre_name)
     return genre_urls
 
 
-def get_featured_movies(quantity=3):
-    movies = services.get_random_movies(quantity, repo.repo_instance)
-    for movie in movies:
-        movie['hyperlink'] = url_for('movies_bp.movies_by_rank', rank=movie['rank'])
-    return movies
+def add_featured_movie_links(movies):
+    return [for_page(movie, hyperlink=url_for('movies_bp.movies_by_rank', rank=movie['rank'])) for movie in movies]
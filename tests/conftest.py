@@ -4,6 +4,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
 from movie_app import create_app
 from movie_app.adapters import memory_repository, database_repository
+import movie_app.adapters.async_repository as async_repo
 from movie_app.adapters.orm import metadata, map_model_to_tables
 from movie_app.adapters.memory_repository import MemoryRepository
 
@@ -13,6 +14,11 @@ TEST_DATABASE_URI_IN_MEMORY = 'sqlite://'
 TEST_DATABASE_URI_FILE = 'sqlite:///movie-test.db'
 
 
+@pytest.fixture
+def data_path():
+    return TEST_DATA_PATH
+
+
 @pytest.fixture
 def in_memory_repo():
     repo = MemoryRepository()
@@ -20,6 +26,16 @@ def in_memory_repo():
     return repo
 
 
+@pytest.fixture
+def in_memory_repo_factory():
+    # Builds freshly populated MemoryRepositories, e.g. to simulate restarting the application.
+    def make_repo():
+        repo = MemoryRepository()
+        memory_repository.populate(TEST_DATA_PATH, repo)
+        return repo
+    return make_repo
+
+
 @pytest.fixture
 def database_engine():
     engine = create_engine(TEST_DATABASE_URI_FILE)
@@ -89,6 +105,42 @@ def client():
     return my_app.test_client()
 
 
+@pytest.fixture
+def database_client():
+    my_app = create_app({
+        'TESTING': True,                                # Set to True during testing.
+        'REPOSITORY': 'database',                       # Serve the application from the database repository.
+        'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URI_FILE,
+        'SQLALCHEMY_ECHO': False,
+        'TEST_DATA_PATH': TEST_DATA_PATH,               # Path for loading test data into the repository.
+        'WTF_CSRF_ENABLED': False                       # test_client will not send a CSRF token, so disable validation.
+    })
+
+    yield my_app.test_client()
+    metadata.drop_all(create_engine(TEST_DATABASE_URI_FILE))
+    clear_mappers()
+
+
+@pytest.fixture
+def async_database_client():
+    my_app = create_app({
+        'TESTING': True,                                # Set to True during testing.
+        'REPOSITORY': 'database',                       # The async views read the database repository's file.
+        'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URI_FILE,
+        'SQLALCHEMY_ECHO': False,
+        'TEST_DATA_PATH': TEST_DATA_PATH,               # Path for loading test data into the repository.
+        'WTF_CSRF_ENABLED': False,                      # test_client will not send a CSRF token, so disable validation.
+        'ASYNC_VIEWS': True
+    })
+
+    yield my_app.test_client()
+    event_loop = my_app.extensions['event_loop']
+    event_loop.run(async_repo.async_repo_instance.close())
+    event_loop.stop()
+    metadata.drop_all(create_engine(TEST_DATABASE_URI_FILE))
+    clear_mappers()
+
+
 class AuthenticationManager:
     def __init__(self, client):
         self._client = client
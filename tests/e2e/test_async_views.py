@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+
+def test_movies_with_genre(async_database_client):
+    response = async_database_client.get('/movies_by_genre?genre=Action')
+    assert response.status_code == 200
+    assert b'Movies with genre Action' in response.data
+    assert b'Guardians of the Galaxy' in response.data
+    assert b'Suicide Squad' in response.data
+    assert b'The Great Wall' in response.data
+
+
+def test_movies_with_review(async_database_client):
+    response = async_database_client.get('/movies_by_genre?genre=Action&cursor=0&view_reviews_for=1')
+    assert response.status_code == 200
+    assert b'GOTG is my new favourite movie of all time!' in response.data
+
+
+def test_movies_by_rank_and_home(async_database_client):
+    response = async_database_client.get('/movies_by_rank?cursor=3')
+    assert response.status_code == 200
+    assert b'Ranked Movies' in response.data
+    assert b'Suicide Squad' in response.data
+    assert async_database_client.get('/').status_code == 200
+
+
+def test_review_is_shown_after_posting(async_database_client):
+    async_database_client.post('authentication/login', data={'username': 'nton939', 'password': 'nton939Password'})
+    response = async_database_client.post('/review', data={'review': 'Async wow!', 'rating': 10, 'movie_rank': 1})
+    assert response.headers['Location'] == 'http://localhost/movie_after_review?view_reviews_for=1&movie_rank=1'
+
+    response = async_database_client.get('/movie_after_review?view_reviews_for=1&movie_rank=1')
+    assert response.status_code == 200
+    assert b'Async wow!' in response.data
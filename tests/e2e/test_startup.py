@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+from movie_app import create_app
+from movie_app.metrics.instrumentation import STARTUP_PHASE_DURATION
+
+# The most seconds importing movie_app and creating a memory-backed app may take, in a fresh interpreter.
+STARTUP_BUDGET_SECONDS = 3.0
+
+# Modules that browsing must not import: they are only needed to post a review, register, or serve the async views.
+DEFERRED_MODULES = ('better_profanity', 'password_validator', 'aiosqlite')
+
+STARTUP_SCRIPT = f'''
+import json, sys, time
+start = time.perf_counter()
+from movie_app import create_app
+imported = time.perf_counter()
+app = create_app({{'TESTING': True, 'REPOSITORY': 'memory', 'TEST_DATA_PATH': sys.argv[1],
+                  'WTF_CSRF_ENABLED': False}})
+created = time.perf_counter()
+client = app.test_client()
+statuses = [client.get(path).status_code for path in ('/', '/movies_by_rank', '/movies_by_genre?genre=Action')]
+print(json.dumps({{
+    'import_seconds': imported - start,
+    'create_app_seconds': created - imported,
+    'statuses': statuses,
+    'loaded': [name for name in {DEFERRED_MODULES!r} if name in sys.modules]
+}}))
+'''
+
+
+def start_in_fresh_interpreter(data_path):
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, data_path], capture_output=True, check=True,
+                            text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_startup_is_within_budget_and_defers_heavy_modules(data_path):
+    startup = start_in_fresh_interpreter(data_path)
+    assert startup['statuses'] == [200, 200, 200]
+    assert startup['import_seconds'] + startup['create_app_seconds'] < STARTUP_BUDGET_SECONDS
+    assert startup['loaded'] == []
+
+
+def test_startup_phases_are_reported(data_path):
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': data_path,
+        'WTF_CSRF_ENABLED': False
+    })
+    phases = app.extensions['startup_phases']
+    assert list(phases) == ['config', 'data_load', 'caches', 'blueprint_registration']
+    assert all(duration >= 0 for duration in phases.values())
+    assert STARTUP_PHASE_DURATION.value(('data_load',)) == phases['data_load']
+    assert b'cs235flix_startup_phase_seconds{phase="data_load"}' in app.test_client().get('/metrics').data
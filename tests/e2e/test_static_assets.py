@@ -0,0 +1,55 @@
+import gzip
+from movie_app.static_assets import StaticAssets, compress_static_files, IMMUTABLE_CACHE_CONTROL
+
+
+def test_static_urls_are_fingerprinted(client):
+    response = client.get('/')
+    static_assets = client.application.extensions['static_assets']
+    fingerprint = static_assets.fingerprint('css/main.css')
+    assert f'/static/css/main.{fingerprint}.css'.encode() in response.data
+
+    response = client.get(f'/static/css/main.{fingerprint}.css')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert response.mimetype == 'text/css'
+
+
+def test_stale_or_missing_fingerprint_is_not_cached_forever(client):
+    response = client.get('/static/css/main.000000000000.css')
+    assert response.status_code == 200
+    assert response.headers.get('Cache-Control') != IMMUTABLE_CACHE_CONTROL
+
+    response = client.get('/static/css/main.css')
+    assert response.status_code == 200
+    assert response.headers.get('Cache-Control') != IMMUTABLE_CACHE_CONTROL
+
+    assert client.get('/static/css/missing.css').status_code == 404
+
+
+def test_precompressed_variant_is_negotiated(client, tmp_path):
+    (tmp_path / 'site.css').write_bytes(b'body { color: red; }\n' * 100)
+    assert compress_static_files(str(tmp_path)) == [str(tmp_path / 'site.css.gz')]
+
+    static_assets = StaticAssets(str(tmp_path))
+    app = client.application
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate'}):
+        response = static_assets.send_static_file('site.css')
+        response.direct_passthrough = False
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.mimetype == 'text/css'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.get_data()) == b'body { color: red; }\n' * 100
+
+    with app.test_request_context():
+        response = static_assets.send_static_file('site.css')
+        assert 'Content-Encoding' not in response.headers
+
+
+def test_html_responses_are_gzipped(client):
+    response = client.get('/movies_by_rank', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'Guardians of the Galaxy' in gzip.decompress(response.data)
+
+    response = client.get('/movies_by_rank')
+    assert 'Content-Encoding' not in response.headers
+    assert b'Guardians of the Galaxy' in response.data
@@ -120,3 +120,104 @@ def test_movies_with_genre(client):
     assert b'Guardians of the Galaxy' in response.data
     assert b'Suicide Squad' in response.data
     assert b'The Great Wall' in response.data
+
+
+def test_movies_by_facets(client):
+    response = client.get('/movies_by_facets?genre=Action&genre=Comedy&decade=2010')
+    assert response.status_code == 200
+
+    assert b'38 matching movies' in response.data
+    assert b'Adventure (13)' in response.data
+
+
+def test_suggest(client):
+    response = client.get('/suggest?q=dark+kn&limit=1')
+    assert response.status_code == 200
+    assert response.get_json() == [{'kind': 'movie', 'name': 'The Dark Knight', 'rank': 55, 'votes': 1791916,
+                                     'url': '/movies_by_rank?cursor=54'}]
+
+    response = client.get('/suggest?q=ridley+scott')
+    assert response.get_json()[0]['url'] == '/filmography/director?name=Ridley+Scott'
+
+    # Nothing starts with a typo, so the closest names are suggested instead.
+    response = client.get('/suggest?q=guardains+of')
+    assert [suggestion['name'] for suggestion in response.get_json()] == ['Guardians of the Galaxy']
+
+
+def test_filmography(client):
+    response = client.get('/filmography/director?name=Ridley+Scott&sort=rating')
+    assert response.status_code == 200
+    assert b'Movies directed by Ridley Scott (8)' in response.data
+    assert b'The Martian' in response.data
+    assert b'/filmography/director?name=Ridley+Scott&amp;sort=rating&amp;cursor=3' in response.data
+    # Names on the page link to their filmographies.
+    assert b'/filmography/actor?name=Matt+Damon' in response.data
+
+    response = client.get('/filmography/actor?name=Chris+Pratt&cursor=6')
+    assert b'Movies starring Chris Pratt (7)' in response.data
+    assert b'10 Years' in response.data
+
+    assert client.get('/filmography/movie?name=Ridley+Scott').status_code == 404
+
+
+def test_filmography_api(client):
+    response = client.get('/api/filmography/actor?name=Chris+Pratt&sort=rating&limit=2')
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'kind': 'actor', 'name': 'Chris Pratt', 'sort': 'rating', 'number_of_movies': 7,
+        'movies': [{'rank': 1, 'title': 'Guardians of the Galaxy', 'release_year': 2014, 'rating': 8.1},
+                   {'rank': 385, 'title': 'The Lego Movie', 'release_year': 2014, 'rating': 7.8}]
+    }
+
+    # An unknown order falls back to the newest movies first.
+    response = client.get('/api/filmography/director?name=Ridley+Scott&sort=title&limit=1')
+    assert response.get_json()['sort'] == 'year'
+    assert [movie['rank'] for movie in response.get_json()['movies']] == [103]
+
+
+def test_watch_api(client, auth):
+    assert client.post('/api/watch', data={'movie': 2}).headers['Location'] == \
+        'http://localhost/authentication/login'
+    auth.login()
+
+    response = client.post('/api/watch', data={'movie': 2})
+    assert response.status_code == 200
+    assert response.get_json()['movies_watched'] == 2 and response.get_json()['minutes'] == 245
+    assert client.post('/api/watch', data={'movie': 0}).status_code == 404
+
+    response = client.get('/api/watch_history?limit=1')
+    assert response.get_json()['totals']['minutes'] == 245
+    assert [watch['movie_rank'] for watch in response.get_json()['watches']] == [2]
+    response = client.get('/api/watch_history?cursor=1')
+    assert [watch['movie_rank'] for watch in response.get_json()['watches']] == [1]
+
+
+def test_metrics(client):
+    # Generate some traffic, then check that it is reported in Prometheus text format.
+    client.get('/movies_by_genre?genre=Action')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert b'# TYPE cs235flix_request_duration_seconds histogram' in response.data
+    assert b'cs235flix_requests_total{endpoint="movies_bp.movies_by_genre",status="200"}' in response.data
+    assert b'cs235flix_repository_call_duration_seconds_count{method="get_movie_ranks_for_genre"}' in response.data
+    assert b'cs235flix_service_call_duration_seconds_count{function="movies.services.get_movies_by_rank"}' \
+        in response.data
+    assert b'cs235flix_template_render_duration_seconds_count{template="movies/movies.html"}' in response.data
+
+
+def test_movie_cards_are_served_from_fragment_cache(client):
+    first = client.get('/movies_by_genre?genre=Action')
+    fragment_cache = client.application.jinja_env.fragment_cache
+    hits = fragment_cache.hits
+
+    second = client.get('/movies_by_genre?genre=Action')
+    # The featured movies in the sidebar are random, so only compare the main content.
+    def main_content(response):
+        return response.data[response.data.index(b'<main'):response.data.index(b'</main>')]
+    assert main_content(second) == main_content(first)
+    assert fragment_cache.hits == hits + 3
+
+    # Showing the reviews of a movie changes the key of its card.
+    third = client.get('/movies_by_genre?genre=Action&cursor=0&view_reviews_for=1')
+    assert b'GOTG is my new favourite movie of all time!' in third.data
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from sqlalchemy.orm import sessionmaker
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.domain.model import Movie, Review, User
+from movie_app.movies import services as movies_services
+
+pytest.importorskip('aiosqlite')
+from movie_app.adapters.async_database_repository import AsyncSqliteRepository     # noqa: E402
+
+
+def run(coroutine_function):
+    # Runs coroutine_function with a repository over the populated test database, closing it afterwards.
+    async def main(database):
+        repo = AsyncSqliteRepository(database, pool_size=2)
+        try:
+            return await coroutine_function(repo)
+        finally:
+            await repo.close()
+    return asyncio.run(main('movie-test.db'))
+
+
+def test_movies_match_the_sqlalchemy_repository(database_engine):
+    repo = SqlAlchemyRepository(sessionmaker(bind=database_engine))
+    expected = movies_services.movies_to_dict(repo.get_movies_by_rank([1, 2, 3, 500]))
+    repo.close_session()
+
+    movies = run(lambda async_repo: async_repo.get_movies_by_rank([3, 1, 2, 500, 2000]))
+    assert movies_services.movies_to_dict(movies) == expected
+
+
+def test_reference_data(database_engine):
+    async def read(repo):
+        return await asyncio.gather(repo.get_number_of_movies(), repo.get_first_movie(), repo.get_last_movie(),
+                                    repo.get_genres(), repo.get_movie_ranks_for_genre('Action'),
+                                    repo.get_director('James Gunn'), repo.get_actor('Xull'), repo.get_movie(2000))
+
+    number_of_movies, first, last, genres, action_ranks, director, actor, missing = run(read)
+    assert number_of_movies == 1000
+    assert first.rank == 1 and last.rank == 1000
+    assert 'Action' in [genre.genre_name for genre in genres]
+    assert action_ranks[:3] == [1, 5, 6]
+    assert director.director_full_name == 'James Gunn'
+    assert actor is None and missing is None
+
+
+def test_add_and_get_reviews_and_users(database_engine):
+    async def write_and_read(repo):
+        movie = await repo.get_movie(2)
+        review = Review(movie, 'Creepy and wonderful', 8)
+        await repo.add_review(review)
+        await repo.add_user(User('Dave', '123456789'))
+        return review, await repo.get_reviews_for_movies([2]), await repo.get_user('dave')
+
+    review, reviews, user = run(write_and_read)
+    assert reviews[-1] == review
+    assert reviews[-1].movie == Movie('Prometheus', 2012)
+    assert user == User('dave', '123456789')
@@ -0,0 +1,32 @@
+from movie_app.adapters.caching_repository import CachingRepository
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.adapters.query_recorder import query_budget
+from movie_app.movies import services as movies_services
+
+
+def test_cached_movies_outlive_their_session(session_factory):
+    repo = CachingRepository(SqlAlchemyRepository(session_factory))
+    movie = repo.get_movie(1)
+    movies = repo.get_movies_by_rank([1, 2, 3])
+    repo.reset_session()
+
+    with query_budget(0, label='cached reads'):
+        assert repo.get_movie(1) is movie
+        assert movies_services.movie_to_dict(movie)['director']['director_name'] == 'James Gunn'
+        assert repo.get_movies_by_rank([1, 2, 3]) == movies
+        assert len(movies_services.movies_to_dict(movies)) == 3
+
+
+def test_review_of_a_cached_movie(session_factory):
+    repo = CachingRepository(SqlAlchemyRepository(session_factory))
+    movie = repo.get_movie(1)
+    repo.reset_session()
+
+    movies_services.add_review(1, 'Loved it', 9, 'nton939', repo)
+    reviews = movies_services.get_reviews_for_movie(1, repo)
+    assert 'Loved it' in [review['review_text'] for review in reviews]
+
+    # The cached movie is still usable after the commit.
+    repo.reset_session()
+    assert repo.get_movie(1) is movie
+    assert movies_services.movie_to_dict(movie)['title'] == movie.title
@@ -1,7 +1,12 @@
 import pytest
+import threading
+from datetime import datetime
+from sqlalchemy import create_engine, inspect
+from movie_app.adapters import database_repository
 from movie_app.adapters.database_repository import SqlAlchemyRepository
-from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User
-from movie_app.adapters.repository import RepositoryException
+from movie_app.adapters.orm import metadata, create_missing_columns
+from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList, MovieWatchingSimulation
+from movie_app.adapters.repository import RepositoryException, FacetFilter, Suggestion, Filmography, WatchTotals
 
 
 def test_repo_can_add_director(session_factory):
@@ -178,6 +183,230 @@ def test_repo_returns_an_empty_list_for_non_existent_genre(session_factory):
     assert len(movie_ranks) == 0
 
 
+@pytest.mark.parametrize('facet_filter', (
+        FacetFilter(),
+        FacetFilter(('Action', 'Comedy'), 2010),
+        FacetFilter(('Drama',), None, None, 7),
+        FacetFilter((), 2000, 'Ridley Scott'),
+        FacetFilter(('Anime',)),
+))
+def test_repo_facets_agree_with_memory_repository(session_factory, in_memory_repo, facet_filter):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.get_movie_facets(facet_filter, 3, 5) == in_memory_repo.get_movie_facets(facet_filter, 3, 5)
+
+
+def test_repo_suggestions_agree_with_memory_repository(session_factory, in_memory_repo):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for prefix in ('dark kn', 'ridley', 'tom', 'xyzzy'):
+        assert repo.get_suggestions(prefix, 5) == in_memory_repo.get_suggestions(prefix, 5)
+
+
+def test_repo_suggestions_include_added_movies(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.get_suggestions('brand new') == []
+
+    movie = Movie('Brand New Movie', 2021)
+    movie.rank = 1001
+    movie.director = Director('Brand New Director')
+    movie.votes = 10
+    repo.add_movie(movie)
+    assert set(repo.get_suggestions('brand new')) == {Suggestion('movie', 'Brand New Movie', 1001, 10),
+                                                      Suggestion('director', 'Brand New Director', None, 10)}
+
+
+def test_repo_fuzzy_matches_agree_with_memory_repository(session_factory, in_memory_repo):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for query in ('Guardains of the Galxy', 'dark knigth', 'Ridly Scott', 'jenifer lawrense', 'the', 'xyzzy'):
+        assert repo.get_fuzzy_matches(query, 5) == in_memory_repo.get_fuzzy_matches(query, 5)
+
+
+def test_repo_fuzzy_matches_include_added_movies(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    movie = Movie('Zyzzyva', 2021)
+    movie.rank = 1001
+    movie.director = Director('Brand New Director')
+    movie.add_actor(Actor('Brand New Actress'))
+    movie.votes = 10
+    repo.add_movie(movie)
+    assert repo.get_fuzzy_matches('zyzzva') == [Suggestion('movie', 'Zyzzyva', 1001, 10)]
+    assert repo.get_fuzzy_matches('brand new actres') == [Suggestion('actor', 'Brand New Actress', None, 10)]
+    assert repo.get_fuzzy_matches('brand new directr') == [Suggestion('director', 'Brand New Director', None, 10)]
+
+
+@pytest.mark.parametrize('kind, name', (
+        ('director', 'Ridley Scott'),
+        ('actor', 'Chris Pratt'),
+        ('actor', 'Nobody'),
+))
+def test_repo_filmographies_agree_with_memory_repository(session_factory, in_memory_repo, kind, name):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for sort in ('year', 'rating'):
+        assert repo.get_filmography(kind, name, sort) == in_memory_repo.get_filmography(kind, name, sort)
+        assert repo.get_filmography(kind, name, sort, 2, 3) == in_memory_repo.get_filmography(kind, name, sort, 2, 3)
+
+
+def test_repo_filmography_includes_added_movies(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    movie = Movie('Unrated', 2021)
+    movie.rank = 1001
+    movie.director = Director('Brand New Director')
+    movie.add_actor(repo.get_actor('Chris Pratt'))
+    repo.add_movie(movie)
+    assert repo.get_filmography('director', 'Brand New Director') == Filmography(1, [1001])
+    assert repo.get_filmography('actor', 'Chris Pratt', 'year', 0, 1) == Filmography(8, [1001])
+    # Movies whose rating isn't known come last.
+    assert repo.get_filmography('actor', 'Chris Pratt', 'rating', 7) == Filmography(8, [1001])
+
+
+def test_repo_watches_agree_with_memory_repository(session_factory, in_memory_repo):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for watching_repo in (repo, in_memory_repo):
+        user = watching_repo.get_user('nton939')
+        for day, rank in enumerate((2, 3, 2), 1):
+            watching_repo.add_watch(user, watching_repo.get_movie(rank), datetime(2021, 1, day))
+
+    user = repo.get_user('nton939')
+    assert repo.get_watch_history(user, 0, 3) == in_memory_repo.get_watch_history(user, 0, 3)
+    assert repo.get_watch_history(user, 1, 2) == in_memory_repo.get_watch_history(user, 1, 2)
+    assert repo.get_watch_totals(user) == in_memory_repo.get_watch_totals(user)
+    assert repo.get_watch_totals(user).movies_watched == 4
+    assert repo.get_user('nton939').time_spent_watching_movies_minutes == 121 + 124 + 117 + 124
+
+
+def test_repo_does_not_add_watch_of_unknown_user_or_movie(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    with pytest.raises(RepositoryException):
+        repo.add_watch(User('Dave', '123456789'), repo.get_movie(1))
+    movie = Movie('Unknown', 2021)
+    movie.rank = 2000
+    with pytest.raises(RepositoryException):
+        repo.add_watch(repo.get_user('nton939'), movie)
+    assert len(repo.get_watch_history(repo.get_user('nton939'))) == 1
+    assert repo.get_watch_totals(User('Dave', '123456789')) == WatchTotals(0, 0, {})
+
+
+def test_repo_watchlists_agree_with_memory_repository(session_factory, in_memory_repo):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for watchlist_repo in (repo, in_memory_repo):
+        watchlist = WatchList(watchlist_repo.get_user('nton939'), 'Weekend')
+        for rank in (1000, 3, 500):
+            watchlist.add_movie(watchlist_repo.get_movie(rank))
+        watchlist_repo.add_watchlist(watchlist)
+
+    user = repo.get_user('nton939')
+    watchlists = repo.get_watchlist(user)
+    assert [watchlist.watchlist_name for watchlist in watchlists] == ['Watch Later', 'Weekend']
+    assert [[movie.rank for movie in watchlist] for watchlist in watchlists] == \
+        [[movie.rank for movie in watchlist] for watchlist in in_memory_repo.get_watchlist(user)]
+    assert watchlists[1].sort_watchlist_by_year() == in_memory_repo.get_watchlist(user)[1].sort_watchlist_by_year()
+
+
+def test_repo_watchlist_leaves_out_deleted_movies(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    session = session_factory()
+    session.execute('DELETE FROM movies WHERE id = 3')
+    session.commit()
+
+    watchlists = repo.get_watchlist(repo.get_user('nton939'))
+    assert [[movie.rank for movie in watchlist] for watchlist in watchlists] == [[1, 2, 4, 5]]
+
+
+def test_repo_does_not_add_watchlist_of_unknown_user(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    with pytest.raises(RepositoryException):
+        repo.add_watchlist(WatchList(User('Dave', '123456789'), 'Weekend'))
+    assert repo.get_watchlist(User('Dave', '123456789')) == []
+    assert repo.get_watchlist(None) == []
+
+
+def test_repo_group_watches_agree_with_memory_repository(session_factory, in_memory_repo):
+    repo = SqlAlchemyRepository(session_factory)
+
+    for watching_repo in (repo, in_memory_repo):
+        watching_repo.add_user(User('Dave', '123456789'))
+        users = [watching_repo.get_user('nton939'), watching_repo.get_user('dave')]
+        watching_repo.add_watches(users, watching_repo.get_movie(2), datetime(2021, 1, 1))
+
+    for username in ('nton939', 'dave'):
+        user = repo.get_user(username)
+        assert repo.get_watch_history(user, 0, 1) == in_memory_repo.get_watch_history(user, 0, 1)
+        assert repo.get_watch_totals(user) == in_memory_repo.get_watch_totals(user)
+    assert repo.get_user('dave').time_spent_watching_movies_minutes == 124
+
+
+def test_repo_does_not_add_any_group_watch_with_an_unknown_user(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    with pytest.raises(RepositoryException):
+        repo.add_watches([repo.get_user('nton939'), User('Dave', '123456789')], repo.get_movie(2))
+    assert len(repo.get_watch_history(repo.get_user('nton939'))) == 1
+    assert repo.get_watch_totals(repo.get_user('nton939')).movies_watched == 1
+
+
+def test_repo_can_add_reviews_of_a_group(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_user(User('Dave', '123456789'))
+    simulation = MovieWatchingSimulation(repo.get_user('nton939'), repo.get_movie(2))
+    simulation.add_user(repo.get_user('dave'))
+
+    repo.add_reviews(simulation.write_review_for_everyone(Review(repo.get_movie(2), 'Seen with friends', 8)))
+
+    assert len(repo.get_reviews()) == 3
+    assert [review.rating for review in repo.get_user('dave').reviews] == [8]
+    assert len(repo.get_user('nton939').reviews) == 2
+
+
+def test_resetting_the_session_leaves_other_threads_sessions_alone(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    movie = repo.get_movie(1)
+
+    # Another thread starting a request must not replace the session of the request in progress on this one.
+    thread = threading.Thread(target=repo.reset_session)
+    thread.start()
+    thread.join()
+
+    assert repo.get_movie(1) is movie
+    repo.reset_session()
+    assert repo.get_movie(1) is not movie
+
+
+def test_missing_columns_are_added_to_an_older_database():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    # Make it a database created before the watch totals were kept.
+    engine.execute('ALTER TABLE users DROP COLUMN movies_watched')
+    engine.execute('ALTER TABLE user_watched_movies DROP COLUMN watched_at')
+    engine.execute("INSERT INTO users (username, password, time_spent_watching_movies_minutes) "
+                   "VALUES ('nton939', 'password', 121)")
+
+    create_missing_columns(engine)
+
+    assert 'watched_at' in {column['name'] for column in inspect(engine).get_columns('user_watched_movies')}
+    assert engine.execute('SELECT movies_watched FROM users').fetchall() == [(0,)]
+
+
+def test_populating_in_parallel_fills_in_the_same_tables(data_path):
+    tables = ('directors', 'genres', 'actors', 'movies', 'movie_actors', 'movie_genres', 'name_trigrams')
+    contents = list()
+    for workers in (1, 2):
+        engine = create_engine('sqlite://')
+        metadata.create_all(engine)
+        database_repository.populate(engine, data_path, workers=workers)
+        contents.append({table: engine.execute(f'SELECT * FROM {table} ORDER BY rowid').fetchall() for table in tables})
+    assert contents[1] == contents[0]
+    assert len(contents[1]['movies']) == 1000
+
+
 def test_repo_can_add_review(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -220,6 +449,14 @@ def test_repo_can_add_user(session_factory):
     assert user2 == user and user2 is user
 
 
+def test_repo_does_not_add_user_with_existing_username(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    with pytest.raises(RepositoryException):
+        repo.add_user(User('nton939', 'anotherPassword'))
+    assert repo.get_user('nton939') is not None
+
+
 def test_repo_can_retrieve_user(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -0,0 +1,126 @@
+import csv
+import os
+from sqlalchemy.orm import sessionmaker
+from movie_app.adapters.database_repository import SqlAlchemyRepository
+from movie_app.adapters.movie_import import import_movies
+
+
+def read_rows(data_path):
+    with open(os.path.join(data_path, 'Data1000Movies.csv'), encoding='utf-8-sig') as csvfile:
+        reader = csv.DictReader(csvfile)
+        return reader.fieldnames, list(reader)
+
+
+def write_rows(path, fieldnames, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def changed_csv(data_path, tmp_path):
+    fieldnames, rows = read_rows(data_path)
+    rows = [row for row in rows if row['Rank'] not in ('1', '1000')]   # Movie 1 has a review.
+    rows[0]['Description'] = 'A new description.'                     # Movie 2
+    rows[1]['Genre'] = 'Horror,Comedy'                                 # Movie 3
+    new_movie = dict(rows[2], Rank='1001', Title='Brand New', Director='New Director',
+                     Actors='New Actor, Ryan Gosling')
+    return write_rows(tmp_path / 'movies.csv', fieldnames, rows + [new_movie])
+
+
+def test_import_of_unchanged_file_changes_nothing(database_engine, data_path):
+    report = import_movies(database_engine, os.path.join(data_path, 'Data1000Movies.csv'))
+    assert report.changed_ranks == []
+    assert report.movies_unchanged == 1000
+    assert report.associations_inserted == report.associations_deleted == 0
+    assert report.batches == 0
+
+
+def test_import_changes_only_what_differs(database_engine, data_path, tmp_path):
+    report = import_movies(database_engine, changed_csv(data_path, tmp_path), batch_size=2)
+
+    assert report.movies_inserted == [1001]
+    assert report.movies_updated == [2, 3]
+    assert report.movies_deleted == [1000]
+    assert report.movies_kept == [1]
+    assert report.movies_unchanged == 996
+    assert report.people_inserted == {'directors': 1, 'actors': 1, 'genres': 0}
+    assert report.batches == 2
+    assert 'movies: 1 inserted, 2 updated, 1 deleted, 1 kept, 996 unchanged' in str(report)
+
+    assert database_engine.execute('SELECT description FROM movies WHERE id = 2').scalar() == 'A new description.'
+    genres = database_engine.execute('SELECT genres.genre_name FROM movie_genres JOIN genres '
+                                     'ON genres.id = movie_genres.genre_id WHERE movie_id = 3').fetchall()
+    assert sorted(row[0] for row in genres) == ['Comedy', 'Horror']
+    assert database_engine.execute('SELECT count(*) FROM movies WHERE id = 1000').scalar() == 0
+    assert database_engine.execute('SELECT count(*) FROM movie_actors WHERE movie_id = 1000').scalar() == 0
+    assert database_engine.execute('SELECT count(*) FROM reviews WHERE movie_id = 1').scalar() == 1
+    assert database_engine.execute('SELECT directors.director_full_name FROM movies JOIN directors '
+                                   'ON directors.id = movies.director_id WHERE movies.id = 1001').scalar() \
+        == 'New Director'
+
+    # The new title and people can be fuzzy matched, and the deleted title no longer is.
+    for kind, entity_id in (('movie', '1001'),
+                            ('director', "(SELECT id FROM directors WHERE director_full_name = 'New Director')"),
+                            ('actor', "(SELECT id FROM actors WHERE actor_full_name = 'New Actor')")):
+        assert database_engine.execute(f"SELECT count(*) FROM name_trigrams WHERE kind = '{kind}' "
+                                       f"AND entity_id = {entity_id}").scalar() > 0
+    assert database_engine.execute("SELECT count(*) FROM name_trigrams WHERE kind = 'movie' AND entity_id = 1000") \
+        .scalar() == 0
+
+    # Importing the same file again finds nothing to change.
+    report = import_movies(database_engine, changed_csv(data_path, tmp_path))
+    assert report.changed_ranks == []
+
+
+def test_people_no_movie_refers_to_are_deleted(database_engine, data_path, tmp_path):
+    fieldnames, rows = read_rows(data_path)
+    # Nobody else directed Search Party (rank 999).
+    rows = [row for row in rows if row['Rank'] != '999']
+    report = import_movies(database_engine, write_rows(tmp_path / 'movies.csv', fieldnames, rows))
+    assert report.movies_deleted == [999]
+    assert report.people_deleted['directors'] == 1
+    assert database_engine.execute("SELECT count(*) FROM directors WHERE director_full_name = 'Scot Armstrong'") \
+        .scalar() == 0
+    assert database_engine.execute("SELECT count(*) FROM name_trigrams WHERE kind = 'director' AND entity_id "
+                                   "NOT IN (SELECT id FROM directors)").scalar() == 0
+
+
+def test_genres_users_have_watch_time_in_are_kept(database_engine, data_path, tmp_path):
+    fieldnames, rows = read_rows(data_path)
+    # The default user has watched a Musical, but no movie in the new file is a Musical or a Western.
+    database_engine.execute("INSERT INTO watch_time_by_genre (user_id, genre_id, minutes) "
+                            "SELECT 1, id, 95 FROM genres WHERE genre_name = 'Musical'")
+    rows = [row for row in rows if not {'Musical', 'Western'} & set(row['Genre'].split(','))]
+    report = import_movies(database_engine, write_rows(tmp_path / 'movies.csv', fieldnames, rows))
+    assert report.people_deleted['genres'] == 1
+    assert database_engine.execute("SELECT count(*) FROM genres WHERE genre_name = 'Musical'").scalar() == 1
+    assert database_engine.execute("SELECT count(*) FROM genres WHERE genre_name = 'Western'").scalar() == 0
+
+    repo = SqlAlchemyRepository(sessionmaker(bind=database_engine))
+    assert repo.get_watch_totals(repo.get_user('nton939')).genre_minutes['Musical'] == 95
+
+
+def test_watchlisted_movies_are_kept(database_engine, data_path, tmp_path):
+    fieldnames, rows = read_rows(data_path)
+    # Rank 2 is on the default user's watchlist, but hasn't been reviewed or watched.
+    rows = [row for row in rows if row['Rank'] != '2']
+    report = import_movies(database_engine, write_rows(tmp_path / 'movies.csv', fieldnames, rows))
+    assert report.movies_deleted == []
+    assert report.movies_kept == [2]
+
+    repo = SqlAlchemyRepository(sessionmaker(bind=database_engine))
+    watchlists = repo.get_watchlist(repo.get_user('nton939'))
+    assert [[movie.rank for movie in watchlist] for watchlist in watchlists] == [[1, 2, 3, 4, 5]]
+
+
+def test_dry_run_and_keep_missing(database_engine, data_path, tmp_path):
+    path = changed_csv(data_path, tmp_path)
+    report = import_movies(database_engine, path, dry_run=True)
+    assert report.movies_updated == [2, 3]
+    assert database_engine.execute('SELECT count(*) FROM movies WHERE id = 1001').scalar() == 0
+
+    report = import_movies(database_engine, path, delete_missing=False)
+    assert report.movies_deleted == report.movies_kept == []
+    assert database_engine.execute('SELECT count(*) FROM movies').scalar() == 1001
@@ -0,0 +1,81 @@
+import pytest
+from unittest import mock
+from movie_app.adapters.database_repository import SqlAlchemyRepository, MOVIE_RANKS_FOR_GENRE
+from movie_app.adapters.query_recorder import QueryRecorder, QueryBudgetExceeded, normalize_sql, query_budget
+from movie_app.movies import services as movies_services
+
+
+def test_normalize_sql_ignores_parameters():
+    assert normalize_sql("SELECT id FROM genres WHERE genre_name = 'Action'") == \
+        normalize_sql('SELECT id FROM genres\n  WHERE genre_name = :genre_name')
+    assert normalize_sql('SELECT * FROM movies WHERE movies.id IN (?, ?, ?)') == \
+        normalize_sql('SELECT * FROM movies WHERE movies.id IN (?)')
+    assert normalize_sql('SELECT * FROM movies WHERE id = 10') != normalize_sql('SELECT * FROM actors WHERE id = 10')
+
+
+def test_recorder_flags_statements_repeated_with_different_parameters(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    with QueryRecorder() as recorder:
+        for genre_name in ('Action', 'Comedy', 'Drama'):
+            repo.get_movie_ranks_for_genre(genre_name)
+
+    repeated = recorder.repeated()
+    assert list(repeated.values()) == [3]
+    with pytest.raises(QueryBudgetExceeded):
+        recorder.check_budget(10, max_repeats=1)
+
+
+def test_get_movie_ranks_for_genre_is_one_statement_compiled_once(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    with mock.patch.object(MOVIE_RANKS_FOR_GENRE, 'compile', wraps=MOVIE_RANKS_FOR_GENRE.compile) as compile_statement:
+        for genre_name in ('Action', 'Comedy', 'Anime'):
+            with query_budget(1, label='get_movie_ranks_for_genre'):
+                repo.get_movie_ranks_for_genre(genre_name)
+    assert compile_statement.call_count == 1
+    assert repo.get_movie_ranks_for_genre('Anime') == []
+
+
+@pytest.mark.parametrize('rank_list', ([1, 2, 3], list(range(1, 31))))
+def test_get_movies_by_rank_has_no_n_plus_one(session_factory, rank_list):
+    # The movies, their directors, actors and genres are loaded in a fixed number of statements.
+    repo = SqlAlchemyRepository(session_factory)
+    with query_budget(3, max_repeats=1, label='movies.services.get_movies_by_rank'):
+        movies = movies_services.get_movies_by_rank(rank_list, repo)
+    assert len(movies) == len(rank_list)
+
+
+def test_get_movie_budget(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    with query_budget(1, label='movies.services.get_movie'):
+        movie = movies_services.get_movie(1, repo)
+    assert movie['director']['director_name'] == 'James Gunn'
+
+
+# Every page with movie cards counts the movies, loads its movies in three statements (the movies with their
+# directors, then their actors, then their genres), and loads the same for the three random movies and the genre
+# names of the sidebar. The movie cards' repeated movie and review lookups are answered by the request-scoped
+# repository cache, so the only statements repeated are the three that load movies, once for the page and once for
+# the sidebar.
+@pytest.mark.parametrize(('url', 'max_statements', 'max_repeats'), (
+        # Count, the random movies (3), genre names.
+        ('/', 5, 1),
+        # Count, the page of movies (3), the reviews, the random movies (3), genre names.
+        ('/movies_by_rank', 9, 2),
+        # The genre's ranks in one statement, then the same as /movies_by_rank.
+        ('/movies_by_genre?genre=Action', 10, 2),
+        # The movie with its director, actors and genres in one statement, its reviews, count, the random
+        # movies (3), genre names.
+        ('/movie_after_review?view_reviews_for=1&movie_rank=1', 7, 1),
+))
+def test_route_query_budgets(database_client, url, max_statements, max_repeats):
+    with query_budget(max_statements, max_repeats=max_repeats, label=url):
+        response = database_client.get(url)
+    assert response.status_code == 200
+
+
+def test_review_post_query_budget(database_client):
+    database_client.post('authentication/login', data={'username': 'nton939', 'password': 'nton939Password'})
+    # The movie and the user add_review checks, the insert, and the movie again once the review has changed it.
+    with query_budget(4, max_repeats=2, label='POST /review'):
+        response = database_client.post('/review', data={'review': 'wow!', 'rating': 10, 'movie_rank': 1})
+    assert response.status_code == 302
@@ -0,0 +1,122 @@
+import random
+import pytest
+from movie_app.adapters.bitmap_index import Bitmap, BitmapIndex, BitmapException, ARRAY_LIMIT
+from movie_app.domain.model import Genre, Movie
+
+
+def random_values(generator, number_of_values, high):
+    return {generator.randrange(high) for _ in range(number_of_values)}
+
+
+@pytest.fixture
+def value_sets():
+    generator = random.Random(235)
+    # Sparse and dense containers, and containers the other set doesn't have.
+    return [
+        random_values(generator, 100, 1 << 20),
+        random_values(generator, 3 * ARRAY_LIMIT, 1 << 16) | random_values(generator, 50, 1 << 18),
+        set(range(60000, 140000)),
+        random_values(generator, 20000, 200000),
+        set(),
+    ]
+
+
+def test_bitmap_holds_values(value_sets):
+    for values in value_sets:
+        bitmap = Bitmap(values)
+        assert len(bitmap) == len(values)
+        assert list(bitmap) == sorted(values)
+        assert all(value in bitmap for value in list(values)[:100])
+        assert (1 << 21) not in bitmap and -1 not in bitmap
+        assert bool(bitmap) == bool(values)
+
+
+def test_bitmap_operations_agree_with_sets(value_sets):
+    for first in value_sets:
+        for second in value_sets:
+            assert list(Bitmap(first) & Bitmap(second)) == sorted(first & second)
+            assert list(Bitmap(first) | Bitmap(second)) == sorted(first | second)
+            assert list(Bitmap(first) - Bitmap(second)) == sorted(first - second)
+            assert Bitmap(first).and_cardinality(Bitmap(second)) == len(first & second)
+            assert Bitmap(first) & Bitmap(second) == Bitmap(first & second)
+
+
+def test_bitmap_to_int_sets_the_bits_of_its_values(value_sets):
+    for values in value_sets:
+        bitmap = Bitmap(values)
+        assert bitmap.to_int() == sum(1 << value for value in values)
+        # Operations keep int containers as ints, whichever way round they are made.
+        assert (bitmap & Bitmap(range(1 << 17))).to_int() == sum(1 << value for value in values if value < 1 << 17)
+
+
+def test_bitmap_is_immutable():
+    bitmap = Bitmap([1, 2, 3])
+    bigger = bitmap.with_values([4])
+    assert list(bitmap) == [1, 2, 3]
+    assert list(bigger) == [1, 2, 3, 4]
+
+
+def test_bitmap_rejects_negative_values():
+    with pytest.raises(BitmapException):
+        Bitmap([1, -1])
+
+
+def test_bitmap_round_trips_through_bytes(value_sets):
+    for values in value_sets:
+        bitmap = Bitmap(values)
+        assert Bitmap.from_bytes(bitmap.to_bytes()) == bitmap
+    # The results of operations are compacted when they are serialized.
+    dense, sparse = Bitmap(range(10000)), Bitmap(range(9990, 10010))
+    assert (dense & sparse).to_bytes() == Bitmap(range(9990, 10000)).to_bytes()
+    with pytest.raises(BitmapException):
+        Bitmap.from_bytes(Bitmap(range(10)).to_bytes()[:-1])
+
+
+def test_index_answers_catalogue_queries(in_memory_repo):
+    index = in_memory_repo.get_bitmap_index()
+    comedies_of_the_2000s = index.get('genres', 'Comedy') & index.get('decades', 2000)
+    assert list(comedies_of_the_2000s) == sorted(
+        movie.rank for movie in in_memory_repo.get_movies_by_rank(range(1, 1001))
+        if Genre('Comedy') in movie.genres and 2000 <= movie.release_year < 2010)
+    assert list(index.get('directors', 'Ridley Scott') - index.get('rating_bands', 7)) == [103, 388, 517, 522, 531]
+    assert len(index.get('actors', 'Tom Hardy')) == index.cardinalities('actors')['Tom Hardy']
+    assert len(index.get('genres', 'Anime')) == 0
+    assert len(index.all) == 1000
+
+
+def test_index_keeps_dense_fields_as_ints(in_memory_repo):
+    index = in_memory_repo.get_bitmap_index()
+    assert index.all_bits() == index.all.to_int()
+    assert index.bits('genres')['Comedy'] == index.get('genres', 'Comedy').to_int()
+    assert index.bits('rating_bands') is index.bits('rating_bands')
+    with pytest.raises(BitmapException):
+        index.bits('actors')
+
+
+def test_index_with_movies_shares_unchanged_bitmaps(in_memory_repo):
+    index = in_memory_repo.get_bitmap_index()
+    movie = Movie('New Movie', 2021)
+    movie.rank = 1001
+    movie.add_genre(Genre('Comedy'))
+    new_index = index.with_movies([movie])
+
+    assert 1001 in new_index.get('genres', 'Comedy') and 1001 not in index.get('genres', 'Comedy')
+    assert list(new_index.get('decades', 2020)) == [1001]
+    assert new_index.get('genres', 'Action') is index.get('genres', 'Action')
+    assert new_index.values('actors') is index.values('actors')
+
+
+def test_index_round_trips_through_a_file(in_memory_repo, tmp_path):
+    index = in_memory_repo.get_bitmap_index()
+    path = str(tmp_path / 'movies.bitmaps')
+    index.save(path)
+    loaded = BitmapIndex.load(path)
+
+    assert loaded.all == index.all
+    for field in ('genres', 'directors', 'actors', 'decades', 'rating_bands'):
+        assert loaded.values(field) == index.values(field)
+
+    data = bytearray(index.to_bytes())
+    data[-1] ^= 1
+    with pytest.raises(BitmapException):
+        BitmapIndex.from_bytes(bytes(data))
@@ -0,0 +1,106 @@
+from movie_app.adapters.caching_repository import CachingRepository, LRUCache
+from movie_app.adapters.repository import FacetFilter
+from movie_app.domain.model import Director, Genre, Actor, Movie
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used_entry():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b', None) is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_cache_entries_expire():
+    clock = FakeClock()
+    cache = LRUCache(max_entries=10, ttl=60, clock=clock)
+    cache.set('a', None)
+    clock.now = 59
+    assert cache.get('a') is None
+    clock.now = 60
+    assert cache.get('a', 'missing') == 'missing'
+    assert cache.stats()['expirations'] == 1
+
+
+def test_reads_are_cached(in_memory_repo):
+    repo = CachingRepository(in_memory_repo)
+    movie = repo.get_movie(1)
+    assert repo.get_movie(1) is movie
+    assert repo.get_movies_by_rank([1, 2]) == repo.get_movies_by_rank((1, 2))
+    assert repo.get_director('No Such Director') is None
+    assert repo.get_director('No Such Director') is None
+
+    stats = repo.stats()
+    assert (stats['get_movie']['hits'], stats['get_movie']['misses']) == (1, 1)
+    assert (stats['get_movies_by_rank']['hits'], stats['get_movies_by_rank']['misses']) == (1, 1)
+    assert (stats['get_director']['hits'], stats['get_director']['misses']) == (1, 1)
+
+
+def test_cached_lists_cannot_be_changed_by_callers(in_memory_repo):
+    repo = CachingRepository(in_memory_repo)
+    repo.get_genres().clear()
+    assert len(repo.get_genres()) > 0
+
+
+def test_add_movie_invalidates_affected_entries(in_memory_repo):
+    repo = CachingRepository(in_memory_repo)
+    number_of_movies = repo.get_number_of_movies()
+    comedies = repo.get_movie_ranks_for_genre('Comedy')
+    repo.get_movie_ranks_for_genre('Drama')
+    assert repo.get_movie(1001) is None
+    assert repo.get_director('Ada Director') is None
+    repo.get_movies_by_rank([1, 2])
+    assert repo.get_movie_facets(FacetFilter(('Comedy',), 2020)).ranks == []
+    assert repo.get_fuzzy_matches('new comdy') == []
+    assert repo.get_filmography('actor', 'Ada Actor').ranks == []
+
+    movie = Movie('New Comedy', 2020)
+    movie.rank = 1001
+    movie.director = Director('Ada Director')
+    movie.add_actor(Actor('Ada Actor'))
+    movie.add_genre(Genre('Comedy'))
+    repo.add_movie(movie)
+    repo.add_director(movie.director)
+
+    assert repo.get_movie(1001) is movie
+    assert repo.get_number_of_movies() == number_of_movies + 1
+    assert repo.get_director('Ada Director') == Director('Ada Director')
+    assert len(repo.get_movie_ranks_for_genre('Comedy')) == len(comedies) + 1
+    assert repo.get_movie_facets(FacetFilter(('Comedy',), 2020)).ranks == [1001]
+    assert [suggestion.rank for suggestion in repo.get_fuzzy_matches('new comdy')] == [1001]
+    assert repo.get_filmography('actor', 'Ada Actor').ranks == [1001]
+    # Entries the new movie doesn't affect stay cached.
+    assert repo.stats()['get_movies_by_rank']['size'] == 1
+    repo.get_movie_ranks_for_genre('Drama')
+    assert repo.stats()['get_movie_ranks_for_genre']['hits'] == 1
+
+
+def test_readding_a_movie_invalidates_its_previous_genres_and_people(in_memory_repo):
+    repo = CachingRepository(in_memory_repo)
+    movie = repo.get_movie(1)
+    old_genre = movie.genres[0].genre_name
+    old_director = movie.director.director_full_name
+    assert 1 in repo.get_movie_ranks_for_genre(old_genre)
+    assert 1 in repo.get_filmography('director', old_director).ranks
+
+    replacement = Movie(movie.title, movie.release_year)
+    replacement.rank = 1
+    replacement.director = Director('Ada Director')
+    replacement.add_genre(Genre('Ada Genre'))
+    repo.add_movie(replacement)
+
+    repo.get_movie_ranks_for_genre(old_genre)
+    repo.get_filmography('director', old_director)
+    assert repo.stats()['get_movie_ranks_for_genre']['hits'] == 0
+    assert repo.stats()['get_filmography']['hits'] == 0
@@ -1,5 +1,7 @@
+import os
 from movie_app.domain.model \
-    import Director, Genre, Actor, Movie, Review, User, WatchList, MovieWatchingSimulation
+    import Director, Genre, Actor, Movie, Review, User, WatchList, MovieWatchingSimulation, WatchSessionRegistry, \
+    MovieFileCSVReader, EntityRegistry
 
 import pytest
 
@@ -272,6 +274,64 @@ def test_sort_by_runtime(w):
     assert watchlist == [m1, m3, m2]
 
 
+def test_sorted_orderings_follow_added_and_removed_movies(w):
+    m1 = Movie("Moana", 2016)
+    m2 = Movie("Ice Age", 2002)
+    m3 = Movie("Guardians of the Galaxy", 2012)
+    m4 = Movie("Up", 2009)
+    w.add_movie(m1)
+    w.add_movie(m2)
+    assert w.sort_watchlist_by_title() == [m2, m1]
+    assert w.sort_watchlist_by_year() == [m2, m1]
+    w.add_movie(m3)
+    w.add_movie(m4)
+    w.add_movie(m2)
+    w.remove_movie(m1)
+    assert w.sort_watchlist_by_title() == [m3, m2, m4]
+    assert w.sort_watchlist_by_year() == [m2, m4, m3]
+    assert w.watchlist == [m2, m3, m4]
+
+
+def test_removing_a_movie_changed_since_it_was_added_removes_that_movie(w):
+    m1 = Movie("Moana", 2016)
+    m2 = Movie("Ice Age", 2002)
+    m3 = Movie("Up", 2009)
+    m1.runtime_minutes = 100
+    m2.runtime_minutes = 120
+    m3.runtime_minutes = 140
+    for movie in (m1, m2, m3):
+        w.add_movie(movie)
+    assert w.sort_watchlist_by_runtime() == [m1, m2, m3]
+    m2.runtime_minutes = 90
+    w.remove_movie(m2)
+    assert w.sort_watchlist_by_runtime() == [m1, m3]
+    assert w.watchlist == [m1, m3]
+    assert w.first_movie_in_watchlist() == m1
+
+
+def test_sort_keeps_movies_with_equal_values_in_the_order_they_were_added(w):
+    m1 = Movie("Moana", 2016)
+    m2 = Movie("Ice Age", 2016)
+    m3 = Movie("Guardians of the Galaxy", 2016)
+    w.add_movie(m1)
+    w.add_movie(m2)
+    assert w.sort_watchlist_by_year() == [m1, m2]
+    w.add_movie(m3)
+    assert w.sort_watchlist_by_year() == [m1, m2, m3]
+
+
+def test_shared_watchlist_is_independent(w):
+    m1 = Movie("Moana", 2016)
+    m2 = Movie("Ice Age", 2002)
+    w.add_movie(m1)
+    w.sort_watchlist_by_title()
+    w1 = w.share_watchlist(User("DEF", "wow"))
+    w1.add_movie(m2)
+    assert m2 in w1 and m2 not in w
+    assert w1.sort_watchlist_by_title() == [m2, m1]
+    assert w.sort_watchlist_by_title() == [m1]
+
+
 def test_change_watchlist_name(w):
     w.change_watchlist_name("WOW")
     assert w.watchlist_name == "WOW"
@@ -327,3 +387,127 @@ def test_update_user_information(simulation):
     assert len(simulation.administrator.watched_movies) == 1
     assert u1.watched_movies[0] == m1
     assert u2.time_spent_watching_movies_minutes == 100
+
+
+def test_members_are_given_a_review_and_watch_once(simulation):
+    u1 = User('X', '123456')
+    simulation.add_user(u1)
+    r1 = Review(Movie('WOW', 2020), "A very good movie", 10)
+    assert len(simulation.write_review_for_everyone(r1)) == 2
+    simulation.add_user(User('Y', '00000'))
+    # Only the member who joined since is given the review.
+    assert [review.rating for review in simulation.write_review_for_everyone(r1)] == [10]
+    assert simulation.administrator.reviews[0] is r1 and u1.reviews == [r1] and u1.reviews[0] is not r1
+
+    assert simulation.update_user_information() == [simulation.administrator, u1, User('Y', '00000')]
+    assert simulation.update_user_information() == []
+    simulation.change_movie(Movie("NEW", 2021))
+    assert len(simulation.members_yet_to_watch()) == 3
+    assert len(u1.watched_movies) == 1
+
+
+def test_members_who_watched_the_movie_before_the_session_do_not_watch_it_again(simulation):
+    movie = Movie("NEW", 2021)
+    movie.runtime_minutes = 100
+    u1, u2 = User('X', '123456'), User('Y', '00000')
+    u1.watch_movie(movie)
+    simulation.add_user(u1)
+    simulation.change_movie(movie)
+    simulation.administrator.watch_movie(movie)
+    simulation.change_movie(Movie("WOW", 2020))
+    simulation.change_movie(movie)
+    simulation.add_user(u2)
+    assert simulation.update_user_information() == [u2]
+    assert u1.time_spent_watching_movies_minutes == 100 and u1.watched_movies == [movie]
+    assert simulation.administrator.watched_movies == [movie]
+
+
+def test_members_who_have_the_review_before_the_session_are_not_given_it_again(simulation):
+    u1, u2 = User('X', '123456'), User('Y', '00000')
+    r1 = Review(Movie('WOW', 2020), "A very good movie", 10)
+    simulation.administrator.add_review(r1)
+    simulation.add_user(u1)
+    assert simulation.write_review_for_everyone(r1) == [u1.reviews[0]]
+    u2.add_review(r1)
+    simulation.add_user(u2)
+    assert simulation.write_review_for_everyone(r1) == []
+    assert len(simulation.administrator.reviews) == 1 and len(u1.reviews) == 1 and len(u2.reviews) == 1
+
+
+def test_watch_session_registry(simulation):
+    registry = WatchSessionRegistry()
+    admin, u1, u2 = User('ABC', '123'), User('X', '123456'), User('Y', '00000')
+    session = registry.start_session(admin, Movie("WOW", 2020))
+    assert registry.join_session(u1, admin) is session
+    registry.join_session(u1, admin)
+    assert registry.session_of(u1) is session and u1 in session and len(session) == 2
+    with pytest.raises(Exception):
+        registry.start_session(u1, Movie("NEW", 2021))
+    with pytest.raises(Exception):
+        registry.join_session(u2, u1)
+
+    registry.leave_session(u1)
+    assert registry.session_of(u1) is None and u1 not in session
+    registry.join_session(u2, admin)
+    # The administrator leaving ends the session.
+    registry.leave_session(admin)
+    assert len(registry) == 0 and registry.session_of(u2) is None
+
+
+# MovieFileCSVReader Unit Tests
+def test_iter_movies_streams_the_movies_in_file_order(data_path):
+    reader = MovieFileCSVReader(os.path.join(data_path, 'Data1000Movies.csv'))
+    movies = reader.iter_movies()
+    movie = next(movies)
+    assert (movie.rank, movie.title, movie.release_year, movie.runtime_minutes) == \
+        (1, 'Guardians of the Galaxy', 2014, 121)
+    assert movie.director == Director('James Gunn')
+    assert movie.actors[0] == Actor('Chris Pratt')
+    assert movie.genres == [Genre('Action'), Genre('Adventure'), Genre('Sci-Fi')]
+    # Streaming doesn't fill in the datasets.
+    assert reader.dataset_of_movies == []
+    assert sum(1 for movie in movies) == 999
+
+
+def test_iter_movies_reads_unknown_values_as_none(data_path):
+    reader = MovieFileCSVReader(os.path.join(data_path, 'Data1000Movies.csv'))
+    movies = list(reader.iter_movies())
+    assert any(movie.revenue is None for movie in movies)
+    assert any(movie.metascore is None for movie in movies)
+    assert all(isinstance(movie.rating, float) for movie in movies)
+
+
+def test_read_csv_file_fills_in_the_datasets(data_path):
+    reader = MovieFileCSVReader(os.path.join(data_path, 'Data1000Movies.csv'))
+    reader.read_csv_file()
+    assert reader.dataset_of_movies == list(reader.iter_movies())
+    assert len(reader.dataset_of_directors) == 644
+    assert len(reader.dataset_of_actors) == 1985
+    assert len(reader.dataset_of_genres) == 20
+
+
+def test_movies_read_share_their_directors_actors_and_genres(data_path):
+    reader = MovieFileCSVReader(os.path.join(data_path, 'Data1000Movies.csv'))
+    reader.read_csv_file()
+    movies = {movie.rank: movie for movie in reader.dataset_of_movies}
+    # Movies 1 and 994 are both listed under Action first.
+    assert movies[1].genres[0] is movies[994].genres[0]
+    assert movies[1].genres[0] in reader.dataset_of_genres
+    assert len({id(actor) for movie in reader.dataset_of_movies for actor in movie.actors}) == \
+        len(reader.dataset_of_actors)
+    assert len({id(movie.director) for movie in reader.dataset_of_movies}) == len(reader.dataset_of_directors)
+
+
+def test_entity_registry_keeps_one_entity_per_name():
+    registry = EntityRegistry()
+    assert registry.genre('Action') is registry.genre('Action')
+    assert registry.director('James Gunn') is registry.director('James ' + 'Gunn')
+    assert registry.actor('Chris Pratt') == Actor('Chris Pratt')
+    movie = Movie('Guardians of the Galaxy', 2014)
+    movie.director = Director('James Gunn')
+    movie.actors = [Actor('Chris Pratt')]
+    movie.genres = [Genre('Action')]
+    registry.share(movie)
+    assert movie.director is registry.director('James Gunn')
+    assert movie.actors[0] is registry.actor('Chris Pratt')
+    assert movie.genres[0] is registry.genre('Action')
@@ -0,0 +1,57 @@
+from jinja2 import Environment, DictLoader
+from movie_app.fragment_cache import FragmentCache, FragmentCacheExtension
+
+
+def make_environment(template_source):
+    environment = Environment(loader=DictLoader({'card.html': template_source}),
+                              extensions=[FragmentCacheExtension], autoescape=True)
+    return environment
+
+
+def test_fragment_is_rendered_once_per_key():
+    calls = []
+
+    def describe(rank):
+        calls.append(rank)
+        return f'<b>movie {rank}</b>'
+
+    environment = make_environment('{% cache rank %}{{ describe(rank) }}{% endcache %}|{{ rank }}')
+    template = environment.get_template('card.html')
+
+    assert template.render(rank=1, describe=describe) == '&lt;b&gt;movie 1&lt;/b&gt;|1'
+    assert template.render(rank=1, describe=describe) == '&lt;b&gt;movie 1&lt;/b&gt;|1'
+    assert template.render(rank=2, describe=describe) == '&lt;b&gt;movie 2&lt;/b&gt;|2'
+    assert calls == [1, 2]
+    assert environment.fragment_cache.hits == 1
+    assert environment.fragment_cache.misses == 2
+
+
+def test_key_with_several_parts():
+    environment = make_environment('{% cache rank, version %}{{ text }}{% endcache %}')
+    template = environment.get_template('card.html')
+    assert template.render(rank=1, version=0, text='old') == 'old'
+    assert template.render(rank=1, version=0, text='new') == 'old'
+    assert template.render(rank=1, version=1, text='new') == 'new'
+
+
+def test_least_recently_used_fragment_is_evicted():
+    cache = FragmentCache(max_entries=2)
+    cache.set('a', 'A', 0.1)
+    cache.set('b', 'B', 0.1)
+    cache.get('a')
+    cache.set('c', 'C', 0.1)
+    assert cache.get('b') is None
+    assert cache.get('a') == ('A', 0.1)
+    assert len(cache) == 2
+    assert cache.seconds_saved == 0.2
+
+
+def test_fragment_expires_after_ttl():
+    now = [0.0]
+    cache = FragmentCache(ttl=10, clock=lambda: now[0])
+    cache.set('a', 'A', 0.1)
+    now[0] = 9.0
+    assert cache.get('a') == ('A', 0.1)
+    now[0] = 10.0
+    assert cache.get('a') is None
+    assert len(cache) == 0
@@ -0,0 +1,83 @@
+from movie_app.adapters.fuzzy import TrigramIndex, trigrams, edit_distance, max_edits, counted_trigrams
+from movie_app.adapters.repository import Suggestion
+from movie_app.domain.model import Director, Actor, Movie
+
+
+def make_movie(rank, title, votes, director_name, actor_names=()):
+    movie = Movie(title, 2020)
+    movie.rank = rank
+    movie.votes = votes
+    movie.director = Director(director_name)
+    for actor_name in actor_names:
+        movie.add_actor(Actor(actor_name))
+    return movie
+
+
+def test_trigrams_are_of_padded_normalized_words():
+    assert trigrams('Up!') == {'  u', ' up', 'up '}
+    assert trigrams('an Ox') == {'  a', ' an', 'an ', '  o', ' ox', 'ox '}
+    assert trigrams('') == frozenset() and trigrams(None) == frozenset()
+
+
+def test_edit_distance_counts_transpositions_once_and_is_bounded():
+    assert edit_distance('guardians', 'guardians', 2) == 0
+    assert edit_distance('guardains', 'guardians', 2) == 1
+    assert edit_distance('kitten', 'sitting', 3) == 3
+    assert edit_distance('kitten', 'sitting', 2) == 3
+    assert edit_distance('abc', 'abcdefgh', 2) == 3
+    assert edit_distance('', 'ab', 2) == 2
+
+
+def test_short_queries_must_match_exactly():
+    assert max_edits('dark') == 0
+    assert max_edits('nolan') == 1
+    assert max_edits('guardains') == 1
+    assert max_edits('chrstopher nolan') == 2
+
+
+def test_counted_trigrams_leave_out_the_common_ones():
+    sizes = {'  t': 900, ' th': 800, 'the': 700, 'he ': 600, 'ark': 3, 'dar': 5, 'rk ': 7, ' da': 100}
+    # A name sharing 6 of the 8 trigrams has at least one of the 3 rarest, and at least 3 of the 5 rarest.
+    assert counted_trigrams(sizes, sizes, 6) == (['ark', 'dar', 'rk ', ' da', 'he '], 3)
+    assert counted_trigrams(sizes, sizes, 1) == (sorted(sizes, key=sizes.get), 1)
+
+
+def test_typos_in_titles_and_names_are_matched():
+    index = TrigramIndex().with_movies([
+        make_movie(1, 'Guardians of the Galaxy', 100, 'James Gunn', ['Chris Pratt']),
+        make_movie(2, 'The Dark Knight', 300, 'Christopher Nolan', ['Christian Bale']),
+        make_movie(3, 'Dark Places', 20, 'Gilles Paquet-Brenner'),
+    ])
+    assert index.search('Guardains of the Galaxy') == [Suggestion('movie', 'Guardians of the Galaxy', 1, 100)]
+    # One word is compared with every word of a name, the closest name first.
+    assert [suggestion.name for suggestion in index.search('guardains')] == ['Guardians of the Galaxy']
+    assert [suggestion.name for suggestion in index.search('dark knigth')] == ['The Dark Knight']
+    assert index.search('Chrstopher Nolan') == [Suggestion('director', 'Christopher Nolan', None, 300)]
+    assert [suggestion.name for suggestion in index.search('dakr places')] == ['Dark Places']
+    # Short queries must match a word exactly.
+    assert index.search('drak') == [] and [suggestion.name for suggestion in index.search('dark')] == [
+        'The Dark Knight', 'Dark Places']
+    assert index.search('xyzzy') == [] and index.search('') == []
+
+
+def test_people_have_the_votes_of_all_their_movies():
+    index = TrigramIndex().with_movies([make_movie(1, 'First', 100, 'Jane Doe')])
+    new_index = index.with_movies([make_movie(2, 'Second', 50, 'Jane Doe'), make_movie(3, 'Third', 10, 'Jane Dow')])
+
+    assert index.search('jane do') == [Suggestion('director', 'Jane Doe', None, 100)]
+    # Equally close names, the most voted first.
+    assert new_index.search('jane do') == [Suggestion('director', 'Jane Doe', None, 150),
+                                            Suggestion('director', 'Jane Dow', None, 10)]
+
+
+def test_incremental_index_agrees_with_one_built_at_once():
+    movies = [make_movie(rank, f'Movie Number {rank}', rank, f'Director {rank % 3}', [f'Actress {rank % 5}'])
+              for rank in range(1, 61)]
+    incremental = TrigramIndex()
+    for movie in movies:
+        incremental = incremental.with_movies([movie])
+    at_once = TrigramIndex().with_movies(movies)
+
+    assert len(incremental) == len(at_once) == 60 + 3 + 5
+    for query in ('movie numbr 4', 'direktor', 'actres 2'):
+        assert incremental.search(query, 20) == at_once.search(query, 20)
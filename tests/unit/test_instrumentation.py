@@ -0,0 +1,57 @@
+import types
+from movie_app.metrics.instrumentation import Counter, Histogram, Registry, instrument_repository, \
+    instrument_module, uninstrument_module, REPOSITORY_CALL_DURATION, SERVICE_CALL_DURATION
+
+
+def test_histogram_exposition_is_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, ('/',))
+    histogram.observe(0.5, ('/',))
+    histogram.observe(5, ('/',))
+    lines = histogram.exposition()
+    assert lines[:2] == ['# HELP latency_seconds Latency.', '# TYPE latency_seconds histogram']
+    assert 'latency_seconds_bucket{route="/",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="/"} 5.55' in lines
+    assert 'latency_seconds_count{route="/"} 3' in lines
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    counter = registry.counter('hits_total', 'Hits.', ('cache',))
+    counter.inc(('say "hi"',))
+    counter.inc(('say "hi"',), 2)
+    assert 'hits_total{cache="say \\"hi\\""} 3' in registry.exposition()
+    assert isinstance(counter, Counter)
+
+
+def test_instrumented_repository_times_calls(in_memory_repo):
+    count_before = REPOSITORY_CALL_DURATION.count(('get_movie',))
+    instrument_repository(in_memory_repo)
+    instrument_repository(in_memory_repo)   # Instrumenting twice must not time calls twice.
+    assert in_memory_repo.get_movie(1).title == 'Guardians of the Galaxy'
+    assert REPOSITORY_CALL_DURATION.count(('get_movie',)) == count_before + 1
+
+
+def test_instrumenting_a_module_times_only_the_named_functions_until_undone():
+    def get_movie(rank):
+        return {'rank': rank}
+
+    def movie_to_dict(movie):
+        return dict(movie)
+
+    module = types.ModuleType('services')
+    module.get_movie, module.movie_to_dict = get_movie, movie_to_dict
+    count_before = SERVICE_CALL_DURATION.count(('services.get_movie',))
+    instrument_module(module, 'services', ['get_movie'])
+    instrument_module(module, 'services', ['get_movie'])     # Instrumenting twice must not time calls twice.
+    assert module.get_movie(1) == {'rank': 1}
+    assert SERVICE_CALL_DURATION.count(('services.get_movie',)) == count_before + 1
+    assert SERVICE_CALL_DURATION.count(('services.movie_to_dict',)) == 0
+    assert module.movie_to_dict is movie_to_dict
+
+    uninstrument_module(module)
+    assert module.get_movie is get_movie
+    module.get_movie(1)
+    assert SERVICE_CALL_DURATION.count(('services.get_movie',)) == count_before + 1
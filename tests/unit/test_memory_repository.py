@@ -1,6 +1,10 @@
+import threading
+from collections import Counter
+from datetime import datetime
 from typing import List
 from movie_app.domain.model import Director, Genre, Actor, Movie, Review, User, WatchList
-from movie_app.adapters.repository import RepositoryException
+from movie_app.adapters.repository import RepositoryException, FacetFilter, Suggestion, Filmography, Watch, \
+    WatchTotals
 import pytest
 
 
@@ -54,6 +58,24 @@ def test_repo_can_add_movie(in_memory_repo):
     assert in_memory_repo.get_movie(1001) == movie
 
 
+def test_movies_added_in_a_batch_are_published_together(in_memory_repo):
+    numbers_of_movies = []
+    with in_memory_repo.movie_batch():
+        for rank in range(1001, 1005):
+            movie = Movie(f'New Movie {rank}', 2020)
+            movie.rank = rank
+            if rank < 1004:
+                in_memory_repo.add_movie(movie)
+            else:
+                with in_memory_repo.movie_batch():     # Joins the batch already open.
+                    in_memory_repo.add_movie(movie)
+            numbers_of_movies.append(in_memory_repo.get_number_of_movies())
+        assert in_memory_repo.get_movie(1001) is None
+    assert numbers_of_movies == [1000, 1000, 1000, 1000]
+    assert in_memory_repo.get_number_of_movies() == 1004
+    assert in_memory_repo.get_movie_facets(FacetFilter(decade=2020)).ranks == [1001, 1002, 1003, 1004]
+
+
 def test_repo_can_retrieve_movie(in_memory_repo):
     movie = in_memory_repo.get_movie(1)
     # Check that the Movie has the expected title.
@@ -116,6 +138,98 @@ def test_repo_returns_an_empty_list_for_non_existent_genre(in_memory_repo):
     assert len(movie_ranks) == 0
 
 
+def test_repo_can_get_movie_facets(in_memory_repo):
+    facets = in_memory_repo.get_movie_facets(FacetFilter(('Action', 'Comedy'), 2010), cursor=3, limit=3)
+
+    assert facets.number_of_movies == 38
+    assert facets.ranks == [80, 96, 105]
+    assert facets.genres['Action'] == facets.genres['Comedy'] == 38
+    assert facets.genres['Crime'] == 11
+    # The decade counts don't apply the decade filter, so that other decades can be selected.
+    assert facets.decades == {2010: 38, 2000: 7}
+    assert sum(facets.directors.values()) == 38
+    assert sum(facets.rating_bands.values()) == 38
+
+
+def test_repo_can_get_movie_facets_for_director_and_rating_band(in_memory_repo):
+    facets = in_memory_repo.get_movie_facets(FacetFilter(director='Ridley Scott', rating_band=7))
+    assert facets.ranks == [2, 471, 738]
+    assert facets.directors['Ridley Scott'] == 3
+    assert facets.rating_bands == {8: 1, 7: 3, 6: 3, 5: 1}
+    assert in_memory_repo.get_movie_facets(FacetFilter(('No Such Genre',))).number_of_movies == 0
+
+
+def test_movie_facets_count_every_director_however_many_movies_match(in_memory_repo):
+    dramas = [movie for movie in in_memory_repo.get_movies_by_rank(range(1, 1001)) if Genre('Drama') in movie.genres]
+    # Half the movies are dramas, and a few are music dramas.
+    assert in_memory_repo.get_movie_facets(FacetFilter(('Drama',))).directors == \
+        Counter(movie.director.director_full_name for movie in dramas)
+    assert in_memory_repo.get_movie_facets(FacetFilter(('Drama', 'Music'))).directors == \
+        Counter(movie.director.director_full_name for movie in dramas if Genre('Music') in movie.genres)
+
+
+def test_movie_facets_include_added_movies(in_memory_repo):
+    assert in_memory_repo.get_movie_facets(FacetFilter(decade=2020)).number_of_movies == 0
+    movie = Movie('New Movie', 2021)
+    movie.rank = 1001
+    movie.add_genre(Genre('Comedy'))
+    in_memory_repo.add_movie(movie)
+    facets = in_memory_repo.get_movie_facets(FacetFilter(('Comedy',), 2020))
+    assert facets.ranks == [1001]
+
+
+def test_repo_can_get_suggestions(in_memory_repo):
+    suggestions = in_memory_repo.get_suggestions('dark kn', 5)
+    assert [(suggestion.kind, suggestion.name) for suggestion in suggestions] == [
+        ('movie', 'The Dark Knight'), ('movie', 'The Dark Knight Rises')]
+    assert in_memory_repo.get_suggestions('ridley')[0] == Suggestion('director', 'Ridley Scott', None, 2080074)
+
+    movie = Movie('Dark Knight Returns', 2021)
+    movie.rank = 1001
+    movie.votes = 2000000
+    in_memory_repo.add_movie(movie)
+    assert in_memory_repo.get_suggestions('dark kn', 1)[0].rank == 1001
+
+
+def test_repo_can_get_fuzzy_matches(in_memory_repo):
+    assert in_memory_repo.get_fuzzy_matches('Guardains of the Galxy') == [
+        Suggestion('movie', 'Guardians of the Galaxy', 1, 757074)]
+    assert in_memory_repo.get_fuzzy_matches('Ridly Scott', 1) == [Suggestion('director', 'Ridley Scott', None, 2080074)]
+    assert in_memory_repo.get_fuzzy_matches('xyzzy') == []
+
+    movie = Movie('Zyzzyva', 2021)
+    movie.rank = 1001
+    in_memory_repo.add_movie(movie)
+    assert in_memory_repo.get_fuzzy_matches('zyzzva') == [Suggestion('movie', 'Zyzzyva', 1001, 0)]
+
+
+def test_repo_can_get_filmography(in_memory_repo):
+    assert in_memory_repo.get_filmography('director', 'Ridley Scott') == Filmography(
+        8, [103, 517, 522, 2, 388, 738, 471, 531])
+    assert in_memory_repo.get_filmography('director', 'Ridley Scott', 'rating', 2, 3) == Filmography(8, [738, 2, 531])
+    # Movies of the same year are in rank order.
+    assert in_memory_repo.get_filmography('actor', 'Chris Pratt', 'year', 0, 2) == Filmography(7, [10, 39])
+    assert in_memory_repo.get_filmography('actor', 'Bob') == Filmography(0, [])
+
+
+def test_repo_filmography_includes_added_movies(in_memory_repo):
+    movie = Movie('Unrated', 2021)
+    movie.rank = 1001
+    movie.director = Director('Ridley Scott')
+    in_memory_repo.add_movie(movie)
+
+    assert in_memory_repo.get_filmography('director', 'Ridley Scott', 'year', 0, 1) == Filmography(9, [1001])
+    # Movies whose rating isn't known come last.
+    assert in_memory_repo.get_filmography('director', 'Ridley Scott', 'rating', 8) == Filmography(9, [1001])
+
+
+def test_repo_does_not_get_filmography_of_unknown_kind_or_order(in_memory_repo):
+    with pytest.raises(RepositoryException):
+        in_memory_repo.get_filmography('movie', 'Ridley Scott')
+    with pytest.raises(RepositoryException):
+        in_memory_repo.get_filmography('director', 'Ridley Scott', 'title')
+
+
 def test_repo_can_add_review(in_memory_repo):
     movie = in_memory_repo.get_movie(10)
     review = Review(movie=movie, txt='It was average.', rating=5)
@@ -150,6 +264,129 @@ def test_repo_does_not_retrieve_non_existent_user(in_memory_repo):
     assert user is None
 
 
+def test_repo_does_not_add_user_with_existing_username(in_memory_repo):
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_user(User('nton939', 'anotherPassword'))
+    assert in_memory_repo.get_user('nton939').password != 'anotherPassword'
+
+
+def run_threads(number_of_threads, target):
+    barrier = threading.Barrier(number_of_threads)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(number_of_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_registrations_of_a_username_add_one_user(in_memory_repo):
+    added = []
+
+    def register(index):
+        for name in range(200):
+            try:
+                in_memory_repo.add_user(User(f'user{name}', f'password{index}'))
+                added.append(name)
+            except RepositoryException:
+                pass
+
+    run_threads(8, register)
+    assert sorted(added) == list(range(200))
+
+
+def test_readers_see_complete_versions_while_movies_are_added(in_memory_repo):
+    writing = threading.Event()
+    writing.set()
+    ranks = list(range(1, 1501))
+
+    def write_or_read(index):
+        if index == 0:
+            for rank in range(1001, 1501):
+                movie = Movie(f'Movie {rank}', 2020)
+                movie.rank = rank
+                in_memory_repo.add_movie(movie)
+            writing.clear()
+            return
+        while writing.is_set():
+            number_before = in_memory_repo.get_number_of_movies()
+            movies = in_memory_repo.get_movies_by_rank(ranks)
+            number_after = in_memory_repo.get_number_of_movies()
+            assert number_before <= len(movies) <= number_after
+            assert [movie.rank for movie in movies] == ranks[:len(movies)]
+            assert in_memory_repo.get_last_movie().rank >= movies[-1].rank
+
+    run_threads(5, write_or_read)
+    assert in_memory_repo.get_number_of_movies() == 1500
+
+
+def test_repo_can_add_watches(in_memory_repo):
+    user = in_memory_repo.get_user('nton939')
+    in_memory_repo.add_watch(user, in_memory_repo.get_movie(2), datetime(2021, 1, 1))
+    in_memory_repo.add_watch(user, in_memory_repo.get_movie(3), datetime(2021, 1, 2))
+    in_memory_repo.add_watch(user, in_memory_repo.get_movie(2), datetime(2021, 1, 3))
+
+    # The default user watched the first movie when the repository was populated.
+    history = in_memory_repo.get_watch_history(user)
+    assert [watch.rank for watch in history] == [2, 3, 2, 1]
+    assert in_memory_repo.get_watch_history(user, 1, 2) == [Watch(3, datetime(2021, 1, 2)),
+                                                            Watch(2, datetime(2021, 1, 1))]
+    assert in_memory_repo.get_watch_history(user, 4) == []
+    assert user.time_spent_watching_movies_minutes == 121 + 124 + 117 + 124
+
+
+def test_repo_keeps_watch_totals(in_memory_repo):
+    user = in_memory_repo.get_user('nton939')
+    assert in_memory_repo.get_watch_totals(user) == WatchTotals(1, 121, {'Action': 121, 'Adventure': 121,
+                                                                          'Sci-Fi': 121})
+
+    in_memory_repo.add_watch(user, in_memory_repo.get_movie(2))
+    assert in_memory_repo.get_watch_totals(user) == WatchTotals(2, 245, {'Action': 121, 'Adventure': 245,
+                                                                          'Sci-Fi': 245, 'Mystery': 124})
+    assert in_memory_repo.get_watch_totals(User('Dave', '123456789')) == WatchTotals(0, 0, {})
+
+
+def test_repo_does_not_add_watch_of_unknown_user_or_movie(in_memory_repo):
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_watch(User('Dave', '123456789'), in_memory_repo.get_movie(1))
+    movie = Movie('Unknown', 2021)
+    movie.rank = 2000
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_watch(in_memory_repo.get_user('nton939'), movie)
+    assert len(in_memory_repo.get_watch_history(in_memory_repo.get_user('nton939'))) == 1
+
+
+def test_repo_adds_watches_of_a_group_or_none_of_them(in_memory_repo):
+    users = [User(f'member{i}', 'password') for i in range(3)]
+    for user in users:
+        in_memory_repo.add_user(user)
+    in_memory_repo.add_watches(users, in_memory_repo.get_movie(2), datetime(2021, 1, 1))
+    assert [in_memory_repo.get_watch_history(user) for user in users] == [[Watch(2, datetime(2021, 1, 1))]] * 3
+    assert users[0].time_spent_watching_movies_minutes == 124
+
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_watches(users + [User('Dave', '123456789')], in_memory_repo.get_movie(3))
+    assert in_memory_repo.get_watch_totals(users[0]).movies_watched == 1
+
+
+def test_repo_can_add_reviews_together(in_memory_repo):
+    reviews = [Review(in_memory_repo.get_movie(rank), 'Seen with friends', 7) for rank in (2, 3)]
+    in_memory_repo.add_reviews(reviews)
+    assert in_memory_repo.get_reviews()[-2:] == reviews
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_reviews([Review(in_memory_repo.get_movie(4), 'Good', 7), Review(None, 'No movie', 7)])
+    assert len(in_memory_repo.get_reviews()) == 3
+
+
 def test_repo_can_add_watchlist(in_memory_repo):
     movies = in_memory_repo.get_movies_by_rank([1, 500, 1000])
     user = in_memory_repo.get_user('nton939')
@@ -160,6 +397,23 @@ def test_repo_can_add_watchlist(in_memory_repo):
     assert len(in_memory_repo.get_watchlist(user)) == 2
 
 
+def test_repo_retrieves_only_the_users_watchlists(in_memory_repo):
+    user = User('Dave', '123456789')
+    in_memory_repo.add_user(user)
+    watchlist = WatchList(user, 'Weekend')
+    watchlist.add_movie(in_memory_repo.get_movie(7))
+    in_memory_repo.add_watchlist(watchlist)
+    assert in_memory_repo.get_watchlist(user) == [watchlist]
+    default_user = in_memory_repo.get_user('nton939')
+    assert [watchlist.watchlist_name for watchlist in in_memory_repo.get_watchlist(default_user)] == ['Watch Later']
+
+
+def test_repo_does_not_add_watchlist_of_unknown_user(in_memory_repo):
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_watchlist(WatchList(User('Dave', '123456789'), 'Weekend'))
+    assert in_memory_repo.get_watchlist(User('Dave', '123456789')) == []
+
+
 def test_repo_can_retrieve_watchlist(in_memory_repo):
     user = in_memory_repo.get_user('nton939')
     watchlist = in_memory_repo.get_watchlist(user)
@@ -0,0 +1,49 @@
+import csv
+import io
+import os
+from movie_app.adapters import memory_repository, parallel_ingest
+from movie_app.adapters.memory_repository import MemoryRepository
+
+
+def rows_of(column, rows):
+    return rows
+
+
+def test_chunk_offsets_split_at_record_boundaries(tmp_path):
+    # Quoted fields with newlines and escaped quotes mustn't be split.
+    records = [['1', 'A "quoted"\nword', 'x'], ['2', 'plain', 'y'], ['3', 'two\nlines\nhere', '"z"'],
+               ['4', '', 'w']] * 20
+    text = io.StringIO(newline='')
+    csv.writer(text).writerows([['Rank', 'Title', 'Extra']] + records)
+    filename = tmp_path / 'movies.csv'
+    filename.write_bytes(text.getvalue().encode('utf-8'))
+
+    column = parallel_ingest.read_columns(str(filename))
+    assert column == {'Rank': 0, 'Title': 1, 'Extra': 2}
+    for chunks in (1, 2, 3, 7, 50, 1000):
+        offsets = parallel_ingest.chunk_offsets(str(filename), chunks)
+        assert 1 <= len(offsets) <= chunks
+        parsed = [row for start, end in offsets
+                  for row in parallel_ingest.parse_chunk((rows_of, str(filename), column, start, end))]
+        assert parsed == records
+
+
+def test_map_chunks_returns_the_chunks_in_file_order(data_path):
+    chunks = list(parallel_ingest.map_chunks(os.path.join(data_path, 'Data1000Movies.csv'), rows_of, 2))
+    assert len(chunks) > 2
+    assert [int(row[0]) for chunk in chunks for row in chunk] == list(range(1, 1001))
+
+
+def test_populating_in_parallel_loads_the_same_repository(data_path, in_memory_repo):
+    repo = MemoryRepository()
+    memory_repository.populate(data_path, repo, workers=2)
+    ranks = range(1, 1001)
+    assert [(movie.title, movie.director, movie.actors, movie.genres, movie.revenue)
+            for movie in repo.get_movies_by_rank(ranks)] == \
+        [(movie.title, movie.director, movie.actors, movie.genres, movie.revenue)
+         for movie in in_memory_repo.get_movies_by_rank(ranks)]
+    assert repo.get_genres() == in_memory_repo.get_genres()
+    assert repo.get_number_of_movies() == in_memory_repo.get_number_of_movies()
+    assert repo.get_actor('Chris Pratt') == in_memory_repo.get_actor('Chris Pratt')
+    # Movies parsed in different chunks share their genres.
+    assert repo.get_movie(1).genres[0] is repo.get_movie(994).genres[0]
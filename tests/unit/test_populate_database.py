@@ -6,7 +6,8 @@ def test_database_populate_inspect_table_names(database_engine):
     # Get table information
     inspector = inspect(database_engine)
     assert inspector.get_table_names() == ['actors', 'directors', 'genres', 'movie_actors', 'movie_genres', 'movies',
-                                           'reviews', 'user_watched_movies', 'users']
+                                           'name_trigrams', 'reviews', 'user_watched_movies', 'users',
+                                           'watch_time_by_genre', 'watchlist_items', 'watchlists']
 
 
 def test_database_populate_select_all_directors(database_engine):
@@ -91,7 +92,7 @@ def test_database_populate_select_all_movies(database_engine):
 def test_database_populate_select_all_reviews(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_reviews_table = inspector.get_table_names()[6]
+    name_of_reviews_table = inspector.get_table_names()[7]
 
     with database_engine.connect() as connection:
         # query for records in table reviews
@@ -108,7 +109,7 @@ def test_database_populate_select_all_reviews(database_engine):
 def test_database_populate_select_all_users(database_engine):
     # Get table information
     inspector = inspect(database_engine)
-    name_of_users_table = inspector.get_table_names()[8]
+    name_of_users_table = inspector.get_table_names()[9]
 
     with database_engine.connect() as connection:
         # query for records in table users
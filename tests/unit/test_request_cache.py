@@ -0,0 +1,71 @@
+from movie_app.adapters.request_cache import RequestScopedRepository
+from movie_app.domain.model import Review, User
+
+
+class CountingRepository:
+    """ Counts the calls made to the wrapped repository's methods. """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.calls = dict()
+
+    def __getattr__(self, name):
+        method = getattr(self.repo, name)
+
+        def counted(*args):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return method(*args)
+        return counted
+
+
+def test_reads_are_memoized_within_a_scope(in_memory_repo):
+    backend = CountingRepository(in_memory_repo)
+    repo = RequestScopedRepository(backend)
+
+    repo.begin_scope()
+    assert repo.get_movie(1) is repo.get_movie(1)
+    repo.get_movie(2)
+    repo.get_reviews()
+    repo.get_reviews()
+    assert backend.calls == {'get_movie': 2, 'get_reviews': 1}
+    assert repo.end_scope() == 2
+
+    # A new scope starts with an empty memo.
+    repo.begin_scope()
+    repo.get_movie(1)
+    assert backend.calls['get_movie'] == 3
+    repo.end_scope()
+
+
+def test_reads_outside_a_scope_are_not_memoized(in_memory_repo):
+    backend = CountingRepository(in_memory_repo)
+    repo = RequestScopedRepository(backend)
+    repo.get_movie(1)
+    repo.get_movie(1)
+    assert backend.calls['get_movie'] == 2
+    assert repo.end_scope() is None
+
+
+def test_get_movies_by_rank_answers_later_get_movie_calls(in_memory_repo):
+    backend = CountingRepository(in_memory_repo)
+    repo = RequestScopedRepository(backend)
+
+    repo.begin_scope()
+    movies = repo.get_movies_by_rank([1, 2, 3])
+    assert repo.get_movie(2) is movies[1]
+    assert 'get_movie' not in backend.calls
+    repo.end_scope()
+
+
+def test_writes_drop_memoized_reads(in_memory_repo):
+    repo = RequestScopedRepository(in_memory_repo)
+
+    repo.begin_scope()
+    number_of_reviews = len(repo.get_reviews())
+    assert repo.get_user('dave') is None
+
+    repo.add_review(Review(repo.get_movie(1), 'Great!', 9))
+    repo.add_user(User('dave', '123456789'))
+    assert len(repo.get_reviews()) == number_of_reviews + 1
+    assert repo.get_user('dave') == User('dave', '123456789')
+    repo.end_scope()
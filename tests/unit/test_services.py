@@ -1,8 +1,9 @@
 from movie_app.authentication import services as auth_services
 from movie_app.authentication.services import AuthenticationException
 from movie_app.movies import services as movies_services
-from movie_app.movies.services import NonExistentMovieException
+from movie_app.movies.services import NonExistentMovieException, UnknownUserException
 from movie_app.utilities import services as utility_services
+from movie_app.domain.model import MovieWatchingSimulation, User
 import pytest
 
 
@@ -22,6 +23,13 @@ def test_cannot_add_user_with_existing_name(in_memory_repo):
         auth_services.add_user(username, password, in_memory_repo)
 
 
+def test_cannot_add_user_whose_name_is_taken_after_the_check(in_memory_repo, monkeypatch):
+    # Simulate a concurrent registration of the username after add_user checked that it was available.
+    monkeypatch.setattr(in_memory_repo, 'get_user', lambda username: None)
+    with pytest.raises(auth_services.NameNotUniqueException):
+        auth_services.add_user('nton939', 'Abcd123', in_memory_repo)
+
+
 def test_authentication_with_valid_credentials(in_memory_repo):
     new_username = 'new_user'
     new_password = 'Abcd123'
@@ -152,6 +160,40 @@ def test_get_reviews_for_movie_without_reviews(in_memory_repo):
     assert len(reviews_as_dict) == 0
 
 
+def test_can_watch_movie(in_memory_repo):
+    movies_services.watch_movie(2, 'nton939', in_memory_repo)
+
+    history = movies_services.get_watch_history('nton939', 0, 10, in_memory_repo)
+    assert [watch['movie_rank'] for watch in history] == [2, 1]
+    totals = movies_services.get_watch_totals('nton939', in_memory_repo)
+    assert totals['movies_watched'] == 2 and totals['minutes'] == 245
+    assert totals['genre_minutes'][:2] == [('Adventure', 245), ('Sci-Fi', 245)]
+
+
+def test_cannot_watch_non_existent_movie_or_as_unknown_user(in_memory_repo):
+    with pytest.raises(NonExistentMovieException):
+        movies_services.watch_movie(0, 'nton939', in_memory_repo)
+    with pytest.raises(UnknownUserException):
+        movies_services.watch_movie(2, 'dave', in_memory_repo)
+    with pytest.raises(UnknownUserException):
+        movies_services.get_watch_totals('dave', in_memory_repo)
+
+
+def test_can_watch_and_review_together(in_memory_repo):
+    admin = in_memory_repo.get_user('nton939')
+    simulation = MovieWatchingSimulation(admin, in_memory_repo.get_movie(2))
+    for username in ('x', 'y'):
+        in_memory_repo.add_user(User(username, 'password'))
+        simulation.add_user(in_memory_repo.get_user(username))
+
+    assert movies_services.watch_together(simulation, in_memory_repo) == 3
+    assert movies_services.watch_together(simulation, in_memory_repo) == 0
+    assert movies_services.get_watch_totals('y', in_memory_repo)['minutes'] == 124
+    assert movies_services.review_together(simulation, 'Seen with friends', 8, in_memory_repo) == 3
+    assert len(movies_services.get_reviews_for_movie(2, in_memory_repo)) == 3
+    assert in_memory_repo.get_user('x').reviews[0].rating == 8
+
+
 def test_get_genres_from_utilities(in_memory_repo):
     genre_names = utility_services.get_genre_names(in_memory_repo)
     assert len(genre_names) == 20
@@ -0,0 +1,66 @@
+from movie_app.adapters.repository import Suggestion
+from movie_app.adapters.suggest import SuggestIndex, normalize
+from movie_app.domain.model import Director, Actor, Movie
+
+
+def make_movie(rank, title, votes, director_name, actor_names=()):
+    movie = Movie(title, 2020)
+    movie.rank = rank
+    movie.votes = votes
+    movie.director = Director(director_name)
+    for actor_name in actor_names:
+        movie.add_actor(Actor(actor_name))
+    return movie
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize('Amélie (Le Fabuleux)') == 'amelie le fabuleux'
+    assert normalize('  Spider-Man:   Homecoming ') == 'spider man homecoming'
+    assert normalize('!!') == ''
+
+
+def test_suggestions_match_a_prefix_of_any_word():
+    index = SuggestIndex().with_movies([
+        make_movie(1, 'The Dark Knight', 100, 'Christopher Nolan', ['Heath Ledger']),
+        make_movie(2, 'Knight and Day', 50, 'James Mangold'),
+        make_movie(3, 'Dark Dark Room', 10, 'Someone Else'),
+    ])
+    assert [suggestion.name for suggestion in index.suggest('knig')] == ['The Dark Knight', 'Knight and Day']
+    assert [suggestion.name for suggestion in index.suggest('DARK K')] == ['The Dark Knight']
+    # Dark Dark Room matches twice, but is suggested once.
+    assert [suggestion.name for suggestion in index.suggest('dark')] == ['The Dark Knight', 'Dark Dark Room']
+    assert index.suggest('nolan') == [Suggestion('director', 'Christopher Nolan', None, 100)]
+    assert index.suggest('') == [] and index.suggest('zzz') == []
+
+
+def test_suggestions_are_ranked_by_votes_and_limited():
+    index = SuggestIndex().with_movies([make_movie(rank, f'Movie {rank}', rank * 10, 'Director')
+                                        for rank in range(1, 31)])
+    # Short prefixes are remembered, so ask twice.
+    for _ in range(2):
+        assert [suggestion.rank for suggestion in index.suggest('mo', 3)] == [30, 29, 28]
+    assert [suggestion.rank for suggestion in index.suggest('movie 1', 2)] == [19, 18]
+
+
+def test_people_have_the_votes_of_all_their_movies():
+    index = SuggestIndex().with_movies([make_movie(1, 'First', 100, 'Jane Doe', ['Sam Actor'])])
+    new_index = index.with_movies([make_movie(2, 'Second', 50, 'Jane Doe', ['Other Actor'])])
+
+    assert index.suggest('jane') == [Suggestion('director', 'Jane Doe', None, 100)]
+    assert new_index.suggest('jane') == [Suggestion('director', 'Jane Doe', None, 150)]
+    assert new_index.suggest('actor') == [Suggestion('actor', 'Sam Actor', None, 100),
+                                          Suggestion('actor', 'Other Actor', None, 50)]
+
+
+def test_incremental_index_agrees_with_one_built_at_once():
+    movies = [make_movie(rank, f'Movie {rank}', rank, f'Director {rank % 3}', [f'Actor {rank % 5}'])
+              for rank in range(1, 121)]
+    incremental = SuggestIndex()
+    for movie in movies:
+        incremental = incremental.with_movies([movie])
+    # More movies than are inserted one by one, so the index is built again.
+    at_once = SuggestIndex().with_movies(movies)
+
+    assert len(incremental) == len(at_once)
+    for prefix in ('m', 'movie 1', 'director', 'actor 4'):
+        assert incremental.suggest(prefix, 20) == at_once.suggest(prefix, 20)
@@ -0,0 +1,43 @@
+import pytest
+from movie_app.movies import view_models
+from movie_app.movies.view_models import MovieViewCache, for_page
+
+
+def test_view_model_is_built_once_and_is_read_only(in_memory_repo):
+    cache = MovieViewCache()
+    movie = in_memory_repo.get_movie(1)
+    view = cache.get(movie)
+    assert cache.get(movie) is view
+
+    assert view['title'] == 'Guardians of the Galaxy'
+    assert view['director']['director_name'] == 'James Gunn'
+    assert [genre['genre_name'] for genre in view['genres']] == ['Action', 'Adventure', 'Sci-Fi']
+    with pytest.raises(TypeError):
+        view['title'] = 'Changed'
+    with pytest.raises(TypeError):
+        view['director']['director_name'] = 'Changed'
+    with pytest.raises(AttributeError):
+        view['actors'].append('Changed')
+
+
+def test_view_model_is_rebuilt_after_invalidation(in_memory_repo):
+    cache = MovieViewCache()
+    movie = in_memory_repo.get_movie(1)
+    view = cache.get(movie)
+
+    movie.description = 'A new description.'
+    assert cache.get(movie) is view
+    cache.invalidate(1)
+    assert cache.get(movie)['description'] == 'A new description.'
+
+    # A different movie with the same rank, e.g. from another data set, doesn't get the cached view model.
+    other_movie = in_memory_repo.get_movie(2)
+    other_movie.rank = 1
+    assert cache.get(other_movie)['title'] == 'Prometheus'
+
+
+def test_page_values_do_not_change_the_shared_view_model(in_memory_repo):
+    view = view_models.build_movie_view(in_memory_repo.get_movie(1))
+    page_movie = for_page(view, reviews=[], add_review_url='/review?movie=1')
+    assert page_movie['reviews'] == [] and page_movie['rank'] == 1
+    assert 'reviews' not in view
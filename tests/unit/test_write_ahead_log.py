@@ -0,0 +1,119 @@
+import os
+from movie_app.adapters.write_ahead_log import WriteAheadLog
+from movie_app.domain.model import Review, User
+
+
+def test_users_and_reviews_survive_restart(tmp_path, in_memory_repo_factory):
+    log_path = str(tmp_path / 'movie.log')
+    repo = in_memory_repo_factory()
+    repo.attach_log(WriteAheadLog(log_path))
+
+    repo.add_user(User('yeezy', 'hashed-password'))
+    review = Review(repo.get_movie(2), 'Scary but great', 8)
+    repo.add_review(review)
+
+    # Simulate a restart: populate a new repository, then replay the log.
+    restarted = in_memory_repo_factory()
+    applied = WriteAheadLog(log_path).replay(restarted)
+
+    assert applied == 2
+    assert restarted.get_user('yeezy').password == 'hashed-password'
+    replayed = [r for r in restarted.get_reviews() if r.movie == restarted.get_movie(2)]
+    assert len(replayed) == 1
+    assert replayed[0].review_text == 'Scary but great'
+    assert replayed[0].timestamp == review.timestamp
+
+
+def test_watches_survive_restart(tmp_path, in_memory_repo_factory):
+    log_path = str(tmp_path / 'movie.log')
+    repo = in_memory_repo_factory()
+    log = WriteAheadLog(log_path, compact_every=3)
+    repo.attach_log(log)
+
+    user = User('yeezy', 'hashed-password')
+    repo.add_user(user)
+    for rank in (2, 3, 4):
+        repo.add_watch(user, repo.get_movie(rank))
+
+    # The user and the first two watches were compacted into the snapshot, which must replay users first.
+    restarted = in_memory_repo_factory()
+    assert WriteAheadLog(log_path).replay(restarted) == 4
+    restarted_user = restarted.get_user('yeezy')
+    assert restarted.get_watch_history(restarted_user) == repo.get_watch_history(user)
+    assert restarted.get_watch_totals(restarted_user) == repo.get_watch_totals(user)
+    assert restarted_user.time_spent_watching_movies_minutes == user.time_spent_watching_movies_minutes
+
+
+def test_group_watches_and_reviews_survive_restart(tmp_path, in_memory_repo_factory):
+    log_path = str(tmp_path / 'movie.log')
+    repo = in_memory_repo_factory()
+    repo.attach_log(WriteAheadLog(log_path))
+
+    users = [User(f'member{i}', 'hashed-password') for i in range(3)]
+    for user in users:
+        repo.add_user(user)
+    repo.add_watches(users, repo.get_movie(2))
+    repo.add_reviews([Review(repo.get_movie(2), 'Seen with friends', 7) for user in users])
+
+    restarted = in_memory_repo_factory()
+    assert WriteAheadLog(log_path).replay(restarted) == 9
+    assert restarted.get_watch_history(restarted.get_user('member2')) == repo.get_watch_history(users[2])
+    assert len(restarted.get_reviews()) == len(repo.get_reviews())
+
+
+def test_replay_does_not_append_to_log(tmp_path, in_memory_repo_factory):
+    log_path = str(tmp_path / 'movie.log')
+    repo = in_memory_repo_factory()
+    repo.attach_log(WriteAheadLog(log_path))
+    repo.add_user(User('yeezy', 'hashed-password'))
+    size_before = os.path.getsize(log_path)
+
+    restarted = in_memory_repo_factory()
+    log = WriteAheadLog(log_path)
+    log.replay(restarted)
+    restarted.attach_log(log)
+
+    assert os.path.getsize(log_path) == size_before
+    assert log.records_in_log == 1
+
+
+def test_replay_ignores_torn_tail(tmp_path, in_memory_repo_factory):
+    log_path = str(tmp_path / 'movie.log')
+    log = WriteAheadLog(log_path)
+    log.append_user(User('first', 'password1'))
+    log.append_user(User('second', 'password2'))
+    log.close()
+
+    # Cut the last record in half, as a crash in the middle of a write would.
+    with open(log_path, mode='r+b') as logfile:
+        logfile.truncate(os.path.getsize(log_path) - 5)
+
+    repo = in_memory_repo_factory()
+    recovered = WriteAheadLog(log_path)
+    assert recovered.replay(repo) == 1
+    assert repo.get_user('first') is not None
+    assert repo.get_user('second') is None
+
+    # New records are appended after the last intact record.
+    recovered.append_user(User('third', 'password3'))
+    recovered.close()
+    repo = in_memory_repo_factory()
+    assert WriteAheadLog(log_path).replay(repo) == 2
+    assert repo.get_user('third') is not None
+
+
+def test_log_is_compacted_into_snapshot(tmp_path, in_memory_repo_factory):
+    log_path = str(tmp_path / 'movie.log')
+    repo = in_memory_repo_factory()
+    log = WriteAheadLog(log_path, compact_every=3)
+    repo.attach_log(log)
+
+    for i in range(4):
+        repo.add_user(User(f'user{i}', 'password'))
+
+    assert os.path.exists(log.snapshot_path)
+    assert log.records_in_log == 1
+
+    restarted = in_memory_repo_factory()
+    assert WriteAheadLog(log_path).replay(restarted) == 4
+    assert all(restarted.get_user(f'user{i}') is not None for i in range(4))